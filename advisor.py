@@ -1,9 +1,8 @@
 import streamlit as st
 import os
-from openai import AzureOpenAI
-from dotenv import load_dotenv
 import json
 from agents.fundamental_agent import FundamentalAgent
+from pipeline.analysis_store import AnalysisStore
 from agents.portfolio_manager import PortfolioManager
 
 # --- Helper functions from run_advisor.py ---
@@ -25,8 +24,33 @@ def get_investment_profile(client):
     )
     return response.choices[0].message.content
 
+@st.cache_resource(show_spinner=False)
+def get_openai_client():
+    """One AzureOpenAI client for the whole server process (cassette-backed when BIONIC_CASSETTE is set)"""
+    from dotenv import load_dotenv
+    from agents.cassette import cassette_client
+    load_dotenv()
+
+    def make_client():
+        from openai import AzureOpenAI
+        return AzureOpenAI(
+            api_version="2024-12-01-preview",
+            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT", "https://bionicadvisor.openai.azure.com/"),
+            api_key=os.getenv("AZURE_OPENAI_API_KEY")
+        )
+    return cassette_client(make_client)
+
+@st.cache_resource(show_spinner=False)
+def get_fundamental_agent():
+    """Analyses are shared by all clients through data/analyses.sqlite3"""
+    return FundamentalAgent(store=AnalysisStore())
+
+@st.cache_resource(show_spinner=False)
+def get_portfolio_manager():
+    return PortfolioManager()
+
 def analyze_stocks(tickers: list, context: dict) -> dict:
-    fundamental_agent = FundamentalAgent()
+    fundamental_agent = get_fundamental_agent()
     analyses = {}
     for ticker in tickers:
         analysis = fundamental_agent.analyze(ticker, context)
@@ -34,7 +58,7 @@ def analyze_stocks(tickers: list, context: dict) -> dict:
     return analyses
 
 def generate_portfolio(tickers: list, analyses: dict, context: dict) -> dict:
-    portfolio_manager = PortfolioManager()
+    portfolio_manager = get_portfolio_manager()
     portfolio = portfolio_manager.analyze(tickers, analyses, context)
     return portfolio
 
@@ -50,14 +74,7 @@ if 'portfolio' not in st.session_state:
     st.session_state.portfolio = None
 
 if st.button("Generate Investment Profile & Portfolio"):
-    load_dotenv()
-    endpoint = "https://bionicadvisor.openai.azure.com/"
-    api_version = "2024-12-01-preview"
-    client = AzureOpenAI(
-        api_version=api_version,
-        azure_endpoint=endpoint,
-        api_key=os.getenv("AZURE_OPENAI_API_KEY")
-    )
+    client = get_openai_client()
     profile = get_investment_profile(client)
     st.session_state.profile = json.loads(profile)
     sample_tickers = ["AAPL", "MSFT", "GOOGL", "AMZN", "META"]
@@ -1,5 +1,18 @@
-from .base_agent import BaseAgent
-from .fundamental_agent import FundamentalAgent
-from .portfolio_manager import PortfolioManager
+import importlib
 
-__all__ = ['BaseAgent', 'FundamentalAgent', 'PortfolioManager'] 
\ No newline at end of file
+# Agents are resolved lazily so `import agents` does not pull in openai/dotenv
+_EXPORTS = {
+    'BaseAgent': '.base_agent',
+    'FundamentalAgent': '.fundamental_agent',
+    'PortfolioManager': '.portfolio_manager',
+    'Budget': '.usage',
+    'BudgetExceeded': '.usage',
+    'track_run': '.usage',
+}
+
+__all__ = ['BaseAgent', 'FundamentalAgent', 'PortfolioManager', 'Budget', 'BudgetExceeded', 'track_run']
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
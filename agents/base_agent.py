@@ -1,19 +1,35 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List, Any
-from openai import AzureOpenAI
+from typing import Dict, List, Any, Optional
 import os
-from dotenv import load_dotenv
 import time
 import random
+from .cassette import cassette_client
+from .routing import get_router
+from .usage import MAX_RESPONSE_TOKENS, current_run, derived_max_tokens
 
 class BaseAgent(ABC):
+    # Response limit used until enough outputs have been observed to derive one
+    max_tokens = MAX_RESPONSE_TOKENS
+    # Routing key selecting the deployments this agent's calls go to (see routing.ROUTES)
+    task = "default"
+
     def __init__(self):
+        # Imported here so modules that only reference agents don't pay for the LLM stack
+        from dotenv import load_dotenv
         load_dotenv()
-        self.client = AzureOpenAI(
-            api_version="2024-12-01-preview",
-            azure_endpoint="https://bionicadvisor.openai.azure.com/",
-            api_key=os.getenv("AZURE_OPENAI_API_KEY")
-        )
+
+        def make_client():
+            from openai import AzureOpenAI
+            return AzureOpenAI(
+                api_version="2024-12-01-preview",
+                azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT", "https://bionicadvisor.openai.azure.com/"),
+                api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                max_retries=0  # failover and backoff happen in the Router and get_llm_response
+            )
+
+        # Recorded to / replayed from a cassette when BIONIC_CASSETTE is set
+        self.client = cassette_client(make_client)
+        self.router = get_router()
     
     @abstractmethod
     def analyze(self, ticker: str, context: Dict[str, Any]) -> Dict[str, Any]:
@@ -27,25 +43,37 @@ class BaseAgent(ABC):
         """
         pass
     
-    def get_llm_response(self, system_prompt: str, user_prompt: str) -> str:
+    def get_llm_response(self, system_prompt: str, user_prompt: str, max_tokens: Optional[int] = None) -> str:
         """
-        Get response from Azure OpenAI with retry mechanism for rate limits
+        Get response from Azure OpenAI with retry mechanism for rate limits.
+        Usage is recorded per call; a tracked run's budget is checked before each attempt.
+        Calls are routed, hedged and failed over by the process-wide Router.
         """
         max_retries = 5
         base_delay = 2  # Base delay in seconds
+        agent_name = type(self).__name__
+        limit = max_tokens or derived_max_tokens(agent_name, self.max_tokens)
         
         for attempt in range(max_retries):
+            run = current_run()
+            if run is not None:
+                run.check()
             try:
-                response = self.client.chat.completions.create(
+                response = self.router.complete(
+                    agent_name, self.task, self.client,
                     messages=[
                         {"role": "system", "content": system_prompt},
                         {"role": "user", "content": user_prompt}
                     ],
-                    max_tokens=4096,
+                    max_tokens=limit,
                     temperature=0.7,
-                    model="gpt-35-turbo",
                     response_format={ "type": "json_object" }  # Force JSON response
                 )
+                if response.choices[0].finish_reason == 'length' and limit < MAX_RESPONSE_TOKENS and attempt < max_retries - 1:
+                    # A cut-off JSON object is useless; retry once with the full allowance
+                    print(f"Response truncated at {limit} tokens. Retrying with {MAX_RESPONSE_TOKENS}...")
+                    limit = MAX_RESPONSE_TOKENS
+                    continue
                 return response.choices[0].message.content
             except Exception as e:
                 if "429" in str(e) and attempt < max_retries - 1:
@@ -0,0 +1,258 @@
+"""
+Record/replay of chat completions ("cassettes").
+
+Recording wraps a real client and appends every request/response pair, with
+its latency, to a JSON Lines cassette. Replaying serves the recorded responses
+without a network or credentials, sleeping the original latency (scaled, or
+not at all), so a whole pipeline run can be reproduced offline and timed.
+
+Enable for any process with environment variables:
+
+    BIONIC_CASSETTE=runs/slow_run.jsonl
+    BIONIC_CASSETTE_MODE=record | replay
+    BIONIC_CASSETTE_LATENCY=original | zero | <scale factor>    (replay only)
+
+Cassette lines are either a text blob {"text": hash, "content": ...}, written
+the first time a prompt text is seen (system prompts repeat on every call, so
+each is stored once), or an interaction:
+
+    {"key", "model", "messages": [[role, text hash], ...], "params",
+     "offset", "latency", "response": {...}} or {..., "error": message}
+
+Requests are matched by a hash of their messages and response format.
+Identical requests replay their recordings in order. Once those are used up,
+the last recording for the request is repeated.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+RECORD = "record"
+REPLAY = "replay"
+
+# Request parameters that vary between otherwise identical calls and are not matched on
+UNMATCHED_PARAMS = ('model', 'max_tokens', 'temperature', 'top_p')
+
+
+class CassetteMiss(KeyError):
+    """Raised in replay mode for a request the cassette has no recording of"""
+
+
+class RecordedError(RuntimeError):
+    """A recorded API error, raised again on replay"""
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+def request_key(messages: List[Dict[str, Any]], params: Dict[str, Any]) -> str:
+    matched = {k: v for k, v in params.items() if k not in UNMATCHED_PARAMS and k != 'messages'}
+    payload = json.dumps({'messages': [[m.get('role'), m.get('content')] for m in messages], 'params': matched},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:24]
+
+
+def response_from_dict(data: Dict[str, Any]) -> SimpleNamespace:
+    """Object shaped like an openai ChatCompletion (the attributes the agents read)"""
+    return SimpleNamespace(
+        id=data.get('id'),
+        model=data.get('model'),
+        choices=[SimpleNamespace(index=0, finish_reason=data.get('finish_reason', 'stop'),
+                                 message=SimpleNamespace(role='assistant', content=data.get('content')))],
+        usage=SimpleNamespace(prompt_tokens=data.get('prompt_tokens', 0),
+                              completion_tokens=data.get('completion_tokens', 0),
+                              total_tokens=data.get('prompt_tokens', 0) + data.get('completion_tokens', 0)),
+    )
+
+
+def response_to_dict(response: Any) -> Dict[str, Any]:
+    choice = response.choices[0]
+    usage = getattr(response, 'usage', None)
+    return {
+        'id': getattr(response, 'id', None),
+        'model': getattr(response, 'model', None),
+        'content': choice.message.content,
+        'finish_reason': choice.finish_reason,
+        'prompt_tokens': int(getattr(usage, 'prompt_tokens', 0) or 0),
+        'completion_tokens': int(getattr(usage, 'completion_tokens', 0) or 0),
+    }
+
+
+class Cassette:
+    """
+    One cassette file in record or replay mode.
+
+    Args:
+        path: JSON Lines cassette file
+        mode: "record" (appends to the file) or "replay"
+        latency_scale: Replay sleeps recorded latency x this (1.0 original, 0 none)
+    """
+
+    def __init__(self, path: str, mode: str = REPLAY, latency_scale: float = 1.0):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode '{mode}'. Use '{RECORD}' or '{REPLAY}'")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.started = time.perf_counter()
+        self.texts: Dict[str, str] = {}
+        self.interactions: Dict[str, List[Dict[str, Any]]] = {}
+        self.replayed: Dict[str, int] = {}
+        self.recorded = 0
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            self._load()
+        elif mode == REPLAY:
+            raise FileNotFoundError(f"Cassette not found: {path}")
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def _load(self):
+        with open(self.path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if 'text' in entry:
+                    self.texts[entry['text']] = entry['content']
+                else:
+                    self.interactions.setdefault(entry['key'], []).append(entry)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self.interactions.values())
+
+    def _append(self, lines: List[Dict[str, Any]]):
+        with open(self.path, 'a') as f:
+            for line in lines:
+                f.write(json.dumps(line, separators=(',', ':')) + "\n")
+
+    def record(self, messages: List[Dict[str, Any]], params: Dict[str, Any], latency: float, started: float,
+               response: Any = None, error: Optional[Exception] = None):
+        key = request_key(messages, params)
+        entry = {
+            'key': key,
+            'model': params.get('model'),
+            'messages': [[m.get('role'), text_hash(m.get('content') or '')] for m in messages],
+            'params': {k: v for k, v in params.items() if k not in ('model', 'messages')},
+            'offset': round(started - self.started, 4),
+            'latency': round(latency, 4),
+        }
+        if error is not None:
+            entry['error'] = str(error)
+        else:
+            entry['response'] = response_to_dict(response)
+        with self._lock:
+            lines = []
+            for message in messages:
+                content = message.get('content') or ''
+                digest = text_hash(content)
+                if digest not in self.texts:
+                    self.texts[digest] = content
+                    lines.append({'text': digest, 'content': content})
+            lines.append(entry)
+            self.interactions.setdefault(key, []).append(entry)
+            self.recorded += 1
+            self._append(lines)
+
+    def replay(self, messages: List[Dict[str, Any]], params: Dict[str, Any]) -> Any:
+        key = request_key(messages, params)
+        with self._lock:
+            entries = self.interactions.get(key)
+            if not entries:
+                prompt = (messages[-1].get('content') or '')[:80] if messages else ''
+                raise CassetteMiss(f"No recording in {self.path} for request starting {prompt!r}")
+            index = self.replayed.get(key, 0)
+            self.replayed[key] = index + 1
+            entry = entries[min(index, len(entries) - 1)]
+        if self.latency_scale > 0:
+            time.sleep(entry['latency'] * self.latency_scale)
+        if 'error' in entry:
+            raise RecordedError(entry['error'])
+        return response_from_dict(entry['response'])
+
+    def create(self, client_factory: Callable[[], Any], **params) -> Any:
+        """chat.completions.create through the cassette (client_factory is only called when recording)"""
+        messages = params.get('messages', [])
+        if self.mode == REPLAY:
+            return self.replay(messages, params)
+        started = time.perf_counter()
+        try:
+            response = client_factory().chat.completions.create(**params)
+        except Exception as e:
+            self.record(messages, params, time.perf_counter() - started, started, error=e)
+            raise
+        self.record(messages, params, time.perf_counter() - started, started, response=response)
+        return response
+
+    def wrap(self, client: Any = None) -> "CassetteClient":
+        return CassetteClient(self, client)
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-model call count and latency of the recorded interactions"""
+        models: Dict[str, Dict[str, float]] = {}
+        for entries in self.interactions.values():
+            for entry in entries:
+                stats = models.setdefault(entry.get('model') or 'unknown', {'calls': 0, 'errors': 0, 'latency': 0.0})
+                stats['calls'] += 1
+                stats['errors'] += int('error' in entry)
+                stats['latency'] = round(stats['latency'] + entry['latency'], 4)
+        return {'path': self.path, 'interactions': len(self), 'distinct_requests': len(self.interactions),
+                'texts': len(self.texts), 'models': models}
+
+
+class CassetteClient:
+    """Drop-in for an AzureOpenAI client whose chat completions go through a cassette"""
+
+    def __init__(self, cassette: Cassette, client: Any = None):
+        self.cassette = cassette
+        self.client = client
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **params) -> Any:
+        return self.cassette.create(lambda: self.client, **params)
+
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def active_cassette() -> Optional[Cassette]:
+    """Process-wide cassette configured by BIONIC_CASSETTE*, or None"""
+    global _cassette
+    path = os.getenv("BIONIC_CASSETTE")
+    if not path:
+        return None
+    with _cassette_lock:
+        if _cassette is None or os.path.abspath(_cassette.path) != os.path.abspath(path):
+            latency = os.getenv("BIONIC_CASSETTE_LATENCY", "original")
+            scale = {'original': 1.0, 'zero': 0.0}.get(latency)
+            _cassette = Cassette(path, os.getenv("BIONIC_CASSETTE_MODE", REPLAY),
+                                 float(latency) if scale is None else scale)
+        return _cassette
+
+
+def cassette_client(factory: Callable[[], Any]) -> Any:
+    """
+    Client for LLM calls honouring the active cassette.
+
+    Without a cassette this is just factory(). When replaying, the factory is
+    never called, so no credentials or network are needed.
+    """
+    cassette = active_cassette()
+    if cassette is None:
+        return factory()
+    return cassette.wrap(None if cassette.mode == REPLAY else factory())
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize a recorded cassette")
+    parser.add_argument("path")
+    args = parser.parse_args()
+    print(json.dumps(Cassette(args.path).summary(), indent=2))
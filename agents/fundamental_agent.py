@@ -1,36 +1,99 @@
 from .base_agent import BaseAgent
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import json
 
+SCORE_FIELDS = ('financial_health', 'growth_potential', 'competitive_position', 'management_quality')
+
+# Weight of each score in the profile-specific overall_score
+RISK_WEIGHTS = {
+    'low': {'financial_health': 0.4, 'growth_potential': 0.15, 'competitive_position': 0.25, 'management_quality': 0.2},
+    'moderate': {'financial_health': 0.25, 'growth_potential': 0.25, 'competitive_position': 0.25, 'management_quality': 0.25},
+    'high': {'financial_health': 0.15, 'growth_potential': 0.4, 'competitive_position': 0.25, 'management_quality': 0.2},
+}
+# Shift from financial health towards growth for longer horizons
+HORIZON_SHIFT = {'short_term': -0.05, 'medium_term': 0.0, 'long_term': 0.05}
+
+
+def adjust_for_profile(analysis: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Profile-specific view of a profile-independent analysis.
+
+    overall_score is recomputed from the component scores with weights for the
+    client's risk tolerance and horizon; the shared score is kept as base_score.
+    Recommendations are left as analyzed. Adjusting an already adjusted
+    analysis for another profile gives the same result as adjusting the base.
+    """
+    weights = dict(RISK_WEIGHTS.get(str(context.get('risk_tolerance', 'moderate')).lower(), RISK_WEIGHTS['moderate']))
+    shift = HORIZON_SHIFT.get(str(context.get('investment_horizon', 'medium_term')).lower(), 0.0)
+    weights['growth_potential'] += shift
+    weights['financial_health'] -= shift
+
+    total = weighted = 0.0
+    for field, weight in weights.items():
+        try:
+            score = float(analysis.get(field))
+        except (TypeError, ValueError):
+            continue
+        if score == score:  # skip NaN
+            weighted += weight * score
+            total += weight
+    adjusted = dict(analysis)
+    if total > 0:
+        adjusted['base_score'] = analysis.get('base_score', analysis.get('overall_score'))
+        adjusted['overall_score'] = round(weighted / total, 4)
+    return adjusted
+
+
 class FundamentalAgent(BaseAgent):
-    def __init__(self):
+    """
+    Per-ticker fundamental analysis.
+
+    The LLM analysis does not depend on the client; with a store it is shared
+    by every client and computed at most once per ticker per day, and the
+    client's profile is applied by adjust_for_profile().
+
+    Args:
+        store: Optional AnalysisStore (pipeline.analysis_store) to share analyses through
+    """
+    # A single-ticker JSON analysis is a few hundred tokens
+    max_tokens = 1024
+    # Many small calls: the cheap/fast deployment
+    task = "scoring"
+
+    def __init__(self, store=None):
         super().__init__()
+        self.store = store
+        # Identical for every call so the provider can cache it as a prompt prefix
         self.system_prompt = """You are an expert fundamental analyst. Analyze the given stock based on:
-        1. Financial ratios (P/E, P/B, ROE, etc.)
-        2. Growth metrics (revenue growth, earnings growth)
-        3. Financial health (debt levels, cash flow)
-        4. Competitive position
-        5. Management quality
-        
-        Return your analysis as a JSON object with the following structure:
-        {
-            "financial_health": float,  # Score from 0-1
-            "growth_potential": float,  # Score from 0-1
-            "competitive_position": float,  # Score from 0-1
-            "management_quality": float,  # Score from 0-1
-            "overall_score": float,  # Weighted average of above scores
-            "key_strengths": List[str],
-            "key_risks": List[str],
-            "recommendation": "buy" | "hold" | "sell"
-        }"""
-
-    def analyze(self, ticker: str, context: Dict[str, Any]) -> Dict[str, Any]:
-        user_prompt = f"""Analyze {ticker} based on fundamental factors.
-        Consider the following context:
-        - Risk tolerance: {context.get('risk_tolerance', 'moderate')}
-        - Investment horizon: {context.get('investment_horizon', 'medium_term')}
-        - Preferred sectors: {context.get('sectors', [])}
-        """
-        
+1. Financial ratios (P/E, P/B, ROE, etc.)
+2. Growth metrics (revenue growth, earnings growth)
+3. Financial health (debt levels, cash flow)
+4. Competitive position
+5. Management quality
+
+Return your analysis as a JSON object with the following structure:
+{
+    "financial_health": float,  # Score from 0-1
+    "growth_potential": float,  # Score from 0-1
+    "competitive_position": float,  # Score from 0-1
+    "management_quality": float,  # Score from 0-1
+    "overall_score": float,  # Weighted average of above scores
+    "key_strengths": List[str],
+    "key_risks": List[str],
+    "recommendation": "buy" | "hold" | "sell"
+}"""
+
+    def analyze_ticker(self, ticker: str) -> Dict[str, Any]:
+        """Profile-independent analysis straight from the LLM"""
+        user_prompt = f"Analyze {ticker} based on fundamental factors."
         response = self.get_llm_response(self.system_prompt, user_prompt)
-        return json.loads(response) 
\ No newline at end of file
+        return json.loads(response)
+
+    def base_analysis(self, ticker: str) -> Dict[str, Any]:
+        """Shared analysis from the store (computed on a miss), or a fresh one without a store"""
+        if self.store is None:
+            return self.analyze_ticker(ticker)
+        return self.store.get_or_compute(ticker, self.analyze_ticker)
+
+    def analyze(self, ticker: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return adjust_for_profile(self.base_analysis(ticker), context or {})
\ No newline at end of file
@@ -2,52 +2,62 @@ from .base_agent import BaseAgent
 from typing import Dict, Any, List
 import json
 
+# Analysis fields kept when the run is over budget and the prompt must shrink
+COMPACT_FIELDS = ('overall_score', 'financial_health', 'growth_potential', 'recommendation')
+
 class PortfolioManager(BaseAgent):
+    # One call per run writing the allocation narrative: the larger deployment when configured
+    task = "allocation"
+
     def __init__(self):
         super().__init__()
+        # Static instructions only, so every allocation call shares this prefix
         self.system_prompt = """You are an expert portfolio manager. Based on the analyses provided and user preferences,
-        create an optimal portfolio allocation. You MUST return a valid JSON object, nothing else.
-        
-        Prioritize including a diverse set of tickers, aiming for a portfolio of up to 30 stocks if sufficient analyses are provided. Ensure the weights assigned to each stock are varied based on your analysis, rather than being uniform.
+create an optimal portfolio allocation. You MUST return a valid JSON object, nothing else.
 
-        Example of the required JSON structure:
+Prioritize including a diverse set of tickers, aiming for a portfolio of up to 30 stocks if sufficient analyses are provided. Ensure the weights assigned to each stock are varied based on your analysis, rather than being uniform.
+Create a diversified portfolio from the provided stocks. Aim to include between 20 and 30 stocks from the analyzed list, distributing the weights optimally. Ensure weights are not identical.
+
+Example of the required JSON structure:
+{
+    "portfolio": [
         {
-            "portfolio": [
-                {
-                    "ticker": "AAPL",
-                    "weight": 0.25,
-                    "rationale": "Strong financial health and growth"
-                }
-            ],
-            "expected_return": 0.12,
-            "risk_score": 0.6,
-            "diversification_score": 0.8,
-            "sector_allocation": {
-                "technology": 0.75,
-                "healthcare": 0.25
-            },
-            "key_risks": [
-                "Supply chain disruptions",
-                "Regulatory risks"
-            ]
+            "ticker": "AAPL",
+            "weight": 0.25,
+            "rationale": "Strong financial health and growth"
         }
+    ],
+    "expected_return": 0.12,
+    "risk_score": 0.6,
+    "diversification_score": 0.8,
+    "sector_allocation": {
+        "technology": 0.75,
+        "healthcare": 0.25
+    },
+    "key_risks": [
+        "Supply chain disruptions",
+        "Regulatory risks"
+    ]
+}
 
-        Important: Return ONLY the JSON object, no additional text or formatting."""
+Important: Return ONLY the JSON object, no additional text or formatting."""
 
-    def analyze(self, tickers: List[str], analyses: Dict[str, Dict[str, Any]], context: Dict[str, Any]) -> Dict[str, Any]:
+    def analyze(self, tickers: List[str], analyses: Dict[str, Dict[str, Any]], context: Dict[str, Any],
+                compact: bool = False) -> Dict[str, Any]:
+        if compact:
+            # Over budget: send only the scores and recommendation per ticker
+            analyses = {ticker: {key: analysis.get(key) for key in COMPACT_FIELDS if key in analysis}
+                        for ticker, analysis in analyses.items()}
+        # Single-line JSON: indentation was about a quarter of the analyses payload
         user_prompt = f"""Create a portfolio allocation based on the following:
-        
-        User Preferences:
-        - Risk tolerance: {context.get('risk_tolerance', 'moderate')}
-        - Investment horizon: {context.get('investment_horizon', 'medium_term')}
-        - Preferred sectors: {context.get('sectors', [])}
-        
-        Stock Analyses:
-        {json.dumps(analyses, indent=2)}
 
-        Please create a diversified portfolio from the provided stocks. Aim to include between 20 and 30 stocks from the analyzed list, distributing the weights optimally. Ensure weights are not identical.
+User Preferences:
+- Risk tolerance: {context.get('risk_tolerance', 'moderate')}
+- Investment horizon: {context.get('investment_horizon', 'medium_term')}
+- Preferred sectors: {context.get('sectors', [])}
 
-        Remember: Return ONLY a valid JSON object matching the example structure above."""
+Stock Analyses:
+{json.dumps(analyses, separators=(',', ':'))}"""
         
         response = self.get_llm_response(self.system_prompt, user_prompt)
         print("\n[DEBUG] Raw LLM response for portfolio manager:\n", response)
@@ -0,0 +1,297 @@
+"""
+Per-task model routing, hedged requests and circuit breaking for LLM calls.
+
+Deployments are configured with BIONIC_DEPLOYMENTS (JSON), e.g.
+
+    {"fast": {"model": "gpt-35-turbo"},
+     "large": {"model": "gpt-4o", "endpoint": "https://other.openai.azure.com/",
+               "api_key_env": "AZURE_OPENAI_LARGE_KEY", "price": [0.0025, 0.01]}}
+
+"price" (USD per 1K prompt and completion tokens) overrides usage.MODEL_PRICES
+for that deployment's model, so run budgets count its calls at their real cost.
+
+A task is routed to the first configured deployment of its ROUTES entry whose
+circuit is closed; later entries serve as failover and hedge targets. When a
+call runs past the p95 latency observed for that agent and deployment, one
+duplicate request is sent (to the next deployment, or the same one if it is
+the only one) and whichever valid response arrives first is used. Every
+response, including the losing one, is recorded in the usage ledger.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from .cassette import cassette_client
+from .usage import GLOBAL_LEDGER, record_response, set_model_price
+
+DEFAULT_DEPLOYMENTS = {'fast': {'model': 'gpt-35-turbo'}}
+
+# Deployments tried per task, in order of preference (unconfigured ones are skipped)
+ROUTES = {
+    'scoring': ('fast', 'large'),
+    'allocation': ('large', 'fast'),
+    'default': ('fast', 'large'),
+}
+
+# Hedge delay: p95 of the last HEDGE_WINDOW latencies once HEDGE_MIN_SAMPLES are known
+HEDGE_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+DEFAULT_HEDGE_AFTER = 10.0
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class Deployment(NamedTuple):
+    """One Azure OpenAI deployment; endpoint/key default to the agent's own client"""
+    name: str
+    model: str
+    endpoint: Optional[str] = None
+    api_key_env: Optional[str] = None
+    price: Optional[Tuple[float, float]] = None
+
+
+class CircuitBreaker:
+    """
+    Stops routing to a deployment after consecutive failures.
+
+    After `failure_threshold` failures in a row the circuit opens for
+    `reset_after` seconds; then a single trial call is let through (half open)
+    and its outcome closes or re-opens the circuit. A trial that never reports
+    back (e.g. its caller gave up on it) is replaced after another `reset_after`.
+    """
+
+    def __init__(self, name: str = "", failure_threshold: int = 3, reset_after: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_at = 0.0
+        self._lock = threading.Lock()
+
+    def _callable(self, now: float) -> bool:
+        if self.state == CLOSED:
+            return True
+        since = self.opened_at if self.state == OPEN else self.trial_at
+        return now - since >= self.reset_after
+
+    def available(self) -> bool:
+        """Whether allow() would let a call through; does not use up the half-open trial"""
+        with self._lock:
+            return self._callable(time.monotonic())
+
+    def allow(self) -> bool:
+        """Whether to send a call now; call only right before sending, as it claims the half-open trial"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == CLOSED:
+                return True
+            if not self._callable(now):
+                return False
+            self.state = HALF_OPEN
+            self.trial_at = now
+            return True
+
+    def success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    print(f"Circuit for {self.name} opened after {self.failures} failures")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+
+def load_deployments() -> Dict[str, Deployment]:
+    """Deployments from BIONIC_DEPLOYMENTS, or the single default one"""
+    config = json.loads(os.getenv("BIONIC_DEPLOYMENTS") or "null") or DEFAULT_DEPLOYMENTS
+    return {name: Deployment(name=name, model=spec['model'], endpoint=spec.get('endpoint'),
+                             api_key_env=spec.get('api_key_env'),
+                             price=tuple(spec['price']) if spec.get('price') else None)
+            for name, spec in config.items()}
+
+
+def valid_response(response: Any) -> bool:
+    choices = getattr(response, 'choices', None) or []
+    return bool(choices) and bool(getattr(choices[0].message, 'content', None))
+
+
+class Router:
+    """
+    Sends chat completions to the deployments configured for a task.
+
+    Args:
+        deployments: {name: Deployment}; load_deployments() if None
+        routes: {task: deployment names in order of preference}
+        hedge: Send a duplicate request once a call exceeds its p95 latency (BIONIC_HEDGE=0 disables)
+        failure_threshold, reset_after: Circuit breaker settings
+        max_workers: Threads available for in-flight requests
+    """
+
+    def __init__(self, deployments: Optional[Dict[str, Deployment]] = None,
+                 routes: Optional[Dict[str, Tuple[str, ...]]] = None, hedge: Optional[bool] = None,
+                 failure_threshold: int = 3, reset_after: float = 30.0, max_workers: int = 32):
+        self.deployments = deployments if deployments is not None else load_deployments()
+        for deployment in self.deployments.values():
+            if deployment.price is not None:
+                set_model_price(deployment.model, *deployment.price)
+        self.routes = routes or ROUTES
+        self.hedge = hedge if hedge is not None else os.getenv("BIONIC_HEDGE", "1") != "0"
+        self.breakers = {name: CircuitBreaker(name, failure_threshold, reset_after) for name in self.deployments}
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+        self._clients: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-request")
+
+    def route(self, task: str) -> List[Deployment]:
+        """Configured deployments for a task with an open circuit skipped (all of them if every circuit is open)"""
+        names = [n for n in self.routes.get(task, self.routes['default']) if n in self.deployments]
+        if not names:
+            names = list(self.deployments)
+        available = [self.deployments[n] for n in names if self.breakers[n].available()]
+        return available or [self.deployments[n] for n in names]
+
+    def hedge_after(self, agent: str, deployment: Deployment) -> float:
+        latencies = GLOBAL_LEDGER.latencies(agent, deployment.model)[-HEDGE_WINDOW:]
+        if len(latencies) < HEDGE_MIN_SAMPLES:
+            return DEFAULT_HEDGE_AFTER
+        latencies.sort()
+        return latencies[int(0.95 * (len(latencies) - 1))]
+
+    def _client(self, deployment: Deployment, default_client):
+        if deployment.endpoint is None:
+            return default_client
+        with self._lock:
+            if deployment.name not in self._clients:
+                def make_client():
+                    from openai import AzureOpenAI
+                    return AzureOpenAI(
+                        api_version="2024-12-01-preview",
+                        azure_endpoint=deployment.endpoint,
+                        api_key=os.getenv(deployment.api_key_env or "AZURE_OPENAI_API_KEY"),
+                        max_retries=0  # failover and backoff happen here and in BaseAgent
+                    )
+                self._clients[deployment.name] = cassette_client(make_client)
+            return self._clients[deployment.name]
+
+    def _call(self, agent: str, deployment: Deployment, default_client, params: Dict[str, Any]):
+        started = time.perf_counter()
+        try:
+            response = self._client(deployment, default_client).chat.completions.create(
+                model=deployment.model, **params)
+        except Exception:
+            self.breakers[deployment.name].failure()
+            raise
+        record_response(agent, deployment.model, response, time.perf_counter() - started)
+        if valid_response(response):
+            self.breakers[deployment.name].success()
+        else:
+            self.breakers[deployment.name].failure()
+        return response
+
+    def complete(self, agent: str, task: str, default_client, **params) -> Any:
+        """
+        Chat completion for one agent call, hedged and with failover.
+
+        Args:
+            agent: Agent name the usage is recorded under
+            task: Routing key (see ROUTES)
+            default_client: Client for deployments without their own endpoint
+            **params: chat.completions.create arguments except `model`
+        Returns:
+            The first valid response
+        """
+        candidates = self.route(task)
+        # When every circuit is open they are all tried anyway, without claiming half-open trials
+        gated = any(self.breakers[d.name].available() for d in candidates)
+        queue = list(candidates)
+        in_flight: Dict[Any, Deployment] = {}
+        errors: List[Exception] = []
+        hedged = None
+
+        def take() -> Optional[Deployment]:
+            # Breakers are consulted only for deployments actually called
+            while queue:
+                deployment = queue.pop(0)
+                if not gated or self.breakers[deployment.name].allow():
+                    return deployment
+            return None
+
+        def submit(deployment: Deployment):
+            # Each request runs in a copy of this context so its usage counts towards the current run
+            future = self._pool.submit(contextvars.copy_context().run, self._call, agent, deployment,
+                                       default_client, params)
+            in_flight[future] = deployment
+            return future
+
+        primary = take() or candidates[0]
+        submit(primary)
+        deadline = time.perf_counter() + self.hedge_after(agent, primary)
+        while in_flight:
+            timeout = None if hedged is not None or not self.hedge else max(0.0, deadline - time.perf_counter())
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                target = take() or (primary if self.breakers[primary.name].state == CLOSED else None)
+                if target is None:
+                    # Nothing healthy to hedge to; keep waiting for the call in flight
+                    hedged = False
+                    continue
+                self.hedges += 1
+                hedged = submit(target)
+                continue
+            for future in done:
+                deployment = in_flight.pop(future)
+                try:
+                    response = future.result()
+                    if not valid_response(response):
+                        raise ValueError(f"Empty response from deployment {deployment.name}")
+                except Exception as e:
+                    # Errors and empty replies fail over alike
+                    errors.append(e)
+                    if not in_flight:
+                        fallback = take()
+                        if fallback is not None:
+                            self.failovers += 1
+                            print(f"{deployment.name} failed ({str(e)[:80]}); failing over to {fallback.name}")
+                            deadline = time.perf_counter() + self.hedge_after(agent, fallback)
+                            submit(fallback)
+                    continue
+                # A still-running loser finishes in the background and is recorded then
+                self.hedge_wins += int(future is hedged)
+                return response
+        raise errors[-1]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'failovers': self.failovers,
+            'circuits': {name: breaker.state for name, breaker in self.breakers.items()},
+        }
+
+
+_router: Optional[Router] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> Router:
+    """Process-wide router, so latency history and circuit state are shared by all agents"""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = Router()
+        return _router
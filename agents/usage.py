@@ -0,0 +1,213 @@
+"""
+Token, cost and latency accounting for LLM calls.
+
+Every completion is recorded twice: in a process-wide ledger of recent calls,
+which is what per-agent `max_tokens` limits are derived from, and in the ledger
+of the run currently being tracked (see track_run), which carries that run's
+budget. Runs are tracked through a context variable, so agents shared between
+sessions/threads attribute each call to the right run.
+"""
+import contextlib
+import contextvars
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# USD per 1K tokens as (prompt, completion); adjust to the Azure contract in use. Versioned model names
+# (e.g. gpt-4o-2024-08-06) take the price of their longest listed prefix; deployments can also set their own
+# price in BIONIC_DEPLOYMENTS (see agents/routing.py)
+MODEL_PRICES = {
+    'gpt-35-turbo': (0.0005, 0.0015),
+    'gpt-4': (0.03, 0.06),
+    'gpt-4-turbo': (0.01, 0.03),
+    'gpt-4o': (0.0025, 0.01),
+    'gpt-4o-mini': (0.00015, 0.0006),
+    'gpt-4.1': (0.002, 0.008),
+    'gpt-4.1-mini': (0.0004, 0.0016),
+}
+DEFAULT_PRICE = (0.0005, 0.0015)
+
+# Hard ceiling for a single response; derived limits never exceed it
+MAX_RESPONSE_TOKENS = 4096
+
+
+def model_price(model: str) -> Tuple[float, float]:
+    """(prompt, completion) USD per 1K tokens of a model"""
+    if model in MODEL_PRICES:
+        return MODEL_PRICES[model]
+    prefixes = [name for name in MODEL_PRICES if model.startswith(name + '-')]
+    return MODEL_PRICES[max(prefixes, key=len)] if prefixes else DEFAULT_PRICE
+
+
+def set_model_price(model: str, prompt: float, completion: float):
+    """Price calls to `model` at these USD per 1K tokens"""
+    MODEL_PRICES[model] = (float(prompt), float(completion))
+
+
+class BudgetExceeded(Exception):
+    """Raised when a run has used up its cost, time or token budget"""
+
+
+class UsageRecord(NamedTuple):
+    """One completed chat completion"""
+    agent: str
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    latency: float
+    truncated: bool = False
+
+    @property
+    def cost(self) -> float:
+        prompt_price, completion_price = model_price(self.model)
+        return (self.prompt_tokens * prompt_price + self.completion_tokens * completion_price) / 1000
+
+
+class Budget(NamedTuple):
+    """Limits for one run; None means unlimited"""
+    max_cost_usd: Optional[float] = None
+    max_seconds: Optional[float] = None
+    max_tokens: Optional[int] = None
+
+
+class UsageLedger:
+    """
+    Thread-safe list of usage records with optional budget.
+
+    Args:
+        budget: Limits checked by exceeded()/check()/can_afford()
+        maxlen: Keep only the most recent records (None keeps all)
+    """
+
+    def __init__(self, budget: Optional[Budget] = None, maxlen: Optional[int] = None):
+        self.budget = budget or Budget()
+        self.records = deque(maxlen=maxlen)
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, record: UsageRecord):
+        with self._lock:
+            self.records.append(record)
+
+    def _snapshot(self, agent: Optional[str] = None) -> List[UsageRecord]:
+        with self._lock:
+            return [r for r in self.records if agent is None or r.agent == agent]
+
+    def totals(self, agent: Optional[str] = None) -> Dict[str, Any]:
+        records = self._snapshot(agent)
+        return {
+            'calls': len(records),
+            'prompt_tokens': sum(r.prompt_tokens for r in records),
+            'completion_tokens': sum(r.completion_tokens for r in records),
+            'cost_usd': round(sum(r.cost for r in records), 6),
+            'llm_seconds': round(sum(r.latency for r in records), 3),
+            'elapsed_seconds': round(time.perf_counter() - self.started, 3),
+        }
+
+    def by_agent(self) -> Dict[str, Dict[str, Any]]:
+        return {agent: self.totals(agent) for agent in sorted({r.agent for r in self._snapshot()})}
+
+    def average(self, agent: str) -> Optional[Dict[str, float]]:
+        """Mean cost/latency/tokens per call for an agent, or None without observations"""
+        records = self._snapshot(agent)
+        if not records:
+            return None
+        n = len(records)
+        return {
+            'cost_usd': sum(r.cost for r in records) / n,
+            'latency': sum(r.latency for r in records) / n,
+            'tokens': sum(r.prompt_tokens + r.completion_tokens for r in records) / n,
+        }
+
+    def completion_tokens(self, agent: str) -> List[int]:
+        """Completion sizes of an agent's untruncated responses"""
+        return [r.completion_tokens for r in self._snapshot(agent) if not r.truncated]
+
+    def latencies(self, agent: str, model: Optional[str] = None) -> List[float]:
+        """Latencies of an agent's calls (optionally on one model), oldest first"""
+        return [r.latency for r in self._snapshot(agent) if model is None or r.model == model]
+
+    def exceeded(self) -> Optional[str]:
+        """Why the budget is used up, or None while there is room left"""
+        totals = self.totals()
+        if self.budget.max_cost_usd is not None and totals['cost_usd'] >= self.budget.max_cost_usd:
+            return f"cost budget of ${self.budget.max_cost_usd:.4f} used (${totals['cost_usd']:.4f})"
+        if self.budget.max_seconds is not None and totals['elapsed_seconds'] >= self.budget.max_seconds:
+            return f"time budget of {self.budget.max_seconds:.1f}s used ({totals['elapsed_seconds']:.1f}s)"
+        tokens = totals['prompt_tokens'] + totals['completion_tokens']
+        if self.budget.max_tokens is not None and tokens >= self.budget.max_tokens:
+            return f"token budget of {self.budget.max_tokens} used ({tokens})"
+        return None
+
+    def check(self):
+        reason = self.exceeded()
+        if reason:
+            raise BudgetExceeded(reason)
+
+    def can_afford(self, cost_usd: float = 0.0, seconds: float = 0.0, tokens: float = 0) -> bool:
+        """Whether spending this much more would stay within the budget"""
+        totals = self.totals()
+        if self.budget.max_cost_usd is not None and totals['cost_usd'] + cost_usd > self.budget.max_cost_usd:
+            return False
+        if self.budget.max_seconds is not None and totals['elapsed_seconds'] + seconds > self.budget.max_seconds:
+            return False
+        used = totals['prompt_tokens'] + totals['completion_tokens']
+        if self.budget.max_tokens is not None and used + tokens > self.budget.max_tokens:
+            return False
+        return True
+
+
+# Recent calls across the whole process; the basis for derived max_tokens
+GLOBAL_LEDGER = UsageLedger(maxlen=2000)
+
+_current_run: contextvars.ContextVar = contextvars.ContextVar("bionic_usage_run", default=None)
+
+
+def current_run() -> Optional[UsageLedger]:
+    return _current_run.get()
+
+
+@contextlib.contextmanager
+def track_run(budget: Optional[Budget] = None) -> Iterator[UsageLedger]:
+    """Attribute every LLM call made in this context (and thread) to a new run ledger"""
+    ledger = UsageLedger(budget)
+    token = _current_run.set(ledger)
+    try:
+        yield ledger
+    finally:
+        _current_run.reset(token)
+
+
+def record_response(agent: str, model: str, response: Any, latency: float) -> UsageRecord:
+    """Record a chat completion response in the process ledger and the current run"""
+    usage = getattr(response, 'usage', None)
+    choices = getattr(response, 'choices', None) or []
+    record = UsageRecord(
+        agent=agent,
+        model=model,
+        prompt_tokens=int(getattr(usage, 'prompt_tokens', 0) or 0),
+        completion_tokens=int(getattr(usage, 'completion_tokens', 0) or 0),
+        latency=latency,
+        truncated=bool(choices) and getattr(choices[0], 'finish_reason', None) == 'length',
+    )
+    GLOBAL_LEDGER.add(record)
+    run = current_run()
+    if run is not None:
+        run.add(record)
+    return record
+
+
+def derived_max_tokens(agent: str, default: int, min_samples: int = 10, headroom: float = 1.5,
+                       floor: int = 256, ceiling: int = MAX_RESPONSE_TOKENS,
+                       ledger: Optional[UsageLedger] = None) -> int:
+    """
+    max_tokens for an agent's next call: p99 of its observed output sizes plus
+    headroom, or `default` until enough calls have been observed.
+    """
+    observed = sorted((ledger or GLOBAL_LEDGER).completion_tokens(agent))
+    if len(observed) < min_samples:
+        return min(default, ceiling)
+    p99 = observed[min(len(observed) - 1, math.ceil(0.99 * len(observed)) - 1)]
+    return int(min(ceiling, max(floor, math.ceil(p99 * headroom))))
@@ -0,0 +1,459 @@
+"""
+Return-correlation index over the ticker universe, computed from stored prices.
+
+Daily returns over a rolling window are reduced to pairwise co-moments (pair
+counts and the sums of x, x^2 and xy over the days both tickers traded), from
+which the correlation matrix follows. The moments are additive over days, so a
+price update only adds the new days and subtracts the ones that left the
+window instead of recomputing the whole window.
+
+The index also stores a hierarchical clustering of the universe (a linkage
+matrix in the scipy layout, on the distance sqrt((1 - rho) / 2)), its leaf
+order, and each ticker's neighbours sorted by correlation, so "stocks like X",
+"stocks unlike X" and "what diversifies this portfolio" are array lookups.
+
+Refresh nightly after the prices, e.g. from cron:
+    15 2 * * *  cd /path/to/mba_bionic && python -m data.correlation_index
+"""
+import json
+import os
+import shutil
+import tempfile
+from typing import Dict, Iterable, Mapping, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from data.typed_loader import PRICES_PATH, PROJECT_ROOT, load_prices, pivot_prices
+
+INDEX_DIR = os.path.join(PROJECT_ROOT, "data", "correlation_index")
+MANIFEST_FILE = "manifest.json"
+TICKERS_FILE = "tickers.npy"
+MOMENTS = ('pairs', 'sum_x', 'sum_xx', 'sum_xy')
+TRADING_DAYS = 252
+
+WINDOW = TRADING_DAYS
+# Pairs with fewer common return days are treated as uncorrelated
+MIN_OVERLAP = 60
+# Rolling updates accumulate rounding error; recompute from scratch every so often
+FULL_REBUILD_EVERY = 20
+METHODS = ('single', 'average')
+
+
+def daily_returns(prices: pd.DataFrame) -> pd.DataFrame:
+    """Simple daily returns of a wide (date x ticker) price frame; NaN where either day is missing"""
+    prices = prices.sort_index()
+    values = prices.to_numpy(dtype=np.float64, na_value=np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns = values[1:] / values[:-1] - 1
+    returns[~np.isfinite(returns)] = np.nan
+    return pd.DataFrame(returns, index=prices.index[1:], columns=prices.columns.astype(str))
+
+
+def compute_moments(returns: np.ndarray) -> Dict[str, np.ndarray]:
+    """Pairwise co-moments of a (days x tickers) return block, over the days both tickers have a return"""
+    valid = ~np.isnan(returns)
+    x = np.where(valid, returns, 0.0)
+    m = valid.astype(np.float64)
+    # sum_x[i, j] sums i's returns over the days j also traded; sum_x.T is the same for j
+    return {'pairs': m.T @ m, 'sum_x': x.T @ m, 'sum_xx': (x * x).T @ m, 'sum_xy': x.T @ x}
+
+
+def correlation_from_moments(moments: Mapping[str, np.ndarray], min_overlap: int = MIN_OVERLAP) -> np.ndarray:
+    """Pairwise-complete Pearson correlation; pairs without enough common days are 0"""
+    n, sx, sxx, sxy = (np.asarray(moments[name], dtype=np.float64) for name in MOMENTS)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = n * sxy - sx * sx.T
+        variance = n * sxx - sx ** 2
+        correlation = covariance / np.sqrt(variance * variance.T)
+    correlation[~np.isfinite(correlation) | (n < min_overlap)] = 0.0
+    np.clip(correlation, -1.0, 1.0, out=correlation)
+    np.fill_diagonal(correlation, 1.0)
+    return correlation
+
+
+def volatility_from_moments(moments: Mapping[str, np.ndarray]) -> np.ndarray:
+    """Annualized volatility of each ticker over its own return days (NaN with fewer than two)"""
+    n, sx, sxx = (np.diag(np.asarray(moments[name], dtype=np.float64)) for name in MOMENTS[:3])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = (sxx - sx ** 2 / n) / (n - 1)
+    return np.where(n > 1, np.sqrt(np.clip(variance, 0.0, None) * TRADING_DAYS), np.nan)
+
+
+def correlation_distance(correlation: np.ndarray) -> np.ndarray:
+    """Metric distance sqrt((1 - rho) / 2): 0 for identical, 1 for opposite returns"""
+    return np.sqrt(np.clip((1.0 - np.asarray(correlation, dtype=np.float64)) / 2.0, 0.0, 1.0))
+
+
+def _single_linkage(distance: np.ndarray) -> np.ndarray:
+    """Single linkage from a minimum spanning tree (Prim's algorithm, O(n^2))"""
+    n = len(distance)
+    in_tree = np.zeros(n, dtype=bool)
+    in_tree[0] = True
+    best = distance[0].copy()
+    nearest = np.zeros(n, dtype=np.int64)
+    edges = []
+    for _ in range(n - 1):
+        j = int(np.argmin(np.where(in_tree, np.inf, best)))
+        edges.append((best[j], int(nearest[j]), j))
+        in_tree[j] = True
+        closer = distance[j] < best
+        best = np.where(closer, distance[j], best)
+        nearest = np.where(closer, j, nearest)
+
+    # Merging the tree edges in order of length gives the single-linkage dendrogram
+    parent = list(range(2 * n - 1))
+    sizes = [1] * n + [0] * (n - 1)
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    links = np.zeros((n - 1, 4))
+    for step, (height, a, b) in enumerate(sorted(edges)):
+        a, b = root(a), root(b)
+        cluster = n + step
+        parent[a] = parent[b] = cluster
+        sizes[cluster] = sizes[a] + sizes[b]
+        links[step] = (min(a, b), max(a, b), height, sizes[cluster])
+    return links
+
+
+def _average_linkage(distance: np.ndarray) -> np.ndarray:
+    """Average (UPGMA) linkage with Lance-Williams updates, O(n^3) but vectorized per merge"""
+    n = len(distance)
+    d = distance.copy()
+    np.fill_diagonal(d, np.inf)
+    ids = np.arange(n)
+    sizes = np.ones(n)
+    links = np.zeros((n - 1, 4))
+    for step in range(n - 1):
+        i, j = divmod(int(np.argmin(d)), n)
+        i, j = min(i, j), max(i, j)
+        links[step] = (min(ids[i], ids[j]), max(ids[i], ids[j]), d[i, j], sizes[i] + sizes[j])
+        merged = (d[i] * sizes[i] + d[j] * sizes[j]) / (sizes[i] + sizes[j])
+        d[i, :] = d[:, i] = merged
+        d[j, :] = d[:, j] = np.inf
+        d[i, i] = np.inf
+        sizes[i] += sizes[j]
+        ids[i] = n + step
+    return links
+
+
+def linkage(distance: np.ndarray, method: str = 'single') -> np.ndarray:
+    """
+    Agglomerative clustering of a square distance matrix.
+
+    Args:
+        distance: Symmetric (n x n) distances with a zero diagonal
+        method: 'single' or 'average'
+    Returns:
+        (n - 1) x 4 linkage matrix in the scipy layout: merged cluster ids, height, size
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown linkage method {method!r}; expected one of {METHODS}")
+    distance = np.asarray(distance, dtype=np.float64)
+    if len(distance) < 2:
+        return np.zeros((0, 4))
+    return _single_linkage(distance) if method == 'single' else _average_linkage(distance)
+
+
+def leaf_order(links: np.ndarray) -> np.ndarray:
+    """Leaves left to right, so similar tickers sit next to each other (quasi-diagonal order)"""
+    n = len(links) + 1
+    if not len(links):
+        return np.zeros(n, dtype=np.int32)
+    order, stack = [], [2 * n - 2]
+    while stack:
+        cluster = stack.pop()
+        if cluster < n:
+            order.append(cluster)
+        else:
+            left, right = links[cluster - n, :2].astype(np.int64)
+            stack.extend((right, left))
+    return np.asarray(order, dtype=np.int32)
+
+
+def cut_tree(links: np.ndarray, k: int) -> np.ndarray:
+    """Cluster label per leaf when the tree is cut into k clusters, numbered along the leaf order"""
+    n = len(links) + 1
+    k = max(1, min(int(k), n))
+    parent = np.arange(2 * n - 1)
+    for step in range(n - k):
+        left, right = links[step, :2].astype(np.int64)
+        parent[left] = parent[right] = n + step
+    roots = np.arange(n)
+    while True:
+        up = parent[roots]
+        if np.array_equal(up, roots):
+            break
+        roots = up
+    labels = np.empty(n, dtype=np.int32)
+    first_seen: Dict[int, int] = {}
+    for leaf in leaf_order(links):
+        labels[leaf] = first_seen.setdefault(int(roots[leaf]), len(first_seen))
+    return labels
+
+
+def write_index(tickers: Iterable[str], moments: Mapping[str, np.ndarray], directory: str = INDEX_DIR,
+                method: str = 'single', manifest: Optional[Dict] = None) -> str:
+    """Derive correlations, clustering and neighbour orders from the moments and swap the index in atomically"""
+    tickers = np.asarray(list(tickers), dtype=str)
+    correlation = correlation_from_moments(moments)
+    links = linkage(correlation_distance(correlation), method)
+
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".correlation_index_", dir=parent)
+    np.save(os.path.join(staging, TICKERS_FILE), tickers)
+    for name in MOMENTS:
+        np.save(os.path.join(staging, f"{name}.npy"), np.asarray(moments[name], dtype=np.float64))
+    np.save(os.path.join(staging, "correlation.npy"), correlation.astype(np.float32))
+    np.save(os.path.join(staging, "volatility.npy"), volatility_from_moments(moments).astype(np.float32))
+    np.save(os.path.join(staging, "linkage.npy"), links)
+    np.save(os.path.join(staging, "leaf_order.npy"), leaf_order(links))
+    # Most to least correlated, per ticker, so k-nearest/k-farthest are slices
+    np.save(os.path.join(staging, "neighbors.npy"), np.argsort(-correlation, axis=1, kind='stable').astype(np.int32))
+    with open(os.path.join(staging, MANIFEST_FILE), 'w') as f:
+        json.dump(dict(manifest or {}, tickers=len(tickers), method=method), f)
+
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.replace(staging, directory)
+    return directory
+
+
+class CorrelationIndex:
+    """Read-only correlation index loaded from an index directory"""
+
+    def __init__(self, directory: str = INDEX_DIR):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        self.tickers = np.load(os.path.join(directory, TICKERS_FILE))
+        self.ticker_index = {ticker: i for i, ticker in enumerate(self.tickers.tolist())}
+        self.correlation = np.load(os.path.join(directory, "correlation.npy"), mmap_mode='r')
+        self.volatility = np.load(os.path.join(directory, "volatility.npy"))
+        self.linkage = np.load(os.path.join(directory, "linkage.npy"))
+        self.leaf_order = np.load(os.path.join(directory, "leaf_order.npy"))
+        self.neighbors = np.load(os.path.join(directory, "neighbors.npy"), mmap_mode='r')
+        self._leaf_position: Optional[np.ndarray] = None
+
+    @property
+    def as_of(self) -> Optional[str]:
+        return self.manifest.get('as_of')
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker in self.ticker_index
+
+    def moments(self) -> Dict[str, np.ndarray]:
+        return {name: np.load(os.path.join(self.directory, f"{name}.npy")) for name in MOMENTS}
+
+    def rows(self, tickers: Iterable[str]) -> np.ndarray:
+        """Row positions of the known subset of `tickers`, in order"""
+        return np.array([self.ticker_index[t] for t in tickers if t in self.ticker_index], dtype=np.int64)
+
+    def _allowed(self, universe: Optional[Iterable[str]]) -> Optional[np.ndarray]:
+        if universe is None:
+            return None
+        allowed = np.zeros(len(self.tickers), dtype=bool)
+        allowed[self.rows(universe)] = True
+        return allowed
+
+    def matrix(self, tickers: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Correlation matrix as a DataFrame (all tickers, or the known subset of `tickers` in order)"""
+        rows = np.arange(len(self.tickers)) if tickers is None else self.rows(tickers)
+        labels = pd.Index(self.tickers[rows], name='ticker')
+        return pd.DataFrame(np.asarray(self.correlation)[np.ix_(rows, rows)], index=labels, columns=labels)
+
+    def _ranked(self, ticker: str, k: int, universe: Optional[Iterable[str]], farthest: bool) -> pd.Series:
+        i = self.ticker_index.get(ticker)
+        if i is None:
+            return pd.Series(dtype=np.float32, name='correlation')
+        order = np.asarray(self.neighbors[i])
+        if farthest:
+            order = order[::-1]
+        keep = order != i
+        allowed = self._allowed(universe)
+        if allowed is not None:
+            keep &= allowed[order]
+        order = order[keep][:k]
+        return pd.Series(np.asarray(self.correlation[i])[order], index=pd.Index(self.tickers[order], name='ticker'),
+                         name='correlation')
+
+    def nearest(self, ticker: str, k: int = 10, universe: Optional[Iterable[str]] = None) -> pd.Series:
+        """The k tickers most correlated with `ticker`, most similar first"""
+        return self._ranked(ticker, k, universe, farthest=False)
+
+    def farthest(self, ticker: str, k: int = 10, universe: Optional[Iterable[str]] = None) -> pd.Series:
+        """The k tickers least correlated with `ticker`, most dissimilar first"""
+        return self._ranked(ticker, k, universe, farthest=True)
+
+    def portfolio_correlation(self, holdings: Union[Mapping[str, float], Iterable[str]]) -> np.ndarray:
+        """
+        Correlation of every ticker's returns with a portfolio's returns.
+
+        Args:
+            holdings: Ticker -> weight, or tickers to weight equally
+        Returns:
+            Array aligned with self.tickers (NaN when the portfolio has no known holdings)
+        """
+        if not isinstance(holdings, Mapping):
+            holdings = {ticker: 1.0 for ticker in holdings}
+        known = [(self.ticker_index[t], w) for t, w in holdings.items()
+                 if t in self.ticker_index and np.isfinite(self.volatility[self.ticker_index[t]])]
+        if not known:
+            return np.full(len(self.tickers), np.nan)
+        rows = np.array([i for i, _ in known])
+        # Weight times volatility: cov(i, p) / sigma_i = sum_j rho_ij * w_j * sigma_j
+        scaled = np.array([w for _, w in known], dtype=np.float64) * self.volatility[rows]
+        block = np.asarray(self.correlation[:, rows], dtype=np.float64)
+        exposure = block @ scaled
+        variance = scaled @ block[rows] @ scaled
+        if variance <= 0:
+            return np.full(len(self.tickers), np.nan)
+        return exposure / np.sqrt(variance)
+
+    def diversifiers(self, holdings: Union[Mapping[str, float], Iterable[str]], k: int = 10,
+                     universe: Optional[Iterable[str]] = None) -> pd.Series:
+        """The k tickers (outside the portfolio) least correlated with the portfolio, best diversifier first"""
+        if not isinstance(holdings, Mapping):
+            holdings = list(holdings)
+        correlation = self.portfolio_correlation(holdings)
+        keep = np.isfinite(correlation)
+        keep[self.rows(holdings)] = False
+        allowed = self._allowed(universe)
+        if allowed is not None:
+            keep &= allowed
+        candidates = np.flatnonzero(keep)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(correlation[candidates], k)[:k]]
+        candidates = candidates[np.argsort(correlation[candidates], kind='stable')]
+        return pd.Series(correlation[candidates], index=pd.Index(self.tickers[candidates], name='ticker'),
+                         name='correlation')
+
+    def quasi_diagonal(self, tickers: Iterable[str]) -> np.ndarray:
+        """
+        Row positions of the known subset of `tickers`, in the universe's leaf order.
+
+        The universe's tree restricted to a subset is still a tree over that subset,
+        so its leaf order serves any subset without clustering again.
+        """
+        if self._leaf_position is None:
+            position = np.empty(len(self.leaf_order), dtype=np.int64)
+            position[self.leaf_order] = np.arange(len(self.leaf_order))
+            self._leaf_position = position
+        rows = np.unique(self.rows(tickers))
+        return rows[np.argsort(self._leaf_position[rows], kind='stable')]
+
+    def covariance(self, rows: np.ndarray) -> np.ndarray:
+        """Annualized covariance matrix of the given rows"""
+        volatility = self.volatility[rows].astype(np.float64)
+        return np.asarray(self.correlation)[np.ix_(rows, rows)].astype(np.float64) * np.outer(volatility, volatility)
+
+    def clusters(self, k: int, tickers: Optional[Iterable[str]] = None) -> pd.Series:
+        """Cluster label per ticker when the universe is cut into k clusters"""
+        labels = pd.Series(cut_tree(self.linkage, k), index=pd.Index(self.tickers, name='ticker'), name='cluster')
+        return labels if tickers is None else labels.reindex([t for t in tickers if t in self.ticker_index])
+
+
+def update_index(prices: pd.DataFrame, directory: str = INDEX_DIR, window: int = WINDOW, method: str = 'single',
+                 force: bool = False, source_mtime: Optional[float] = None) -> CorrelationIndex:
+    """
+    Bring the index up to date with a wide price frame.
+
+    When the stored index covers the same tickers and its window is still part of
+    the price history, only the days entering and leaving the window are applied
+    to the stored moments; otherwise the whole window is recomputed.
+
+    Args:
+        prices: Wide close prices (see typed_loader.pivot_prices)
+        directory: Index directory
+        window: Number of most recent daily returns to correlate
+        method: Linkage method, 'single' or 'average'
+        force: Always recompute the whole window
+        source_mtime: Modification time of the price file, recorded for refresh_index
+    Returns:
+        The refreshed CorrelationIndex (manifest['update'] says 'full' or 'incremental')
+    """
+    returns = daily_returns(prices)
+    current = returns.iloc[-window:]
+    tickers = list(current.columns)
+    dates = returns.index
+    manifest = {'as_of': str(dates[-1])[:10] if len(dates) else None, 'window': window, 'days': len(current),
+                'window_start': str(current.index[0]) if len(current) else None,
+                'window_end': str(current.index[-1]) if len(current) else None, 'source_mtime': source_mtime}
+
+    moments = None
+    previous = _load_previous(directory)
+    if not force and previous is not None and len(current):
+        old = previous.manifest
+        if (old.get('window') == window and old.get('method') == method and previous.tickers.tolist() == tickers
+                and old.get('incremental_updates', 0) + 1 < FULL_REBUILD_EVERY and old.get('window_start')):
+            start, end = pd.Timestamp(old['window_start']), pd.Timestamp(old['window_end'])
+            if start in dates and end in dates:
+                added = returns.loc[returns.index > end].iloc[-window:]
+                removed = returns.loc[(returns.index >= start) & (returns.index <= end)
+                                      & (returns.index < current.index[0])]
+                if len(added) + len(removed) < window:
+                    moments = previous.moments()
+                    for block, sign in ((added, 1.0), (removed, -1.0)):
+                        if len(block):
+                            for name, delta in compute_moments(block.to_numpy()).items():
+                                moments[name] += sign * delta
+                    manifest.update(update='incremental', incremental_updates=old.get('incremental_updates', 0) + 1,
+                                    added_days=len(added), removed_days=len(removed))
+    if moments is None:
+        moments = compute_moments(current.to_numpy())
+        manifest.update(update='full', incremental_updates=0, added_days=len(current), removed_days=0)
+
+    write_index(tickers, moments, directory, method=method, manifest=manifest)
+    return CorrelationIndex(directory)
+
+
+def _load_previous(directory: str) -> Optional[CorrelationIndex]:
+    if not os.path.exists(os.path.join(directory, MANIFEST_FILE)):
+        return None
+    try:
+        return CorrelationIndex(directory)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def refresh_index(prices_path: Optional[str] = None, directory: str = INDEX_DIR, window: int = WINDOW,
+                  method: str = 'single', force: bool = False) -> CorrelationIndex:
+    """Update the index if the price file changed since it was written (or if forced)"""
+    prices_path = prices_path or PRICES_PATH
+    mtime = os.path.getmtime(prices_path)
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    if not force and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get('source_mtime') == mtime and manifest.get('window') == window \
+                and manifest.get('method') == method:
+            return CorrelationIndex(directory)
+
+    print(f"Updating correlation index from {prices_path}...")
+    index = update_index(pivot_prices(load_prices(prices_path)), directory, window, method, force, mtime)
+    manifest = index.manifest
+    print(f"✅ Correlation index for {len(index)} tickers as of {index.as_of} ({manifest['update']} update, "
+          f"+{manifest['added_days']}/-{manifest['removed_days']} days) written to {directory}")
+    return index
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Refresh the return-correlation index")
+    parser.add_argument("--prices", default=PRICES_PATH)
+    parser.add_argument("--output", default=INDEX_DIR)
+    parser.add_argument("--window", type=int, default=WINDOW, help="Daily returns to correlate (default: 1 year)")
+    parser.add_argument("--method", choices=METHODS, default='single')
+    parser.add_argument("--force", action="store_true", help="Recompute the whole window")
+    args = parser.parse_args()
+    refresh_index(args.prices, args.output, args.window, args.method, force=args.force)
@@ -0,0 +1,236 @@
+"""
+Per-ticker factor and risk snapshot computed from stored prices.
+
+One vectorized pass over the (dates x tickers) price matrix yields momentum,
+volatility, drawdown, beta and liquidity for every ticker. The table is stored
+column-wise (one .npy per column, plus a ticker index and a descending sort
+order per factor), so screening and ranking become array lookups.
+
+Refresh nightly, e.g. from cron:
+    0 2 * * *  cd /path/to/mba_bionic && python -m data.factor_snapshot
+"""
+import json
+import os
+import shutil
+import tempfile
+from datetime import date
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from data.typed_loader import PRICES_PATH, PROJECT_ROOT, load_prices, pivot_prices
+
+SNAPSHOT_DIR = os.path.join(PROJECT_ROOT, "data", "factor_snapshot")
+MANIFEST_FILE = "manifest.json"
+TICKERS_FILE = "tickers.npy"
+TRADING_DAYS = 252
+
+FACTORS = ('momentum_12_1', 'momentum_3m', 'volatility_1y', 'max_drawdown_1y', 'beta_1y',
+           'dollar_volume_3m', 'last_close', 'observations')
+RISK_BUCKETS = ('low', 'moderate', 'high')
+
+
+def _window_return(values: np.ndarray, start: int, end: int) -> np.ndarray:
+    """Return from `start` rows before the last row to `end` rows before it (NaN without history)"""
+    if len(values) <= start:
+        return np.full(values.shape[1], np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return values[-1 - end] / values[-1 - start] - 1
+
+
+def compute_factors(prices: pd.DataFrame, volumes: Optional[pd.DataFrame] = None,
+                    benchmark: Optional[str] = None) -> pd.DataFrame:
+    """
+    Compute the factor table from a wide (date x ticker) price frame.
+
+    Args:
+        prices: Wide close prices (see typed_loader.pivot_prices)
+        volumes: Optional wide share volumes aligned with prices, for dollar volume
+        benchmark: Ticker used as the market for beta; equal-weight universe if None
+    Returns:
+        DataFrame indexed by ticker with one column per factor plus risk_bucket
+    """
+    prices = prices.sort_index()
+    values = prices.to_numpy(dtype=np.float64, na_value=np.nan)
+    # Carry the last price over gaps so returns are not lost around missing days
+    values = pd.DataFrame(values).ffill().to_numpy()
+    year = values[-(TRADING_DAYS + 1):]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns = year[1:] / year[:-1] - 1
+        if benchmark is not None and benchmark in prices.columns:
+            market = returns[:, prices.columns.get_loc(benchmark)]
+        else:
+            market = np.nanmean(returns, axis=1) if returns.size else np.zeros(0)
+        valid = ~np.isnan(returns) & ~np.isnan(market)[:, None]
+        counts = valid.sum(axis=0)
+        r = np.where(valid, returns, 0.0)
+        m = np.where(valid, market[:, None], 0.0)
+        r_mean = r.sum(axis=0) / counts
+        m_mean = m.sum(axis=0) / counts
+        covariance = ((r - r_mean) * (m - m_mean) * valid).sum(axis=0) / (counts - 1)
+        market_variance = (((m - m_mean) ** 2) * valid).sum(axis=0) / (counts - 1)
+        volatility = np.sqrt((((r - r_mean) ** 2) * valid).sum(axis=0) / (counts - 1) * TRADING_DAYS)
+        beta = covariance / market_variance
+        drawdown = np.nanmin(year / np.fmax.accumulate(year, axis=0) - 1, axis=0) if len(year) else np.nan
+
+    if volumes is not None:
+        dollar_volume = np.nanmean((prices * volumes.reindex_like(prices)).to_numpy()[-63:], axis=0)
+    else:
+        dollar_volume = np.full(values.shape[1], np.nan)
+
+    factors = pd.DataFrame({
+        'momentum_12_1': _window_return(values, TRADING_DAYS, 21),
+        'momentum_3m': _window_return(values, 63, 0),
+        'volatility_1y': volatility,
+        'max_drawdown_1y': drawdown,
+        'beta_1y': beta,
+        'dollar_volume_3m': dollar_volume,
+        'last_close': values[-1] if len(values) else np.nan,
+        'observations': (~np.isnan(prices.to_numpy(dtype=np.float64, na_value=np.nan))).sum(axis=0),
+    }, index=pd.Index(prices.columns.astype(str), name='ticker'))
+    factors = factors.astype({f: np.float32 for f in FACTORS if f != 'observations'})
+    factors['observations'] = factors['observations'].astype(np.int32)
+    factors['risk_bucket'] = risk_buckets(factors['volatility_1y'].to_numpy())
+    return factors
+
+
+def risk_buckets(volatility: np.ndarray) -> np.ndarray:
+    """Volatility terciles of the universe as codes into RISK_BUCKETS (-1 when unknown)"""
+    known = ~np.isnan(volatility)
+    buckets = np.full(len(volatility), -1, dtype=np.int8)
+    if known.any():
+        edges = np.quantile(volatility[known], [1 / 3, 2 / 3])
+        buckets[known] = np.searchsorted(edges, volatility[known], side='left')
+    return buckets
+
+
+def write_snapshot(factors: pd.DataFrame, directory: str = SNAPSHOT_DIR, as_of: Optional[str] = None,
+                   source_mtime: Optional[float] = None) -> str:
+    """Persist a factor table column-wise with per-factor sort orders, swapping it in atomically"""
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".factor_snapshot_", dir=parent)
+
+    np.save(os.path.join(staging, TICKERS_FILE), np.asarray(factors.index.astype(str), dtype=str))
+    columns = list(factors.columns)
+    for column in columns:
+        data = factors[column].to_numpy()
+        np.save(os.path.join(staging, f"{column}.npy"), data)
+        if column in FACTORS:
+            # Descending order with NaNs last, so "top by factor" is a slice
+            key = np.where(np.isnan(data.astype(np.float64)), -np.inf, data.astype(np.float64))
+            np.save(os.path.join(staging, f"order_{column}.npy"), np.argsort(-key, kind='stable').astype(np.int32))
+    with open(os.path.join(staging, MANIFEST_FILE), 'w') as f:
+        json.dump({'as_of': as_of, 'rows': len(factors), 'columns': columns, 'source_mtime': source_mtime}, f)
+
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.replace(staging, directory)
+    return directory
+
+
+class FactorSnapshot:
+    """Read-only factor table loaded from a snapshot directory"""
+
+    def __init__(self, directory: str = SNAPSHOT_DIR):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        self.tickers = np.load(os.path.join(directory, TICKERS_FILE))
+        self.ticker_index = {ticker: i for i, ticker in enumerate(self.tickers.tolist())}
+        self.columns = {c: np.load(os.path.join(directory, f"{c}.npy"), mmap_mode='r')
+                        for c in self.manifest['columns']}
+        self._orders: Dict[str, np.ndarray] = {}
+
+    @property
+    def as_of(self) -> Optional[str]:
+        return self.manifest.get('as_of')
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker in self.ticker_index
+
+    def order(self, factor: str) -> np.ndarray:
+        """Row positions sorted by factor, descending, NaNs last"""
+        if factor not in self._orders:
+            self._orders[factor] = np.load(os.path.join(self.directory, f"order_{factor}.npy"))
+        return self._orders[factor]
+
+    def row(self, ticker: str) -> Optional[Dict[str, float]]:
+        i = self.ticker_index.get(ticker)
+        if i is None:
+            return None
+        return {column: values[i].item() for column, values in self.columns.items()}
+
+    def frame(self, tickers: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Factor table as a DataFrame (all tickers, or the known subset of `tickers` in order)"""
+        if tickers is None:
+            rows = np.arange(len(self.tickers))
+        else:
+            rows = np.array([self.ticker_index[t] for t in tickers if t in self.ticker_index], dtype=np.int64)
+        return pd.DataFrame({c: np.asarray(v)[rows] for c, v in self.columns.items()},
+                            index=pd.Index(self.tickers[rows], name='ticker'))
+
+    def risk_mask(self, risk_tolerance: str) -> np.ndarray:
+        """Tickers whose volatility bucket is at or below the client's risk tolerance"""
+        level = RISK_BUCKETS.index(str(risk_tolerance).lower()) if str(risk_tolerance).lower() in RISK_BUCKETS \
+            else len(RISK_BUCKETS) - 1
+        buckets = np.asarray(self.columns['risk_bucket'])
+        return (buckets >= 0) & (buckets <= level)
+
+    def rank(self, factor: str, top_k: Optional[int] = None, risk_tolerance: Optional[str] = None,
+             universe: Optional[Iterable[str]] = None, ascending: bool = False) -> List[str]:
+        """Tickers ordered by a precomputed factor, optionally within a risk bucket and/or universe"""
+        order = self.order(factor)
+        values = np.asarray(self.columns[factor])[order]
+        keep = ~np.isnan(values.astype(np.float64))
+        if risk_tolerance is not None:
+            keep &= self.risk_mask(risk_tolerance)[order]
+        if universe is not None:
+            allowed = np.zeros(len(self.tickers), dtype=bool)
+            allowed[[self.ticker_index[t] for t in universe if t in self.ticker_index]] = True
+            keep &= allowed[order]
+        ranked = order[keep]
+        if ascending:
+            ranked = ranked[::-1]
+        if top_k is not None:
+            ranked = ranked[:top_k]
+        return self.tickers[ranked].tolist()
+
+
+def refresh_snapshot(prices_path: Optional[str] = None, directory: str = SNAPSHOT_DIR, force: bool = False,
+                     benchmark: Optional[str] = None) -> FactorSnapshot:
+    """Rebuild the snapshot if the price file changed since it was written (or if forced)"""
+    prices_path = prices_path or PRICES_PATH
+    mtime = os.path.getmtime(prices_path)
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    if not force and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            if json.load(f).get('source_mtime') == mtime:
+                return FactorSnapshot(directory)
+
+    print(f"Computing factor snapshot from {prices_path}...")
+    prices = load_prices(prices_path)
+    volumes = pivot_prices(prices, value='volume') if 'volume' in prices.columns else None
+    wide = pivot_prices(prices)
+    factors = compute_factors(wide, volumes, benchmark)
+    as_of = str(wide.index.max())[:10] if len(wide) else str(date.today())
+    write_snapshot(factors, directory, as_of=as_of, source_mtime=mtime)
+    print(f"✅ Factor snapshot for {len(factors)} tickers as of {as_of} written to {directory}")
+    return FactorSnapshot(directory)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Refresh the per-ticker factor snapshot")
+    parser.add_argument("--prices", default=PRICES_PATH)
+    parser.add_argument("--output", default=SNAPSHOT_DIR)
+    parser.add_argument("--benchmark", default=None, help="Market ticker for beta (default: equal-weight universe)")
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+    refresh_snapshot(args.prices, args.output, force=args.force, benchmark=args.benchmark)
@@ -0,0 +1,199 @@
+"""
+Compact typed records for stock metadata, fundamental analyses and portfolio
+positions, plus a columnar universe table for ranking thousands of tickers.
+
+Records are NamedTuples (no per-instance __dict__); the agents still speak
+JSON dicts, so every record converts from/to the dict shape they produce.
+"""
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+SCORE_FIELDS = ('financial_health', 'growth_potential', 'competitive_position',
+                'management_quality', 'overall_score')
+RECOMMENDATIONS = ('sell', 'hold', 'buy')
+
+
+def _float(value: Any, default: float = float('nan')) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class StockMetadata(NamedTuple):
+    """One row of stock_metadata.csv"""
+    ticker: str
+    name: str = 'N/A'
+    sector: str = 'Unknown'
+    industry: str = 'Unknown'
+    volatility: float = float('nan')
+    market_cap: float = 0.0
+    tags: str = ''
+
+    @classmethod
+    def from_dict(cls, row: Dict[str, Any]) -> "StockMetadata":
+        return cls(
+            ticker=str(row['ticker']),
+            name=str(row.get('name', 'N/A')),
+            sector=str(row.get('sector', 'Unknown')),
+            industry=str(row.get('industry', 'Unknown')),
+            volatility=_float(row.get('volatility')),
+            market_cap=_float(row.get('market_cap'), 0.0),
+            tags=str(row.get('tags', '')),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self._asdict()
+
+
+class FundamentalAnalysis(NamedTuple):
+    """FundamentalAgent output; scores are in [0, 1], NaN when missing"""
+    ticker: str
+    financial_health: float = float('nan')
+    growth_potential: float = float('nan')
+    competitive_position: float = float('nan')
+    management_quality: float = float('nan')
+    overall_score: float = float('nan')
+    key_strengths: Tuple[str, ...] = ()
+    key_risks: Tuple[str, ...] = ()
+    recommendation: str = 'hold'
+
+    @classmethod
+    def from_dict(cls, ticker: str, analysis: Dict[str, Any]) -> "FundamentalAnalysis":
+        return cls(
+            ticker=ticker,
+            **{field: _float(analysis.get(field)) for field in SCORE_FIELDS},
+            key_strengths=tuple(analysis.get('key_strengths') or ()),
+            key_risks=tuple(analysis.get('key_risks') or ()),
+            recommendation=str(analysis.get('recommendation', 'hold')).lower(),
+        )
+
+    def scores(self) -> Tuple[float, ...]:
+        return tuple(getattr(self, field) for field in SCORE_FIELDS)
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = self._asdict()
+        del result['ticker']
+        result['key_strengths'] = list(self.key_strengths)
+        result['key_risks'] = list(self.key_risks)
+        return result
+
+
+class PortfolioPosition(NamedTuple):
+    """One entry of PortfolioManager's `portfolio` list"""
+    ticker: str
+    weight: float
+    rationale: str = ''
+
+    @classmethod
+    def from_dict(cls, row: Dict[str, Any]) -> "PortfolioPosition":
+        return cls(ticker=str(row['ticker']), weight=_float(row.get('weight'), 0.0),
+                   rationale=str(row.get('rationale', '')))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self._asdict()
+
+
+def positions_from_portfolio(portfolio: Dict[str, Any]) -> List[PortfolioPosition]:
+    """Typed positions from a PortfolioManager result"""
+    return [PortfolioPosition.from_dict(row) for row in portfolio.get('portfolio', [])]
+
+
+class UniverseTable:
+    """
+    Universe-wide metadata and analysis scores stored column-wise.
+
+    Sectors/industries are categorical codes (int16) into `sectors`/`industries`,
+    numeric columns are float32, and analysis scores live in an (n, 5) float32
+    matrix that is NaN for tickers that have not been analyzed.
+    """
+
+    def __init__(self, tickers: List[str], names: List[str], sectors: List[str], industries: List[str],
+                 volatility: Iterable[float], market_cap: Iterable[float], tags: List[str]):
+        self.tickers = np.asarray(tickers, dtype=object)
+        self.names = np.asarray(names, dtype=object)
+        self.tags = np.asarray(tags, dtype=object)
+        self.index = {ticker: i for i, ticker in enumerate(tickers)}
+        self.sectors, sector_codes = np.unique(np.asarray(sectors, dtype=str), return_inverse=True)
+        self.industries, industry_codes = np.unique(np.asarray(industries, dtype=str), return_inverse=True)
+        self.sector_codes = sector_codes.astype(np.int16)
+        self.industry_codes = industry_codes.astype(np.int16)
+        self.volatility = np.asarray(volatility, dtype=np.float32)
+        self.market_cap = np.asarray(market_cap, dtype=np.float64)
+        self.scores = np.full((len(tickers), len(SCORE_FIELDS)), np.nan, dtype=np.float32)
+        self.recommendation_codes = np.full(len(tickers), -1, dtype=np.int8)
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    @classmethod
+    def from_metadata(cls, metadata) -> "UniverseTable":
+        """Build from a metadata DataFrame with the stock_metadata.csv columns"""
+        def column(name, default):
+            if name not in metadata:
+                return [default] * len(metadata)
+            # object first so categorical columns accept a fill value outside their categories
+            return metadata[name].astype(object).fillna(default).astype(str).tolist()
+
+        return cls(
+            tickers=metadata['ticker'].astype(str).tolist(),
+            names=column('name', 'N/A'),
+            sectors=column('sector', 'Unknown'),
+            industries=column('industry', 'Unknown'),
+            volatility=metadata['volatility'].to_numpy(dtype=np.float32, na_value=np.nan) if 'volatility' in metadata else np.full(len(metadata), np.nan),
+            market_cap=metadata['market_cap'].to_numpy(dtype=np.float64, na_value=0.0) if 'market_cap' in metadata else np.zeros(len(metadata)),
+            tags=column('tags', ''),
+        )
+
+    def metadata(self, ticker: str) -> Optional[StockMetadata]:
+        i = self.index.get(ticker)
+        if i is None:
+            return None
+        return StockMetadata(
+            ticker=ticker,
+            name=self.names[i],
+            sector=str(self.sectors[self.sector_codes[i]]),
+            industry=str(self.industries[self.industry_codes[i]]),
+            volatility=float(self.volatility[i]),
+            market_cap=float(self.market_cap[i]),
+            tags=self.tags[i],
+        )
+
+    def set_analysis(self, analysis: FundamentalAnalysis):
+        i = self.index.get(analysis.ticker)
+        if i is None:
+            raise KeyError(f"{analysis.ticker} is not in the universe")
+        self.scores[i] = analysis.scores()
+        rec = analysis.recommendation
+        self.recommendation_codes[i] = RECOMMENDATIONS.index(rec) if rec in RECOMMENDATIONS else -1
+
+    def set_analyses(self, analyses: Dict[str, Dict[str, Any]]):
+        """Load a `{ticker: analysis_dict}` mapping as produced by analyze_stocks"""
+        for ticker, analysis in analyses.items():
+            if ticker in self.index:
+                self.set_analysis(FundamentalAnalysis.from_dict(ticker, analysis))
+
+    def sector_mask(self, sectors: Iterable[str]) -> np.ndarray:
+        codes = [i for i, sector in enumerate(self.sectors) if sector in set(sectors)]
+        return np.isin(self.sector_codes, codes)
+
+    def rank(self, by: str = 'overall_score', sectors: Optional[Iterable[str]] = None,
+             top_k: Optional[int] = None) -> List[str]:
+        """Tickers ordered by a score column (descending), skipping unanalyzed tickers"""
+        values = self.scores[:, SCORE_FIELDS.index(by)]
+        mask = ~np.isnan(values)
+        if sectors is not None:
+            mask &= self.sector_mask(sectors)
+        candidates = np.flatnonzero(mask)
+        order = candidates[np.argsort(-values[candidates], kind='stable')]
+        if top_k is not None:
+            order = order[:top_k]
+        return self.tickers[order].tolist()
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the numeric/categorical columns"""
+        arrays = (self.sector_codes, self.industry_codes, self.volatility, self.market_cap,
+                  self.scores, self.recommendation_codes)
+        return sum(a.nbytes for a in arrays)
@@ -0,0 +1,143 @@
+"""
+Memory-mapped wide price matrix shared by worker processes.
+
+The long price frame is pivoted once into a (dates x tickers) float32 matrix on
+disk next to its date/ticker indexes. Workers attach with np.memmap, so every
+process reads the same OS page-cache copy instead of reloading and re-pivoting
+the CSV. Pickling a SharedPriceMatrix only sends its directory.
+"""
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from data.typed_loader import PRICES_PATH, PROJECT_ROOT, load_prices, pivot_prices
+
+MATRIX_DIR = os.path.join(PROJECT_ROOT, "data", "price_matrix")
+VALUES_FILE = "prices.f32"
+DATES_FILE = "dates.npy"
+TICKERS_FILE = "tickers.npy"
+MANIFEST_FILE = "manifest.json"
+
+
+def materialize_price_matrix(prices: pd.DataFrame, directory: str = MATRIX_DIR,
+                             source_mtime: Optional[float] = None) -> str:
+    """
+    Write a long (date, ticker, close) or already-wide price frame as a memory-mappable matrix.
+
+    The files are written to a temporary sibling directory and swapped in, so
+    readers never see a half-written matrix.
+    """
+    wide = pivot_prices(prices) if 'ticker' in prices.columns else prices.sort_index()
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".price_matrix_", dir=parent)
+
+    values = np.memmap(os.path.join(staging, VALUES_FILE), dtype=np.float32, mode='w+', shape=wide.shape)
+    values[:] = wide.to_numpy(dtype=np.float32, na_value=np.nan)
+    values.flush()
+    del values
+    np.save(os.path.join(staging, DATES_FILE), wide.index.to_numpy(dtype='datetime64[ns]'))
+    np.save(os.path.join(staging, TICKERS_FILE), np.asarray(wide.columns.astype(str), dtype=str))
+    with open(os.path.join(staging, MANIFEST_FILE), 'w') as f:
+        json.dump({'shape': list(wide.shape), 'dtype': 'float32', 'source_mtime': source_mtime}, f)
+
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.replace(staging, directory)
+    return directory
+
+
+def ensure_price_matrix(prices_path: Optional[str] = None, directory: str = MATRIX_DIR) -> "SharedPriceMatrix":
+    """Attach to the matrix, (re)building it first if the price CSV changed since it was written"""
+    prices_path = prices_path or PRICES_PATH
+    mtime = os.path.getmtime(prices_path)
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            if json.load(f).get('source_mtime') == mtime:
+                return SharedPriceMatrix(directory)
+    print(f"Materializing price matrix from {prices_path}...")
+    materialize_price_matrix(load_prices(prices_path), directory, source_mtime=mtime)
+    return SharedPriceMatrix(directory)
+
+
+class SharedPriceMatrix:
+    """Read-only, zero-copy view of a materialized price matrix"""
+
+    def __init__(self, directory: str = MATRIX_DIR):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        self.values = np.memmap(os.path.join(directory, VALUES_FILE), dtype=manifest['dtype'], mode='r',
+                                shape=tuple(manifest['shape']))
+        self.dates = np.load(os.path.join(directory, DATES_FILE))
+        self.tickers = np.load(os.path.join(directory, TICKERS_FILE))
+        self.ticker_index = {ticker: i for i, ticker in enumerate(self.tickers.tolist())}
+
+    def __reduce__(self):
+        # Ship the path, not the data; the receiving process re-attaches
+        return (SharedPriceMatrix, (self.directory,))
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def columns(self, tickers: Iterable[str]) -> np.ndarray:
+        """(dates x len(tickers)) array for the given tickers (a copy of just those columns)"""
+        return self.values[:, [self.ticker_index[t] for t in tickers]]
+
+    def frame(self, tickers: Optional[List[str]] = None) -> pd.DataFrame:
+        """DataFrame over the matrix (all tickers, or a column subset)"""
+        if tickers is None:
+            return pd.DataFrame(self.values, index=pd.DatetimeIndex(self.dates, name='date'),
+                                columns=pd.Index(self.tickers, name='ticker'), copy=False)
+        return pd.DataFrame(self.columns(tickers), index=pd.DatetimeIndex(self.dates, name='date'),
+                            columns=pd.Index(tickers, name='ticker'))
+
+
+# --- Process-pool fan-out ---
+
+_worker_matrix: Optional[SharedPriceMatrix] = None
+
+
+def _attach_worker(directory: str):
+    global _worker_matrix
+    _worker_matrix = SharedPriceMatrix(directory)
+
+
+def _run_task(fn: Callable[[SharedPriceMatrix, Any], Any], task: Any) -> Any:
+    return fn(_worker_matrix, task)
+
+
+def map_with_prices(fn: Callable[[SharedPriceMatrix, Any], Any], tasks: Iterable[Any],
+                    matrix: SharedPriceMatrix, max_workers: Optional[int] = None) -> List[Any]:
+    """
+    Run fn(matrix, task) for every task on a process pool.
+
+    Each worker attaches to the memory-mapped matrix once at startup; `fn` must
+    be a module-level (picklable) function.
+    """
+    tasks = list(tasks)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_attach_worker,
+                             initargs=(matrix.directory,)) as pool:
+        return list(pool.map(_run_task, [fn] * len(tasks), tasks))
+
+
+def matrix_info(matrix: SharedPriceMatrix) -> Dict[str, Any]:
+    return {
+        'dates': int(matrix.shape[0]),
+        'tickers': int(matrix.shape[1]),
+        'mb': round(matrix.values.nbytes / 2 ** 20, 2),
+        'first_date': str(matrix.dates[0])[:10] if len(matrix.dates) else None,
+        'last_date': str(matrix.dates[-1])[:10] if len(matrix.dates) else None,
+    }
+
+
+if __name__ == "__main__":
+    print(matrix_info(ensure_price_matrix()))
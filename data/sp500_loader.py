@@ -1,5 +1,4 @@
 import pandas as pd
-import yfinance as yf
 from datetime import datetime, timedelta
 import time
 from pathlib import Path
@@ -14,6 +13,8 @@ def get_sp500_tickers():
 
 def get_stock_metadata(ticker):
     """Get detailed metadata for a stock using yfinance"""
+    import yfinance as yf
+
     try:
         stock = yf.Ticker(ticker)
         info = stock.info
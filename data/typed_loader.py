@@ -0,0 +1,104 @@
+"""
+Memory-compact loaders for stock_metadata.csv and the long price CSV.
+
+Tickers, sectors, industries and tags become categoricals, volatility becomes
+float32, and closes are downcast to float32 when that loses no more than
+`price_tolerance` (half a cent by default).
+"""
+import os
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+METADATA_PATH = os.path.join(PROJECT_ROOT, "data", "stock_metadata.csv")
+PRICES_PATH = os.path.join(PROJECT_ROOT, "data", "stock_prices.csv")
+
+METADATA_CATEGORIES = ['ticker', 'sector', 'industry', 'tags']
+
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    """Deep memory footprint of a DataFrame in bytes"""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> Dict[str, Any]:
+    before_bytes, after_bytes = frame_bytes(before), frame_bytes(after)
+    return {
+        'before_mb': round(before_bytes / 2 ** 20, 3),
+        'after_mb': round(after_bytes / 2 ** 20, 3),
+        'reduction': round(1 - after_bytes / before_bytes, 3) if before_bytes else 0.0,
+    }
+
+
+def downcast_prices(values: pd.Series, price_tolerance: float = 0.005) -> pd.Series:
+    """float32 copy of a price column if the rounding error stays within tolerance"""
+    as_float32 = values.astype(np.float32)
+    error = np.nanmax(np.abs(as_float32.to_numpy(dtype=np.float64) - values.to_numpy(dtype=np.float64)), initial=0.0)
+    return as_float32 if error <= price_tolerance else values.astype(np.float64)
+
+
+def compact_metadata(metadata: pd.DataFrame) -> pd.DataFrame:
+    """Categorical/float32 version of a stock_metadata frame"""
+    compact = metadata.copy()
+    for column in METADATA_CATEGORIES:
+        if column in compact:
+            compact[column] = compact[column].astype('category')
+    if 'volatility' in compact:
+        compact['volatility'] = compact['volatility'].astype(np.float32)
+    if 'market_cap' in compact and pd.api.types.is_integer_dtype(compact['market_cap']):
+        compact['market_cap'] = pd.to_numeric(compact['market_cap'], downcast='integer')
+    return compact
+
+
+def compact_prices(prices: pd.DataFrame, price_tolerance: float = 0.005) -> pd.DataFrame:
+    """Categorical-ticker / float32-close version of a long (date, ticker, close) frame"""
+    compact = prices.copy()
+    compact['ticker'] = compact['ticker'].astype('category')
+    if not pd.api.types.is_datetime64_any_dtype(compact['date']):
+        compact['date'] = pd.to_datetime(compact['date'])
+    for column in compact.columns.difference(['date', 'ticker']):
+        if pd.api.types.is_float_dtype(compact[column]):
+            compact[column] = downcast_prices(compact[column], price_tolerance)
+    return compact
+
+
+def load_metadata(path: Optional[str] = None, report: bool = False) -> pd.DataFrame:
+    """Load stock_metadata.csv with compact dtypes"""
+    raw = pd.read_csv(path or METADATA_PATH)
+    metadata = compact_metadata(raw)
+    if report:
+        print(f"Metadata memory: {memory_report(raw, metadata)}")
+    return metadata
+
+
+def load_prices(path: Optional[str] = None, price_tolerance: float = 0.005, report: bool = False) -> pd.DataFrame:
+    """Load the long (date, ticker, close) price CSV with compact dtypes"""
+    path = path or PRICES_PATH
+    if report:
+        raw = pd.read_csv(path, parse_dates=['date'])
+        prices = compact_prices(raw, price_tolerance)
+        print(f"Price memory: {memory_report(raw, prices)}")
+        return prices
+    # Parse tickers straight into a categorical so the object strings never materialize
+    return compact_prices(pd.read_csv(path, parse_dates=['date'], dtype={'ticker': 'category'}), price_tolerance)
+
+
+def pivot_prices(prices: pd.DataFrame, value: str = 'close') -> pd.DataFrame:
+    """Wide date x ticker matrix, keeping the (float32) value dtype"""
+    wide = prices.pivot(index='date', columns='ticker', values=value)
+    wide.columns = pd.Index(wide.columns.astype(str), name='ticker')
+    return wide.sort_index()
+
+
+def load_data(prices_path: Optional[str] = None, metadata_path: Optional[str] = None,
+              report: bool = False) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Compact (stock_data, metadata) pair"""
+    return load_prices(prices_path, report=report), load_metadata(metadata_path, report=report)
+
+
+if __name__ == "__main__":
+    load_metadata(report=True)
+    if os.path.exists(PRICES_PATH):
+        load_prices(report=True)
@@ -1,23 +1,147 @@
 import streamlit as st
 import os
-from openai import AzureOpenAI
-from dotenv import load_dotenv
 import json
-from data.sp500_loader import get_sp500_tickers, get_stock_metadata, update_sp500_metadata
+import time
+from data.records import UniverseTable
+from data.typed_loader import load_metadata
+from data.factor_snapshot import SNAPSHOT_DIR, FactorSnapshot
+from data.correlation_index import INDEX_DIR, CorrelationIndex
+from data.shared_prices import MATRIX_DIR, SharedPriceMatrix
+from data.sp500_loader import get_stock_metadata, update_sp500_metadata
 import pandas as pd
 from agents.fundamental_agent import FundamentalAgent
+from pipeline.analysis_store import AnalysisStore
 from agents.portfolio_manager import PortfolioManager
+from agents.usage import Budget
+from pipeline.chat import guided_chat_turn, new_guided_chat
+from pipeline.generation import collect_progress, run_portfolio_generation
+from pipeline.report import build_report, portfolio_key
+from filter.prescore import candidate_budget, diversify, prescore
+from engine.stress import default_scenarios
+from pipeline.jobs import DONE, FAILED, FINISHED_STATUSES, JobExecutor, JobStore
 
 # Set page config must be the first Streamlit command
 st.set_page_config(page_title="Bionic Advisor Demo", layout="wide")
 
-# Initialize stock metadata if not exists and load into session state
+# --- Process-wide caches (shared by every browser session) ---
+# Data caches are keyed by file mtime, so regenerating a CSV invalidates them.
 metadata_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data/stock_metadata.csv")
-if 'stock_metadata_df' not in st.session_state:
-    if not os.path.exists(metadata_path):
-        with st.spinner("Initializing stock metadata..."):
-            update_sp500_metadata()
-    st.session_state.stock_metadata_df = pd.read_csv(metadata_path)
+tickers_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data/sp500_tickers.csv")
+# LLM budget per generated portfolio; decides how many candidates get a full analysis
+LATENCY_BUDGET_S = float(os.getenv("BIONIC_LATENCY_BUDGET", "90"))
+COST_BUDGET_USD = float(os.getenv("BIONIC_COST_BUDGET", "0.05"))
+# Analyses run in parallel; a draft allocation is shown once half of them (or 20s) are in
+ANALYSIS_CONCURRENCY = int(os.getenv("BIONIC_ANALYSIS_CONCURRENCY", "4"))
+DRAFT_FRACTION = 0.5
+DRAFT_AFTER_S = 20.0
+# Hard limits for a whole generation run; analyses stop early to stay inside them
+RUN_BUDGET = Budget(max_cost_usd=float(os.getenv("BIONIC_RUN_COST_LIMIT", "0.10")),
+                    max_seconds=float(os.getenv("BIONIC_RUN_TIME_LIMIT", "300")))
+
+@st.cache_data(show_spinner=False)
+def load_stock_metadata(path, mtime):
+    """Read stock_metadata.csv (categorical/float32 columns) once per file version"""
+    return load_metadata(path)
+
+@st.cache_data(show_spinner=False)
+def load_sp500_tickers(path, mtime):
+    """Read the S&P 500 ticker list once per file version"""
+    return pd.read_csv(path)['Symbol'].tolist()
+
+@st.cache_resource(show_spinner=False)
+def get_openai_client():
+    """One AzureOpenAI client for the whole server process (cassette-backed when BIONIC_CASSETTE is set)"""
+    from dotenv import load_dotenv
+    from agents.cassette import cassette_client
+    load_dotenv()
+
+    def make_client():
+        from openai import AzureOpenAI
+        return AzureOpenAI(
+            api_version="2024-12-01-preview",
+            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT", "https://bionicadvisor.openai.azure.com/"),
+            api_key=os.getenv("AZURE_OPENAI_API_KEY")
+        )
+    return cassette_client(make_client)
+
+@st.cache_resource(show_spinner=False)
+def get_fundamental_agent():
+    """Analyses are shared by all clients through data/analyses.sqlite3"""
+    return FundamentalAgent(store=AnalysisStore())
+
+@st.cache_resource(show_spinner=False)
+def get_portfolio_manager():
+    return PortfolioManager()
+
+@st.cache_resource(show_spinner=False)
+def get_job_executor():
+    """Background executor for portfolio generation, backed by data/jobs.sqlite3"""
+    return JobExecutor(JobStore())
+
+@st.cache_resource(show_spinner=False)
+def load_universe_table(path, mtime):
+    """Columnar view of the metadata (read-only, shared by all sessions)"""
+    return UniverseTable.from_metadata(load_stock_metadata(path, mtime))
+
+@st.cache_data(show_spinner=False)
+def load_factor_table(directory, mtime):
+    """Nightly factor snapshot as a DataFrame, once per refresh"""
+    return FactorSnapshot(directory).frame()
+
+def get_stock_metadata_df():
+    return load_stock_metadata(metadata_path, os.path.getmtime(metadata_path))
+
+def get_factor_table():
+    """Factor snapshot if `python -m data.factor_snapshot` has been run, else None"""
+    manifest = os.path.join(SNAPSHOT_DIR, "manifest.json")
+    if not os.path.exists(manifest):
+        return None
+    return load_factor_table(SNAPSHOT_DIR, os.path.getmtime(manifest))
+
+@st.cache_resource(show_spinner=False)
+def load_correlation_index(directory, mtime):
+    """Memory-mapped correlation index, shared by all sessions until the next refresh"""
+    return CorrelationIndex(directory)
+
+def get_correlation_index():
+    """Correlation index if `python -m data.correlation_index` has been run, else None"""
+    manifest = os.path.join(INDEX_DIR, "manifest.json")
+    if not os.path.exists(manifest):
+        return None
+    return load_correlation_index(INDEX_DIR, os.path.getmtime(manifest))
+
+def _mtime(path):
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+@st.cache_resource(show_spinner=False)
+def load_stress_scenarios(metadata_mtime, factors_mtime, prices_mtime):
+    """Sector shocks, plus market shocks and past episodes when the factor snapshot/price matrix exist"""
+    prices = SharedPriceMatrix(MATRIX_DIR).frame() if prices_mtime is not None else None
+    return default_scenarios(get_stock_metadata_df(), get_factor_table(), prices)
+
+def get_stress_scenarios():
+    return load_stress_scenarios(os.path.getmtime(metadata_path), _mtime(os.path.join(SNAPSHOT_DIR, "manifest.json")),
+                                 _mtime(os.path.join(MATRIX_DIR, "manifest.json")))
+
+def get_universe_table():
+    return load_universe_table(metadata_path, os.path.getmtime(metadata_path))
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def load_portfolio_report(key, metadata_mtime, index_mtime, factors_mtime, prices_mtime, _portfolio):
+    """Report artifacts of one portfolio, keyed by its content hash and the versions of the data behind them"""
+    return build_report(get_openai_client(), _portfolio, get_universe_table(), get_correlation_index(),
+                        get_stress_scenarios())
+
+def get_portfolio_report(portfolio):
+    return load_portfolio_report(portfolio_key(portfolio), os.path.getmtime(metadata_path),
+                                 _mtime(os.path.join(INDEX_DIR, "manifest.json")),
+                                 _mtime(os.path.join(SNAPSHOT_DIR, "manifest.json")),
+                                 _mtime(os.path.join(MATRIX_DIR, "manifest.json")), portfolio)
+
+# Initialize stock metadata if not exists
+if not os.path.exists(metadata_path):
+    with st.spinner("Initializing stock metadata..."):
+        update_sp500_metadata()
 
 # Initialize session state
 if 'chat_history' not in st.session_state:
@@ -36,12 +160,7 @@ if 'debug_mode' not in st.session_state:
     st.session_state.debug_mode = False
 
 # Initialize Azure OpenAI client
-load_dotenv()
-client = AzureOpenAI(
-    api_version="2024-12-01-preview",
-    azure_endpoint="https://bionicadvisor.openai.azure.com/",
-    api_key=os.getenv("AZURE_OPENAI_API_KEY")
-)
+client = get_openai_client()
 
 # Simple progress tracker
 def get_progress():
@@ -122,39 +241,19 @@ if all(st.session_state.preferences.values()):
         # Here you would add the portfolio generation logic
 
 # --- Helper functions (reuse your logic) ---
-def get_investment_profile(client, risk, horizon, sectors):
-    system_prompt = f"""You are a financial advisor assistant. Create an investment profile based on the following preferences:
-- Risk tolerance: {risk}
-- Investment horizon: {horizon}
-- Preferred sectors: {', '.join(sectors)}
-
-Return the profile as a JSON object with these exact fields:
-{{
-    \"risk_tolerance\": \"{risk}\",
-    \"investment_horizon\": \"{horizon}\",
-    \"sectors\": {json.dumps(sectors)}
-}}"""
-    response = client.chat.completions.create(
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": "Create an investment profile."}
-        ],
-        max_tokens=4096,
-        temperature=0.7,
-        model="gpt-35-turbo"
-    )
-    return response.choices[0].message.content
-
-def analyze_stocks(tickers, context):
-    fundamental_agent = FundamentalAgent()
-    analyses = {}
-    for ticker in tickers:
-        analyses[ticker] = fundamental_agent.analyze(ticker, context)
-    return analyses
-
-def generate_portfolio(tickers, analyses, context):
-    portfolio_manager = PortfolioManager()
-    return portfolio_manager.analyze(tickers, analyses, context)
+def portfolio_generation_job(client, fundamental_agent, portfolio_manager, job_store):
+    """Build the job function for the background executor (it must not call Streamlit)"""
+    def job(params, progress):
+        # Incremental mode: reuse whatever the previous finished run computed that is still valid
+        previous = job_store.get(params['previous_job']) if params.get('previous_job') else None
+        return run_portfolio_generation(
+            client, fundamental_agent, portfolio_manager,
+            params['risk'], params['horizon'], params['sectors'], params['tickers'],
+            progress=progress, budget=RUN_BUDGET, max_concurrency=ANALYSIS_CONCURRENCY,
+            draft_fraction=DRAFT_FRACTION, draft_after=DRAFT_AFTER_S,
+            previous=previous['result'] if previous and previous['status'] == DONE else None
+        )
+    return job
 
 # --- Streamlit UI ---
 
@@ -187,7 +286,7 @@ st.markdown("""
 - Use the tabs below to view your investment profile, stock analyses, and portfolio recommendation (with a pie chart and risk summary).
 
 ---
-- You can change your preferences at any time and re-generate the portfolio.
+- You can change your preferences at any time and re-generate the portfolio; only the stocks and steps your change affects are recomputed.
 - The app analyzes up to 10 stocks at a time to avoid API rate limits.
 - The maximum weight for any single stock in your portfolio is capped at 4%.
 """)
@@ -197,40 +296,10 @@ col1, col2 = st.columns([1, 2])
 
 with col1:
     st.subheader("Step 1: Chat with the Advisor")
-    load_dotenv()
-    endpoint = "https://bionicadvisor.openai.azure.com/"
-    api_version = "2024-12-01-preview"
-    client = AzureOpenAI(
-        api_version=api_version,
-        azure_endpoint=endpoint,
-        api_key=os.getenv("AZURE_OPENAI_API_KEY")
-    )
+    client = get_openai_client()
     # Chat state
     if 'guided_chat' not in st.session_state:
-        st.session_state['guided_chat'] = {
-            'messages': [
-                {"role": "system", "content": """You are a financial advisor assistant. Your task is to help users determine their investment preferences.
-                You need to collect:
-                1. Risk tolerance (low, moderate, high)
-                2. Investment horizon (short_term, medium_term, long_term)
-                3. Preferred sectors (from: Technology, Healthcare, Financials, Energy, Consumer Discretionary, Consumer Staples, Industrials, Materials, Utilities, Real Estate, Communication Services)
-                
-                Have a natural conversation with the user to collect these preferences. After EACH response, include a JSON object showing your current understanding of their preferences. Format your response like this:
-                
-                [Your natural conversation response here]
-                
-                <preferences>
-                {
-                    "risk_tolerance": "low/moderate/high or null if not yet determined",
-                    "investment_horizon": "short_term/medium_term/long_term or null if not yet determined",
-                    "sectors": ["sector1", "sector2", ...] or [] if not yet determined
-                }
-                </preferences>
-                
-                Keep the conversation natural, but always include the preferences JSON at the end of your response, even if some preferences are still null or empty."""}
-            ],
-            'preferences': None
-        }
+        st.session_state['guided_chat'] = new_guided_chat()
     guided = st.session_state['guided_chat']
     
     # Show chat history
@@ -272,33 +341,8 @@ with col1:
         submitted = st.form_submit_button("Send")
         
         if submitted and user_input:
-            # Add user message to history
-            guided['messages'].append({'role': 'user', 'content': user_input})
-            
-            # Get response from Azure API
-            response = client.chat.completions.create(
-                messages=guided['messages'],
-                max_tokens=4096,
-                temperature=0.7,
-                model="gpt-35-turbo"
-            )
-            
-            # Get AI response
-            ai_response = response.choices[0].message.content
-            
-            # Add AI response to history
-            guided['messages'].append({'role': 'assistant', 'content': ai_response})
-            
-            # Parse preferences from the response if it contains the <preferences> tag
-            if '<preferences>' in ai_response:
-                conversation, preferences_json = ai_response.split('<preferences>')
-                try:
-                    preferences = json.loads(preferences_json.strip())
-                    if preferences and any(preferences.values()):
-                        guided['preferences'] = preferences
-                        st.session_state['guided_chat'] = guided
-                except json.JSONDecodeError:
-                    pass
+            # Only the system prompt, a summary of older turns and the latest turns are sent
+            guided_chat_turn(client, guided, user_input)
             
             st.rerun()  # Rerun to update the chat history and button states immediately
 
@@ -495,17 +539,25 @@ with col2:
             help="Which industries are you most interested in for your investments?"
         )
 
-        # Filter tickers by selected sector(s)
-        metadata = st.session_state.stock_metadata_df
-        filtered_tickers = metadata[
-            metadata["sector"].isin(form_sectors) & (metadata["sector"] != "Unknown")
-        ]["ticker"].unique().tolist()
+        # Pre-rank the sector matches deterministically; only the top K reach the LLM
+        metadata = get_stock_metadata_df()
+        candidate_scores = prescore(metadata, form_risk, form_sectors, factors=get_factor_table())
+        k = candidate_budget(latency_budget_s=LATENCY_BUDGET_S, cost_budget_usd=COST_BUDGET_USD,
+                             concurrency=ANALYSIS_CONCURRENCY)
+        correlation_index = get_correlation_index()
+        if correlation_index is not None:
+            filtered_tickers = diversify(candidate_scores.index, correlation_index, k)
+        else:
+            filtered_tickers = candidate_scores.index[:k].tolist()
         filtered_tickers_str = ", ".join(filtered_tickers)
 
         # Show filtered tickers as a read-only summary
         st.markdown("**Stocks matching your sector selection:**")
         st.code(filtered_tickers_str, language=None)
-        st.caption("These stocks will be used for your portfolio analysis.")
+        st.caption(f"Top {len(filtered_tickers)} of {len(candidate_scores)} matching stocks by risk fit, size and "
+                   "market factors" + (", skipping near-duplicates of higher-ranked picks"
+                                       if correlation_index is not None else "") +
+                   ". These stocks will be used for your portfolio analysis.")
 
         submitted = st.form_submit_button("Submit Preferences")
 
@@ -520,26 +572,81 @@ with col2:
     # --- Main Page Tabs ---
     tabs = st.tabs(["Investment Profile", "Stock Analyses", "Portfolio Recommendation"])
 
+    incremental = st.checkbox("Reuse previous results", value=True, key="incremental",
+                              help="Only recompute what your changes affect: new stocks are analyzed, and the "
+                                   "profile and allocation are regenerated only if their inputs changed.")
     if st.button("Generate Portfolio", key="run_portfolio"):
         risk = st.session_state.get('risk', default_risk)
         horizon = st.session_state.get('horizon', 'medium_term')
         sectors = st.session_state.get('sectors', ['technology', 'healthcare'])
-        tickers = st.session_state.get('tickers', ",".join(get_sp500_tickers()))
-        with st.spinner("Generating investment profile..."):
-            profile = get_investment_profile(client, risk, horizon, sectors)
-            profile_dict = json.loads(profile)
-            st.session_state.profile = profile_dict  # Store profile in session state
-        with st.spinner("Analyzing stocks..."):
-            ticker_list = [t.strip().upper() for t in tickers.split(",") if t.strip()]
-            ticker_list = ticker_list[:30]
-            if st.session_state.debug_mode:
-                st.write(f"Tickers passed to analyze_stocks and generate_portfolio: {ticker_list}")
-            analyses = analyze_stocks(ticker_list, profile_dict)
-            st.session_state.analyses = analyses  # Store analyses in session state
-        with st.spinner("Generating portfolio..."):
-            portfolio = generate_portfolio(ticker_list, analyses, profile_dict)
-            st.session_state.portfolio = portfolio  # Store portfolio in session state
-            st.rerun()  # Force rerun to update progress bar
+        tickers = st.session_state.get('tickers')
+        if tickers is None:
+            tickers = ",".join(load_sp500_tickers(tickers_path, os.path.getmtime(tickers_path)))
+        ticker_list = [t.strip().upper() for t in tickers.split(",") if t.strip()]
+        ticker_list = ticker_list[:30]
+        if st.session_state.debug_mode:
+            st.write(f"Tickers passed to analyze_stocks and generate_portfolio: {ticker_list}")
+        # Drop results of the previous run, then hand the work to the background executor
+        for key in ('profile', 'analyses', 'portfolio', 'usage', 'reused'):
+            st.session_state.pop(key, None)
+        executor = get_job_executor()
+        job_id = executor.submit(
+            "portfolio_generation",
+            portfolio_generation_job(client, get_fundamental_agent(), get_portfolio_manager(), executor.store),
+            {'risk': risk, 'horizon': horizon, 'sectors': sectors, 'tickers': ticker_list,
+             'previous_job': st.session_state.get('last_done_job') if incremental else None}
+        )
+        st.session_state['job_id'] = job_id
+        st.query_params['job'] = job_id  # survives a page refresh so we can reattach
+        st.rerun()
+
+    # --- Attach to a running (or just finished) generation job ---
+    job_running = False
+    job_id = st.session_state.get('job_id') or st.query_params.get('job')
+    job = get_job_executor().store.get(job_id) if job_id else None
+    if job is not None:
+        st.session_state['job_id'] = job_id
+        progress = collect_progress(get_job_executor().store.events(job_id))
+        if progress['profile'] is not None:
+            st.session_state.profile = progress['profile']
+        if progress['analyses']:
+            st.session_state.analyses = progress['analyses']
+        if progress['portfolio'] is not None:
+            st.session_state.portfolio = progress['portfolio']
+        elif progress['draft'] is not None:
+            # Usable right away; replaced when the portfolio manager finishes
+            st.session_state.portfolio = progress['draft']
+        if progress['usage'] is not None:
+            st.session_state.usage = progress['usage']
+        if progress['budget'] is not None:
+            st.warning(f"Budget reached ({progress['budget']['reason']}): the portfolio uses "
+                       f"{progress['budget']['analyzed']} analyzed stocks and skips "
+                       f"{len(progress['budget']['skipped'])}.")
+
+        if job['status'] in FINISHED_STATUSES:
+            st.session_state.pop('job_id', None)
+            if 'job' in st.query_params:
+                del st.query_params['job']
+            if job['status'] == DONE:
+                st.session_state['last_done_job'] = job_id
+                st.session_state.reused = progress['reused']
+            elif job['status'] == FAILED:
+                st.error(f"Portfolio generation failed: {job['error']}")
+            else:
+                st.warning("Portfolio generation was interrupted. Please generate it again.")
+        else:
+            job_running = True
+            total = progress['total'] or len(job['params']['tickers'])
+            done = len(progress['analyses'])
+            stage_labels = {
+                None: "Waiting to start...",
+                'profile': "Generating investment profile...",
+                'analyses': f"Analyzing stocks ({done}/{total})...",
+                'portfolio': "Generating portfolio...",
+            }
+            st.progress(done / total if total else 0.0, text=stage_labels[progress['stage']])
+    elif job_id:
+        st.session_state.pop('job_id', None)
 
     # Show results in tabs
     with tabs[0]:
@@ -554,77 +661,60 @@ with col2:
     
     with tabs[2]:
         st.subheader("Portfolio Recommendation")
+        reused = st.session_state.get('reused')
+        if reused and (reused['profile'] or reused['analyses'] or reused['portfolio']):
+            st.caption(f"Reused from the previous run: {reused['analyses']} analyses"
+                       + (", the profile" if reused['profile'] else "")
+                       + (", the allocation" if reused['portfolio'] else "") + ".")
         if 'portfolio' in st.session_state:
             portfolio = st.session_state.portfolio
+            if portfolio.get("draft"):
+                based_on = portfolio["based_on"]
+                st.info(f"Draft allocation from {based_on['analyses']} of {based_on['total']} analyses. "
+                        "It will be refined when the remaining analyses are done.")
             if "portfolio" in portfolio:
-                import pandas as pd
-                import matplotlib.pyplot as plt
-
-                df = pd.DataFrame(portfolio["portfolio"])
-                tickers = df["ticker"].tolist()
-                weights = df["weight"].tolist()
+                # Computed once per portfolio content; reruns just redisplay it
+                report = get_portfolio_report(portfolio)
 
                 # Show tickers as a list
                 st.markdown("**Tickers in Portfolio:**")
-                st.write(", ".join(tickers))
+                st.write(", ".join(report['table']["Ticker"].tolist() if len(report['table']) else []))
 
                 # --- Portfolio Table ---
                 st.markdown("**Portfolio Details:**")
-                portfolio_data = []
-                for row in portfolio["portfolio"]:
-                    # Retrieve metadata from the already loaded DataFrame in session state
-                    metadata = st.session_state.stock_metadata_df
-                    meta_row = metadata[metadata['ticker'] == row['ticker']]
-
-                    if st.session_state.debug_mode:
-                        st.write(f"Looking up ticker: {row['ticker']}. Found in metadata: {not meta_row.empty}")
-
-                    if not meta_row.empty:
-                        meta = meta_row.iloc[0].to_dict()
-                    else:
-                        meta = None
-
-                    if meta is None:
-                        meta = {
-                            "name": "N/A",
-                            "sector": "N/A",
-                            "industry": "N/A"
-                        }
-                    portfolio_data.append({
-                        "Ticker": row["ticker"],
-                        "Full Name": meta.get("name", "N/A"),
-                        "Sector": meta.get("sector", "N/A"),
-                        "Industry": meta.get("industry", "N/A"),
-                        "Weight (%)": f"{row['weight']*100:.2f}%"
-                    })
-                df_table = pd.DataFrame(portfolio_data)
-                st.dataframe(df_table, use_container_width=True)
+                if st.session_state.debug_mode and report['missing']:
+                    st.write(f"Tickers not found in metadata: {', '.join(report['missing'])}")
+                st.dataframe(report['table'], use_container_width=True)
 
                 # Pie chart
-                fig, ax = plt.subplots()
-                ax.pie(weights, labels=tickers, autopct='%1.1f%%', startangle=90)
-                ax.axis('equal')
-                st.pyplot(fig)
-
-                # Summarize key risks using GPT if available
-                if "key_risks" in portfolio and portfolio["key_risks"]:
-                    risks_text = "\n".join(portfolio["key_risks"])
-                    gpt_prompt = (
-                        "Summarize these key risks in 5 sentences for a portfolio report:\n"
-                        f"{risks_text}"
-                    )
-                    response = client.chat.completions.create(
-                        messages=[
-                            {"role": "system", "content": "You are a financial analyst."},
-                            {"role": "user", "content": gpt_prompt}
-                        ],
-                        max_tokens=512,
-                        temperature=0.7,
-                        model="gpt-35-turbo"
-                    )
-                    summary = response.choices[0].message.content
+                if report['chart'] is not None:
+                    st.image(report['chart'])
+
+                # Correlation-aware alternative; reuses the universe clustering of the correlation index
+                if report['hrp'] is not None:
+                    with st.expander("Risk-parity weights (HRP)"):
+                        st.dataframe(report['hrp'], use_container_width=True, hide_index=True)
+                        st.caption("Hierarchical Risk Parity: correlated stocks share one risk budget and each "
+                                   "cluster's weight is inversely proportional to its variance. Stocks without "
+                                   "price history are left out.")
+
+                # Quantitative counterpart to the LLM's key risks
+                with st.expander("Stress test"):
+                    if report['stress'] is not None and len(report['stress']):
+                        st.dataframe(report['stress'], use_container_width=True, hide_index=True)
+                        st.caption("Sector shocks, market moves scaled by each stock's beta, and past market "
+                                   "episodes replayed from stored prices, where available.")
+
+                # Key risks summarized by GPT
+                if report['risk_summary']:
                     st.markdown("**Key Risks (Summary):**")
-                    st.write(summary)
+                    st.write(report['risk_summary'])
+
+                if 'usage' in st.session_state:
+                    usage = st.session_state.usage
+                    st.caption(f"LLM usage: {usage['calls']} calls, "
+                               f"{usage['prompt_tokens'] + usage['completion_tokens']:,} tokens, "
+                               f"${usage['cost_usd']:.4f}, {usage['elapsed_seconds']:.1f}s")
             else:
                 st.info("No portfolio data to display.")
 
@@ -645,7 +735,7 @@ with st.sidebar:
     # Test type selection
     test_type = st.radio(
         "Select Test Type",
-        ["All Tests", "Unit Tests", "Integration Tests"],
+        ["All Tests", "Unit Tests", "Integration Tests", "Benchmarks"],
         horizontal=True
     )
     
@@ -686,6 +776,23 @@ with st.sidebar:
         with col2:
             st.markdown(f"`{test_name}`")
     
+    # Benchmarks Section
+    st.markdown("#### Benchmarks")
+    for test_name in st.session_state.test_list.get("benchmark", []):
+        status = st.session_state.test_results.get(test_name, "not_run")
+        col1, col2 = st.columns([1, 4])
+        with col1:
+            if status == "passed":
+                st.markdown("✅")
+            elif status == "failed":
+                st.markdown("❌")
+            elif status == "error":
+                st.markdown("⚠️")
+            else:
+                st.markdown("⚪")
+        with col2:
+            st.markdown(f"`{test_name}`")
+    
     # Run tests button
     if st.button("Run Selected Tests"):
         from tests.run_tests import run_tests
@@ -694,7 +801,8 @@ with st.sidebar:
         test_type_map = {
             "All Tests": None,
             "Unit Tests": "unit",
-            "Integration Tests": "integration"
+            "Integration Tests": "integration",
+            "Benchmarks": "benchmark"
         }
         
         with st.spinner("Running tests..."):
@@ -742,4 +850,9 @@ with st.sidebar:
 
 # Add debug toggle in sidebar
 with st.sidebar:
-    st.session_state.debug_mode = st.toggle("Debug Mode", value=st.session_state.debug_mode, help="Show JSON preferences in chat") 
\ No newline at end of file
+    st.session_state.debug_mode = st.toggle("Debug Mode", value=st.session_state.debug_mode, help="Show JSON preferences in chat") 
+
+# Poll the background job: rerun until it finishes so partial results keep appearing
+if job_running:
+    time.sleep(1)
+    st.rerun()
\ No newline at end of file
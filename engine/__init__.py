@@ -0,0 +1,4 @@
+"""
+Deterministic portfolio engine: simulation, allocation and risk analytics
+on top of stored prices.
+"""
@@ -0,0 +1,98 @@
+"""
+Hierarchical Risk Parity allocation on top of the correlation index.
+
+HRP (Lopez de Prado, 2016) orders assets so that correlated ones sit next to
+each other (quasi-diagonalization of the covariance matrix), then splits the
+ordered list in halves recursively, giving each half weight in inverse
+proportion to its variance. It needs no matrix inversion, so it stays stable
+for hundreds of highly correlated tickers.
+
+Clustering is the expensive step and is done once for the whole universe when
+the correlation index is built (data.correlation_index). Allocating any subset
+reuses that tree: the subset is sorted by the universe's leaf order, O(n log n),
+and only the bisection runs per request.
+"""
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def inverse_variance_weights(covariance: np.ndarray) -> np.ndarray:
+    """Weights proportional to 1 / variance, summing to 1"""
+    inverse = 1.0 / np.diag(covariance)
+    return inverse / inverse.sum()
+
+
+def cluster_variance(covariance: np.ndarray) -> float:
+    """Variance of a cluster held at inverse-variance weights"""
+    weights = inverse_variance_weights(covariance)
+    return float(weights @ covariance @ weights)
+
+
+def recursive_bisection(covariance: np.ndarray, order: Optional[Iterable[int]] = None) -> np.ndarray:
+    """
+    HRP weights for a covariance matrix whose rows are visited in a quasi-diagonal order.
+
+    Args:
+        covariance: (n x n) covariance matrix
+        order: Row positions in leaf order (rows as given if None)
+    Returns:
+        Weights aligned with the covariance rows, summing to 1
+    """
+    covariance = np.asarray(covariance, dtype=np.float64)
+    order = np.arange(len(covariance)) if order is None else np.asarray(list(order), dtype=np.int64)
+    weights = np.ones(len(covariance))
+    segments = [order] if len(order) else []
+    while segments:
+        halves = []
+        for segment in segments:
+            if len(segment) < 2:
+                continue
+            left, right = segment[:len(segment) // 2], segment[len(segment) // 2:]
+            left_variance = cluster_variance(covariance[np.ix_(left, left)])
+            right_variance = cluster_variance(covariance[np.ix_(right, right)])
+            alpha = 1.0 - left_variance / (left_variance + right_variance)
+            weights[left] *= alpha
+            weights[right] *= 1.0 - alpha
+            halves += [left, right]
+        segments = halves
+    return weights
+
+
+def hrp_weights(tickers: Iterable[str], index) -> pd.Series:
+    """
+    HRP weights for a ticker subset, reusing the universe clustering of a correlation index.
+
+    Args:
+        tickers: Tickers to allocate
+        index: CorrelationIndex (see data.correlation_index)
+    Returns:
+        Weight per ticker, largest first; tickers without price history are left out
+    """
+    rows = index.quasi_diagonal(tickers)
+    rows = rows[np.isfinite(index.volatility[rows]) & (index.volatility[rows] > 0)]
+    weights = recursive_bisection(index.covariance(rows))
+    result = pd.Series(weights, index=pd.Index(index.tickers[rows], name='ticker'), name='weight')
+    return result.sort_values(ascending=False, kind='mergesort')
+
+
+def hrp_portfolio(tickers: Iterable[str], index) -> Dict[str, Any]:
+    """
+    HRP allocation in the PortfolioManager output shape.
+
+    Args:
+        tickers: Tickers to allocate
+        index: CorrelationIndex (see data.correlation_index)
+    Returns:
+        Dict with 'portfolio' (ticker, weight, rationale), 'method' and 'missing' (tickers left out)
+    """
+    tickers = list(dict.fromkeys(tickers))
+    weights = hrp_weights(tickers, index)
+    volatility = dict(zip(index.tickers.tolist(), index.volatility.tolist()))
+    positions: List[Dict[str, Any]] = [{
+        'ticker': ticker,
+        'weight': round(float(weight), 4),
+        'rationale': f"HRP: {volatility[ticker]:.0%} annualized volatility",
+    } for ticker, weight in weights.items()]
+    return {'portfolio': positions, 'method': 'hrp', 'missing': [t for t in tickers if t not in weights.index]}
@@ -0,0 +1,171 @@
+"""
+Monte Carlo simulation of multi-year portfolio outcomes from historical returns.
+
+Methods:
+    bootstrap  - i.i.d. resampling of historical trading days (rows, so the
+                 cross-section of returns on a day stays together)
+    block      - moving-block bootstrap preserving short-range autocorrelation
+    normal     - normal fitted to historical mean/covariance (log returns for
+                 buy-and-hold, so each horizon segment is one draw)
+
+Paths are generated in vectorized batches; batches are spread across a process
+pool and seeded from one SeedSequence, so results do not depend on worker count.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+METHODS = ('bootstrap', 'block', 'normal')
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+CHUNK_DAYS = 63  # days of (paths x assets) samples held at once in buy-and-hold mode
+
+
+def returns_from_prices(prices: pd.DataFrame) -> pd.DataFrame:
+    """Daily simple returns from a wide date x ticker price frame"""
+    return prices.sort_index().pct_change().iloc[1:].dropna(axis=1, how='all').fillna(0.0)
+
+
+def _sample_days(rng: np.random.Generator, n_days: int, batch: int, horizon: int, method: str,
+                 block_size: int) -> np.ndarray:
+    """(batch, horizon) indexes of historical days to replay"""
+    if method == 'bootstrap':
+        return rng.integers(0, n_days, size=(batch, horizon))
+    block_size = max(1, min(block_size, n_days))
+    n_blocks = -(-horizon // block_size)
+    starts = rng.integers(0, n_days - block_size + 1, size=(batch, n_blocks))
+    idx = starts[:, :, None] + np.arange(block_size)
+    return idx.reshape(batch, -1)[:, :horizon]
+
+
+def _simulate_batch(returns: np.ndarray, weights: np.ndarray, checkpoints: np.ndarray, batch: int,
+                    method: str, block_size: int, rebalance: bool, seed: np.random.SeedSequence) -> np.ndarray:
+    """Portfolio value (start = 1.0) at each checkpoint day for one batch of paths"""
+    rng = np.random.default_rng(seed)
+    horizon = int(checkpoints[-1])
+    n_days, n_assets = returns.shape
+
+    if rebalance:
+        # A constant-mix portfolio only needs its own daily return series
+        if method == 'normal':
+            portfolio = returns @ weights
+            daily = rng.normal(portfolio.mean(), portfolio.std(ddof=1), size=(batch, horizon))
+        else:
+            daily = (returns @ weights)[_sample_days(rng, n_days, batch, horizon, method, block_size)]
+        log_growth = np.cumsum(np.log1p(np.maximum(daily, -0.99)), axis=1)
+        return np.exp(log_growth[:, checkpoints - 1])
+
+    # Buy-and-hold: track each asset's log growth
+    log_returns = np.log1p(np.maximum(returns, -0.99))
+    if method == 'normal':
+        # Fitting log returns makes a whole segment's growth a single multivariate
+        # normal draw with mean/covariance scaled by its length
+        mean = log_returns.mean(axis=0)
+        chol = np.linalg.cholesky(np.cov(log_returns, rowvar=False).reshape(n_assets, n_assets)
+                                  + 1e-12 * np.eye(n_assets))
+        asset_log_growth = np.zeros((batch, n_assets))
+        values = np.empty((batch, len(checkpoints)))
+        start = 0
+        for k, checkpoint in enumerate(checkpoints):
+            days = checkpoint - start
+            asset_log_growth += rng.standard_normal((batch, n_assets)) @ chol.T * np.sqrt(days) + mean * days
+            values[:, k] = np.exp(asset_log_growth) @ weights
+            start = checkpoint
+        return values
+
+    day_index = _sample_days(rng, n_days, batch, horizon, method, block_size)
+    # Resampled days are gathered a quarter at a time to bound memory
+    asset_log_growth = np.zeros((batch, n_assets))
+    values = np.empty((batch, len(checkpoints)))
+    start = 0
+    for k, checkpoint in enumerate(checkpoints):
+        for chunk_start in range(start, checkpoint, CHUNK_DAYS):
+            chunk_end = min(chunk_start + CHUNK_DAYS, checkpoint)
+            asset_log_growth += log_returns[day_index[:, chunk_start:chunk_end]].sum(axis=1)
+        values[:, k] = np.exp(asset_log_growth) @ weights
+        start = checkpoint
+    return values
+
+
+def simulate_portfolio(returns: pd.DataFrame, weights: Dict[str, float], horizons_years: Sequence[int] = (1, 3, 5, 10),
+                       n_paths: int = 10000, method: str = 'bootstrap', block_size: int = 20,
+                       rebalance: bool = True, seed: int = 0, batch_size: int = 2000,
+                       max_workers: Optional[int] = None,
+                       percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, Any]:
+    """
+    Simulate portfolio value paths and summarize them at each horizon.
+
+    Args:
+        returns: Daily simple returns, date x ticker (see returns_from_prices)
+        weights: {ticker: weight}; normalized to sum to 1, tickers without history dropped
+        horizons_years: Horizons (years) at which to report results
+        n_paths: Number of simulated paths
+        method: 'bootstrap', 'block' or 'normal'
+        block_size: Block length in days for the block bootstrap
+        rebalance: True for daily constant weights, False for buy-and-hold
+        seed: Master seed; identical inputs and seed give identical results
+        batch_size: Paths per vectorized batch (bounds memory per worker)
+        max_workers: Process pool size; 1 runs in-process
+        percentiles: Percentile bands to report
+    Returns:
+        Dictionary with per-horizon percentile bands, mean, probability of loss
+        and median annualized return
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method '{method}'. Use one of {METHODS}")
+    if n_paths < 1:
+        raise ValueError(f"n_paths must be at least 1, got {n_paths}")
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+    if not len(horizons_years) or any(h < 1 for h in horizons_years):
+        raise ValueError(f"horizons_years must be one or more horizons of at least 1 year, got {list(horizons_years)}")
+    tickers = [t for t in weights if t in returns.columns and weights[t] > 0]
+    if not tickers:
+        raise ValueError("None of the portfolio tickers have return history")
+    w = np.array([weights[t] for t in tickers], dtype=np.float64)
+    w /= w.sum()
+    history = returns[tickers].to_numpy(dtype=np.float64)
+    horizons = sorted(set(int(h) for h in horizons_years))
+    checkpoints = np.array([h * TRADING_DAYS for h in horizons])
+
+    sizes = [batch_size] * (n_paths // batch_size) + ([n_paths % batch_size] if n_paths % batch_size else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [(history, w, checkpoints, size, method, block_size, rebalance, s) for size, s in zip(sizes, seeds)]
+    if max_workers == 1 or len(args) == 1:
+        batches = [_simulate_batch(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            batches = list(pool.map(_simulate_batch, *zip(*args)))
+    values = np.vstack(batches)
+
+    bands = np.percentile(values, percentiles, axis=0)
+    results = []
+    for k, years in enumerate(horizons):
+        results.append({
+            'years': years,
+            'percentiles': {str(p): float(bands[i, k]) for i, p in enumerate(percentiles)},
+            'mean': float(values[:, k].mean()),
+            'prob_loss': float((values[:, k] < 1.0).mean()),
+            'median_annualized_return': float(np.median(values[:, k]) ** (1 / years) - 1),
+        })
+    return {
+        'method': method,
+        'n_paths': int(values.shape[0]),
+        'rebalance': rebalance,
+        'tickers': tickers,
+        'weights': w.round(6).tolist(),
+        'horizons': results,
+    }
+
+
+def percentile_table(result: Dict[str, Any]) -> pd.DataFrame:
+    """Horizon x statistic table of a simulate_portfolio result (handy for display)"""
+    rows: List[Dict[str, Any]] = []
+    for horizon in result['horizons']:
+        row = {'years': horizon['years']}
+        row.update({f"p{p}": v for p, v in horizon['percentiles'].items()})
+        row.update({'mean': horizon['mean'], 'prob_loss': horizon['prob_loss']})
+        rows.append(row)
+    return pd.DataFrame(rows).set_index('years')
@@ -0,0 +1,310 @@
+"""
+Rebalance planner: target weights to integer share orders.
+
+For every account the planner picks whole-share (or whole-lot) target
+quantities x that minimize
+
+    sum_i (x_i p_i / V - w_i)^2  +  turnover_penalty * sum_i |x_i - h_i| p_i / V
+
+(squared active weight plus a turnover charge) for prices p, current holdings
+h, target weights w and account value V (cash plus holdings), subject to:
+
+    cash      - buys net of sells leave at least min_cash
+    min trade - an order is either zero, at least min_trade in value, or closes the position
+    lots      - target quantities are multiples of the ticker's lot size
+
+Solvers:
+    greedy - round the fractional targets down, undo orders below the minimum,
+             sell the cheapest-to-give-up lots if cash is short, then take the
+             single best buy/sell step while one improves the objective.
+             Vectorized over all accounts at once.
+    exact  - dynamic programming over cash for each account, over candidate
+             quantities within EXACT_RADIUS lots of the fractional target (plus
+             keeping or closing the position); never worse than greedy
+
+Usage:
+    python -m engine.rebalance --accounts accounts.json [--prices prices.json] [--exact]
+"""
+import json
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from data.records import positions_from_portfolio
+
+MIN_TRADE_VALUE = 100.0
+# A trade must cut squared active weight by more than this times its size (as a share of the account)
+TURNOVER_PENALTY = 0.0005
+EXACT_RADIUS = 3
+# Cash grid of the exact solver (cash is rounded conservatively to 1 / MAX_CASH_UNITS of the budget)
+MAX_CASH_UNITS = 100_000
+MAX_STEPS = 100_000
+
+
+def _terms(x, price, weight, holding, value, penalty):
+    """Objective terms per ticker (elementwise, broadcastable)"""
+    return (x * price / value - weight) ** 2 + penalty * np.abs(x - holding) * price / value
+
+
+def _feasible(x, holding, min_shares, lot):
+    """Quantities that are the holding, zero, or a lot multiple at least a minimum trade away (elementwise)"""
+    remainder = np.mod(x, lot)
+    on_lot = np.isclose(remainder, 0) | np.isclose(remainder, lot)
+    return (x == holding) | (x == 0) | ((x > 0) & on_lot & (np.abs(x - holding) >= min_shares - 1e-9))
+
+
+def _targets(account: Mapping[str, Any]) -> Dict[str, float]:
+    """Target weights of an account: {'targets': {ticker: weight}} or a PortfolioManager result"""
+    targets = account.get('targets', account)
+    if isinstance(targets.get('portfolio'), list):
+        return {p.ticker: p.weight for p in positions_from_portfolio(targets)}
+    return {str(t): float(w) for t, w in targets.items()}
+
+
+class _Batch:
+    """
+    Accounts stacked into (accounts x slots) arrays.
+
+    Slot j of row a is the j-th priced ticker account a targets or holds; rows
+    are padded to the longest account, so work scales with positions per
+    account rather than with the union of all tickers.
+    """
+
+    def __init__(self, accounts: Sequence[Mapping[str, Any]], prices: Mapping[str, float],
+                 lot_sizes: Optional[Mapping[str, int]], min_trade: float, min_cash: float, penalty: float):
+        targets = [_targets(a) for a in accounts]
+        holdings = [{str(t): int(s) for t, s in (a.get('holdings') or {}).items()} for a in accounts]
+        priced = {t for t, p in prices.items() if p is not None and np.isfinite(p) and p > 0}
+        self.tickers = [sorted({t for d in (w, h) for t in d if t in priced}) for w, h in zip(targets, holdings)]
+        self.unpriced = [sorted({t for d in (w, h) for t in d if t not in priced}) for w, h in zip(targets, holdings)]
+
+        shape = (len(accounts), max([len(t) for t in self.tickers] + [0]))
+        self.weights, self.holdings = np.zeros(shape), np.zeros(shape)
+        self.prices, self.lots = np.ones(shape), np.ones(shape)
+        self.mask = np.zeros(shape, dtype=bool)
+        for row, tickers in enumerate(self.tickers):
+            n = len(tickers)
+            self.weights[row, :n] = [targets[row].get(t, 0.0) for t in tickers]
+            self.holdings[row, :n] = [holdings[row].get(t, 0) for t in tickers]
+            self.prices[row, :n] = [float(prices[t]) for t in tickers]
+            self.lots[row, :n] = [max(1, int((lot_sizes or {}).get(t, 1))) for t in tickers]
+            self.mask[row, :n] = True
+        self.cash = np.array([float(a.get('cash', 0.0)) for a in accounts])
+        self.value = self.cash + (self.holdings * self.prices).sum(axis=1)
+        self.budget = self.cash - min_cash
+        # Smallest order, in shares, that meets the minimum trade value
+        self.min_shares = min_trade / self.prices
+        self.penalty = penalty
+
+    def target_shares(self) -> np.ndarray:
+        return self.weights * np.maximum(self.value, 0)[:, None] / self.prices
+
+    def cost(self, x: np.ndarray, rows=slice(None)) -> np.ndarray:
+        """Per-slot objective terms of quantities x for the given account rows"""
+        value = np.where(self.value[rows] > 0, self.value[rows], 1.0)[:, None]
+        return _terms(x, self.prices[rows], self.weights[rows], self.holdings[rows], value, self.penalty)
+
+    def step_up(self, x: np.ndarray) -> np.ndarray:
+        """Next feasible quantity above x"""
+        h, m, lot = self.holdings, self.min_shares, self.lots
+        up = (np.floor(x / lot + 1e-9) + 1) * lot
+        up = np.where((up > h - m) & (up < h), h, up)
+        return np.where((up > h) & (up < h + m), np.ceil((h + m) / lot - 1e-9) * lot, up)
+
+    def step_down(self, x: np.ndarray, rows=slice(None)) -> np.ndarray:
+        """Next feasible quantity below x (-1 when x is already 0)"""
+        h, m, lot = self.holdings[rows], self.min_shares[rows], self.lots[rows]
+        down = (np.ceil(x / lot - 1e-9) - 1) * lot
+        down = np.where((down > h) & (down < h + m), h, down)
+        down = np.where((down > h - m) & (down < h) & (down > 0), np.floor((h - m) / lot + 1e-9) * lot, down)
+        down = np.maximum(down, 0)
+        return np.where(x > 0, down, -1)
+
+    def spent(self, x: np.ndarray, rows=slice(None)) -> np.ndarray:
+        """Cash each account spends to go from its holdings to x (negative when selling more)"""
+        return ((x - self.holdings[rows]) * self.prices[rows]).sum(axis=1)
+
+
+def _greedy(batch: _Batch) -> np.ndarray:
+    if batch.weights.shape[1] == 0:
+        return batch.holdings.copy()
+    x = np.floor(batch.target_shares() / batch.lots + 1e-9) * batch.lots
+    x = np.where(_feasible(x, batch.holdings, batch.min_shares, batch.lots), x, batch.holdings)
+
+    # Short of cash (orders undone above, or a cash reserve): give up the lots that hurt least per dollar
+    for _ in range(MAX_STEPS):
+        short = np.flatnonzero(batch.spent(x) > batch.budget + 1e-9)
+        if not len(short):
+            break
+        down = batch.step_down(x[short], short)
+        freed = (x[short] - down) * batch.prices[short]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            score = np.where(down >= 0, (batch.cost(down, short) - batch.cost(x[short], short)) / freed, np.inf)
+        best = np.argmin(score, axis=1)
+        movable = np.isfinite(score[np.arange(len(short)), best])
+        if not movable.any():
+            break
+        x[short[movable], best[movable]] = down[movable, best[movable]]
+
+    # Best single improving buy or sell step, for every account at once
+    rows = np.arange(len(x))
+    for _ in range(MAX_STEPS):
+        current = batch.cost(x)
+        up, down = batch.step_up(x), batch.step_down(x)
+        affordable = batch.mask & (batch.spent(x)[:, None] + (up - x) * batch.prices <= batch.budget[:, None] + 1e-9)
+        gain_up = np.where(affordable, batch.cost(up) - current, np.inf)
+        gain_down = np.where(down >= 0, batch.cost(down) - current, np.inf)
+        best_up, best_down = np.argmin(gain_up, axis=1), np.argmin(gain_down, axis=1)
+        up_gain, down_gain = gain_up[rows, best_up], gain_down[rows, best_down]
+        buy = up_gain <= down_gain
+        improving = np.where(buy, up_gain, down_gain) < -1e-15
+        if not improving.any():
+            break
+        columns = np.where(buy, best_up, best_down)[improving]
+        moved = np.where(buy[:, None], up, down)
+        x[rows[improving], columns] = moved[rows[improving], columns]
+    return x
+
+
+def _exact(batch: _Batch, start: np.ndarray, radius: int = EXACT_RADIUS) -> np.ndarray:
+    """Exact solution per account by dynamic programming over invested value, starting from a feasible x"""
+    result = start.copy()
+    if batch.weights.shape[1] == 0:
+        return result
+    targets = batch.target_shares()
+    for row in range(len(result)):
+        h, prices, lots = batch.holdings[row], batch.prices[row], batch.lots[row]
+        slots = np.flatnonzero(batch.mask[row])
+        # Everything the account may hold after trading: cash above the reserve plus its holdings
+        investable = batch.budget[row] + h @ prices
+        if investable <= 0 or not len(slots):
+            continue
+        unit = max(0.01, investable / MAX_CASH_UNITS)
+        units = int(np.floor(investable / unit + 1e-9))
+
+        value = batch.value[row]
+        best = np.full(units + 1, np.inf)
+        best[0] = 0.0
+        picks = []
+        for i in slots:
+            base = np.floor(targets[row, i] / lots[i])
+            grid = (base + np.arange(-radius, radius + 2)) * lots[i]
+            candidates = np.unique(np.concatenate([grid[grid >= 0], [0.0, h[i], start[row, i]]]))
+            candidates = candidates[_feasible(candidates, h[i], batch.min_shares[row, i], lots[i])]
+            terms = _terms(candidates, prices[i], batch.weights[row, i], h[i], value, batch.penalty)
+            # Cost rounded up to the grid, so the plan never overspends
+            costs = np.ceil(candidates * prices[i] / unit - 1e-9).astype(np.int64)
+            merged = np.full(units + 1, np.inf)
+            pick = np.full(units + 1, -1, dtype=np.int16)
+            for k, (c, term) in enumerate(zip(costs, terms)):
+                if c > units:
+                    continue
+                total = best[:units + 1 - c] + term
+                better = total < merged[c:]
+                merged[c:][better] = total[better]
+                pick[c:][better] = k
+            best = merged
+            picks.append((candidates, costs, pick))
+
+        at = int(np.argmin(best))
+        if not np.isfinite(best[at]):
+            continue
+        solution = start[row].copy()
+        for i, (candidates, costs, pick) in zip(slots[::-1], picks[::-1]):
+            k = pick[at]
+            solution[i] = candidates[k]
+            at -= costs[k]
+        # Rounding cash up can cut off the greedy plan itself; keep whichever is better
+        if batch.cost(solution[None], [row]).sum() <= batch.cost(start[row][None], [row]).sum():
+            result[row] = solution
+    return result
+
+
+def plan_rebalance(accounts: Sequence[Mapping[str, Any]], prices: Mapping[str, float], exact: bool = False,
+                   min_trade: float = MIN_TRADE_VALUE, min_cash: float = 0.0,
+                   turnover_penalty: float = TURNOVER_PENALTY,
+                   lot_sizes: Optional[Mapping[str, int]] = None) -> List[Dict[str, Any]]:
+    """
+    Integer share orders that bring each account close to its target weights.
+
+    Args:
+        accounts: Dicts with 'targets' ({ticker: weight} or a PortfolioManager result),
+            'holdings' ({ticker: shares}), 'cash' and optionally 'account_id'
+        prices: {ticker: price}; tickers without a price are neither bought nor sold
+        exact: Use the exact solver instead of the greedy one
+        min_trade: Smallest order value (closing a position is always allowed)
+        min_cash: Cash every account keeps after trading
+        turnover_penalty: Objective charge per unit of turnover (as a share of the account)
+        lot_sizes: {ticker: lot}; target quantities are multiples of it (default 1 share)
+    Returns:
+        One plan per account: orders (sells first), final shares and weights, remaining cash,
+        tracking error (root of summed squared active weights), turnover and unpriced tickers
+    """
+    if not accounts:
+        return []
+    batch = _Batch(accounts, prices, lot_sizes, min_trade, min_cash, turnover_penalty)
+    x = _greedy(batch)
+    if exact:
+        x = _exact(batch, x)
+
+    value = np.where(batch.value > 0, batch.value, np.nan)
+    weights = x * batch.prices / value[:, None]
+    active = np.nan_to_num(weights - batch.weights)
+    tracking_error = np.sqrt((active ** 2).sum(axis=1))
+    turnover = np.nan_to_num((np.abs(x - batch.holdings) * batch.prices).sum(axis=1) / value)
+    cash = batch.cash - batch.spent(x)
+
+    plans = []
+    for row, account in enumerate(accounts):
+        tickers = batch.tickers[row]
+        n = len(tickers)
+        shares, holdings = x[row, :n].round().astype(int).tolist(), batch.holdings[row, :n].astype(int).tolist()
+        prices, final = batch.prices[row, :n].tolist(), np.nan_to_num(weights[row, :n]).round(6).tolist()
+        orders = [{'ticker': t, 'side': 'buy' if s > h else 'sell', 'shares': abs(s - h), 'price': p,
+                   'value': round(abs(s - h) * p, 2)}
+                  for t, s, h, p in zip(tickers, shares, holdings, prices) if s != h]
+        orders.sort(key=lambda o: (o['side'] != 'sell', -o['value'], o['ticker']))
+        plans.append({
+            'account_id': account.get('account_id', row),
+            'orders': orders,
+            'shares': {t: s for t, s in zip(tickers, shares) if s},
+            'weights': {t: w for t, w, s in zip(tickers, final, shares) if s},
+            'cash': round(float(cash[row]), 2),
+            'tracking_error': float(tracking_error[row]),
+            'turnover': float(turnover[row]),
+            'unpriced': batch.unpriced[row],
+        })
+    return plans
+
+
+def objective(plan: Mapping[str, Any], turnover_penalty: float = TURNOVER_PENALTY) -> float:
+    """Objective value of a plan (squared tracking error plus the turnover charge)"""
+    return plan['tracking_error'] ** 2 + turnover_penalty * plan['turnover']
+
+
+def _last_closes() -> Dict[str, float]:
+    from data.factor_snapshot import FactorSnapshot
+    frame = FactorSnapshot().frame()
+    return {t: float(p) for t, p in frame['last_close'].items() if np.isfinite(p)}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Turn target weights into integer share orders")
+    parser.add_argument("--accounts", required=True, help="JSON list of {account_id, cash, holdings, targets}")
+    parser.add_argument("--prices", help="JSON {ticker: price} (default: last closes from the factor snapshot)")
+    parser.add_argument("--exact", action="store_true")
+    parser.add_argument("--min-trade", type=float, default=MIN_TRADE_VALUE)
+    parser.add_argument("--min-cash", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with open(args.accounts) as f:
+        book = json.load(f)
+    if args.prices:
+        with open(args.prices) as f:
+            closes = json.load(f)
+    else:
+        closes = _last_closes()
+    print(json.dumps(plan_rebalance(book, closes, exact=args.exact, min_trade=args.min_trade,
+                                    min_cash=args.min_cash), indent=2))
@@ -0,0 +1,248 @@
+"""
+Stress tests of many portfolios at once: historical episodes and parametric shocks.
+
+Every scenario is reduced to one return per ticker (a row of the scenario x
+ticker shock matrix) and every portfolio to one weight per ticker (a row of
+the portfolio x ticker weight matrix), so the return of every portfolio under
+every scenario is a single matrix product.
+
+Scenario kinds:
+    historical - buy-and-hold return of each stock between two dates of the
+                 stored prices; stocks without prices in the window take the
+                 average return of their sector (or of the universe)
+    sector     - fixed returns per sector, 0 for sectors not named
+    factor     - factor moves applied through each stock's exposures
+                 (e.g. a market move times beta_1y from the factor snapshot)
+"""
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from data.records import positions_from_portfolio
+
+# Peak-to-trough windows of past market stress
+HISTORICAL_EPISODES = {
+    'gfc_2008': ('2008-09-19', '2009-03-09'),
+    'euro_debt_2011': ('2011-07-22', '2011-10-03'),
+    'q4_selloff_2018': ('2018-09-20', '2018-12-24'),
+    'covid_crash_2020': ('2020-02-19', '2020-03-23'),
+    'rate_shock_2022': ('2022-01-03', '2022-10-12'),
+}
+
+SECTOR_SHOCKS = {
+    'tech_selloff': {'Technology': -0.25, 'Communication Services': -0.18, 'Consumer Discretionary': -0.12},
+    'energy_spike': {'Energy': 0.20, 'Consumer Discretionary': -0.08, 'Industrials': -0.06, 'Utilities': -0.04},
+    'credit_crunch': {'Financials': -0.30, 'Real Estate': -0.25, 'Consumer Discretionary': -0.15,
+                      'Industrials': -0.12, 'Materials': -0.12},
+    'defensive_rotation': {'Technology': -0.10, 'Consumer Discretionary': -0.08, 'Consumer Staples': 0.05,
+                           'Utilities': 0.06, 'Healthcare': 0.03},
+}
+
+# Factor -> move; a stock's return is the sum of exposure x move
+FACTOR_SHOCKS = {
+    'market_down_10': {'beta_1y': -0.10},
+    'market_down_20': {'beta_1y': -0.20},
+    'market_down_35': {'beta_1y': -0.35},
+}
+
+DEFAULT_PERCENTILES = (5, 50, 95)
+
+
+class Scenarios(NamedTuple):
+    """Scenario x ticker matrix of simple returns"""
+    names: List[str]
+    kinds: List[str]
+    tickers: List[str]
+    shocks: np.ndarray
+
+    def frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.shocks, index=pd.Index(self.names, name='scenario'),
+                            columns=pd.Index(self.tickers, name='ticker'))
+
+
+def _group_fill(shocks: np.ndarray, groups: Optional[Sequence[Any]]) -> np.ndarray:
+    """Replace NaN shocks with the scenario's mean over the same group, else over all tickers"""
+    missing = np.isnan(shocks)
+    if not missing.any():
+        return shocks
+    known = (~missing).astype(np.float64)
+    values = np.where(missing, 0.0, shocks)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        overall = values.sum(axis=1) / known.sum(axis=1)
+        fill = np.broadcast_to(overall[:, None], shocks.shape)
+        if groups is not None and len(groups):
+            codes, _ = pd.factorize(pd.Series(list(groups), dtype=object).fillna('Unknown'))
+            membership = np.zeros((len(codes), codes.max() + 1))
+            membership[np.arange(len(codes)), codes] = 1.0
+            group_mean = (values @ membership) / (known @ membership)
+            fill = np.where(np.isnan(group_mean[:, codes]), fill, group_mean[:, codes])
+    return np.nan_to_num(np.where(missing, fill, shocks))
+
+
+def historical_scenarios(prices: pd.DataFrame, episodes: Mapping[str, Tuple[str, str]] = HISTORICAL_EPISODES,
+                         sectors: Optional[Mapping[str, str]] = None) -> Scenarios:
+    """
+    Replay past episodes from a wide (date x ticker) price frame.
+
+    Args:
+        prices: Wide close prices (see typed_loader.pivot_prices)
+        episodes: {name: (start date, end date)}; episodes outside the price history are skipped
+        sectors: Optional {ticker: sector} for filling stocks without prices in a window
+    Returns:
+        Scenarios with one 'historical' row per episode covered by the prices
+    """
+    prices = prices.sort_index()
+    tickers = [str(t) for t in prices.columns]
+    dates = pd.DatetimeIndex(prices.index)
+    names, starts, ends = [], [], []
+    for name, (start, end) in episodes.items():
+        first = dates.searchsorted(pd.Timestamp(start), side='left')
+        last = dates.searchsorted(pd.Timestamp(end), side='right') - 1
+        if first < last:
+            names.append(name)
+            starts.append(first)
+            ends.append(last)
+    values = prices.to_numpy(dtype=np.float64, na_value=np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        shocks = values[ends] / values[starts] - 1 if names else np.zeros((0, len(tickers)))
+    shocks[~np.isfinite(shocks)] = np.nan
+    groups = [sectors.get(t) for t in tickers] if sectors is not None else None
+    return Scenarios(names, ['historical'] * len(names), tickers, _group_fill(shocks, groups))
+
+
+def sector_scenarios(sectors: Mapping[str, str],
+                     shocks: Mapping[str, Mapping[str, float]] = SECTOR_SHOCKS) -> Scenarios:
+    """
+    Parametric sector shocks.
+
+    Args:
+        sectors: {ticker: sector} over the universe
+        shocks: {scenario: {sector: return}}
+    Returns:
+        Scenarios with one 'sector' row per scenario
+    """
+    tickers = list(sectors)
+    codes, labels = pd.factorize(pd.Series([sectors[t] for t in tickers], dtype=object).fillna('Unknown'))
+    by_sector = np.array([[moves.get(label, 0.0) for label in labels] for moves in shocks.values()],
+                         dtype=np.float64).reshape(len(shocks), len(labels))
+    return Scenarios(list(shocks), ['sector'] * len(shocks), tickers, by_sector[:, codes])
+
+
+def factor_scenarios(exposures: pd.DataFrame,
+                     shocks: Mapping[str, Mapping[str, float]] = FACTOR_SHOCKS) -> Scenarios:
+    """
+    Parametric factor shocks applied through per-ticker exposures.
+
+    Args:
+        exposures: Ticker x factor frame (e.g. the factor snapshot's beta_1y column);
+            missing exposures take the factor's median
+        shocks: {scenario: {factor: move}}
+    Returns:
+        Scenarios with one 'factor' row per scenario
+    """
+    factors = sorted({factor for moves in shocks.values() for factor in moves})
+    table = exposures.reindex(columns=factors).astype(np.float64)
+    table = table.fillna(table.median()).fillna(0.0)
+    moves = np.array([[scenario.get(f, 0.0) for f in factors] for scenario in shocks.values()],
+                     dtype=np.float64).reshape(len(shocks), len(factors))
+    return Scenarios(list(shocks), ['factor'] * len(shocks), [str(t) for t in table.index],
+                     moves @ table.to_numpy().T)
+
+
+def combine_scenarios(*sets: Scenarios) -> Scenarios:
+    """Stack scenario sets over the union of their tickers (tickers a set lacks get that scenario's mean)"""
+    tickers = list(dict.fromkeys(t for s in sets for t in s.tickers))
+    rows = []
+    for scenario_set in sets:
+        frame = scenario_set.frame().reindex(columns=tickers)
+        rows.append(_group_fill(frame.to_numpy(dtype=np.float64), None))
+    return Scenarios([n for s in sets for n in s.names], [k for s in sets for k in s.kinds], tickers,
+                     np.vstack(rows) if rows else np.zeros((0, len(tickers))))
+
+
+def default_scenarios(metadata: pd.DataFrame, factors: Optional[pd.DataFrame] = None,
+                      prices: Optional[pd.DataFrame] = None) -> Scenarios:
+    """Built-in sector shocks, plus market shocks when a factor table and episodes when prices are given"""
+    universe = metadata.drop_duplicates('ticker')
+    sectors = dict(zip(universe['ticker'].astype(str), universe['sector'].astype(object)))
+    sets = [sector_scenarios(sectors)]
+    if factors is not None and 'beta_1y' in factors.columns:
+        sets.append(factor_scenarios(factors[['beta_1y']]))
+    if prices is not None:
+        sets.append(historical_scenarios(prices, sectors=sectors))
+    return combine_scenarios(*sets)
+
+
+def weight_matrix(portfolios: Sequence[Union[Mapping[str, float], Dict[str, Any]]],
+                  tickers: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Portfolio x ticker weight matrix.
+
+    Args:
+        portfolios: {ticker: weight} mappings or PortfolioManager results ({'portfolio': [...]})
+        tickers: Column order (the scenarios' tickers)
+    Returns:
+        (weights, uncovered): the matrix, and per portfolio the weight in tickers not in `tickers`
+    """
+    column = {ticker: i for i, ticker in enumerate(tickers)}
+    weights = np.zeros((len(portfolios), len(tickers)))
+    uncovered = np.zeros(len(portfolios))
+    for row, portfolio in enumerate(portfolios):
+        if isinstance(portfolio.get('portfolio'), list):
+            portfolio = {p.ticker: p.weight for p in positions_from_portfolio(portfolio)}
+        for ticker, weight in portfolio.items():
+            i = column.get(ticker)
+            if i is None:
+                uncovered[row] += weight
+            else:
+                weights[row, i] += weight
+    return weights, uncovered
+
+
+def stress_test(portfolios: Union[np.ndarray, Sequence[Mapping[str, float]]], scenarios: Scenarios,
+                percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, Any]:
+    """
+    Losses of every portfolio under every scenario.
+
+    Args:
+        portfolios: Portfolio x ticker weights aligned with scenarios.tickers, or a list of
+            portfolios as accepted by weight_matrix; weight outside the scenarios' tickers
+            takes each scenario's average return, cash (weights below 1) is not shocked
+        scenarios: Scenario matrix (see historical/sector/factor_scenarios)
+        percentiles: Percentiles of the loss distribution to report per scenario
+    Returns:
+        Dictionary with 'losses' (portfolio x scenario array, positive = loss) and one
+        summary per scenario: percentiles, mean, worst loss and share of portfolios losing money
+    """
+    if isinstance(portfolios, np.ndarray):
+        weights, uncovered = np.asarray(portfolios, dtype=np.float64), np.zeros(len(portfolios))
+    else:
+        weights, uncovered = weight_matrix(portfolios, scenarios.tickers)
+    shocks = np.asarray(scenarios.shocks, dtype=np.float64)
+    losses = -(weights @ shocks.T + uncovered[:, None] * shocks.mean(axis=1)[None, :])
+
+    summaries = []
+    if len(losses):
+        bands = np.percentile(losses, percentiles, axis=0)
+        for k, name in enumerate(scenarios.names):
+            summaries.append({
+                'scenario': name,
+                'kind': scenarios.kinds[k],
+                'percentiles': {str(p): float(bands[i, k]) for i, p in enumerate(percentiles)},
+                'mean': float(losses[:, k].mean()),
+                'worst': float(losses[:, k].max()),
+                'prob_loss': float((losses[:, k] > 0).mean()),
+            })
+    return {'n_portfolios': int(len(losses)), 'scenarios': summaries, 'losses': losses}
+
+
+def loss_table(result: Dict[str, Any]) -> pd.DataFrame:
+    """Scenario x statistic table of a stress_test result (handy for display)"""
+    rows: List[Dict[str, Any]] = []
+    for scenario in result['scenarios']:
+        row = {'scenario': scenario['scenario'], 'kind': scenario['kind']}
+        row.update({f"p{p}": v for p, v in scenario['percentiles'].items()})
+        row.update({'mean': scenario['mean'], 'worst': scenario['worst'], 'prob_loss': scenario['prob_loss']})
+        rows.append(row)
+    return pd.DataFrame(rows).set_index('scenario') if rows else pd.DataFrame()
@@ -0,0 +1,4 @@
+"""
+Screener and market-signal utilities: deterministic candidate selection that
+runs before any LLM call.
+"""
@@ -0,0 +1,169 @@
+"""
+Deterministic pre-scoring of the stock universe.
+
+Every ticker that reaches the FundamentalAgent costs one LLM call, so the
+universe is ranked first with cheap rules over metadata (sector, volatility,
+market cap) and, when a factor snapshot is available, price-derived factors
+(momentum, drawdown, liquidity). Only the top-K go on to the LLM, where K is
+derived from a latency/cost budget. With a correlation index, near-duplicates
+of better-ranked picks give way to the next best diversifying candidate.
+"""
+import math
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Annualized volatility a client at each risk level is steered towards, and the
+# level above which a ticker is ranked behind every in-range one
+TARGET_VOLATILITY = {'low': 0.18, 'moderate': 0.28, 'high': 0.40}
+MAX_VOLATILITY = {'low': 0.35, 'moderate': 0.50, 'high': float('inf')}
+
+COMPONENTS = ('size', 'risk_fit', 'drawdown', 'momentum', 'liquidity')
+
+# Component weights per risk level (each component is a 0-1 percentile rank)
+WEIGHTS = {
+    'low': {'size': 0.35, 'risk_fit': 0.30, 'drawdown': 0.20, 'momentum': 0.05, 'liquidity': 0.10},
+    'moderate': {'size': 0.30, 'risk_fit': 0.25, 'drawdown': 0.15, 'momentum': 0.20, 'liquidity': 0.10},
+    'high': {'size': 0.20, 'risk_fit': 0.20, 'drawdown': 0.05, 'momentum': 0.40, 'liquidity': 0.15},
+}
+
+# Defaults for sizing K; tune with observed numbers from the agent benchmark
+SECONDS_PER_ANALYSIS = 4.0
+COST_PER_ANALYSIS_USD = 0.002
+MIN_CANDIDATES = 5
+MAX_CANDIDATES = 30
+# Candidates more correlated than this with a better-ranked pick are passed over when diversifying
+MAX_PAIR_CORRELATION = 0.85
+
+
+def _percentile(values: pd.Series) -> pd.Series:
+    """0-1 percentile rank (higher value -> higher rank); missing values are neutral (0.5)"""
+    if values.notna().sum() <= 1:
+        return pd.Series(0.5, index=values.index)
+    return ((values.rank(method='average') - 1) / (values.notna().sum() - 1)).fillna(0.5)
+
+
+def prescore(metadata: pd.DataFrame, risk_tolerance: str = 'moderate', sectors: Optional[Iterable[str]] = None,
+             factors: Optional[pd.DataFrame] = None, exclude: Iterable[str] = ()) -> pd.DataFrame:
+    """
+    Score and rank candidate tickers without calling the LLM.
+
+    Args:
+        metadata: Frame with the stock_metadata.csv columns
+        risk_tolerance: 'low', 'moderate' or 'high'
+        sectors: Allowed sectors (all known sectors if None or empty)
+        factors: Optional factor table indexed by ticker (see data.factor_snapshot)
+        exclude: Tickers to leave out
+    Returns:
+        DataFrame indexed by ticker, best first, with 'score' and one column per component
+    """
+    risk = str(risk_tolerance).lower()
+    if risk not in WEIGHTS:
+        risk = 'moderate'
+
+    universe = metadata.drop_duplicates('ticker')
+    universe.index = pd.Index(universe['ticker'].astype(str))
+    sector = universe['sector'].astype(object)
+    eligible = (sector != 'Unknown') & sector.notna()
+    sectors = list(sectors or [])
+    if sectors:
+        eligible &= sector.isin(sectors)
+    eligible &= ~universe.index.isin(list(exclude))
+    universe = universe[eligible.to_numpy()]
+
+    volatility = pd.to_numeric(universe['volatility'], errors='coerce').astype(np.float64)
+    market_cap = pd.to_numeric(universe['market_cap'], errors='coerce').astype(np.float64)
+    if factors is not None:
+        factors = factors.reindex(universe.index)
+        # Fresh price-derived volatility wins over the metadata value when present
+        volatility = factors['volatility_1y'].astype(np.float64).fillna(volatility)
+        momentum = factors['momentum_12_1'].astype(np.float64)
+        drawdown = factors['max_drawdown_1y'].astype(np.float64)
+        liquidity = factors['dollar_volume_3m'].astype(np.float64)
+    else:
+        momentum = drawdown = liquidity = pd.Series(np.nan, index=universe.index)
+
+    components = pd.DataFrame({
+        'size': _percentile(np.log(market_cap.where(market_cap > 0))),
+        'risk_fit': _percentile(-(volatility - TARGET_VOLATILITY[risk]).abs()),
+        'drawdown': _percentile(drawdown),
+        'momentum': _percentile(momentum),
+        'liquidity': _percentile(liquidity),
+    }, index=universe.index)
+    score = sum(components[name] * weight for name, weight in WEIGHTS[risk].items())
+    # Too volatile for the client: still rankable, but behind every in-range ticker
+    score = score - (volatility > MAX_VOLATILITY[risk]).astype(float)
+
+    result = components.assign(score=score, volatility=volatility, market_cap=market_cap,
+                               sector=sector[universe.index])
+    result.index.name = 'ticker'
+    result = result.reset_index()
+    # Ties broken by market cap, then ticker, so the order is fully deterministic
+    result = result.sort_values(['score', 'market_cap', 'ticker'], ascending=[False, False, True],
+                                na_position='last', kind='mergesort')
+    return result.set_index('ticker')
+
+
+def candidate_budget(latency_budget_s: Optional[float] = None, cost_budget_usd: Optional[float] = None,
+                     seconds_per_analysis: float = SECONDS_PER_ANALYSIS,
+                     cost_per_analysis_usd: float = COST_PER_ANALYSIS_USD, concurrency: int = 1,
+                     min_k: int = MIN_CANDIDATES, max_k: int = MAX_CANDIDATES) -> int:
+    """How many tickers can be sent for LLM analysis within the latency and cost budgets"""
+    k = max_k
+    if latency_budget_s is not None:
+        k = min(k, math.floor(latency_budget_s / seconds_per_analysis) * max(1, concurrency))
+    if cost_budget_usd is not None:
+        k = min(k, math.floor(cost_budget_usd / cost_per_analysis_usd))
+    return max(min_k, min(k, max_k))
+
+
+def diversify(ranked: Iterable[str], correlation, k: int,
+              max_correlation: float = MAX_PAIR_CORRELATION) -> List[str]:
+    """
+    Best-ranked k tickers, skipping near-duplicates of tickers already picked.
+
+    Args:
+        ranked: Tickers, best first (e.g. the prescore index)
+        correlation: CorrelationIndex (see data.correlation_index)
+        k: Number of tickers to pick
+        max_correlation: Highest allowed correlation with a better-ranked pick
+    Returns:
+        Up to k tickers: the picks in rank order, then skipped tickers if too few passed
+    """
+    ranked = list(ranked)
+    known = [t for t in ranked if t in correlation]
+    rows = correlation.rows(known)
+    block = np.asarray(correlation.correlation)[np.ix_(rows, rows)]
+    position = {ticker: i for i, ticker in enumerate(known)}
+    closest = np.full(len(known), -np.inf)
+    picked, skipped = [], []
+    for ticker in ranked:
+        if len(picked) == k:
+            break
+        i = position.get(ticker)
+        if i is not None and closest[i] > max_correlation:
+            skipped.append(ticker)
+            continue
+        picked.append(ticker)
+        if i is not None:
+            closest = np.maximum(closest, block[i])
+    return picked + skipped[:k - len(picked)]
+
+
+def select_candidates(metadata: pd.DataFrame, risk_tolerance: str = 'moderate',
+                      sectors: Optional[Iterable[str]] = None, k: Optional[int] = None,
+                      factors: Optional[pd.DataFrame] = None, exclude: Iterable[str] = (),
+                      correlation=None) -> List[str]:
+    """Top-k tickers by prescore (k defaults to candidate_budget()), diversified when a CorrelationIndex is given"""
+    k = candidate_budget() if k is None else k
+    ranked = prescore(metadata, risk_tolerance, sectors, factors, exclude).index
+    if correlation is not None:
+        return diversify(ranked, correlation, k)
+    return ranked[:k].tolist()
+
+
+def explain(scores: pd.DataFrame, ticker: str) -> Dict[str, float]:
+    """Component breakdown for one ticker of a prescore result"""
+    row = scores.loc[ticker]
+    return {name: round(float(row[name]), 4) for name in ('score',) + COMPONENTS}
@@ -0,0 +1,4 @@
+"""
+Advisor pipeline orchestration: profile -> analyze -> allocate, plus the
+background job machinery that runs it outside the UI thread.
+"""
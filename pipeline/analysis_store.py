@@ -0,0 +1,174 @@
+"""
+Dated store of profile-independent per-ticker fundamental analyses.
+
+A ticker's fundamentals do not depend on who is asking, so one analysis per
+ticker per day is shared by every client; the client's profile is applied
+afterwards by a deterministic adjustment (see agents.fundamental_agent).
+Analyses are computed on first use and refreshed on a schedule, e.g. nightly:
+
+    30 1 * * *  cd /path/to/mba_bionic && python -m pipeline.analysis_store
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+DEFAULT_ANALYSES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data",
+                                     "analyses.sqlite3")
+
+# An analysis dated today or up to this many days earlier is served as is
+MAX_AGE_DAYS = 1
+# Older analyses are deleted by prune()
+KEEP_DAYS = 30
+
+
+class AnalysisStore:
+    """
+    On-disk (SQLite) analyses keyed by (ticker, as_of date).
+
+    Like JobStore, every call opens its own short-lived connection. Concurrent
+    get_or_compute() calls for the same ticker in this process share one
+    computation.
+
+    Args:
+        path: SQLite file
+        max_age_days: Oldest analysis (in days) still considered fresh
+    """
+
+    def __init__(self, path: str = DEFAULT_ANALYSES_PATH, max_age_days: int = MAX_AGE_DAYS):
+        self.path = path
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._ticker_locks: Dict[str, threading.Lock] = {}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS analyses (
+                ticker TEXT NOT NULL,
+                as_of TEXT NOT NULL,
+                analysis TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (ticker, as_of)
+            )""")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _oldest_fresh(self, today: Optional[date] = None) -> str:
+        return ((today or date.today()) - timedelta(days=self.max_age_days)).isoformat()
+
+    def get(self, ticker: str, today: Optional[date] = None) -> Optional[Dict[str, Any]]:
+        """Newest fresh analysis of a ticker (with its 'as_of' date), or None"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT as_of, analysis FROM analyses WHERE ticker = ? AND as_of >= ? ORDER BY as_of DESC LIMIT 1",
+                (ticker, self._oldest_fresh(today))
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(json.loads(row["analysis"]), as_of=row["as_of"])
+
+    def put(self, ticker: str, analysis: Dict[str, Any], as_of: Optional[str] = None) -> Dict[str, Any]:
+        as_of = as_of or date.today().isoformat()
+        analysis = {k: v for k, v in analysis.items() if k != 'as_of'}
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO analyses (ticker, as_of, analysis, created_at) VALUES (?, ?, ?, ?)",
+                (ticker, as_of, json.dumps(analysis), time.time())
+            )
+        return dict(analysis, as_of=as_of)
+
+    def get_or_compute(self, ticker: str, compute: Callable[[str], Dict[str, Any]]) -> Dict[str, Any]:
+        """Fresh stored analysis, or compute(ticker) once and store it"""
+        with self._lock:
+            ticker_lock = self._ticker_locks.setdefault(ticker, threading.Lock())
+        with ticker_lock:
+            analysis = self.get(ticker)
+            if analysis is not None:
+                self.hits += 1
+                return analysis
+            self.misses += 1
+            return self.put(ticker, compute(ticker))
+
+    def stale(self, tickers: Iterable[str], today: Optional[date] = None) -> List[str]:
+        """Tickers without a fresh analysis"""
+        tickers = list(tickers)
+        with self._connect() as conn:
+            fresh = {row["ticker"] for row in conn.execute(
+                "SELECT DISTINCT ticker FROM analyses WHERE as_of >= ?", (self._oldest_fresh(today),)
+            )}
+        return [t for t in tickers if t not in fresh]
+
+    def prune(self, keep_days: int = KEEP_DAYS, today: Optional[date] = None) -> int:
+        """Delete analyses older than keep_days; returns how many"""
+        cutoff = ((today or date.today()) - timedelta(days=keep_days)).isoformat()
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM analyses WHERE as_of < ?", (cutoff,))
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT COUNT(*) FROM analyses WHERE as_of >= ?", (self._oldest_fresh(),)).fetchone()[0]
+        return {"fresh_analyses": rows, "hits": self.hits, "misses": self.misses}
+
+
+def refresh_store(fundamental_agent, tickers: Iterable[str], store: Optional[AnalysisStore] = None,
+                  max_workers: int = 4, force: bool = False) -> Dict[str, Any]:
+    """
+    Compute today's analysis for every ticker that lacks a fresh one.
+
+    Args:
+        fundamental_agent: FundamentalAgent providing analyze_ticker()
+        tickers: Universe to keep fresh
+        store: Target store (the default store if None)
+        max_workers: Analyses running at once
+        force: Re-analyze even tickers with a fresh analysis
+    Returns:
+        Dictionary with 'refreshed', 'failed' ({ticker: error}) and 'pruned'
+    """
+    store = store or AnalysisStore()
+    tickers = list(dict.fromkeys(tickers))
+    due = tickers if force else store.stale(tickers)
+    print(f"Refreshing {len(due)} of {len(tickers)} analyses...")
+    failed: Dict[str, str] = {}
+
+    def refresh(ticker: str):
+        try:
+            store.put(ticker, fundamental_agent.analyze_ticker(ticker))
+        except Exception as e:
+            failed[ticker] = str(e)
+            print(f"Error analyzing {ticker}: {str(e)}")
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="analysis-refresh") as pool:
+        list(pool.map(refresh, due))
+    pruned = store.prune()
+    print(f"✅ {len(due) - len(failed)} analyses refreshed, {len(failed)} failed, {pruned} old ones pruned")
+    return {"refreshed": len(due) - len(failed), "failed": failed, "pruned": pruned}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Refresh the shared per-ticker analysis store")
+    parser.add_argument("--tickers", default=None, help="Comma-separated tickers (default: data/sp500_tickers.csv)")
+    parser.add_argument("--store", default=DEFAULT_ANALYSES_PATH)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+
+    if args.tickers:
+        universe = [t.strip().upper() for t in args.tickers.split(",") if t.strip()]
+    else:
+        import pandas as pd
+        universe = pd.read_csv(os.path.join(os.path.dirname(DEFAULT_ANALYSES_PATH), "sp500_tickers.csv"))['Symbol'].tolist()
+
+    from agents.fundamental_agent import FundamentalAgent
+    refresh_store(FundamentalAgent(), universe, AnalysisStore(args.store), max_workers=args.workers, force=args.force)
@@ -0,0 +1,288 @@
+"""
+Headless HTTP API for the advisor pipeline (plain ASGI, no web framework).
+
+Endpoints (JSON in, JSON out):
+    POST /profile   {"risk_tolerance", "investment_horizon", "sectors"}
+    POST /screen    {"sectors", "limit"?, "risk_tolerance"?, "k"?}
+    POST /analyze   {"tickers", "context"}
+    POST /allocate  {"tickers", "analyses", "context"}
+    GET  /health, GET /stats
+
+Identical concurrent requests (and identical per-ticker analyses) share one
+in-flight computation; per-ticker analyses are also shared across client
+profiles through the dated analysis store. Admission is bounded and every
+request has a timeout.
+
+Run with:
+    python -m pipeline.api --port 8000      (requires uvicorn)
+"""
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from agents.routing import get_router
+from agents.usage import GLOBAL_LEDGER
+from pipeline.generation import get_investment_profile, screen_by_sector
+from pipeline.singleflight import Backpressure, Overloaded, SingleFlight
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def canonical(value: Any) -> str:
+    """Stable JSON encoding used as a coalescing key"""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"))
+
+
+def require(body: Dict[str, Any], *fields: str):
+    missing = [f for f in fields if f not in body]
+    if missing:
+        raise HTTPError(400, f"Missing field(s): {', '.join(missing)}")
+
+
+class AdvisorAPI:
+    """
+    ASGI application exposing profile -> screen -> analyze -> allocate.
+
+    Args:
+        client: AzureOpenAI client for profile calls (created lazily if None)
+        fundamental_agent: FundamentalAgent (created lazily if None)
+        portfolio_manager: PortfolioManager (created lazily if None)
+        metadata: Stock metadata frame for /screen (data/stock_metadata.csv if None)
+        max_concurrent: Requests processed at once
+        max_waiting: Requests allowed to queue before new ones get 503
+        request_timeout: Upper bound in seconds for a single request
+        llm_workers: Threads available for blocking LLM calls
+    """
+
+    def __init__(self, client=None, fundamental_agent=None, portfolio_manager=None, metadata=None,
+                 max_concurrent: int = 32, max_waiting: int = 64, request_timeout: float = 120.0,
+                 llm_workers: int = 16):
+        self._client = client
+        self._fundamental_agent = fundamental_agent
+        self._portfolio_manager = portfolio_manager
+        self._metadata = metadata
+        self.request_timeout = request_timeout
+        self.singleflight = SingleFlight()
+        self.backpressure = Backpressure(max_concurrent, max_waiting)
+        self._pool = ThreadPoolExecutor(max_workers=llm_workers, thread_name_prefix="advisor-api")
+        self.timeouts = 0
+        self.requests = 0
+        self.routes = {
+            ("POST", "/profile"): self.profile,
+            ("POST", "/screen"): self.screen,
+            ("POST", "/analyze"): self.analyze,
+            ("POST", "/allocate"): self.allocate,
+            ("GET", "/health"): self.health,
+            ("GET", "/stats"): self.stats,
+        }
+
+    # --- Lazily constructed dependencies ---
+
+    @property
+    def client(self):
+        if self._client is None:
+            from dotenv import load_dotenv
+            from agents.cassette import cassette_client
+            load_dotenv()
+
+            def make_client():
+                from openai import AzureOpenAI
+                return AzureOpenAI(
+                    api_version="2024-12-01-preview",
+                    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT", "https://bionicadvisor.openai.azure.com/"),
+                    api_key=os.getenv("AZURE_OPENAI_API_KEY")
+                )
+            self._client = cassette_client(make_client)
+        return self._client
+
+    @property
+    def fundamental_agent(self):
+        if self._fundamental_agent is None:
+            from agents.fundamental_agent import FundamentalAgent
+            from pipeline.analysis_store import AnalysisStore
+            self._fundamental_agent = FundamentalAgent(store=AnalysisStore())
+        return self._fundamental_agent
+
+    @property
+    def portfolio_manager(self):
+        if self._portfolio_manager is None:
+            from agents.portfolio_manager import PortfolioManager
+            self._portfolio_manager = PortfolioManager()
+        return self._portfolio_manager
+
+    @property
+    def metadata(self):
+        if self._metadata is None:
+            from data.typed_loader import load_metadata
+            self._metadata = load_metadata(os.path.join(PROJECT_ROOT, "data", "stock_metadata.csv"))
+        return self._metadata
+
+    async def _blocking(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+
+    # --- Handlers ---
+
+    async def profile(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        require(body, "risk_tolerance", "investment_horizon", "sectors")
+        key = ("profile", canonical(body))
+
+        async def compute():
+            raw = await self._blocking(get_investment_profile, self.client, body["risk_tolerance"],
+                                       body["investment_horizon"], body["sectors"])
+            return json.loads(raw)
+
+        return {"profile": await self.singleflight.do(key, compute)}
+
+    async def screen(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        require(body, "sectors")
+        if "risk_tolerance" in body or "k" in body:
+            # Deterministically pre-ranked top-K, ready to send for analysis
+            from filter.prescore import select_candidates
+            tickers = select_candidates(self.metadata, body.get("risk_tolerance", "moderate"), body["sectors"],
+                                        k=body.get("k"))
+        else:
+            tickers = screen_by_sector(self.metadata, body["sectors"], body.get("limit"))
+        return {"tickers": tickers}
+
+    async def analyze(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        require(body, "tickers", "context")
+        context_key = canonical(body["context"])
+
+        async def analyze_one(ticker: str):
+            return await self.singleflight.do(
+                ("analyze", ticker, context_key),
+                lambda: self._blocking(self.fundamental_agent.analyze, ticker, body["context"])
+            )
+
+        tickers: List[str] = body["tickers"]
+        results = await asyncio.gather(*(analyze_one(t) for t in tickers))
+        return {"analyses": dict(zip(tickers, results))}
+
+    async def allocate(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        require(body, "tickers", "analyses", "context")
+        key = ("allocate", canonical(body))
+        portfolio = await self.singleflight.do(
+            key,
+            lambda: self._blocking(self.portfolio_manager.analyze, body["tickers"], body["analyses"], body["context"])
+        )
+        return {"portfolio": portfolio}
+
+    async def health(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        return {"status": "ok"}
+
+    async def stats(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        store = getattr(self._fundamental_agent, "store", None)
+        return {
+            "requests": self.requests,
+            "active": self.backpressure.active,
+            "waiting": self.backpressure.waiting,
+            "rejected": self.backpressure.rejected,
+            "timeouts": self.timeouts,
+            "computations": self.singleflight.started,
+            "coalesced": self.singleflight.coalesced,
+            "llm_usage": GLOBAL_LEDGER.by_agent(),
+            "routing": get_router().stats(),
+            "analysis_store": store.stats() if store is not None else None,
+        }
+
+    # --- ASGI plumbing ---
+
+    async def handle(self, method: str, path: str, raw_body: bytes,
+                     timeout: Optional[float] = None) -> Tuple[int, Dict[str, Any]]:
+        """Route one request and return (status, JSON payload)"""
+        handler = self.routes.get((method, path))
+        if handler is None:
+            known_path = any(p == path for _, p in self.routes)
+            return (405, {"error": "Method not allowed"}) if known_path else (404, {"error": "Not found"})
+        if method == "GET":
+            return 200, await handler({})
+
+        self.requests += 1
+        try:
+            body = json.loads(raw_body or b"{}")
+        except json.JSONDecodeError:
+            return 400, {"error": "Request body must be JSON"}
+        if timeout is not None and not timeout > 0:
+            return 400, {"error": "x-timeout must be a positive number of seconds"}
+        timeout = self.request_timeout if timeout is None else min(timeout, self.request_timeout)
+        try:
+            async with self.backpressure:
+                return 200, await asyncio.wait_for(handler(body), timeout)
+        except Overloaded as e:
+            return 503, {"error": f"Server overloaded: {str(e)}"}
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return 504, {"error": f"Request timed out after {timeout:.1f}s"}
+        except HTTPError as e:
+            return e.status, {"error": e.message}
+        except Exception as e:
+            print(f"Error handling {path}: {str(e)}")
+            return 500, {"error": str(e)}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    self._pool.shutdown(wait=False)
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        headers = dict(scope.get("headers") or [])
+        timeout = headers.get(b"x-timeout")
+        try:
+            timeout = float(timeout) if timeout is not None else None
+        except ValueError:
+            status, payload = 400, {"error": "x-timeout must be a positive number of seconds"}
+        else:
+            status, payload = await self.handle(scope["method"], scope["path"], b"".join(chunks), timeout)
+
+        body = json.dumps(payload).encode()
+        response_headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        if status == 503:
+            response_headers.append((b"retry-after", b"1"))
+        await send({"type": "http.response.start", "status": status, "headers": response_headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the advisor pipeline over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-concurrent", type=int, default=32)
+    parser.add_argument("--max-waiting", type=int, default=64)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("uvicorn is required to serve the API: pip install uvicorn")
+    app = AdvisorAPI(max_concurrent=args.max_concurrent, max_waiting=args.max_waiting,
+                     request_timeout=args.timeout)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
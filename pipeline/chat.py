@@ -0,0 +1,152 @@
+"""
+Guided preference chat with a bounded context.
+
+Every turn used to resend the whole conversation. Now each request is the
+unchanging system prompt (a stable, cacheable prefix), a rolling summary of
+older turns, and only the most recent turns that fit a token window. Older
+turns are folded into the summary in one LLM call whenever the unsummarized
+history outgrows the window, so summarization is rare and amortized.
+
+The full history stays in `guided['messages']` for display.
+"""
+import json
+import time
+from typing import Any, Dict, List
+
+from agents.usage import derived_max_tokens, record_response
+
+GUIDED_SYSTEM_PROMPT = """You are a financial advisor assistant. Your task is to help users determine their investment preferences.
+You need to collect:
+1. Risk tolerance (low, moderate, high)
+2. Investment horizon (short_term, medium_term, long_term)
+3. Preferred sectors (from: Technology, Healthcare, Financials, Energy, Consumer Discretionary, Consumer Staples, Industrials, Materials, Utilities, Real Estate, Communication Services)
+
+Have a natural conversation with the user to collect these preferences. After EACH response, include a JSON object showing your current understanding of their preferences. Format your response like this:
+
+[Your natural conversation response here]
+
+<preferences>
+{
+    "risk_tolerance": "low/moderate/high or null if not yet determined",
+    "investment_horizon": "short_term/medium_term/long_term or null if not yet determined",
+    "sectors": ["sector1", "sector2", ...] or [] if not yet determined
+}
+</preferences>
+
+Keep the conversation natural, but always include the preferences JSON at the end of your response, even if some preferences are still null or empty."""
+
+SUMMARY_SYSTEM_PROMPT = """Summarize the conversation between a financial advisor assistant and a client in at most 5 sentences.
+Keep every preference, constraint and open question the client mentioned. Return plain text only."""
+
+# Recent turns sent verbatim (estimated tokens) and the minimum kept when summarizing
+MAX_HISTORY_TOKENS = 1200
+KEEP_LAST = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)"""
+    return max(1, len(text) // 4)
+
+
+def new_guided_chat() -> Dict[str, Any]:
+    """Initial guided chat state"""
+    return {
+        'messages': [{"role": "system", "content": GUIDED_SYSTEM_PROMPT}],
+        'preferences': None,
+        'summary': None,
+        'summarized': 0,  # number of history messages folded into the summary
+    }
+
+
+def history(guided: Dict[str, Any]) -> List[Dict[str, str]]:
+    """User/assistant turns (without the system prompt)"""
+    return [m for m in guided['messages'] if m['role'] != 'system']
+
+
+def build_context(guided: Dict[str, Any], max_history_tokens: int = MAX_HISTORY_TOKENS) -> List[Dict[str, str]]:
+    """Messages for the next request: system prompt, summary, then the newest turns that fit the window"""
+    messages = [{"role": "system", "content": GUIDED_SYSTEM_PROMPT}]
+    if guided.get('summary'):
+        messages.append({"role": "system", "content": f"Summary of the earlier conversation: {guided['summary']}"})
+
+    recent = history(guided)[guided.get('summarized', 0):]
+    window: List[Dict[str, str]] = []
+    used = 0
+    for message in reversed(recent):
+        used += estimate_tokens(message['content'])
+        if window and used > max_history_tokens:
+            break
+        window.append(message)
+    return messages + window[::-1]
+
+
+def summarize_if_needed(client, guided: Dict[str, Any], max_history_tokens: int = MAX_HISTORY_TOKENS,
+                        keep_last: int = KEEP_LAST) -> bool:
+    """Fold all but the last `keep_last` unsummarized turns into the summary once they outgrow the window"""
+    turns = history(guided)
+    start = guided.get('summarized', 0)
+    unsummarized = turns[start:]
+    if sum(estimate_tokens(m['content']) for m in unsummarized) <= max_history_tokens:
+        return False
+    to_fold = unsummarized[:-keep_last] if keep_last else unsummarized
+    if not to_fold:
+        return False
+
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in to_fold)
+    if guided.get('summary'):
+        transcript = f"Earlier summary: {guided['summary']}\n{transcript}"
+    try:
+        started = time.perf_counter()
+        response = client.chat.completions.create(
+            messages=[
+                {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+                {"role": "user", "content": transcript}
+            ],
+            max_tokens=derived_max_tokens("GuidedChatSummary", 256),
+            temperature=0.2,
+            model="gpt-35-turbo"
+        )
+        record_response("GuidedChatSummary", "gpt-35-turbo", response, time.perf_counter() - started)
+        guided['summary'] = response.choices[0].message.content.strip()
+    except Exception as e:
+        # The window alone still caps the context; the turns are just dropped unsummarized
+        print(f"Error summarizing guided chat: {str(e)}")
+    guided['summarized'] = start + len(to_fold)
+    return True
+
+
+def parse_preferences(reply: str):
+    """Preferences JSON from a reply's <preferences> block, or None"""
+    if '<preferences>' not in reply:
+        return None
+    block = reply.split('<preferences>', 1)[1]
+    if '}' not in block:
+        return None
+    try:
+        preferences = json.loads(block[:block.rindex('}') + 1])
+    except json.JSONDecodeError:
+        return None
+    return preferences if preferences and any(preferences.values()) else None
+
+
+def guided_chat_turn(client, guided: Dict[str, Any], user_input: str,
+                     max_history_tokens: int = MAX_HISTORY_TOKENS, keep_last: int = KEEP_LAST) -> str:
+    """Send one user message with a bounded context; updates `guided` in place and returns the reply"""
+    guided['messages'].append({'role': 'user', 'content': user_input})
+    summarize_if_needed(client, guided, max_history_tokens, keep_last)
+
+    started = time.perf_counter()
+    response = client.chat.completions.create(
+        messages=build_context(guided, max_history_tokens),
+        max_tokens=derived_max_tokens("GuidedChat", 1024),
+        temperature=0.7,
+        model="gpt-35-turbo"
+    )
+    record_response("GuidedChat", "gpt-35-turbo", response, time.perf_counter() - started)
+    reply = response.choices[0].message.content
+
+    guided['messages'].append({'role': 'assistant', 'content': reply})
+    preferences = parse_preferences(reply)
+    if preferences:
+        guided['preferences'] = preferences
+    return reply
@@ -0,0 +1,85 @@
+"""
+Deterministic draft allocations from whatever analyses have completed.
+
+A draft is shown while the remaining analyses and the PortfolioManager call
+are still running; it has the same shape as the PortfolioManager output (plus
+"draft": True) so the UI renders it the same way, and is replaced by the final
+allocation once that arrives.
+"""
+import math
+from typing import Any, Dict, List, Optional
+
+from data.records import FundamentalAnalysis
+
+# How much each recommendation counts towards a ticker's weight
+RECOMMENDATION_FACTOR = {'buy': 1.0, 'hold': 0.6, 'sell': 0.0}
+
+# Score blended with overall_score at each risk level
+RISK_TILT = {'low': 'financial_health', 'moderate': None, 'high': 'growth_potential'}
+
+MAX_WEIGHT = 0.25
+
+
+def draft_score(analysis: FundamentalAnalysis, risk_tolerance: str = 'moderate') -> float:
+    """Draft score of one analysis (0 for sells or unusable scores)"""
+    score = analysis.overall_score
+    tilt = RISK_TILT.get(str(risk_tolerance).lower())
+    if tilt is not None and not math.isnan(getattr(analysis, tilt)):
+        score = 0.5 * score + 0.5 * getattr(analysis, tilt)
+    if math.isnan(score):
+        return 0.0
+    return max(0.0, score) ** 2 * RECOMMENDATION_FACTOR.get(analysis.recommendation, 0.6)
+
+
+def cap_weights(weights: Dict[str, float], cap: float) -> Dict[str, float]:
+    """Normalize weights to 1 with no single weight above `cap` (excess spread pro rata)"""
+    weights = {t: w for t, w in weights.items() if w > 0}
+    if not weights:
+        return {}
+    cap = max(cap, 1.0 / len(weights))
+    fixed: Dict[str, float] = {}
+    free = dict(weights)
+    while free:
+        scale = (1.0 - cap * len(fixed)) / sum(free.values())
+        over = [t for t, w in free.items() if w * scale > cap]
+        if not over:
+            fixed.update({t: w * scale for t, w in free.items()})
+            break
+        for t in over:
+            fixed[t] = cap
+            del free[t]
+    return fixed
+
+
+def draft_portfolio(analyses: Dict[str, Dict[str, Any]], context: Optional[Dict[str, Any]] = None,
+                    total: Optional[int] = None, max_weight: float = MAX_WEIGHT) -> Dict[str, Any]:
+    """
+    Score-weighted allocation over the analyses completed so far.
+
+    Args:
+        analyses: {ticker: FundamentalAgent analysis dict}
+        context: Investment profile (risk_tolerance tilts the score)
+        total: Number of analyses the run expects (for the "based_on" note)
+        max_weight: Largest weight any single ticker may get
+    Returns:
+        PortfolioManager-shaped dict with 'portfolio', 'draft' and 'based_on'
+    """
+    risk = (context or {}).get('risk_tolerance', 'moderate')
+    records = [FundamentalAnalysis.from_dict(ticker, analysis) for ticker, analysis in analyses.items()]
+    scores = {record.ticker: draft_score(record, risk) for record in records}
+    weights = cap_weights(scores, max_weight)
+
+    positions: List[Dict[str, Any]] = []
+    by_ticker = {record.ticker: record for record in records}
+    for ticker, weight in sorted(weights.items(), key=lambda item: (-item[1], item[0])):
+        record = by_ticker[ticker]
+        positions.append({
+            'ticker': ticker,
+            'weight': round(weight, 4),
+            'rationale': f"Draft: overall score {record.overall_score:.2f}, {record.recommendation}",
+        })
+    return {
+        'portfolio': positions,
+        'draft': True,
+        'based_on': {'analyses': len(analyses), 'total': total if total is not None else len(analyses)},
+    }
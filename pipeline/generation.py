@@ -0,0 +1,286 @@
+import contextvars
+import hashlib
+import json
+import time
+from datetime import date, timedelta
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+from agents.fundamental_agent import adjust_for_profile
+from agents.usage import (GLOBAL_LEDGER, Budget, BudgetExceeded, UsageLedger, current_run,
+                          derived_max_tokens, record_response, track_run)
+from pipeline.analysis_store import MAX_AGE_DAYS
+from pipeline.draft import draft_portfolio
+
+ProgressCallback = Callable[[str, Any], None]
+
+# Per-call estimates used for budgeting until real calls have been observed
+CALL_ESTIMATES = {
+    'FundamentalAgent': {'cost_usd': 0.001, 'latency': 4.0, 'tokens': 800},
+    'PortfolioManager': {'cost_usd': 0.005, 'latency': 20.0, 'tokens': 5000},
+}
+
+
+def get_investment_profile(client, risk: str, horizon: str, sectors: List[str]) -> str:
+    """Ask the LLM for a structured investment profile (returns the raw JSON string)"""
+    run = current_run()
+    if run is not None:
+        run.check()
+    system_prompt = f"""You are a financial advisor assistant. Create an investment profile based on the following preferences:
+- Risk tolerance: {risk}
+- Investment horizon: {horizon}
+- Preferred sectors: {', '.join(sectors)}
+
+Return the profile as a JSON object with these exact fields:
+{{
+    \"risk_tolerance\": \"{risk}\",
+    \"investment_horizon\": \"{horizon}\",
+    \"sectors\": {json.dumps(sectors)}
+}}"""
+    started = time.perf_counter()
+    response = client.chat.completions.create(
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": "Create an investment profile."}
+        ],
+        max_tokens=derived_max_tokens("InvestmentProfile", 512),
+        temperature=0.7,
+        model="gpt-35-turbo"
+    )
+    record_response("InvestmentProfile", "gpt-35-turbo", response, time.perf_counter() - started)
+    return response.choices[0].message.content
+
+
+def screen_by_sector(metadata, sectors: List[str], limit: Optional[int] = None) -> List[str]:
+    """Tickers from the metadata frame whose sector is one of `sectors`"""
+    matches = metadata[
+        metadata["sector"].isin(sectors) & (metadata["sector"] != "Unknown")
+    ]["ticker"].unique().tolist()
+    return matches[:limit] if limit else matches
+
+
+def estimate_call(agent: str, run: Optional[UsageLedger] = None) -> Dict[str, float]:
+    """Expected cost/latency/tokens of an agent's next call (this run, then recent calls, then defaults)"""
+    for ledger in (run, GLOBAL_LEDGER):
+        observed = ledger.average(agent) if ledger is not None else None
+        if observed is not None:
+            return observed
+    return CALL_ESTIMATES[agent]
+
+
+def can_afford_analysis(run: UsageLedger, in_flight: int = 0) -> bool:
+    """Whether one more analysis (besides those in flight) still leaves room for the final portfolio call"""
+    analysis = estimate_call('FundamentalAgent', run)
+    portfolio = estimate_call('PortfolioManager', run)
+    calls = 1 + in_flight
+    return run.can_afford(analysis['cost_usd'] * calls + portfolio['cost_usd'],
+                          analysis['latency'] + portfolio['latency'],
+                          analysis['tokens'] * calls + portfolio['tokens'])
+
+
+def allocation_key(tickers: List[str], analyses: Dict[str, Any], profile: Dict[str, Any], compact: bool) -> str:
+    """Hash of everything the portfolio allocation depends on"""
+    inputs = {'tickers': tickers, 'analyses': analyses, 'profile': profile, 'compact': compact}
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def reusable_results(previous: Optional[Dict[str, Any]], risk: str, horizon: str, sectors: List[str],
+                     max_age_days: int = MAX_AGE_DAYS, today: Optional[date] = None) -> Dict[str, Any]:
+    """
+    What a previous run contributes to a run with these preferences.
+
+    The profile depends only on risk, horizon and sectors. Analyses depend on
+    their ticker and the profile; when the profile changed they are re-weighted
+    by adjust_for_profile() without another LLM call. Analyses older than
+    max_age_days (the AnalysisStore freshness window) are not reused.
+
+    Returns:
+        Dictionary with 'profile' (None if it must be regenerated), 'analyses'
+        (previous analyses by ticker), 'allocation_key' of the previous run and
+        'as_of', the date of reused analyses without a date of their own (or None)
+    """
+    if not previous or not previous.get('inputs'):
+        return {'profile': None, 'analyses': {}, 'allocation_key': None, 'as_of': None}
+    inputs = previous['inputs']
+    same_preferences = (inputs['risk'], inputs['horizon'], list(inputs['sectors'])) == (risk, horizon, list(sectors))
+    oldest_fresh = ((today or date.today()) - timedelta(days=max_age_days)).isoformat()
+    # Analyses served by the store carry their own date; the others date from the previous run
+    run_as_of = inputs.get('as_of') or ''
+    analyses = {ticker: analysis for ticker, analysis in (previous.get('analyses') or {}).items()
+                if (analysis.get('as_of') or run_as_of) >= oldest_fresh}
+    return {
+        'profile': previous['profile'] if same_preferences else None,
+        'analyses': analyses,
+        'allocation_key': previous.get('allocation_key'),
+        'as_of': run_as_of if any('as_of' not in a for a in analyses.values()) else None,
+    }
+
+
+def run_portfolio_generation(client, fundamental_agent, portfolio_manager,
+                             risk: str, horizon: str, sectors: List[str], tickers: List[str],
+                             progress: Optional[ProgressCallback] = None,
+                             budget: Optional[Budget] = None, max_concurrency: int = 1,
+                             draft_fraction: Optional[float] = None,
+                             draft_after: Optional[float] = None,
+                             previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Run profile -> per-ticker analyses -> portfolio allocation.
+
+    With a budget, analyses stop early once another one would leave no room for
+    the portfolio call, and the portfolio is built from the analyses so far with
+    a compact prompt. If the budget runs out during the analyses anyway, the
+    finished ones are kept and allocated deterministically (see draft_portfolio).
+    The run aborts with BudgetExceeded if nothing was analyzed, or if that
+    allocation is empty (every finished analysis is a sell).
+
+    With draft_fraction and/or draft_after, a deterministic draft allocation of
+    the analyses completed so far is emitted (a "draft" event) as soon as that
+    share of analyses is done or that many seconds have passed, whichever comes
+    first; the PortfolioManager result later replaces it.
+
+    With the result of a previous run, only what the preference change affects
+    is recomputed: the profile when risk, horizon or sectors changed, analyses
+    of tickers the previous run did not analyze, and the allocation when its
+    inputs (profile, analyses, ticker set) differ (see reusable_results()).
+
+    Args:
+        client: AzureOpenAI client used for the profile call
+        fundamental_agent: FundamentalAgent used per ticker
+        portfolio_manager: PortfolioManager used for the allocation
+        risk, horizon, sectors: Client preferences
+        tickers: Tickers to analyze
+        progress: Optional callback receiving (event, payload) as each step lands
+        budget: Optional cost/time/token limits for the whole run
+        max_concurrency: Analyses running at once
+        draft_fraction: Share of completed analyses (0-1) that triggers the draft
+        draft_after: Seconds into the analysis stage that trigger the draft
+        previous: Result of an earlier run to reuse from
+    Returns:
+        Dictionary with 'profile', 'analyses', 'portfolio', 'draft', 'usage',
+        'inputs', 'allocation_key' and 'reused' (what came from `previous`)
+    """
+    report = progress or (lambda event, payload: None)
+    reusable = reusable_results(previous, risk, horizon, sectors)
+    # Undated analyses carried over keep counting from the run that made them
+    as_of = min(date.today().isoformat(), reusable['as_of'] or date.today().isoformat())
+    reused = {'profile': reusable['profile'] is not None, 'analyses': 0, 'portfolio': False}
+
+    with track_run(budget) as run:
+        report("stage", {"stage": "profile"})
+        profile = reusable['profile'] or json.loads(get_investment_profile(client, risk, horizon, sectors))
+        report("profile", profile)
+
+        report("stage", {"stage": "analyses", "total": len(tickers)})
+        analyses = {}
+        for ticker in tickers:
+            if ticker in reusable['analyses']:
+                analyses[ticker] = adjust_for_profile(reusable['analyses'][ticker], profile)
+                report("analysis", {"ticker": ticker, "analysis": analyses[ticker]})
+        reused['analyses'] = len(analyses)
+        draft = None
+        pending = [t for t in tickers if t not in analyses]
+        in_flight: Dict[Any, str] = {}
+        budget_reason: Optional[str] = None
+        exhausted: List[str] = []
+        started = time.perf_counter()
+        pool = ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="analysis")
+        try:
+            while pending or in_flight:
+                while pending and len(in_flight) < max(1, max_concurrency):
+                    if budget is not None and not can_afford_analysis(run, len(in_flight)):
+                        skipped, pending = pending, []
+                        print(f"Budget reached after {len(analyses) + len(in_flight)} analyses; "
+                              f"skipping {len(skipped)} tickers")
+                        report("budget", {"reason": run.exceeded() or "no room for further analyses",
+                                          "analyzed": len(tickers) - len(skipped), "skipped": skipped})
+                        break
+                    ticker = pending.pop(0)
+                    # Each worker runs in a copy of this context so its calls count towards this run
+                    future = pool.submit(contextvars.copy_context().run, fundamental_agent.analyze, ticker, profile)
+                    in_flight[future] = ticker
+                if not in_flight:
+                    break
+
+                # Wake up when the draft window closes; once it has, only a finished analysis can change anything
+                timeout = None
+                if draft is None and draft_after is not None:
+                    window_left = draft_after - (time.perf_counter() - started)
+                    if window_left > 0:
+                        timeout = window_left
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    ticker = in_flight.pop(future)
+                    try:
+                        analyses[ticker] = future.result()
+                    except BudgetExceeded as e:
+                        # Keep what finished: stop submitting and allocate from the analyses so far
+                        if budget_reason is None:
+                            print(f"Budget exceeded during analyses ({e}); skipping {len(pending) + 1} tickers")
+                        budget_reason = budget_reason or str(e)
+                        exhausted += [ticker] + pending
+                        pending = []
+                        continue
+                    report("analysis", {"ticker": ticker, "analysis": analyses[ticker]})
+
+                remaining = len(pending) + len(in_flight)
+                fraction_reached = draft_fraction is not None and len(analyses) >= draft_fraction * len(tickers)
+                time_reached = draft_after is not None and time.perf_counter() - started >= draft_after
+                if draft is None and analyses and remaining and (fraction_reached or time_reached):
+                    draft = draft_portfolio(analyses, profile, total=len(tickers))
+                    report("draft", draft)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        if not analyses and tickers:
+            raise BudgetExceeded(budget_reason or run.exceeded() or "budget too small to analyze any ticker")
+        if budget_reason is not None:
+            skipped = [t for t in tickers if t in set(exhausted)]
+            report("budget", {"reason": budget_reason, "analyzed": len(tickers) - len(skipped), "skipped": skipped})
+        # Completion order varies with concurrency; the allocation prompt should not
+        analyses = {ticker: analyses[ticker] for ticker in tickers if ticker in analyses}
+
+        report("stage", {"stage": "portfolio"})
+        compact = len(analyses) < len(tickers)
+        key = allocation_key(list(analyses), analyses, profile, compact)
+        if key == reusable['allocation_key']:
+            portfolio = previous['portfolio']
+            reused['portfolio'] = True
+        elif budget_reason is not None:
+            # The budget is used up, so the allocation call would be refused too; allocate deterministically
+            portfolio = dict(draft_portfolio(analyses, profile, total=len(tickers)), draft=False)
+            if not portfolio['portfolio']:
+                raise BudgetExceeded(f"{budget_reason}; none of the {len(analyses)} analyzed tickers "
+                                     f"qualifies for a portfolio")
+        elif compact:
+            portfolio = portfolio_manager.analyze(list(analyses), analyses, profile, compact=True)
+        else:
+            portfolio = portfolio_manager.analyze(tickers, analyses, profile)
+        report("portfolio", portfolio)
+        report("reused", reused)
+
+        usage = dict(run.totals(), by_agent=run.by_agent())
+        report("usage", usage)
+
+    return {"profile": profile, "analyses": analyses, "portfolio": portfolio, "draft": draft, "usage": usage,
+            "inputs": {"risk": risk, "horizon": horizon, "sectors": list(sectors), "tickers": list(tickers),
+                       "as_of": as_of},
+            "allocation_key": key, "reused": reused}
+
+
+def collect_progress(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Fold a generation job's event stream into its partial results so far"""
+    state = {"stage": None, "total": 0, "profile": None, "analyses": {}, "portfolio": None,
+             "draft": None, "budget": None, "usage": None, "reused": None}
+    for item in events:
+        event, payload = item["event"], item["payload"]
+        if event == "stage":
+            state["stage"] = payload["stage"]
+            state["total"] = payload.get("total", state["total"])
+        elif event == "profile":
+            state["profile"] = payload
+        elif event == "analysis":
+            state["analyses"][payload["ticker"]] = payload["analysis"]
+        elif event == "portfolio":
+            state["portfolio"] = payload
+        elif event in ("draft", "budget", "usage", "reused"):
+            state[event] = payload
+    return state
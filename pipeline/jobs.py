@@ -0,0 +1,211 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_JOBS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "jobs.sqlite3")
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+INTERRUPTED = "interrupted"
+FINISHED_STATUSES = (DONE, FAILED, INTERRUPTED)
+
+# Unfinished jobs of other hosts (whose processes can't be checked) count as abandoned after this long without
+# an update; progress events refresh updated_at
+STALE_JOB_SECONDS = 3600.0
+
+JobFunction = Callable[[Dict[str, Any], Callable[[str, Any], None]], Any]
+
+
+def process_owner() -> str:
+    """Owner tag of jobs created by this process"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _process_alive(pid: int) -> bool:
+    if os.name == "nt":
+        # os.kill would terminate the process on Windows; rely on the staleness timeout there
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """
+    On-disk job table (SQLite) with an append-only event stream per job.
+
+    Every call opens its own short-lived connection, so a store can be shared
+    between the UI thread and worker threads.
+    """
+
+    def __init__(self, path: str = DEFAULT_JOBS_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                params TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                owner TEXT
+            )""")
+            if "owner" not in {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}:
+                conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            conn.execute("""CREATE TABLE IF NOT EXISTS job_events (
+                job_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                event TEXT NOT NULL,
+                payload TEXT,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (job_id, seq)
+            )""")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def create(self, kind: str, params: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, params, created_at, updated_at, owner) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, PENDING, json.dumps(params), now, now, process_owner())
+            )
+        return job_id
+
+    def set_status(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+            )
+
+    def add_event(self, job_id: str, event: str, payload: Any = None) -> int:
+        with self._connect() as conn:
+            # Take the write lock before reading MAX(seq), so concurrent writers can't pick the same seq
+            conn.execute("BEGIN IMMEDIATE")
+            seq = conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) + 1 FROM job_events WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT INTO job_events (job_id, seq, event, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, seq, event, json.dumps(payload), time.time())
+            )
+            conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time(), job_id))
+        return seq
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def events(self, job_id: str, after_seq: int = 0) -> List[Dict[str, Any]]:
+        """Events of a job with seq > after_seq, oldest first"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT seq, event, payload, created_at FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, after_seq)
+            ).fetchall()
+        return [{**dict(row), "payload": json.loads(row["payload"])} for row in rows]
+
+    def mark_interrupted(self, stale_after: float = STALE_JOB_SECONDS) -> int:
+        """
+        Flag jobs left pending/running by a process that is gone; returns how many.
+
+        Jobs of live processes sharing the file (other Streamlit/API processes) are left
+        alone: a job is abandoned when its owner ran on this host and has exited, or when
+        it has not been updated for `stale_after` seconds.
+        """
+        host = socket.gethostname()
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT id, owner, updated_at FROM jobs WHERE status IN (?, ?)", (PENDING, RUNNING)
+            ).fetchall()
+            abandoned = []
+            for row in rows:
+                owner_host, _, pid = (row["owner"] or "").rpartition(":")
+                if owner_host == host and pid.isdigit():
+                    gone = not _process_alive(int(pid))
+                else:
+                    gone = now - row["updated_at"] >= stale_after
+                if gone:
+                    abandoned.append(row["id"])
+            conn.executemany(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                [(INTERRUPTED, "Process stopped before the job finished", now, job_id) for job_id in abandoned]
+            )
+        return len(abandoned)
+
+
+class JobExecutor:
+    """
+    Runs job functions on background threads and records their progress in a JobStore.
+
+    A job function is called as fn(params, progress) where progress(event, payload)
+    appends to the job's event stream; its return value becomes the job result.
+    """
+
+    def __init__(self, store: JobStore, max_workers: int = 2):
+        self.store = store
+        self.store.mark_interrupted()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bionic-job")
+        self._lock = threading.Lock()
+        self._futures = {}
+
+    def submit(self, kind: str, fn: JobFunction, params: Dict[str, Any]) -> str:
+        job_id = self.store.create(kind, params)
+        with self._lock:
+            self._futures[job_id] = self._pool.submit(self._run, job_id, fn, params)
+        return job_id
+
+    def _run(self, job_id: str, fn: JobFunction, params: Dict[str, Any]):
+        self.store.set_status(job_id, RUNNING)
+        try:
+            result = fn(params, lambda event, payload=None: self.store.add_event(job_id, event, payload))
+        except Exception as e:
+            print(f"Job {job_id} failed: {str(e)}")
+            self.store.add_event(job_id, "error", {"message": str(e), "traceback": traceback.format_exc()})
+            self.store.set_status(job_id, FAILED, error=str(e))
+        else:
+            self.store.set_status(job_id, DONE, result=result)
+        finally:
+            with self._lock:
+                self._futures.pop(job_id, None)
+
+    def wait(self, job_id: str, timeout: Optional[float] = None):
+        """Block until a job submitted by this executor finishes"""
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            future.result(timeout=timeout)
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,133 @@
+"""
+Derived report artifacts for a generated portfolio.
+
+The holdings table, pie chart, LLM risk summary, HRP comparison and stress
+test depend only on the portfolio itself (and on the data files behind them),
+so the demo computes them once per portfolio_key() and reuses them on every
+rerun instead of re-rendering and re-calling the LLM.
+"""
+import hashlib
+import io
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from agents.usage import record_response
+from data.records import StockMetadata, UniverseTable, positions_from_portfolio
+from engine.hrp import hrp_weights
+from engine.stress import loss_table, stress_test
+
+
+def portfolio_key(portfolio: Dict[str, Any]) -> str:
+    """Content hash of a portfolio result (independent of dict ordering)"""
+    canonical = json.dumps(portfolio, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def portfolio_table(portfolio: Dict[str, Any], universe: Optional[UniverseTable]) -> pd.DataFrame:
+    """Positions enriched with name/sector/industry from the universe metadata"""
+    rows: List[Dict[str, Any]] = []
+    for position in positions_from_portfolio(portfolio):
+        meta = universe.metadata(position.ticker) if universe is not None else None
+        if meta is None:
+            meta = StockMetadata(ticker=position.ticker, name="N/A", sector="N/A", industry="N/A")
+        rows.append({
+            "Ticker": position.ticker,
+            "Full Name": meta.name,
+            "Sector": meta.sector,
+            "Industry": meta.industry,
+            "Weight (%)": f"{position.weight*100:.2f}%"
+        })
+    return pd.DataFrame(rows)
+
+
+def pie_chart_png(portfolio: Dict[str, Any]) -> bytes:
+    """Allocation pie chart rendered once to PNG bytes"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    positions = positions_from_portfolio(portfolio)
+    fig, ax = plt.subplots()
+    ax.pie([p.weight for p in positions], labels=[p.ticker for p in positions], autopct='%1.1f%%', startangle=90)
+    ax.axis('equal')
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight")
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def hrp_table(portfolio: Dict[str, Any], correlation_index) -> pd.DataFrame:
+    """Recommended weights next to HRP weights over the same tickers (those with price history)"""
+    recommended = {p.ticker: p.weight for p in positions_from_portfolio(portfolio)}
+    hrp = hrp_weights(recommended, correlation_index)
+    return pd.DataFrame({
+        "Ticker": hrp.index,
+        "Recommended (%)": [round(recommended[t] * 100, 2) for t in hrp.index],
+        "HRP (%)": (hrp.to_numpy() * 100).round(2),
+    })
+
+
+def stress_table(portfolio: Dict[str, Any], scenarios) -> pd.DataFrame:
+    """Return of the portfolio under each stress scenario"""
+    losses = loss_table(stress_test([portfolio], scenarios))
+    if not len(losses):
+        return pd.DataFrame()
+    return pd.DataFrame({
+        "Scenario": losses.index.str.replace('_', ' ').str.capitalize(),
+        "Type": losses['kind'],
+        "Portfolio return (%)": (-losses['mean'] * 100).round(2),
+    })
+
+
+def summarize_risks(client, key_risks: List[str]) -> str:
+    """Five-sentence summary of the portfolio's key risks"""
+    risks_text = "\n".join(key_risks)
+    gpt_prompt = (
+        "Summarize these key risks in 5 sentences for a portfolio report:\n"
+        f"{risks_text}"
+    )
+    started = time.perf_counter()
+    response = client.chat.completions.create(
+        messages=[
+            {"role": "system", "content": "You are a financial analyst."},
+            {"role": "user", "content": gpt_prompt}
+        ],
+        max_tokens=512,
+        temperature=0.7,
+        model="gpt-35-turbo"
+    )
+    record_response("RiskSummary", "gpt-35-turbo", response, time.perf_counter() - started)
+    return response.choices[0].message.content
+
+
+def build_report(client, portfolio: Dict[str, Any], universe: Optional[UniverseTable],
+                 correlation_index=None, scenarios=None) -> Dict[str, Any]:
+    """
+    Compute every derived artifact of a portfolio result.
+
+    Args:
+        client: AzureOpenAI client for the risk summary
+        portfolio: PortfolioManager (or draft) result
+        universe: Metadata used to enrich the holdings table
+        correlation_index: Optional CorrelationIndex for the HRP comparison
+        scenarios: Optional stress Scenarios (see engine.stress)
+    Returns:
+        Dictionary with 'key', 'table', 'missing' (tickers without metadata),
+        'chart' (PNG bytes), 'risk_summary' (None without key risks),
+        'hrp' (see hrp_table; None without a correlation index) and
+        'stress' (see stress_table; None without scenarios)
+    """
+    table = portfolio_table(portfolio, universe)
+    risks = portfolio.get("key_risks") or []
+    return {
+        'key': portfolio_key(portfolio),
+        'table': table,
+        'missing': [t for t in table.get("Ticker", []) if universe is None or universe.metadata(t) is None],
+        'chart': pie_chart_png(portfolio) if len(table) else None,
+        'risk_summary': summarize_risks(client, risks) if risks else None,
+        'hrp': hrp_table(portfolio, correlation_index) if correlation_index is not None and len(table) else None,
+        'stress': stress_table(portfolio, scenarios) if scenarios is not None and len(table) else None,
+    }
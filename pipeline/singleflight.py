@@ -0,0 +1,66 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent async computations.
+
+    The first caller for a key starts the computation; callers arriving while
+    it is in flight await the same result instead of starting their own. The
+    key is forgotten as soon as the computation finishes, so this is not a cache.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._inflight.get(key)
+        if future is None:
+            self.started += 1
+            future = asyncio.ensure_future(fn())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # Shield so one caller timing out does not cancel the work other callers wait on
+        return await asyncio.shield(future)
+
+
+class Overloaded(Exception):
+    """Raised when the server refuses work instead of queueing it"""
+
+
+class Backpressure:
+    """
+    Bounded admission control: at most `max_concurrent` requests run and at most
+    `max_waiting` queue behind them; anything beyond that is rejected immediately.
+    """
+
+    def __init__(self, max_concurrent: int, max_waiting: int = 0):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    async def __aenter__(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        if self.active >= self.max_concurrent and self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise Overloaded(f"{self.active} requests running and {self.waiting} queued")
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        self.active -= 1
+        self._semaphore.release()
@@ -0,0 +1,678 @@
+"""
+Work queue for batch runs (ticker analyses, client portfolio jobs) spread over
+any number of worker processes and machines.
+
+Tasks are leased rather than popped: a leased task becomes visible again once
+its lease expires, so work held by a crashed or stalled worker is picked up by
+another one. A task is retried until it has been leased max_attempts times.
+Results are written idempotently (the first result for a task id wins) and
+enqueueing an existing task id is a no-op, so a batch can be re-submitted or
+run by overlapping workers safely.
+
+Backends:
+
+    sqlite:///path/to/queue.sqlite3   one machine, or several sharing a local disk
+    redis://host:6379/0               any number of machines (needs the redis package)
+
+Typical overnight run:
+
+    python -m pipeline.work_queue --queue redis://queue-host:6379/0 enqueue --clients clients.json
+    python -m pipeline.work_queue --queue redis://queue-host:6379/0 work      # on every node
+    python -m pipeline.work_queue --queue redis://queue-host:6379/0 status
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+DEFAULT_QUEUE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data",
+                                  "work_queue.sqlite3")
+
+# Seconds a leased task stays invisible to other workers (workers extend it while running)
+LEASE_SECONDS = 300.0
+MAX_ATTEMPTS = 3
+# Delay before a failed task is offered again, multiplied by the attempts so far
+RETRY_DELAY = 5.0
+
+QUEUED = "queued"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+Handler = Callable[[Dict[str, Any]], Any]
+
+
+class Task(NamedTuple):
+    """A leased unit of work"""
+    id: str
+    kind: str
+    payload: Dict[str, Any]
+    attempts: int
+    max_attempts: int
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def throughput(stats: Dict[str, float]) -> Dict[str, float]:
+    """Add tasks-per-second figures to a worker's raw counters"""
+    busy = stats.get('busy_seconds', 0.0)
+    elapsed = max(stats.get('last_seen', 0.0) - stats.get('first_seen', 0.0), busy)
+    tasks = stats.get('tasks', 0)
+    return dict(stats, tasks_per_sec=round(tasks / elapsed, 3) if elapsed > 0 else 0.0,
+                tasks_per_busy_sec=round(tasks / busy, 3) if busy > 0 else 0.0)
+
+
+class WorkQueue(ABC):
+    """
+    Interface shared by the queue backends.
+
+    put() and complete() are idempotent; lease(), extend() and fail() take the
+    id of the calling worker so per-worker metrics can be kept.
+    """
+
+    @abstractmethod
+    def put(self, kind: str, payload: Dict[str, Any], task_id: Optional[str] = None,
+            max_attempts: int = MAX_ATTEMPTS) -> str:
+        """Enqueue a task (a no-op if task_id was enqueued before); returns its id"""
+
+    @abstractmethod
+    def lease(self, worker: str, lease_seconds: float = LEASE_SECONDS) -> Optional[Task]:
+        """Next visible task, hidden from other workers for lease_seconds; None if there is none"""
+
+    @abstractmethod
+    def extend(self, task_id: str, worker: str, lease_seconds: float = LEASE_SECONDS) -> bool:
+        """Push back the lease expiry of a task this worker holds; False if it lost the lease"""
+
+    @abstractmethod
+    def complete(self, task_id: str, worker: str, result: Any, seconds: float = 0.0) -> bool:
+        """Store a task's result; False if a result was already stored (which is kept)"""
+
+    @abstractmethod
+    def fail(self, task_id: str, worker: str, error: str, seconds: float = 0.0) -> bool:
+        """
+        Record a failed attempt of a task this worker holds; retried later unless attempts are used
+        up (then returns False). Only the worker's metrics are updated if it lost the lease.
+        """
+
+    @abstractmethod
+    def state(self, task_id: str) -> Optional[str]:
+        """QUEUED, LEASED, DONE or FAILED; None for an unknown task"""
+
+    @abstractmethod
+    def result(self, task_id: str) -> Any:
+        """Stored result of a task, or None"""
+
+    @abstractmethod
+    def errors(self) -> Dict[str, str]:
+        """{task id: last error} of tasks that failed for good"""
+
+    @abstractmethod
+    def counts(self) -> Dict[str, int]:
+        """Number of tasks 'queued' (visible or waiting to retry), 'leased', 'done' and 'failed'"""
+
+    @abstractmethod
+    def worker_stats(self) -> Dict[str, Dict[str, float]]:
+        """Per worker: tasks, failures, busy_seconds, first/last seen and throughput"""
+
+    def pending(self) -> int:
+        counts = self.counts()
+        return counts[QUEUED] + counts[LEASED]
+
+    def put_many(self, tasks: Iterable[Dict[str, Any]]) -> List[str]:
+        """Enqueue several tasks given as put() keyword arguments"""
+        return [self.put(**task) for task in tasks]
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """
+    Queue in a SQLite file, for workers on one machine (or sharing a local disk).
+
+    Like JobStore, every call opens its own short-lived connection; leasing
+    runs in an IMMEDIATE transaction so two workers never get the same task.
+    """
+
+    def __init__(self, path: str = DEFAULT_QUEUE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS tasks (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                visible_at REAL NOT NULL,
+                worker TEXT,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL
+            )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS tasks_visible ON tasks (status, visible_at)")
+            conn.execute("""CREATE TABLE IF NOT EXISTS workers (
+                worker TEXT PRIMARY KEY,
+                tasks INTEGER NOT NULL DEFAULT 0,
+                failures INTEGER NOT NULL DEFAULT 0,
+                busy_seconds REAL NOT NULL DEFAULT 0,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL
+            )""")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _touch_worker(self, conn: sqlite3.Connection, worker: str, tasks: int = 0, failures: int = 0,
+                      seconds: float = 0.0):
+        now = time.time()
+        conn.execute(
+            """INSERT INTO workers (worker, tasks, failures, busy_seconds, first_seen, last_seen)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(worker) DO UPDATE SET tasks = tasks + excluded.tasks,
+                   failures = failures + excluded.failures, busy_seconds = busy_seconds + excluded.busy_seconds,
+                   last_seen = excluded.last_seen""",
+            (worker, tasks, failures, seconds, now, now)
+        )
+
+    def put(self, kind: str, payload: Dict[str, Any], task_id: Optional[str] = None,
+            max_attempts: int = MAX_ATTEMPTS) -> str:
+        task_id = task_id or uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                """INSERT OR IGNORE INTO tasks (id, kind, payload, status, max_attempts, visible_at, created_at)
+                   VALUES (?, ?, ?, 'queued', ?, ?, ?)""",
+                (task_id, kind, json.dumps(payload), max_attempts, now, now)
+            )
+        return task_id
+
+    def lease(self, worker: str, lease_seconds: float = LEASE_SECONDS) -> Optional[Task]:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            self._touch_worker(conn, worker)
+            while True:
+                row = conn.execute(
+                    """SELECT * FROM tasks WHERE status = 'queued' AND visible_at <= ?
+                       ORDER BY visible_at, rowid LIMIT 1""", (now,)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                if row["attempts"] >= row["max_attempts"]:
+                    # Its last lease expired without a result or an error (the worker died)
+                    conn.execute("UPDATE tasks SET status = 'failed', error = COALESCE(error, ?) WHERE id = ?",
+                                 (f"Lease expired {row['attempts']} times", row["id"]))
+                    continue
+                conn.execute("UPDATE tasks SET attempts = attempts + 1, visible_at = ?, worker = ? WHERE id = ?",
+                             (now + lease_seconds, worker, row["id"]))
+                conn.execute("COMMIT")
+                return Task(row["id"], row["kind"], json.loads(row["payload"]), row["attempts"] + 1,
+                            row["max_attempts"])
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def extend(self, task_id: str, worker: str, lease_seconds: float = LEASE_SECONDS) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET visible_at = ? WHERE id = ? AND worker = ? AND status = 'queued'",
+                (time.time() + lease_seconds, task_id, worker)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, task_id: str, worker: str, result: Any, seconds: float = 0.0) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = 'done', result = ?, worker = ? WHERE id = ? AND status != 'done'",
+                (json.dumps(result), worker, task_id)
+            )
+            self._touch_worker(conn, worker, tasks=1, seconds=seconds)
+        return cursor.rowcount == 1
+
+    def fail(self, task_id: str, worker: str, error: str, seconds: float = 0.0) -> bool:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT status, attempts, max_attempts, worker FROM tasks WHERE id = ?",
+                               (task_id,)).fetchone()
+            # A worker that lost its lease must not release the task from under the new holder
+            held = row is not None and row["status"] == QUEUED and row["worker"] == worker
+            retry = held and row["attempts"] < row["max_attempts"]
+            if held:
+                conn.execute(
+                    """UPDATE tasks SET status = ?, error = ?, visible_at = ?, worker = NULL
+                       WHERE id = ? AND worker = ?""",
+                    (QUEUED if retry else FAILED, error, time.time() + RETRY_DELAY * row["attempts"], task_id,
+                     worker)
+                )
+            self._touch_worker(conn, worker, failures=1, seconds=seconds)
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return retry
+
+    def state(self, task_id: str) -> Optional[str]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT status, worker, visible_at FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        if row is None:
+            return None
+        if row["status"] == QUEUED and row["worker"] is not None and row["visible_at"] > time.time():
+            return LEASED
+        return row["status"]
+
+    def result(self, task_id: str) -> Any:
+        with self._connect() as conn:
+            row = conn.execute("SELECT result FROM tasks WHERE id = ? AND status = 'done'", (task_id,)).fetchone()
+        return json.loads(row["result"]) if row is not None else None
+
+    def errors(self) -> Dict[str, str]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id, error FROM tasks WHERE status = 'failed'").fetchall()
+        return {row["id"]: row["error"] for row in rows}
+
+    def counts(self) -> Dict[str, int]:
+        now = time.time()
+        with self._connect() as conn:
+            rows = conn.execute(
+                """SELECT CASE WHEN status = 'queued' AND worker IS NOT NULL AND visible_at > ?
+                                    THEN 'leased' ELSE status END AS state, COUNT(*)
+                   FROM tasks GROUP BY state""", (now,)
+            ).fetchall()
+        counts = {QUEUED: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        counts.update({row[0]: row[1] for row in rows})
+        return counts
+
+    def worker_stats(self) -> Dict[str, Dict[str, float]]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM workers ORDER BY worker").fetchall()
+        return {row["worker"]: throughput({k: row[k] for k in row.keys() if k != "worker"}) for row in rows}
+
+
+class RedisWorkQueue(WorkQueue):
+    """
+    Queue in Redis (or any server speaking its protocol), for workers on many machines.
+
+    Visible and leased tasks live in one sorted set scored by the time they
+    become visible; a lease moves a task's score into the future inside a
+    WATCH/MULTI transaction, so expired leases need no separate reaper.
+
+    Args:
+        url: redis:// URL (ignored if client is given)
+        client: Existing redis.Redis client
+        prefix: Key prefix, so several queues can share a server
+    """
+
+    def __init__(self, url: str = "redis://localhost:6379/0", client=None, prefix: str = "bionic:queue"):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url, decode_responses=True)
+        self.redis = client
+        self.prefix = prefix
+
+    def _key(self, name: str) -> str:
+        return f"{self.prefix}:{name}"
+
+    def _touch_worker(self, pipe, worker: str, tasks: int = 0, failures: int = 0, seconds: float = 0.0):
+        key = self._key(f"worker:{worker}")
+        now = time.time()
+        pipe.sadd(self._key("workers"), worker)
+        pipe.hsetnx(key, "first_seen", now)
+        pipe.hset(key, "last_seen", now)
+        pipe.hincrby(key, "tasks", tasks)
+        pipe.hincrby(key, "failures", failures)
+        pipe.hincrbyfloat(key, "busy_seconds", seconds)
+
+    def put(self, kind: str, payload: Dict[str, Any], task_id: Optional[str] = None,
+            max_attempts: int = MAX_ATTEMPTS) -> str:
+        task_id = task_id or uuid.uuid4().hex
+        spec = json.dumps({'kind': kind, 'payload': payload, 'max_attempts': max_attempts})
+        if self.redis.hsetnx(self._key("tasks"), task_id, spec):
+            self.redis.zadd(self._key("visible"), {task_id: time.time()})
+        return task_id
+
+    def lease(self, worker: str, lease_seconds: float = LEASE_SECONDS) -> Optional[Task]:
+        from redis.exceptions import WatchError
+
+        visible = self._key("visible")
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(visible)
+                    now = time.time()
+                    ids = pipe.zrangebyscore(visible, "-inf", now, start=0, num=1)
+                    if not ids:
+                        pipe.unwatch()
+                        return None
+                    task_id = ids[0]
+                    spec = json.loads(pipe.hget(self._key("tasks"), task_id))
+                    attempts = int(pipe.hget(self._key("attempts"), task_id) or 0)
+                    pipe.multi()
+                    if attempts >= spec['max_attempts']:
+                        # Its last lease expired without a result or an error (the worker died)
+                        pipe.zrem(visible, task_id)
+                        pipe.hsetnx(self._key("errors"), task_id, f"Lease expired {attempts} times")
+                        pipe.execute()
+                        continue
+                    pipe.zadd(visible, {task_id: now + lease_seconds})
+                    pipe.hset(self._key("leases"), task_id, worker)
+                    pipe.hincrby(self._key("attempts"), task_id, 1)
+                    self._touch_worker(pipe, worker)
+                    pipe.execute()
+                    return Task(task_id, spec['kind'], spec['payload'], attempts + 1, spec['max_attempts'])
+                except WatchError:
+                    continue  # another worker leased a task first
+
+    def extend(self, task_id: str, worker: str, lease_seconds: float = LEASE_SECONDS) -> bool:
+        if self.redis.hget(self._key("leases"), task_id) != worker:
+            return False
+        return bool(self.redis.zadd(self._key("visible"), {task_id: time.time() + lease_seconds}, xx=True, ch=True))
+
+    def complete(self, task_id: str, worker: str, result: Any, seconds: float = 0.0) -> bool:
+        with self.redis.pipeline() as pipe:
+            pipe.hsetnx(self._key("results"), task_id, json.dumps(result))
+            pipe.zrem(self._key("visible"), task_id)
+            pipe.hdel(self._key("leases"), task_id)
+            self._touch_worker(pipe, worker, tasks=1, seconds=seconds)
+            written = pipe.execute()[0]
+        return bool(written)
+
+    def fail(self, task_id: str, worker: str, error: str, seconds: float = 0.0) -> bool:
+        from redis.exceptions import WatchError
+
+        leases = self._key("leases")
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    # Leasing and completing both write the leases hash, so this sees either
+                    pipe.watch(leases)
+                    held = pipe.hget(leases, task_id) == worker
+                    spec = pipe.hget(self._key("tasks"), task_id)
+                    attempts = int(pipe.hget(self._key("attempts"), task_id) or 0)
+                    retry = held and spec is not None and attempts < json.loads(spec)['max_attempts']
+                    pipe.multi()
+                    if held:
+                        if retry:
+                            pipe.zadd(self._key("visible"), {task_id: time.time() + RETRY_DELAY * attempts}, xx=True)
+                        else:
+                            pipe.zrem(self._key("visible"), task_id)
+                            pipe.hset(self._key("errors"), task_id, error)
+                        pipe.hdel(leases, task_id)
+                    self._touch_worker(pipe, worker, failures=1, seconds=seconds)
+                    pipe.execute()
+                    return retry
+                except WatchError:
+                    continue  # the task (or another one) was leased or completed meanwhile
+
+    def state(self, task_id: str) -> Optional[str]:
+        with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hexists(self._key("tasks"), task_id)
+            pipe.hexists(self._key("results"), task_id)
+            pipe.hexists(self._key("errors"), task_id)
+            pipe.hexists(self._key("leases"), task_id)
+            pipe.zscore(self._key("visible"), task_id)
+            known, done, failed, leased, visible_at = pipe.execute()
+        if not known:
+            return None
+        if done or failed:
+            return DONE if done else FAILED
+        return LEASED if leased and visible_at is not None and visible_at > time.time() else QUEUED
+
+    def result(self, task_id: str) -> Any:
+        raw = self.redis.hget(self._key("results"), task_id)
+        return json.loads(raw) if raw is not None else None
+
+    def errors(self) -> Dict[str, str]:
+        return self.redis.hgetall(self._key("errors"))
+
+    def counts(self) -> Dict[str, int]:
+        visible = self._key("visible")
+        now = time.time()
+        with self.redis.pipeline(transaction=False) as pipe:
+            for task_id in self.redis.hkeys(self._key("leases")):
+                pipe.zscore(visible, task_id)
+            leased = sum(1 for score in pipe.execute() if score is not None and score > now)
+        return {
+            QUEUED: self.redis.zcard(visible) - leased,
+            LEASED: leased,
+            DONE: self.redis.hlen(self._key("results")),
+            FAILED: self.redis.hlen(self._key("errors")),
+        }
+
+    def worker_stats(self) -> Dict[str, Dict[str, float]]:
+        stats = {}
+        for worker in sorted(self.redis.smembers(self._key("workers"))):
+            raw = self.redis.hgetall(self._key(f"worker:{worker}"))
+            stats[worker] = throughput({k: float(v) if k in ('busy_seconds', 'first_seen', 'last_seen') else int(v)
+                                        for k, v in raw.items()})
+        return stats
+
+
+def open_queue(url: Optional[str] = None) -> WorkQueue:
+    """Queue for a sqlite:///path or redis:// URL (BIONIC_QUEUE_URL, else the local SQLite queue)"""
+    url = url or os.getenv("BIONIC_QUEUE_URL") or f"sqlite:///{DEFAULT_QUEUE_PATH}"
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisWorkQueue(url)
+    if url.startswith("sqlite:///"):
+        return SQLiteWorkQueue(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported queue URL '{url}'. Use sqlite:///path or redis://host:port/db")
+
+
+def run_worker(queue: WorkQueue, handlers: Dict[str, Handler], worker: Optional[str] = None,
+               lease_seconds: float = LEASE_SECONDS, idle_timeout: float = 0.0, poll_interval: float = 1.0,
+               max_tasks: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Lease and run tasks until the queue stays empty.
+
+    While a handler runs, its lease is extended every lease_seconds / 3. A
+    handler exception is recorded as a failed attempt and the task is retried
+    by whichever worker leases it next.
+
+    Args:
+        queue: Queue to work on
+        handlers: {task kind: fn(payload) -> JSON-serializable result}
+        worker: Worker id used for leases and metrics (host-pid-random if None)
+        lease_seconds: Lease length
+        idle_timeout: Keep polling this many seconds after the queue runs dry
+        poll_interval: Seconds between polls while idle
+        max_tasks: Stop after this many tasks
+    Returns:
+        Dictionary with 'worker', 'tasks', 'failures', 'duplicates' (results
+        another worker had already stored), 'busy_seconds' and 'tasks_per_sec'
+    """
+    worker = worker or default_worker_id()
+    stats = {'worker': worker, 'tasks': 0, 'failures': 0, 'duplicates': 0, 'busy_seconds': 0.0}
+    started = time.perf_counter()
+    idle_since = None
+    while max_tasks is None or stats['tasks'] + stats['failures'] < max_tasks:
+        task = queue.lease(worker, lease_seconds)
+        if task is None:
+            idle_since = idle_since or time.perf_counter()
+            if time.perf_counter() - idle_since >= idle_timeout:
+                break
+            time.sleep(poll_interval)
+            continue
+        idle_since = None
+
+        done = threading.Event()
+
+        def keep_leased(task_id=task.id):
+            while not done.wait(lease_seconds / 3):
+                if not queue.extend(task_id, worker, lease_seconds):
+                    return
+
+        heartbeat = threading.Thread(target=keep_leased, daemon=True)
+        heartbeat.start()
+        task_started = time.perf_counter()
+        try:
+            handler = handlers.get(task.kind)
+            if handler is None:
+                raise ValueError(f"No handler for task kind '{task.kind}'")
+            result = handler(task.payload)
+        except Exception as e:
+            seconds = time.perf_counter() - task_started
+            print(f"Task {task.id} failed (attempt {task.attempts}/{task.max_attempts}): {str(e)}")
+            queue.fail(task.id, worker, str(e), seconds)
+            stats['failures'] += 1
+        else:
+            seconds = time.perf_counter() - task_started
+            stats['duplicates'] += int(not queue.complete(task.id, worker, result, seconds))
+            stats['tasks'] += 1
+        finally:
+            done.set()
+            heartbeat.join()
+        stats['busy_seconds'] += seconds
+    elapsed = time.perf_counter() - started
+    stats['busy_seconds'] = round(stats['busy_seconds'], 3)
+    stats['tasks_per_sec'] = round(stats['tasks'] / elapsed, 3) if elapsed > 0 else 0.0
+    return stats
+
+
+# --- Batch rebalancing tasks ---
+
+ANALYSIS = "analysis"
+PORTFOLIO = "portfolio"
+# Longest a portfolio job waits for analyses other workers are still running
+ANALYSIS_WAIT = 120.0
+
+
+def analysis_task_id(ticker: str, as_of: Optional[str] = None) -> str:
+    return f"{ANALYSIS}:{ticker}:{as_of or date.today().isoformat()}"
+
+
+def portfolio_task_id(client_id: str, as_of: Optional[str] = None) -> str:
+    return f"{PORTFOLIO}:{client_id}:{as_of or date.today().isoformat()}"
+
+
+def enqueue_rebalance(queue: WorkQueue, clients: List[Dict[str, Any]], as_of: Optional[str] = None) -> Dict[str, int]:
+    """
+    Enqueue one analysis per distinct ticker and one portfolio job per client.
+
+    Task ids are dated, so enqueueing the same book twice on a day adds
+    nothing. Analyses are enqueued first, so workers mostly finish them before
+    the portfolio jobs that reuse them.
+
+    Args:
+        queue: Target queue
+        clients: Dicts with 'client_id', 'risk_tolerance', 'investment_horizon',
+            'sectors' and 'tickers'
+        as_of: Batch date (today if None); stored with every task, so a batch
+            running past midnight still finds the analyses it enqueued
+    Returns:
+        Dictionary with the number of 'analyses' and 'portfolios' enqueued
+    """
+    as_of = as_of or date.today().isoformat()
+    tickers = list(dict.fromkeys(t for client in clients for t in client['tickers']))
+    for ticker in tickers:
+        queue.put(ANALYSIS, {'ticker': ticker, 'as_of': as_of}, task_id=analysis_task_id(ticker, as_of))
+    for client in clients:
+        queue.put(PORTFOLIO, {**client, 'as_of': as_of}, task_id=portfolio_task_id(client['client_id'], as_of))
+    return {'analyses': len(tickers), 'portfolios': len(clients)}
+
+
+def rebalance_handlers(queue: WorkQueue, client, fundamental_agent, portfolio_manager,
+                       max_concurrency: int = 4) -> Dict[str, Handler]:
+    """
+    Handlers for enqueue_rebalance() tasks.
+
+    Analysis results travel through the queue: before a portfolio job runs, it
+    waits for analyses of its tickers still leased by other workers and copies
+    their results into this worker's analysis store, so each ticker is
+    analyzed once per batch whichever node needs it.
+
+    Args:
+        queue: Queue the tasks come from
+        client: AzureOpenAI client for profile calls
+        fundamental_agent: FundamentalAgent, with an AnalysisStore to share analyses
+        portfolio_manager: PortfolioManager
+        max_concurrency: Analyses running at once inside one portfolio job
+    """
+    from pipeline.generation import run_portfolio_generation
+    store = fundamental_agent.store
+
+    def analysis(payload: Dict[str, Any]) -> Dict[str, Any]:
+        return fundamental_agent.base_analysis(payload['ticker'])
+
+    def portfolio(payload: Dict[str, Any]) -> Dict[str, Any]:
+        if store is not None:
+            deadline = time.monotonic() + ANALYSIS_WAIT
+            for ticker in payload['tickers']:
+                task_id = analysis_task_id(ticker, payload.get('as_of'))
+                while queue.state(task_id) == LEASED and time.monotonic() < deadline:
+                    time.sleep(0.2)
+                shared = queue.result(task_id)
+                if shared is not None and store.get(ticker) is None:
+                    store.put(ticker, shared, as_of=shared.get('as_of'))
+        result = run_portfolio_generation(client, fundamental_agent, portfolio_manager,
+                                          payload['risk_tolerance'], payload['investment_horizon'],
+                                          payload['sectors'], payload['tickers'], max_concurrency=max_concurrency)
+        return {'client_id': payload['client_id'], 'portfolio': result['portfolio'], 'usage': result['usage']}
+
+    return {ANALYSIS: analysis, PORTFOLIO: portfolio}
+
+
+def status(queue: WorkQueue) -> Dict[str, Any]:
+    return {'counts': queue.counts(), 'workers': queue.worker_stats(), 'errors': queue.errors()}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Distributed batch rebalancing")
+    parser.add_argument("--queue", default=None,
+                        help="sqlite:///path or redis://host:port/db (default: BIONIC_QUEUE_URL)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    enqueue = commands.add_parser("enqueue", help="Enqueue analyses and portfolio jobs for a client book")
+    enqueue.add_argument("--clients", required=True, help="JSON file with a list of client preference dicts")
+    enqueue.add_argument("--as-of", default=None, help="Batch date, YYYY-MM-DD (default: today)")
+    work = commands.add_parser("work", help="Run a worker until the queue is empty")
+    work.add_argument("--worker", default=None)
+    work.add_argument("--lease", type=float, default=LEASE_SECONDS)
+    work.add_argument("--idle-timeout", type=float, default=0.0)
+    commands.add_parser("status", help="Show task counts and per-worker throughput")
+    args = parser.parse_args()
+
+    work_queue = open_queue(args.queue)
+    if args.command == "enqueue":
+        with open(args.clients) as f:
+            print(f"✅ Enqueued {enqueue_rebalance(work_queue, json.load(f), as_of=args.as_of)}")
+    elif args.command == "work":
+        from dotenv import load_dotenv
+        from agents.cassette import cassette_client
+        from agents.fundamental_agent import FundamentalAgent
+        from agents.portfolio_manager import PortfolioManager
+        from pipeline.analysis_store import AnalysisStore
+
+        load_dotenv()
+
+        def make_client():
+            from openai import AzureOpenAI
+            return AzureOpenAI(
+                api_version="2024-12-01-preview",
+                azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT", "https://bionicadvisor.openai.azure.com/"),
+                api_key=os.getenv("AZURE_OPENAI_API_KEY")
+            )
+
+        agent = FundamentalAgent(store=AnalysisStore())
+        handlers = rebalance_handlers(work_queue, cassette_client(make_client), agent, PortfolioManager())
+        print(f"✅ {run_worker(work_queue, handlers, args.worker, args.lease, args.idle_timeout)}")
+    else:
+        print(json.dumps(status(work_queue), indent=2))
@@ -1,8 +1,8 @@
 import os
-from openai import AzureOpenAI
-from dotenv import load_dotenv
 import json
+from agents.cassette import cassette_client
 from agents.fundamental_agent import FundamentalAgent
+from pipeline.analysis_store import AnalysisStore
 from agents.portfolio_manager import PortfolioManager
 
 def get_investment_profile(client):
@@ -35,9 +35,9 @@ def get_investment_profile(client):
     
     return response.choices[0].message.content
 
-def analyze_stocks(tickers: list, context: dict) -> dict:
-    """Analyze stocks using the fundamental agent"""
-    fundamental_agent = FundamentalAgent()
+def analyze_stocks(tickers: list, context: dict, store: AnalysisStore = None) -> dict:
+    """Analyze stocks using the fundamental agent, sharing analyses through the store (data/analyses.sqlite3)"""
+    fundamental_agent = FundamentalAgent(store=store if store is not None else AnalysisStore())
     analyses = {}
     
     for ticker in tickers:
@@ -56,11 +56,14 @@ def generate_portfolio(tickers: list, analyses: dict, context: dict) -> dict:
     return portfolio
 
 def main():
+    from dotenv import load_dotenv
+    from openai import AzureOpenAI
+
     # Load environment variables
     load_dotenv()
     
     # Azure OpenAI Configuration
-    endpoint = "https://bionicadvisor.openai.azure.com/"
+    endpoint = os.getenv("AZURE_OPENAI_ENDPOINT", "https://bionicadvisor.openai.azure.com/")
     deployment = "gpt-35-turbo"
     api_version = "2024-12-01-preview"
     
@@ -68,11 +71,11 @@ def main():
     
     try:
         # Initialize Azure OpenAI client
-        client = AzureOpenAI(
+        client = cassette_client(lambda: AzureOpenAI(
             api_version=api_version,
             azure_endpoint=endpoint,
             api_key=os.getenv("AZURE_OPENAI_API_KEY")
-        )
+        ))
         
         # Get investment profile through conversation
         print("\n💬 Starting conversation to gather investment preferences...")
@@ -0,0 +1,157 @@
+"""
+Offline throughput/latency benchmark for the agent pipeline.
+
+Runs the profile -> analyze_stocks -> generate_portfolio pipeline from
+run_advisor.py against a local FakeAzureOpenAI server at several universe sizes
+and concurrency levels, and reports p50/p95 latency, calls/sec and tokens/sec.
+
+Usage:
+    python tests/benchmark/agent_benchmark.py --sizes 5 20 --concurrency 1 4
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(BENCHMARK_DIR))
+for path in (PROJECT_ROOT, BENCHMARK_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from fake_azure_server import FakeAzureOpenAI
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Linear-interpolated percentile (pct in 0-100) of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def load_universe() -> List[str]:
+    """S&P 500 tickers from data/sp500_tickers.csv"""
+    with open(os.path.join(PROJECT_ROOT, "data", "sp500_tickers.csv"), newline="") as f:
+        return [row["Symbol"] for row in csv.DictReader(f)]
+
+
+def run_pipeline(tickers: List[str]) -> float:
+    """Run one full advisor pipeline and return its wall time in seconds"""
+    from openai import AzureOpenAI
+    from agents.cassette import cassette_client
+    from pipeline.analysis_store import AnalysisStore
+    from run_advisor import analyze_stocks, generate_portfolio, get_investment_profile
+
+    started = time.perf_counter()
+    client = cassette_client(lambda: AzureOpenAI(
+        api_version="2024-12-01-preview",
+        azure_endpoint=os.environ["AZURE_OPENAI_ENDPOINT"],
+        api_key=os.environ["AZURE_OPENAI_API_KEY"]
+    ))
+    profile = json.loads(get_investment_profile(client))
+    # A fresh store per pipeline, so every run measures the LLM calls rather than cached analyses
+    with tempfile.TemporaryDirectory() as directory:
+        analyses = analyze_stocks(tickers, profile, store=AnalysisStore(os.path.join(directory, "analyses.sqlite3")))
+    generate_portfolio(tickers, analyses, profile)
+    return time.perf_counter() - started
+
+
+def run_scenario(server: FakeAzureOpenAI, tickers: List[str], concurrency: int,
+                 verbose: bool = False) -> Dict[str, Any]:
+    """Run `concurrency` pipelines in parallel over `tickers` and summarize the calls served"""
+    server.reset_stats()
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    started = time.perf_counter()
+    with output, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        pipeline_times = list(pool.map(run_pipeline, [tickers] * concurrency))
+    wall = time.perf_counter() - started
+
+    ok_calls = [c for c in server.calls if c["status"] == 200]
+    call_latencies = [c["latency"] for c in ok_calls]
+    tokens = sum(c["prompt_tokens"] + c["completion_tokens"] for c in ok_calls)
+    return {
+        "universe_size": len(tickers),
+        "concurrency": concurrency,
+        "wall_seconds": round(wall, 3),
+        "calls": len(ok_calls),
+        "throttled": len(server.calls) - len(ok_calls),
+        "call_p50": round(percentile(call_latencies, 50), 3),
+        "call_p95": round(percentile(call_latencies, 95), 3),
+        "pipeline_p50": round(percentile(pipeline_times, 50), 3),
+        "pipeline_p95": round(percentile(pipeline_times, 95), 3),
+        "calls_per_sec": round(len(ok_calls) / wall, 2),
+        "tokens_per_sec": round(tokens / wall, 1),
+    }
+
+
+def run_benchmark(sizes: List[int], concurrency_levels: List[int], **server_options) -> List[Dict[str, Any]]:
+    """Run every (universe size, concurrency) combination against one fake server"""
+    universe = load_universe()
+    results = []
+    with FakeAzureOpenAI(**server_options) as server:
+        previous = {k: os.environ.get(k) for k in ("AZURE_OPENAI_ENDPOINT", "AZURE_OPENAI_API_KEY")}
+        os.environ["AZURE_OPENAI_ENDPOINT"] = server.url
+        os.environ["AZURE_OPENAI_API_KEY"] = "fake-key"
+        try:
+            for size in sizes:
+                for concurrency in concurrency_levels:
+                    print(f"⏱  universe={size} concurrency={concurrency} ...")
+                    results.append(run_scenario(server, universe[:size], concurrency))
+        finally:
+            for key, value in previous.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+    return results
+
+
+def format_results(results: List[Dict[str, Any]]) -> str:
+    """Render benchmark results as a fixed-width table"""
+    columns = ["universe_size", "concurrency", "calls", "throttled", "call_p50", "call_p95",
+               "pipeline_p50", "pipeline_p95", "calls_per_sec", "tokens_per_sec"]
+    widths = [max(len(col), *(len(str(r[col])) for r in results)) for col in columns]
+    lines = ["  ".join(col.rjust(w) for col, w in zip(columns, widths))]
+    for result in results:
+        lines.append("  ".join(str(result[col]).rjust(w) for col, w in zip(columns, widths)))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the advisor pipeline against a fake Azure OpenAI server")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 20])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--latency", default="lognormal", choices=["fixed", "uniform", "lognormal"])
+    parser.add_argument("--latency-median", type=float, default=0.2)
+    parser.add_argument("--latency-sigma", type=float, default=0.3)
+    parser.add_argument("--tokens-per-sec", type=float, default=0.0,
+                        help="Simulated output generation speed (0 disables)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of an injected 429")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Probability that a call is a straggler")
+    parser.add_argument("--slow-latency", type=float, default=0.0, help="Extra seconds a straggler takes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = run_benchmark(
+        args.sizes, args.concurrency,
+        latency=args.latency, latency_median=args.latency_median, latency_sigma=args.latency_sigma,
+        output_tokens_per_sec=args.tokens_per_sec, error_rate=args.error_rate, seed=args.seed,
+        slow_rate=args.slow_rate, slow_latency=args.slow_latency
+    )
+    print(json.dumps(results, indent=2) if args.json else format_results(results))
+
+
+if __name__ == "__main__":
+    main()
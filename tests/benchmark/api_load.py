@@ -0,0 +1,119 @@
+"""
+Load generator for the advisor HTTP API (pipeline/api.py).
+
+By default drives an in-process AdvisorAPI whose agents talk to a local
+FakeAzureOpenAI server; with --url it sends real HTTP requests to a running
+service instead. Reports status counts, p50/p95 latency, requests/sec and how
+many computations were coalesced.
+
+Usage:
+    python tests/benchmark/api_load.py --requests 200 --concurrency 50 --distinct 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(BENCHMARK_DIR))
+for path in (PROJECT_ROOT, BENCHMARK_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from agent_benchmark import load_universe, percentile
+from fake_azure_server import FakeAzureOpenAI
+
+
+def make_requests(n_requests: int, distinct: int, tickers_per_request: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """`n_requests` /analyze bodies drawn from `distinct` unique ones (duplicates get coalesced)"""
+    rng = random.Random(seed)
+    universe = load_universe()
+    context = {"risk_tolerance": "moderate", "investment_horizon": "medium_term", "sectors": ["Technology"]}
+    unique = [{"tickers": rng.sample(universe, tickers_per_request), "context": context} for _ in range(distinct)]
+    return [rng.choice(unique) for _ in range(n_requests)]
+
+
+async def call_in_process(app, body: Dict[str, Any]) -> Tuple[int, float]:
+    started = time.perf_counter()
+    status, _ = await app.handle("POST", "/analyze", json.dumps(body).encode())
+    return status, time.perf_counter() - started
+
+
+async def call_http(url: str, body: Dict[str, Any]) -> Tuple[int, float]:
+    def send():
+        request = urllib.request.Request(url.rstrip("/") + "/analyze", data=json.dumps(body).encode(),
+                                         headers={"Content-Type": "application/json"}, method="POST")
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    started = time.perf_counter()
+    status = await asyncio.get_running_loop().run_in_executor(None, send)
+    return status, time.perf_counter() - started
+
+
+async def run_load(call, bodies: List[Dict[str, Any]], concurrency: int) -> Dict[str, Any]:
+    """Issue all bodies with at most `concurrency` outstanding requests"""
+    limiter = asyncio.Semaphore(concurrency)
+
+    async def one(body):
+        async with limiter:
+            return await call(body)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(b) for b in bodies))
+    wall = time.perf_counter() - started
+    latencies = [latency for status, latency in results if status == 200]
+    return {
+        "requests": len(bodies),
+        "statuses": dict(Counter(status for status, _ in results)),
+        "p50": round(percentile(latencies, 50), 3),
+        "p95": round(percentile(latencies, 95), 3),
+        "requests_per_sec": round(len(bodies) / wall, 2),
+        "wall_seconds": round(wall, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the advisor API")
+    parser.add_argument("--url", help="Target a running service instead of an in-process app")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--distinct", type=int, default=10, help="Number of unique request bodies")
+    parser.add_argument("--tickers", type=int, default=5, help="Tickers per request")
+    parser.add_argument("--max-concurrent", type=int, default=32)
+    parser.add_argument("--max-waiting", type=int, default=64)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--latency-median", type=float, default=0.2)
+    args = parser.parse_args()
+
+    bodies = make_requests(args.requests, args.distinct, args.tickers)
+    if args.url:
+        report = asyncio.run(run_load(lambda body: call_http(args.url, body), bodies, args.concurrency))
+        print(json.dumps(report, indent=2))
+        return
+
+    from pipeline.api import AdvisorAPI
+
+    with FakeAzureOpenAI(latency="lognormal", latency_median=args.latency_median) as server:
+        os.environ["AZURE_OPENAI_ENDPOINT"] = server.url
+        os.environ["AZURE_OPENAI_API_KEY"] = "fake-key"
+        app = AdvisorAPI(max_concurrent=args.max_concurrent, max_waiting=args.max_waiting,
+                         request_timeout=args.timeout)
+        report = asyncio.run(run_load(lambda body: call_in_process(app, body), bodies, args.concurrency))
+        report["llm_calls"] = len(server.calls)
+        report["api_stats"] = asyncio.run(app.stats({}))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Local stand-in for the Azure OpenAI chat-completions endpoint.
+
+Speaks enough of the API for `openai.AzureOpenAI` to work against it, with a
+configurable latency distribution, 429 injection and canned JSON replies, so
+the agent pipeline can be benchmarked without touching real quota.
+"""
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Union
+
+Reply = Union[str, Callable[[List[Dict[str, Any]]], str]]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)"""
+    return max(1, len(text) // 4)
+
+
+def _ticker_score(ticker: str, salt: str) -> float:
+    """Deterministic pseudo-score in [0.3, 0.95) for a ticker"""
+    return 0.3 + (zlib.crc32(f"{ticker}:{salt}".encode()) % 650) / 1000
+
+
+def fundamental_reply(messages: List[Dict[str, Any]]) -> str:
+    """Canned FundamentalAgent analysis for the ticker named in the user prompt"""
+    match = re.search(r"Analyze (\S+) based on", messages[-1]["content"])
+    ticker = match.group(1) if match else "UNKNOWN"
+    scores = {
+        key: round(_ticker_score(ticker, key), 2)
+        for key in ("financial_health", "growth_potential", "competitive_position", "management_quality")
+    }
+    overall = round(sum(scores.values()) / len(scores), 2)
+    return json.dumps({
+        **scores,
+        "overall_score": overall,
+        "key_strengths": [f"{ticker} has a durable market position", "Healthy free cash flow"],
+        "key_risks": [f"{ticker} faces margin pressure", "Regulatory risk"],
+        "recommendation": "buy" if overall >= 0.7 else "hold" if overall >= 0.5 else "sell",
+    })
+
+
+def portfolio_reply(messages: List[Dict[str, Any]]) -> str:
+    """Canned PortfolioManager allocation over the tickers found in the analyses"""
+    prompt = messages[-1]["content"]
+    tickers = re.findall(r'"([A-Z][A-Z0-9.\-]*)":\s*\{', prompt) or ["AAPL"]
+    tickers = tickers[:30]
+    raw = [_ticker_score(t, "weight") for t in tickers]
+    total = sum(raw)
+    return json.dumps({
+        "portfolio": [
+            {"ticker": t, "weight": round(w / total, 4), "rationale": "Balanced fundamentals"}
+            for t, w in zip(tickers, raw)
+        ],
+        "expected_return": 0.09,
+        "risk_score": 0.5,
+        "diversification_score": 0.7,
+        "sector_allocation": {"technology": 0.6, "healthcare": 0.4},
+        "key_risks": ["Market drawdown", "Sector concentration"],
+    })
+
+
+def profile_reply(messages: List[Dict[str, Any]]) -> str:
+    """Canned investment profile"""
+    return json.dumps({
+        "risk_tolerance": "moderate",
+        "investment_horizon": "medium_term",
+        "sectors": ["technology", "healthcare"],
+    })
+
+
+def guided_chat_reply(messages: List[Dict[str, Any]]) -> str:
+    """Canned guided-chat turn: a short answer plus the preferences block"""
+    return ("Thanks, that helps. Could you tell me more about how long you plan to stay invested?\n"
+            "<preferences>\n" + json.dumps({"risk_tolerance": "moderate", "investment_horizon": None,
+                                             "sectors": ["Technology"]}) + "\n</preferences>")
+
+
+def summary_reply(messages: List[Dict[str, Any]]) -> str:
+    """Canned conversation summary"""
+    return ("The client wants moderate risk, prefers Technology and has not yet chosen an investment "
+            "horizon. They asked about diversification and fees.")
+
+
+# Matched in order against the system prompt; first hit wins
+DEFAULT_REPLIES = [
+    ("expert fundamental analyst", fundamental_reply),
+    ("expert portfolio manager", portfolio_reply),
+    ("Create an investment profile", profile_reply),
+    ("Summarize the conversation", summary_reply),
+    ("determine their investment preferences", guided_chat_reply),
+]
+
+
+class FakeAzureOpenAI:
+    """
+    Threaded HTTP server answering `POST .../chat/completions`.
+
+    Args:
+        latency: "fixed", "uniform" or "lognormal"
+        latency_median: Median (or fixed) time-to-first-byte in seconds
+        latency_sigma: Spread; lognormal sigma or uniform half-width in seconds
+        output_tokens_per_sec: Simulated generation speed added on top of latency (0 disables)
+        prompt_tokens_per_sec: Simulated prompt processing speed added on top of latency (0 disables)
+        slow_rate: Probability that a request is a straggler
+        slow_latency: Extra seconds a straggler takes
+        error_rate: Probability of answering with HTTP 429
+        retry_after: Seconds advertised in the Retry-After header of injected 429s
+        replies: Extra (system prompt substring, reply) pairs checked before the defaults
+        seed: Seed for the latency/error random stream
+    """
+
+    def __init__(self, latency: str = "lognormal", latency_median: float = 0.5,
+                 latency_sigma: float = 0.3, output_tokens_per_sec: float = 0.0,
+                 prompt_tokens_per_sec: float = 0.0, slow_rate: float = 0.0, slow_latency: float = 0.0,
+                 error_rate: float = 0.0, retry_after: float = 0.05,
+                 replies: Optional[List[tuple]] = None, seed: int = 0,
+                 host: str = "127.0.0.1", port: int = 0):
+        if latency not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {latency}")
+        self.latency = latency
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.output_tokens_per_sec = output_tokens_per_sec
+        self.prompt_tokens_per_sec = prompt_tokens_per_sec
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.replies = list(replies or []) + DEFAULT_REPLIES
+        self.calls: List[Dict[str, Any]] = []
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> "FakeAzureOpenAI":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeAzureOpenAI":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset_stats(self):
+        with self._lock:
+            self.calls = []
+
+    def _sample_latency(self) -> float:
+        with self._lock:
+            straggler = self.slow_latency if self.slow_rate and self._rng.random() < self.slow_rate else 0.0
+            if self.latency == "fixed":
+                return self.latency_median + straggler
+            if self.latency == "uniform":
+                return max(0.0, self._rng.uniform(self.latency_median - self.latency_sigma,
+                                                  self.latency_median + self.latency_sigma)) + straggler
+            return self._rng.lognormvariate(0.0, self.latency_sigma) * self.latency_median + straggler
+
+    def _inject_error(self) -> bool:
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+    def _reply_for(self, messages: List[Dict[str, Any]]) -> str:
+        system = next((m["content"] for m in messages if m["role"] == "system"), "")
+        for needle, reply in self.replies:
+            if needle in system:
+                return reply(messages) if callable(reply) else reply
+        return "This is a canned reply from the fake Azure OpenAI server."
+
+    def _record(self, **call):
+        with self._lock:
+            self.calls.append(call)
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Small JSON replies would otherwise wait ~40ms for delayed ACKs
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                started = time.perf_counter()
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if not self.path.split("?")[0].endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"code": "404", "message": "Not found"}})
+                    return
+
+                if fake._inject_error():
+                    fake._record(status=429, latency=time.perf_counter() - started,
+                                 prompt_tokens=0, completion_tokens=0, started=started, model=request.get("model"))
+                    self._send_json(429, {"error": {"code": "429", "message": "Rate limit is exceeded."}},
+                                    headers={"Retry-After": str(fake.retry_after),
+                                             "retry-after-ms": str(int(fake.retry_after * 1000))})
+                    return
+
+                messages = request.get("messages", [])
+                content = fake._reply_for(messages)
+                prompt_tokens = sum(estimate_tokens(m.get("content") or "") for m in messages)
+                completion_tokens = estimate_tokens(content)
+                finish_reason = "stop"
+                max_tokens = request.get("max_tokens")
+                if max_tokens and completion_tokens > max_tokens:
+                    # Cut the reply off like the real service does
+                    content = content[:max_tokens * 4]
+                    completion_tokens = max_tokens
+                    finish_reason = "length"
+                delay = fake._sample_latency()
+                if fake.output_tokens_per_sec > 0:
+                    delay += completion_tokens / fake.output_tokens_per_sec
+                if fake.prompt_tokens_per_sec > 0:
+                    delay += prompt_tokens / fake.prompt_tokens_per_sec
+                time.sleep(delay)
+
+                fake._record(status=200, latency=time.perf_counter() - started,
+                             prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                             started=started, max_tokens=max_tokens, model=request.get("model"),
+                             prompt=messages[-1].get("content") if messages else None)
+                self._send_json(200, {
+                    "id": f"chatcmpl-fake-{len(fake.calls)}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "gpt-35-turbo"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": finish_reason,
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens,
+                    },
+                })
+
+        return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a fake Azure OpenAI chat-completions server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="lognormal", choices=["fixed", "uniform", "lognormal"])
+    parser.add_argument("--latency-median", type=float, default=0.5)
+    parser.add_argument("--latency-sigma", type=float, default=0.3)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeAzureOpenAI(latency=args.latency, latency_median=args.latency_median,
+                             latency_sigma=args.latency_sigma, error_rate=args.error_rate,
+                             port=args.port)
+    print(f"🧪 Fake Azure OpenAI listening on {server.url}")
+    print(f"   export AZURE_OPENAI_ENDPOINT={server.url} AZURE_OPENAI_API_KEY=fake")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server._server.server_close()
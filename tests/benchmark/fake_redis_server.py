@@ -0,0 +1,286 @@
+"""
+Local stand-in for a Redis server.
+
+Speaks RESP2/RESP3 and implements the hash, set and sorted-set commands plus
+the WATCH/MULTI/EXEC transactions that pipeline.work_queue.RedisWorkQueue
+uses, so the Redis backend can be tested with the real redis client and
+without a Redis installation. Commands run one at a time under a lock, like Redis.
+"""
+import socketserver
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+
+class CommandError(Exception):
+    pass
+
+
+def _parse_bound(value: str) -> Tuple[float, bool]:
+    """Score bound of ZRANGEBYSCORE/ZCOUNT as (score, exclusive)"""
+    exclusive = value.startswith("(")
+    value = value[1:] if exclusive else value
+    return float({'-inf': '-inf', '+inf': 'inf', 'inf': 'inf'}.get(value, value)), exclusive
+
+
+def _format_score(score: float) -> str:
+    return repr(score) if score != int(score) else str(int(score))
+
+
+class FakeRedis:
+    """
+    In-process Redis stand-in on 127.0.0.1 and a free port.
+
+    Usage:
+        with FakeRedis() as server:
+            queue = RedisWorkQueue(server.url)
+    """
+
+    def __init__(self):
+        self.data: Dict[str, Any] = {}
+        self.versions: Dict[str, int] = {}
+        self.commands: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"redis://{host}:{port}/0"
+
+    def start(self) -> "FakeRedis":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeRedis":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # --- Commands ---
+
+    def _get(self, key: str, kind: type):
+        value = self.data.get(key)
+        if value is None:
+            return kind()
+        if not isinstance(value, kind):
+            raise CommandError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def _store(self, key: str, value):
+        self.versions[key] = self.versions.get(key, 0) + 1
+        if value:
+            self.data[key] = value
+        else:
+            self.data.pop(key, None)
+
+    def execute(self, args: List[str]) -> Any:
+        """Run one command (the caller holds the lock)"""
+        name, args = args[0].upper(), args[1:]
+        self.commands[name] = self.commands.get(name, 0) + 1
+        if name in ("PING",):
+            return "PONG"
+        if name in ("SELECT", "CLIENT"):
+            return "OK"
+        if name == "FLUSHDB":
+            for key in list(self.data):
+                self._store(key, None)
+            return "OK"
+        if name == "DEL":
+            removed = sum(1 for key in args if key in self.data)
+            for key in args:
+                self._store(key, None)
+            return removed
+
+        if name.startswith("H"):
+            key, table = args[0], dict(self._get(args[0], dict))
+            if name == "HGET":
+                return table.get(args[1])
+            if name == "HEXISTS":
+                return int(args[1] in table)
+            if name == "HGETALL":
+                return table
+            if name == "HKEYS":
+                return list(table)
+            if name == "HLEN":
+                return len(table)
+            if name == "HSETNX":
+                if args[1] in table:
+                    return 0
+                table[args[1]] = args[2]
+                self._store(key, table)
+                return 1
+            if name == "HSET":
+                pairs = list(zip(args[1::2], args[2::2]))
+                added = sum(1 for field, _ in pairs if field not in table)
+                table.update(pairs)
+                self._store(key, table)
+                return added
+            if name == "HDEL":
+                removed = sum(1 for field in args[1:] if table.pop(field, None) is not None)
+                self._store(key, table)
+                return removed
+            if name in ("HINCRBY", "HINCRBYFLOAT"):
+                number = float if name == "HINCRBYFLOAT" else int
+                value = number(table.get(args[1], 0)) + number(args[2])
+                table[args[1]] = _format_score(value) if number is float else str(value)
+                self._store(key, table)
+                return table[args[1]] if number is float else value
+
+        if name in ("SADD", "SMEMBERS"):
+            members: Set[str] = set(self._get(args[0], set))
+            if name == "SMEMBERS":
+                return members
+            added = len(set(args[1:]) - members)
+            self._store(args[0], members | set(args[1:]))
+            return added
+
+        if name.startswith("Z"):
+            key, scores = args[0], dict(self._get(args[0], dict))
+            if name == "ZADD":
+                options = set()
+                rest = args[1:]
+                while rest and rest[0].upper() in ("NX", "XX", "CH", "GT", "LT"):
+                    options.add(rest[0].upper())
+                    rest = rest[1:]
+                changed = added = 0
+                for score, member in zip(rest[::2], rest[1::2]):
+                    exists = member in scores
+                    if ("XX" in options and not exists) or ("NX" in options and exists):
+                        continue
+                    changed += int(not exists or scores[member] != float(score))
+                    added += int(not exists)
+                    scores[member] = float(score)
+                self._store(key, scores)
+                return changed if "CH" in options else added
+            if name == "ZREM":
+                removed = sum(1 for member in args[1:] if scores.pop(member, None) is not None)
+                self._store(key, scores)
+                return removed
+            if name == "ZSCORE":
+                return scores.get(args[1])
+            if name == "ZCARD":
+                return len(scores)
+            if name in ("ZRANGEBYSCORE", "ZCOUNT"):
+                (low, low_open), (high, high_open) = _parse_bound(args[1]), _parse_bound(args[2])
+                members = [m for m, s in sorted(scores.items(), key=lambda item: (item[1], item[0]))
+                           if (s > low if low_open else s >= low) and (s < high if high_open else s <= high)]
+                if name == "ZCOUNT":
+                    return len(members)
+                options = [a.upper() for a in args[3:]]
+                if "LIMIT" in options:
+                    at = options.index("LIMIT")
+                    offset, count = int(args[3 + at + 1]), int(args[3 + at + 2])
+                    members = members[offset:] if count < 0 else members[offset:offset + count]
+                return members
+        raise CommandError(f"ERR unknown command '{name}'")
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            disable_nagle_algorithm = True
+
+            def read_command(self) -> Optional[List[str]]:
+                line = self.rfile.readline()
+                if not line:
+                    return None
+                if not line.startswith(b"*"):
+                    return line.decode().split()
+                args = []
+                for _ in range(int(line[1:])):
+                    length = int(self.rfile.readline()[1:])
+                    args.append(self.rfile.read(length + 2)[:-2].decode())
+                return args
+
+            protocol = 2
+
+            def encode(self, value: Any) -> bytes:
+                resp3 = self.protocol == 3
+                if isinstance(value, CommandError):
+                    return f"-{value}\r\n".encode()
+                if value is None:
+                    return b"_\r\n" if resp3 else b"$-1\r\n"
+                if isinstance(value, bool) or isinstance(value, int):
+                    return f":{int(value)}\r\n".encode()
+                if isinstance(value, float):
+                    return f",{_format_score(value)}\r\n".encode() if resp3 else self.encode(_format_score(value))
+                if isinstance(value, dict):
+                    if resp3:
+                        return f"%{len(value)}\r\n".encode() + b"".join(
+                            self.encode(k) + self.encode(v) for k, v in value.items())
+                    return self.encode([item for pair in value.items() for item in pair])
+                if isinstance(value, set):
+                    if resp3:
+                        return f"~{len(value)}\r\n".encode() + b"".join(self.encode(v) for v in sorted(value))
+                    return self.encode(sorted(value))
+                if isinstance(value, list):
+                    return f"*{len(value)}\r\n".encode() + b"".join(self.encode(v) for v in value)
+                if value in ("OK", "PONG", "QUEUED"):
+                    return f"+{value}\r\n".encode()
+                data = str(value).encode()
+                return b"$%d\r\n%s\r\n" % (len(data), data)
+
+            def handle(self):
+                watched: Dict[str, int] = {}
+                queued: Optional[List[List[str]]] = None
+                while True:
+                    args = self.read_command()
+                    if args is None:
+                        return
+                    if not args:
+                        continue
+                    name = args[0].upper()
+                    with server._lock:
+                        if name == "HELLO":
+                            self.protocol = int(args[1]) if len(args) > 1 else self.protocol
+                            reply = {"server": "redis", "version": "7.2.0", "proto": self.protocol,
+                                     "mode": "standalone", "role": "master", "modules": []}
+                        elif name == "WATCH":
+                            watched.update({key: server.versions.get(key, 0) for key in args[1:]})
+                            reply: Any = "OK"
+                        elif name == "UNWATCH":
+                            watched.clear()
+                            reply = "OK"
+                        elif name == "MULTI":
+                            queued = []
+                            reply = "OK"
+                        elif name == "DISCARD":
+                            queued = None
+                            watched.clear()
+                            reply = "OK"
+                        elif name == "EXEC":
+                            if queued is None:
+                                reply = CommandError("ERR EXEC without MULTI")
+                            elif any(server.versions.get(key, 0) != version for key, version in watched.items()):
+                                reply = None
+                                self.wfile.write(b"_\r\n" if self.protocol == 3 else b"*-1\r\n")
+                            else:
+                                reply = []
+                                for command in queued:
+                                    try:
+                                        reply.append(server.execute(command))
+                                    except CommandError as e:
+                                        reply.append(e)
+                            queued = None
+                            watched.clear()
+                            if reply is None:
+                                continue
+                        elif queued is not None:
+                            queued.append(args)
+                            reply = "QUEUED"
+                        else:
+                            try:
+                                reply = server.execute(args)
+                            except CommandError as e:
+                                reply = e
+                    self.wfile.write(self.encode(reply))
+
+        return Handler
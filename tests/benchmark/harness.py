@@ -0,0 +1,112 @@
+"""
+Timing, peak-memory and baseline-regression helpers for the benchmark suite.
+
+Environment variables:
+    BIONIC_BENCHMARK=1          enable the (slow) hot-path benchmarks
+    BENCHMARK_GRID=500x5,...    tickers x years combinations to run
+    BENCHMARK_THRESHOLD=1.0     allowed slowdown vs. baseline (timings vary between machines and runs)
+    BENCHMARK_MEMORY_THRESHOLD=0.25   allowed peak-memory growth vs. baseline
+    BENCHMARK_UPDATE=1          overwrite stored baselines with this run
+
+baselines.json is committed, recorded on the default grid; regenerate it with
+BENCHMARK_UPDATE=1 when the reference machine changes. Grid points without a
+baseline store this run's result instead of being checked.
+"""
+import gc
+import json
+import os
+import statistics
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+DEFAULT_GRID = "500x5"
+FULL_GRID = "500x5,500x30,1000x10,5000x5,5000x30"
+# Timings below this many seconds are not checked (scheduler noise dominates them)
+MIN_CHECKED_SECONDS = 0.01
+
+_baselines_lock = threading.Lock()
+
+
+def benchmarks_enabled() -> bool:
+    return os.getenv("BIONIC_BENCHMARK", "") not in ("", "0")
+
+
+def benchmark_grid() -> List[Tuple[int, int]]:
+    """Parse BENCHMARK_GRID ("full" or "TICKERSxYEARS,...") into (tickers, years) pairs"""
+    spec = os.getenv("BENCHMARK_GRID", DEFAULT_GRID)
+    if spec == "full":
+        spec = FULL_GRID
+    grid = []
+    for item in spec.split(","):
+        tickers, years = item.strip().lower().split("x")
+        grid.append((int(tickers), int(years)))
+    return grid
+
+
+def measure(fn: Callable[[], Any], repeat: int = 3) -> Dict[str, float]:
+    """
+    Time a callable and track its peak Python-heap allocation.
+
+    Timing (median of `repeat`) runs without tracemalloc so tracing overhead
+    does not skew it; peak memory comes from one extra traced run.
+    """
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": statistics.median(timings), "peak_mb": peak / 2 ** 20}
+
+
+def load_baselines(path: str = BASELINES_PATH) -> Dict[str, Dict[str, float]]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def check_regression(name: str, result: Dict[str, float], threshold: float = None,
+                     path: str = BASELINES_PATH) -> List[str]:
+    """
+    Compare a measurement with its stored baseline.
+
+    Missing baselines (or BENCHMARK_UPDATE=1) store the result instead.
+    `threshold` overrides the timing threshold; memory uses BENCHMARK_MEMORY_THRESHOLD.
+    Returns a list of human-readable regression messages; empty means OK.
+    """
+    thresholds = {
+        "seconds": float(os.getenv("BENCHMARK_THRESHOLD", "1.0")) if threshold is None else threshold,
+        "peak_mb": float(os.getenv("BENCHMARK_MEMORY_THRESHOLD", "0.25")),
+    }
+    with _baselines_lock:
+        baselines = load_baselines(path)
+        baseline = baselines.get(name)
+        if baseline is None or os.getenv("BENCHMARK_UPDATE", "") not in ("", "0"):
+            baselines[name] = {key: round(value, 6) for key, value in result.items()}
+            with open(path, "w") as f:
+                json.dump(baselines, f, indent=2, sort_keys=True)
+            return []
+
+    problems = []
+    for key, value in result.items():
+        allowed = thresholds.get(key, thresholds["seconds"])
+        limit = baseline.get(key, value) * (1 + allowed)
+        # Ignore sub-10ms / sub-MB noise
+        floor = MIN_CHECKED_SECONDS if key == "seconds" else 1.0
+        if value > max(limit, floor):
+            problems.append(f"{name}: {key} {value:.4f} exceeds baseline {baseline[key]:.4f} "
+                            f"by more than {allowed:.0%}")
+    return problems
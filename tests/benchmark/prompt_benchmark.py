@@ -0,0 +1,152 @@
+"""
+Prompt size benchmark against the fake Azure OpenAI server.
+
+Guided chat: replays a synthetic conversation twice, once resending the full
+history every turn (the old behaviour) and once through pipeline.chat
+(system prompt + summary + windowed recent turns), and reports prompt tokens
+and latency per turn. The fake server charges `--prompt-rate` tokens/sec of
+prompt processing so latency follows context size.
+
+Prompt prefix: runs FundamentalAgent over a few tickers and reports how much
+of each request is identical to the previous one (the part a provider-side
+prompt cache can reuse).
+
+Usage:
+    python tests/benchmark/prompt_benchmark.py --turns 30
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(BENCHMARK_DIR))
+for path in (PROJECT_ROOT, BENCHMARK_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from agent_benchmark import percentile
+from fake_azure_server import FakeAzureOpenAI, fundamental_reply
+
+USER_TURNS = [
+    "I'm saving for retirement in about twenty years and I'd like steady growth without big swings.",
+    "I work in software so I know the Technology sector, but I'm worried about being too concentrated.",
+    "What would a moderate allocation look like compared to a conservative one, roughly speaking?",
+    "I also care about dividends, healthcare seems like a sensible defensive sector to me.",
+    "How much should fees matter when I compare funds with similar holdings and performance?",
+    "If the market drops twenty percent next year, I think I could hold on, but not much more than that.",
+]
+
+
+def make_client(server):
+    import openai
+    return openai.AzureOpenAI(api_version="2024-12-01-preview", azure_endpoint=server.url,
+                              api_key="fake-key", max_retries=0)
+
+
+def conversation(turns: int) -> List[str]:
+    return [f"{USER_TURNS[i % len(USER_TURNS)]} (turn {i + 1})" for i in range(turns)]
+
+
+def full_history_chat(client, messages: List[str]):
+    """Old behaviour: every turn resends the whole conversation"""
+    from pipeline.chat import GUIDED_SYSTEM_PROMPT
+
+    history = [{"role": "system", "content": GUIDED_SYSTEM_PROMPT}]
+    for text in messages:
+        history.append({"role": "user", "content": text})
+        response = client.chat.completions.create(messages=history, max_tokens=4096, temperature=0.7,
+                                                  model="gpt-35-turbo")
+        history.append({"role": "assistant", "content": response.choices[0].message.content})
+
+
+def windowed_chat(client, messages: List[str], max_history_tokens: int):
+    from pipeline.chat import guided_chat_turn, new_guided_chat
+
+    guided = new_guided_chat()
+    for text in messages:
+        guided_chat_turn(client, guided, text, max_history_tokens=max_history_tokens)
+
+
+def run_chat(server, mode: str, turns: int, max_history_tokens: int) -> Dict[str, Any]:
+    server.reset_stats()
+    client = make_client(server)
+    started = time.perf_counter()
+    if mode == "full":
+        full_history_chat(client, conversation(turns))
+    else:
+        windowed_chat(client, conversation(turns), max_history_tokens)
+    wall = time.perf_counter() - started
+    calls = [c for c in server.calls if c["status"] == 200]
+    # Summary calls are extra requests; charge them to the turn that triggered them
+    prompt_tokens = [c["prompt_tokens"] for c in calls]
+    return {
+        "mode": mode,
+        "turns": turns,
+        "requests": len(calls),
+        "prompt_tokens_total": sum(prompt_tokens),
+        "prompt_tokens_per_turn": round(sum(prompt_tokens) / turns, 1),
+        "prompt_tokens_max": max(prompt_tokens),
+        "latency_p50": round(percentile([c["latency"] for c in calls], 50), 3),
+        "seconds_per_turn": round(wall / turns, 3),
+    }
+
+
+def shared_prefix(a: str, b: str) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def run_prefix(server, tickers: List[str]) -> Dict[str, Any]:
+    """Fraction of each FundamentalAgent request identical to the previous request"""
+    captured: List[str] = []
+
+    def capture(messages):
+        captured.append("".join(m.get("content") or "" for m in messages))
+        return fundamental_reply(messages)
+
+    server.replies.insert(0, ("expert fundamental analyst", capture))
+    os.environ["AZURE_OPENAI_ENDPOINT"] = server.url
+    os.environ["AZURE_OPENAI_API_KEY"] = "fake-key"
+    from agents.fundamental_agent import FundamentalAgent
+
+    agent = FundamentalAgent()
+    context = {"risk_tolerance": "moderate", "investment_horizon": "long_term", "sectors": ["Technology"]}
+    for ticker in tickers:
+        agent.analyze(ticker, context)
+    server.replies.pop(0)
+
+    fractions = [shared_prefix(prev, cur) / len(cur) for prev, cur in zip(captured, captured[1:])]
+    return {
+        "requests": len(captured),
+        "prompt_chars": len(captured[-1]),
+        "shared_prefix_fraction": round(sum(fractions) / len(fractions), 3) if fractions else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prompt size/latency benchmark on the fake Azure server")
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--window", type=int, default=1200, help="max_history_tokens for the windowed chat")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fixed time-to-first-byte in seconds")
+    parser.add_argument("--prompt-rate", type=float, default=5000.0, help="Simulated prompt tokens/sec")
+    parser.add_argument("--tickers", default="AAPL,MSFT,NVDA,JNJ,PFE,XOM,JPM,KO")
+    args = parser.parse_args()
+
+    with FakeAzureOpenAI(latency="fixed", latency_median=args.latency,
+                         prompt_tokens_per_sec=args.prompt_rate) as server:
+        results = {
+            "chat": [run_chat(server, mode, args.turns, args.window) for mode in ("full", "windowed")],
+            "prefix": run_prefix(server, args.tickers.split(",")),
+        }
+    full, windowed = results["chat"]
+    results["reduction"] = {
+        "prompt_tokens": round(1 - windowed["prompt_tokens_total"] / full["prompt_tokens_total"], 3),
+        "seconds_per_turn": round(1 - windowed["seconds_per_turn"] / full["seconds_per_turn"], 3),
+    }
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,102 @@
+"""
+Synthetic market data generators for benchmarks and tests.
+
+Produces frames in the same layout as data/stock_metadata.csv and the long
+(date, ticker, close) price format of data/stock_prices.csv, and small wide
+(date x ticker) price frames with a known factor structure for unit tests
+(import them as tests.benchmark.synthetic).
+"""
+import os
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+SECTORS = [
+    'Technology', 'Healthcare', 'Financials', 'Energy', 'Consumer Discretionary',
+    'Consumer Staples', 'Industrials', 'Materials', 'Utilities', 'Real Estate', 'Communication Services'
+]
+TRADING_DAYS = 252
+
+# Daily (drift, volatility) of the common factors behind make_wide_prices()
+FACTORS = {'tech': (0.0005, 0.012), 'energy': (0.0003, 0.015), 'market': (0.0005, 0.01)}
+
+# Ticker -> (factor loadings, idiosyncratic daily volatility): a tech bloc, an energy bloc and an independent name
+BLOCS = {
+    'AAPL': ({'tech': 1.0}, 0.004),
+    'MSFT': ({'tech': 1.0}, 0.004),
+    'NVDA': ({'tech': 1.5}, 0.008),
+    'XOM': ({'energy': 1.0}, 0.004),
+    'CVX': ({'energy': 1.0}, 0.004),
+    'GOLD': ({}, 0.01),
+}
+
+
+def make_tickers(n_tickers: int) -> list:
+    """Unique 4-letter synthetic tickers (AAAA, AAAB, ...)"""
+    letters = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    idx = np.arange(n_tickers)
+    return ["".join(letters[(idx[i] // 26 ** p) % 26] for p in (3, 2, 1, 0)) for i in range(n_tickers)]
+
+
+def make_metadata(n_tickers: int, seed: int = 0) -> pd.DataFrame:
+    """Metadata frame with the columns of stock_metadata.csv"""
+    rng = np.random.default_rng(seed)
+    tickers = make_tickers(n_tickers)
+    sectors = rng.choice(SECTORS, size=n_tickers)
+    industries = np.char.add(sectors.astype(str), rng.choice([" Services", " Products", " Equipment"], size=n_tickers))
+    return pd.DataFrame({
+        'ticker': tickers,
+        'name': [f"{t} Corporation" for t in tickers],
+        'sector': sectors,
+        'industry': industries,
+        'volatility': rng.uniform(0.1, 0.6, size=n_tickers),
+        'market_cap': rng.lognormal(23, 1.2, size=n_tickers).astype(np.int64),
+        'tags': [f"{s}, {i}" for s, i in zip(sectors, industries)],
+    })
+
+
+def make_wide_prices(loadings: Optional[Dict[str, Tuple[Dict[str, float], float]]] = None, days: int = 320,
+                     seed: int = 5, start: str = '2020-01-01') -> pd.DataFrame:
+    """
+    Wide (business date x ticker) closes whose daily returns are factor moves times loadings plus noise.
+
+    Args:
+        loadings: {ticker: ({factor: loading}, idiosyncratic volatility)} over FACTORS (BLOCS if None)
+        days: Number of business days
+        seed: Random seed
+        start: First date
+    """
+    loadings = BLOCS if loadings is None else loadings
+    rng = np.random.default_rng(seed)
+    moves = {name: rng.normal(drift, vol, days) for name, (drift, vol) in FACTORS.items()}
+    returns = pd.DataFrame({
+        ticker: sum((beta * moves[f] for f, beta in betas.items()), np.zeros(days)) + rng.normal(0, noise, days)
+        for ticker, (betas, noise) in loadings.items()
+    }, index=pd.bdate_range(start=start, periods=days))
+    return 100 * (1 + returns).cumprod()
+
+
+def make_prices(n_tickers: int, n_years: int, seed: int = 0) -> pd.DataFrame:
+    """Long (date, ticker, close) frame of geometric random-walk daily closes"""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end="2024-12-31", periods=n_years * TRADING_DAYS)
+    drift = rng.normal(0.0003, 0.0002, size=n_tickers)
+    vol = rng.uniform(0.008, 0.03, size=n_tickers)
+    log_returns = rng.standard_normal((len(dates), n_tickers)) * vol + drift
+    closes = 100 * np.exp(np.cumsum(log_returns, axis=0))
+    return pd.DataFrame({
+        'date': np.repeat(dates.values, n_tickers),
+        'ticker': np.tile(make_tickers(n_tickers), len(dates)),
+        'close': closes.ravel().round(4),
+    })
+
+
+def write_dataset(directory: str, n_tickers: int, n_years: int, seed: int = 0) -> Tuple[str, str]:
+    """Write synthetic stock_prices.csv and stock_metadata.csv; return their paths"""
+    os.makedirs(directory, exist_ok=True)
+    prices_path = os.path.join(directory, "stock_prices.csv")
+    metadata_path = os.path.join(directory, "stock_metadata.csv")
+    make_prices(n_tickers, n_years, seed).to_csv(prices_path, index=False)
+    make_metadata(n_tickers, seed).to_csv(metadata_path, index=False)
+    return prices_path, metadata_path
@@ -0,0 +1,207 @@
+import json
+import time
+import pytest
+from fake_azure_server import FakeAzureOpenAI
+from agent_benchmark import percentile
+
+openai = pytest.importorskip("openai")
+
+
+@pytest.fixture
+def fake_server():
+    """Fixture providing a zero-latency fake Azure OpenAI server"""
+    with FakeAzureOpenAI(latency="fixed", latency_median=0.0) as server:
+        yield server
+
+
+def make_client(server, max_retries=2):
+    return openai.AzureOpenAI(
+        api_version="2024-12-01-preview",
+        azure_endpoint=server.url,
+        api_key="fake-key",
+        max_retries=max_retries
+    )
+
+
+def test_fundamental_reply_is_json(fake_server):
+    """Test that the fake server answers the FundamentalAgent prompt with canned JSON"""
+    client = make_client(fake_server)
+    response = client.chat.completions.create(
+        messages=[
+            {"role": "system", "content": "You are an expert fundamental analyst."},
+            {"role": "user", "content": "Analyze MSFT based on fundamental factors."}
+        ],
+        max_tokens=4096,
+        model="gpt-35-turbo"
+    )
+    analysis = json.loads(response.choices[0].message.content)
+
+    assert 0 <= analysis["overall_score"] <= 1
+    assert analysis["recommendation"] in ("buy", "hold", "sell")
+    assert response.usage.total_tokens == response.usage.prompt_tokens + response.usage.completion_tokens
+    assert len(fake_server.calls) == 1
+
+
+def test_rate_limit_injection(fake_server):
+    """Test that injected 429s surface as rate limit errors"""
+    fake_server.error_rate = 1.0
+    client = make_client(fake_server, max_retries=0)
+
+    with pytest.raises(openai.RateLimitError):
+        client.chat.completions.create(
+            messages=[{"role": "user", "content": "Hello"}],
+            model="gpt-35-turbo"
+        )
+    assert fake_server.calls[0]["status"] == 429
+
+
+def test_percentile():
+    """Test linear-interpolated percentiles"""
+    assert percentile([], 50) == 0.0
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile([1, 2, 3, 4], 100) == 4
+
+
+def test_agent_records_usage_and_retries_truncated_replies(fake_server, monkeypatch):
+    """Test that BaseAgent records token usage and retries a cut-off reply with the full allowance"""
+    from agents.fundamental_agent import FundamentalAgent
+    from agents.usage import MAX_RESPONSE_TOKENS, track_run
+
+    monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", fake_server.url)
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "fake-key")
+    agent = FundamentalAgent()
+    # Retries are BaseAgent's and the Router's, not the SDK's
+    assert agent.client.max_retries == 0
+
+    with track_run() as run:
+        reply = agent.get_llm_response(agent.system_prompt, "Analyze MSFT based on fundamental factors.",
+                                       max_tokens=10)
+
+    assert json.loads(reply)["recommendation"] in ("buy", "hold", "sell")
+    assert [call["max_tokens"] for call in fake_server.calls] == [10, MAX_RESPONSE_TOKENS]
+    assert run.totals()['calls'] == 2
+    assert run.totals()['completion_tokens'] == sum(call["completion_tokens"] for call in fake_server.calls)
+
+
+def test_analyses_are_shared_across_client_profiles(fake_server, monkeypatch, tmp_path):
+    """Test that clients with different profiles reuse one stored analysis per ticker"""
+    from agents.fundamental_agent import FundamentalAgent
+    from pipeline.analysis_store import AnalysisStore
+
+    monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", fake_server.url)
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "fake-key")
+    agent = FundamentalAgent(store=AnalysisStore(str(tmp_path / "analyses.sqlite3")))
+    profiles = [{"risk_tolerance": risk, "investment_horizon": horizon, "sectors": ["Technology"]}
+                for risk in ("low", "moderate", "high") for horizon in ("short_term", "long_term")]
+
+    results = [{t: agent.analyze(t, profile) for t in ("AAPL", "MSFT", "NVDA")} for profile in profiles]
+
+    assert len(fake_server.calls) == 3
+    assert len({r["AAPL"]["overall_score"] for r in results}) > 1
+    assert {r["AAPL"]["base_score"] for r in results} == {results[0]["AAPL"]["base_score"]}
+
+
+def timed_calls(router, agent, client, n):
+    """Client-observed latency of n routed calls"""
+    latencies = []
+    for i in range(n):
+        started = time.perf_counter()
+        router.complete(agent, "scoring", client, max_tokens=100,
+                        messages=[{"role": "system", "content": "You are an expert fundamental analyst."},
+                                  {"role": "user", "content": f"Analyze T{i} based on fundamental factors."}])
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def test_hedged_requests_cut_tail_latency():
+    """Test that a duplicate request sent after the observed p95 hides straggling responses"""
+    from agents.routing import HEDGE_MIN_SAMPLES, Deployment, Router
+
+    deployments = {"fast": Deployment("fast", "gpt-35-turbo")}
+    results = {}
+    for hedge in (False, True):
+        with FakeAzureOpenAI(latency="fixed", latency_median=0.01, slow_rate=0.04, slow_latency=0.3,
+                             seed=3) as server:
+            router = Router(deployments, hedge=hedge)
+            agent = f"HedgeTest-{hedge}-{time.time()}"
+            client = make_client(server)
+            timed_calls(router, agent, client, HEDGE_MIN_SAMPLES)  # warm-up: learn the p95
+            results[hedge] = (timed_calls(router, agent, client, 60), router.hedges, len(server.calls))
+
+    unhedged, _, _ = results[False]
+    hedged, hedges, calls = results[True]
+    assert percentile(unhedged, 99) > 0.25
+    assert percentile(hedged, 99) < 0.15
+    assert 0 < hedges <= 12 and calls >= HEDGE_MIN_SAMPLES + 60
+
+
+def test_failing_deployment_is_skipped_once_its_circuit_opens(monkeypatch):
+    """Test failover to the next deployment and that an open circuit stops traffic to the failing one"""
+    from agents.routing import Deployment, Router
+
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "fake-key")
+    with FakeAzureOpenAI(latency="fixed", latency_median=0.0, error_rate=1.0) as bad, \
+            FakeAzureOpenAI(latency="fixed", latency_median=0.0) as good:
+        router = Router({"fast": Deployment("fast", "small", endpoint=bad.url),
+                         "large": Deployment("large", "big", endpoint=good.url)},
+                        failure_threshold=2, reset_after=60)
+        timed_calls(router, "BreakerTest", None, 5)
+
+        assert len(bad.calls) == 2
+        assert len(good.calls) == 5
+        assert router.stats()["circuits"] == {"fast": "open", "large": "closed"}
+        assert router.failovers == 2
+
+
+def test_agents_are_routed_by_task(fake_server, monkeypatch):
+    """Test that scoring and allocation calls go to their own deployments"""
+    from agents.fundamental_agent import FundamentalAgent
+    from agents.portfolio_manager import PortfolioManager
+    from agents.routing import Deployment, Router
+
+    monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", fake_server.url)
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "fake-key")
+    router = Router({"fast": Deployment("fast", "small-model"), "large": Deployment("large", "big-model")})
+    analyst, manager = FundamentalAgent(), PortfolioManager()
+    analyst.router = manager.router = router
+
+    analyses = {"AAPL": analyst.analyze("AAPL", {})}
+    manager.analyze(["AAPL"], analyses, {})
+
+    assert [call["model"] for call in fake_server.calls] == ["small-model", "big-model"]
+
+
+def test_pipeline_run_replays_offline_from_a_cassette(monkeypatch, tmp_path):
+    """Test that a recorded pipeline run replays without the server, with original or zero latency"""
+    import agents.cassette as cassette
+    from agents.fundamental_agent import FundamentalAgent
+    from agents.portfolio_manager import PortfolioManager
+    from pipeline.generation import run_portfolio_generation
+
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "fake-key")
+    monkeypatch.setenv("BIONIC_CASSETTE", str(tmp_path / "run.jsonl"))
+    tickers = ["AAPL", "MSFT", "JNJ", "XOM"]
+
+    def run(mode, latency="original"):
+        monkeypatch.setenv("BIONIC_CASSETTE_MODE", mode)
+        monkeypatch.setenv("BIONIC_CASSETTE_LATENCY", latency)
+        monkeypatch.setattr(cassette, "_cassette", None)
+        client = cassette.cassette_client(lambda: make_client(server))
+        started = time.perf_counter()
+        result = run_portfolio_generation(client, FundamentalAgent(), PortfolioManager(), "moderate",
+                                          "long_term", ["Technology"], tickers)
+        return result, time.perf_counter() - started
+
+    with FakeAzureOpenAI(latency="fixed", latency_median=0.1) as server:
+        monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", server.url)
+        recorded, recorded_seconds = run("record")
+    monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", "http://127.0.0.1:9/")  # nothing listens here
+
+    replayed, replayed_seconds = run("replay")
+    instant, instant_seconds = run("replay", "zero")
+
+    assert replayed["portfolio"] == recorded["portfolio"] == instant["portfolio"]
+    assert replayed["analyses"] == recorded["analyses"]
+    assert replayed["usage"]["prompt_tokens"] == recorded["usage"]["prompt_tokens"]
+    assert abs(replayed_seconds - recorded_seconds) < 0.3 * recorded_seconds
+    assert instant_seconds < 0.25 * recorded_seconds
@@ -0,0 +1,137 @@
+import re
+import threading
+import time
+import pytest
+from fake_azure_server import FakeAzureOpenAI
+from fake_redis_server import FakeRedis
+
+redis = pytest.importorskip("redis")
+openai = pytest.importorskip("openai")
+
+import pipeline.work_queue as work_queue  # noqa: E402
+from pipeline.work_queue import RedisWorkQueue, enqueue_rebalance, run_worker  # noqa: E402
+
+
+@pytest.fixture
+def fake_redis():
+    """Fixture providing an empty Redis stand-in"""
+    with FakeRedis() as server:
+        yield server
+
+
+def test_redis_queue_leases_retries_and_keeps_first_result(fake_redis, monkeypatch):
+    """Test lease expiry, retries and idempotent results on the Redis backend"""
+    monkeypatch.setattr(work_queue, "RETRY_DELAY", 0.0)
+    queue = RedisWorkQueue(fake_redis.url)
+    queue.put("analysis", {"ticker": "AAPL"}, task_id="t1", max_attempts=2)
+    queue.put("analysis", {"ticker": "AAPL"}, task_id="t1", max_attempts=2)
+
+    assert queue.lease("w1", lease_seconds=0.05).id == "t1"
+    assert queue.state("t1") == work_queue.LEASED
+    time.sleep(0.06)
+    again = queue.lease("w2", lease_seconds=5)
+    assert again.id == "t1" and again.attempts == 2
+    assert not queue.extend("t1", "w1") and queue.extend("t1", "w2")
+
+    assert queue.complete("t1", "w2", {"score": 1})
+    assert not queue.complete("t1", "w1", {"score": 2})
+    assert queue.result("t1") == {"score": 1}
+
+    queue.put("broken", {}, task_id="t2", max_attempts=1)
+    assert queue.lease("w1").id == "t2"
+    assert not queue.fail("t2", "w1", "bad payload")
+    assert queue.lease("w1") is None
+    assert queue.errors() == {"t2": "bad payload"}
+    assert queue.counts() == {'queued': 0, 'leased': 0, 'done': 1, 'failed': 1}
+    assert queue.worker_stats()["w2"]["tasks"] == 1
+
+
+def test_redis_failure_after_losing_the_lease_is_ignored(fake_redis):
+    """Test that a stalled worker's failure does not release a task another worker has leased"""
+    queue = RedisWorkQueue(fake_redis.url)
+    queue.put("slow", {}, task_id="t1", max_attempts=2)
+    queue.lease("w1", lease_seconds=0.05)
+    time.sleep(0.06)
+    assert queue.lease("w2", lease_seconds=5).attempts == 2
+
+    assert not queue.fail("t1", "w1", "timeout")
+    assert queue.state("t1") == work_queue.LEASED and queue.lease("w3") is None
+    assert queue.extend("t1", "w2") and queue.complete("t1", "w2", "ok")
+    assert queue.errors() == {} and queue.counts() == {'queued': 0, 'leased': 0, 'done': 1, 'failed': 0}
+    assert queue.worker_stats()["w1"]["failures"] == 1
+
+
+def test_redis_workers_run_each_task_once(fake_redis):
+    """Test that workers with their own connections split the queue without duplicates"""
+    RedisWorkQueue(fake_redis.url).put_many(
+        {"kind": "square", "payload": {"n": n}, "task_id": f"sq-{n}"} for n in range(60))
+    seen = []
+
+    def square(payload):
+        seen.append(payload["n"])
+        time.sleep(0.002)
+        return payload["n"] ** 2
+
+    stats = []
+    threads = [threading.Thread(target=lambda i=i: stats.append(
+        run_worker(RedisWorkQueue(fake_redis.url), {"square": square}, worker=f"node{i}")))
+        for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(seen) == list(range(60))
+    assert sum(s["tasks"] for s in stats) == 60 and all(s["duplicates"] == 0 for s in stats)
+    assert sum(w["tasks"] for w in RedisWorkQueue(fake_redis.url).worker_stats().values()) == 60
+
+
+@pytest.fixture
+def fresh_router(monkeypatch):
+    """Fixture giving the test its own process-wide router and usage history"""
+    import agents.routing as routing
+    import agents.usage as usage
+    ledger = usage.UsageLedger(maxlen=2000)
+    monkeypatch.setattr(usage, "GLOBAL_LEDGER", ledger)
+    monkeypatch.setattr(routing, "GLOBAL_LEDGER", ledger)
+    monkeypatch.setattr(routing, "_router", None)
+
+
+def test_rebalance_batch_spread_over_nodes_analyzes_each_ticker_once(fake_redis, fresh_router, monkeypatch,
+                                                                     tmp_path):
+    """Test that nodes with separate analysis stores share analyses through the queue"""
+    from agents.fundamental_agent import FundamentalAgent
+    from agents.portfolio_manager import PortfolioManager
+    from pipeline.analysis_store import AnalysisStore
+
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "fake-key")
+    tickers = ["AAPL", "MSFT", "NVDA", "JNJ", "PFE", "XOM"]
+    clients = [{"client_id": f"c{i}", "risk_tolerance": risk, "investment_horizon": "long_term",
+                "sectors": ["Technology"], "tickers": tickers[i:i + 4]}
+               for i, risk in enumerate(("low", "moderate", "high"))]
+
+    with FakeAzureOpenAI(latency="fixed", latency_median=0.05) as server:
+        monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", server.url)
+        enqueue_rebalance(RedisWorkQueue(fake_redis.url), clients)
+
+        def node(i):
+            queue = RedisWorkQueue(fake_redis.url)
+            agent = FundamentalAgent(store=AnalysisStore(str(tmp_path / f"node{i}" / "analyses.sqlite3")))
+            client = openai.AzureOpenAI(api_version="2024-12-01-preview", azure_endpoint=server.url,
+                                        api_key="fake-key")
+            run_worker(queue, work_queue.rebalance_handlers(queue, client, agent, PortfolioManager()),
+                       worker=f"node{i}")
+
+        threads = [threading.Thread(target=node, args=(i,)) for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    analyzed = [m.group(1) for call in server.calls
+                for m in [re.search(r"Analyze (\S+) based on", call.get("prompt") or "")] if m]
+    queue = RedisWorkQueue(fake_redis.url)
+    assert sorted(analyzed) == sorted(tickers)
+    assert queue.counts()['done'] == len(tickers) + len(clients)
+    assert queue.result(work_queue.portfolio_task_id("c2"))["portfolio"]["portfolio"]
+    assert set(queue.worker_stats()) == {"node0", "node1"}
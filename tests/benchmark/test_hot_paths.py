@@ -0,0 +1,172 @@
+"""
+Micro-benchmarks for the data, screening and engine hot paths.
+
+Skipped unless BIONIC_BENCHMARK=1 (set automatically by
+`run_tests('benchmark')`); see harness.py for the grid/threshold settings.
+Stages whose modules are not importable in this checkout are skipped.
+"""
+import importlib
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data import typed_loader
+from harness import benchmark_grid, benchmarks_enabled, check_regression, measure
+from synthetic import write_dataset
+
+pytestmark = pytest.mark.skipif(not benchmarks_enabled(), reason="set BIONIC_BENCHMARK=1 to run benchmarks")
+
+GRID = benchmark_grid()
+
+
+def optional_module(name):
+    try:
+        return importlib.import_module(name)
+    except ImportError as e:
+        pytest.skip(f"{name} not available: {e}")
+
+
+@pytest.fixture(scope="module", params=GRID, ids=[f"{t}x{y}" for t, y in GRID])
+def dataset(request, tmp_path_factory):
+    """Synthetic dataset on disk plus its loaded frames for one grid point"""
+    n_tickers, n_years = request.param
+    directory = tmp_path_factory.mktemp(f"bench_{n_tickers}x{n_years}")
+    prices_path, metadata_path = write_dataset(str(directory), n_tickers, n_years)
+    stock_data = pd.read_csv(prices_path, parse_dates=['date'])
+    metadata = pd.read_csv(metadata_path)
+    return SimpleNamespace(
+        key=f"{n_tickers}x{n_years}",
+        prices_path=prices_path,
+        metadata_path=metadata_path,
+        stock_data=stock_data,
+        metadata=metadata,
+        tickers=metadata['ticker'].tolist(),
+    )
+
+
+def run_stage(name, dataset, fn, repeat=3):
+    result = measure(fn, repeat=repeat)
+    print(f"{name}[{dataset.key}]: {result['seconds']:.4f}s, peak {result['peak_mb']:.1f} MB")
+    problems = check_regression(f"{name}[{dataset.key}]", result)
+    assert not problems, "\n".join(problems)
+
+
+def test_bench_load_metadata(dataset):
+    """Benchmark reading the metadata CSV"""
+    run_stage("load_metadata", dataset, lambda: pd.read_csv(dataset.metadata_path))
+
+
+def test_bench_load_prices(dataset):
+    """Benchmark reading the long price CSV"""
+    run_stage("load_prices", dataset, lambda: pd.read_csv(dataset.prices_path, parse_dates=['date']), repeat=2)
+
+
+def test_bench_load_prices_typed(dataset):
+    """Benchmark the categorical/float32 price loader"""
+    run_stage("load_prices_typed", dataset, lambda: typed_loader.load_prices(dataset.prices_path), repeat=2)
+
+
+def test_bench_load_metadata_typed(dataset):
+    """Benchmark the categorical metadata loader"""
+    run_stage("load_metadata_typed", dataset, lambda: typed_loader.load_metadata(dataset.metadata_path))
+
+
+def test_bench_pivot_prices(dataset):
+    """Benchmark pivoting long prices into a date x ticker matrix"""
+    run_stage("pivot_prices", dataset,
+              lambda: dataset.stock_data.pivot(index='date', columns='ticker', values='close'))
+
+
+def test_bench_volatility(dataset):
+    """Benchmark annualized volatility for every ticker"""
+    wide = dataset.stock_data.pivot(index='date', columns='ticker', values='close')
+    run_stage("volatility", dataset, lambda: wide.pct_change().std() * np.sqrt(252))
+
+
+def test_bench_factor_snapshot(dataset):
+    """Benchmark the one-pass factor table (momentum, volatility, drawdown, beta)"""
+    from data.factor_snapshot import compute_factors
+    wide = typed_loader.pivot_prices(dataset.stock_data)
+    run_stage("factor_snapshot", dataset, lambda: compute_factors(wide))
+
+
+def test_bench_prescore(dataset):
+    """Benchmark deterministic top-K candidate selection over the whole universe"""
+    from filter.prescore import select_candidates
+    run_stage("prescore", dataset,
+              lambda: select_candidates(dataset.metadata, "moderate", ["Technology", "Healthcare"], k=20))
+
+
+def test_bench_screener(dataset):
+    """Benchmark filter.screener.filter_stocks"""
+    screener = optional_module("filter.screener")
+    request = SimpleNamespace(
+        risk_tolerance="low",
+        investment_horizon="long_term",
+        sectors=["Technology", "Healthcare"],
+        ethical_preferences=[],
+        exclude=[],
+    )
+    run_stage("screener", dataset,
+              lambda: screener.filter_stocks(dataset.stock_data, dataset.metadata, request))
+
+
+def test_bench_backtest(dataset):
+    """Benchmark engine.backtester.backtest_portfolio on a 30-stock portfolio"""
+    backtester = optional_module("engine.backtester")
+    tickers = dataset.tickers[:30]
+    portfolio = {"tickers": tickers, "weights": [1 / len(tickers)] * len(tickers)}
+    run_stage("backtest", dataset, lambda: backtester.backtest_portfolio(portfolio, dataset.stock_data))
+
+
+def test_bench_metrics(dataset):
+    """Benchmark engine.metrics CAGR and Sharpe on an equal-weight portfolio value series"""
+    metrics = optional_module("engine.metrics")
+    wide = dataset.stock_data.pivot(index='date', columns='ticker', values='close')
+    portfolio_value = (wide / wide.iloc[0]).mean(axis=1)
+    run_stage("metrics", dataset, lambda: (metrics.compute_cagr(portfolio_value),
+                                           metrics.compute_sharpe(portfolio_value)))
+
+
+def test_bench_correlation_index(dataset, tmp_path):
+    """Benchmark building the correlation index (co-moments, clustering, neighbour orders)"""
+    from data.correlation_index import update_index
+    wide = typed_loader.pivot_prices(dataset.stock_data)
+    run_stage("correlation_index", dataset, lambda: update_index(wide, str(tmp_path / "index"), force=True))
+
+
+def test_bench_hrp(dataset, tmp_path):
+    """Benchmark an HRP allocation over the whole universe from the cached clustering"""
+    from data.correlation_index import update_index
+    from engine.hrp import hrp_weights
+    index = update_index(typed_loader.pivot_prices(dataset.stock_data), str(tmp_path / "index"))
+    run_stage("hrp", dataset, lambda: hrp_weights(dataset.tickers, index))
+
+
+def test_bench_stress(dataset):
+    """Benchmark 50 scenarios x 1,000 thirty-stock portfolios"""
+    from engine.stress import Scenarios, stress_test
+    rng = np.random.default_rng(0)
+    tickers = dataset.tickers
+    scenarios = Scenarios([f"s{k}" for k in range(50)], ['sector'] * 50, tickers,
+                          rng.normal(-0.05, 0.1, (50, len(tickers))))
+    size = min(30, len(tickers))
+    portfolios = [dict(zip(rng.choice(tickers, size, replace=False), np.full(size, 1 / size))) for _ in range(1000)]
+    run_stage("stress", dataset, lambda: stress_test(portfolios, scenarios))
+
+
+def test_bench_rebalance(dataset):
+    """Benchmark whole-share orders for 1,000 accounts with thirty targets and twenty holdings each"""
+    from engine.rebalance import plan_rebalance
+    rng = np.random.default_rng(0)
+    tickers = [str(t) for t in dataset.tickers]
+    prices = dict(zip(tickers, rng.uniform(5, 500, len(tickers))))
+    size = min(30, len(tickers))
+    accounts = [{'cash': float(rng.uniform(1e3, 1e5)),
+                 'holdings': dict(zip(rng.choice(tickers, min(20, len(tickers)), replace=False).tolist(),
+                                      rng.integers(1, 200, min(20, len(tickers))).tolist())),
+                 'targets': dict(zip(rng.choice(tickers, size, replace=False).tolist(), np.full(size, 1 / size)))}
+                for _ in range(1000)]
+    run_stage("rebalance", dataset, lambda: plan_rebalance(accounts, prices))
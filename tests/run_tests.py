@@ -51,9 +51,24 @@ def get_test_list() -> Dict[str, List[str]]:
                             test_name = line.split('def ')[1].split('(')[0]
                             integration_tests.append(test_name)
     
+    # Get benchmarks
+    benchmark_tests = []
+    benchmark_dir = os.path.join(test_dir, 'benchmark')
+    if os.path.exists(benchmark_dir):
+        for file in os.listdir(benchmark_dir):
+            if file.startswith('test_') and file.endswith('.py'):
+                with open(os.path.join(benchmark_dir, file), 'r') as f:
+                    content = f.read()
+                    # Find all test functions
+                    for line in content.split('\n'):
+                        if line.strip().startswith('def test_'):
+                            test_name = line.split('def ')[1].split('(')[0]
+                            benchmark_tests.append(test_name)
+    
     return {
         "unit": unit_tests,
-        "integration": integration_tests
+        "integration": integration_tests,
+        "benchmark": benchmark_tests
     }
 
 def run_tests(test_type=None):
@@ -61,7 +76,8 @@ def run_tests(test_type=None):
     Run the test suite and return detailed results.
     
     Args:
-        test_type (str, optional): Type of tests to run. Can be 'unit', 'integration', or None for all tests.
+        test_type (str, optional): Type of tests to run. Can be 'unit', 'integration', 'benchmark',
+            or None for all tests. Hot-path benchmarks only run when 'benchmark' is selected.
     
     Returns:
         tuple: (test_results, logs, test_list)
@@ -84,6 +100,8 @@ def run_tests(test_type=None):
         test_path = os.path.join(test_dir, 'unit')
     elif test_type == 'integration':
         test_path = os.path.join(test_dir, 'integration')
+    elif test_type == 'benchmark':
+        test_path = os.path.join(test_dir, 'benchmark')
     else:
         test_path = test_dir
     
@@ -99,8 +117,17 @@ def run_tests(test_type=None):
         '--capture=sys',  # capture stdout/stderr
     ]
     
-    # Run pytest and capture results
-    result = pytest.main(args)
+    # Run pytest and capture results (benchmarks are opt-in via BIONIC_BENCHMARK)
+    previous_benchmark_flag = os.environ.get('BIONIC_BENCHMARK')
+    if test_type == 'benchmark':
+        os.environ['BIONIC_BENCHMARK'] = '1'
+    try:
+        result = pytest.main(args)
+    finally:
+        if previous_benchmark_flag is None:
+            os.environ.pop('BIONIC_BENCHMARK', None)
+        else:
+            os.environ['BIONIC_BENCHMARK'] = previous_benchmark_flag
     
     # Get the captured output
     logs = stdout_capture.getvalue() + stderr_capture.getvalue()
@@ -112,7 +139,10 @@ def run_tests(test_type=None):
     for line in logs.split('\n'):
         if 'test_' in line:
             test_name = line.split('::')[1].strip()
-            test_type = 'unit' if 'unit' in line else 'integration'
+            if 'benchmark' in line:
+                test_type = 'benchmark'
+            else:
+                test_type = 'unit' if 'unit' in line else 'integration'
             
             if 'PASSED' in line:
                 test_results.append(TestResult(
@@ -0,0 +1,73 @@
+import threading
+import time
+from datetime import date, timedelta
+from agents.fundamental_agent import adjust_for_profile
+from pipeline.analysis_store import AnalysisStore, refresh_store
+
+ANALYSIS = {"financial_health": 0.9, "growth_potential": 0.3, "competitive_position": 0.6,
+            "management_quality": 0.6, "overall_score": 0.6, "recommendation": "hold"}
+
+
+class StubAgent:
+    def __init__(self):
+        self.calls = []
+
+    def analyze_ticker(self, ticker):
+        self.calls.append(ticker)
+        time.sleep(0.01)
+        return dict(ANALYSIS)
+
+
+def test_analyses_are_served_while_fresh(tmp_path):
+    """Test that an analysis is returned up to max_age_days after its date and then reported stale"""
+    store = AnalysisStore(str(tmp_path / "analyses.sqlite3"), max_age_days=1)
+    today = date(2024, 5, 10)
+    store.put("AAPL", dict(ANALYSIS), as_of="2024-05-09")
+
+    assert store.get("AAPL", today=today)["as_of"] == "2024-05-09"
+    assert store.get("AAPL", today=today + timedelta(days=1)) is None
+    assert store.stale(["AAPL", "MSFT"], today=today) == ["MSFT"]
+    assert store.prune(keep_days=0, today=today) == 1
+
+
+def test_concurrent_requests_share_one_computation(tmp_path):
+    """Test that parallel get_or_compute calls for a ticker trigger a single analysis"""
+    store = AnalysisStore(str(tmp_path / "analyses.sqlite3"))
+    agent = StubAgent()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(store.get_or_compute("AAPL", agent.analyze_ticker)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert agent.calls == ["AAPL"]
+    assert store.misses == 1 and store.hits == 7
+    assert all(r["as_of"] == date.today().isoformat() for r in results)
+
+
+def test_refresh_only_analyzes_stale_tickers(tmp_path):
+    """Test that a scheduled refresh skips tickers analyzed today"""
+    store = AnalysisStore(str(tmp_path / "analyses.sqlite3"))
+    store.put("AAPL", dict(ANALYSIS))
+    agent = StubAgent()
+
+    result = refresh_store(agent, ["AAPL", "MSFT", "JNJ", "MSFT"], store, max_workers=2)
+
+    assert sorted(agent.calls) == ["JNJ", "MSFT"]
+    assert result["refreshed"] == 2 and result["failed"] == {}
+    assert store.stale(["AAPL", "MSFT", "JNJ"]) == []
+
+
+def test_profile_adjustment_is_deterministic_and_risk_aware():
+    """Test that the shared analysis is re-weighted per profile without touching the original"""
+    low = adjust_for_profile(ANALYSIS, {"risk_tolerance": "low", "investment_horizon": "short_term"})
+    high = adjust_for_profile(ANALYSIS, {"risk_tolerance": "high", "investment_horizon": "long_term"})
+
+    assert low == adjust_for_profile(ANALYSIS, {"risk_tolerance": "low", "investment_horizon": "short_term"})
+    assert low["overall_score"] > high["overall_score"]  # strong balance sheet, weak growth
+    assert low["base_score"] == high["base_score"] == 0.6
+    assert ANALYSIS["overall_score"] == 0.6 and "base_score" not in ANALYSIS
+    assert adjust_for_profile({"recommendation": "hold"}, {}) == {"recommendation": "hold"}
+    assert adjust_for_profile(low, {"risk_tolerance": "high", "investment_horizon": "long_term"}) == high
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import threading
+import time
+import pandas as pd
+from pipeline.api import AdvisorAPI
+
+
+class SlowAgent:
+    """FundamentalAgent stand-in that counts calls and blocks for a while"""
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def analyze(self, ticker, context):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return {"overall_score": 0.5, "ticker": ticker}
+
+
+def post(app, path, body, timeout=None):
+    return app.handle("POST", path, json.dumps(body).encode(), timeout)
+
+
+def test_identical_concurrent_requests_are_coalesced():
+    """Test that duplicate in-flight analyses share one agent call"""
+    agent = SlowAgent()
+    app = AdvisorAPI(fundamental_agent=agent)
+    body = {"tickers": ["AAPL", "MSFT"], "context": {"risk_tolerance": "low"}}
+
+    async def run():
+        return await asyncio.gather(*(post(app, "/analyze", body) for _ in range(5)))
+
+    results = asyncio.run(run())
+
+    assert all(status == 200 for status, _ in results)
+    assert results[0][1]["analyses"]["MSFT"]["ticker"] == "MSFT"
+    assert agent.calls == 2
+    assert app.singleflight.coalesced == 8
+
+
+def test_overload_is_rejected_with_503():
+    """Test that requests beyond the admission limit are shed"""
+    app = AdvisorAPI(fundamental_agent=SlowAgent(), max_concurrent=1, max_waiting=0)
+
+    async def run():
+        return await asyncio.gather(*(
+            post(app, "/analyze", {"tickers": [f"T{i}"], "context": {}}) for i in range(3)
+        ))
+
+    statuses = sorted(status for status, _ in asyncio.run(run()))
+    assert statuses == [200, 503, 503]
+
+
+def test_request_timeout_returns_504():
+    """Test that slow requests time out without failing the server"""
+    app = AdvisorAPI(fundamental_agent=SlowAgent(delay=0.5), request_timeout=0.05)
+
+    status, payload = asyncio.run(post(app, "/analyze", {"tickers": ["AAPL"], "context": {}}))
+
+    assert status == 504
+    assert app.timeouts == 1
+
+
+def test_malformed_or_non_positive_timeouts_are_rejected():
+    """Test that a bad x-timeout header is a 400 instead of an error or a silent default"""
+    app = AdvisorAPI(fundamental_agent=SlowAgent(delay=0))
+    body = {"tickers": ["AAPL"], "context": {}}
+
+    for timeout in (0.0, -1.0, float("nan")):
+        status, payload = asyncio.run(post(app, "/analyze", body, timeout))
+        assert status == 400 and "x-timeout" in payload["error"]
+
+    async def call(header):
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": json.dumps(body).encode()}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": "POST", "path": "/analyze", "headers": [(b"x-timeout", header)]}
+        await app(scope, receive, send)
+        return sent[0]["status"], json.loads(sent[1]["body"])
+
+    assert asyncio.run(call(b"soon"))[0] == 400
+    status, payload = asyncio.run(call(b"5"))
+    assert status == 200 and payload["analyses"]["AAPL"]["ticker"] == "AAPL"
+
+
+def test_screen_and_validation():
+    """Test sector screening and missing-field errors"""
+    metadata = pd.DataFrame({
+        'ticker': ['AAPL', 'XOM', 'MSFT'],
+        'sector': ['Technology', 'Energy', 'Technology'],
+    })
+    app = AdvisorAPI(metadata=metadata)
+
+    status, payload = asyncio.run(post(app, "/screen", {"sectors": ["Technology"]}))
+    assert status == 200
+    assert payload["tickers"] == ["AAPL", "MSFT"]
+
+    status, payload = asyncio.run(post(app, "/allocate", {"tickers": []}))
+    assert status == 400
+    assert "analyses" in payload["error"]
+
+    status, _ = asyncio.run(app.handle("GET", "/nope", b""))
+    assert status == 404
+
+
+def test_screen_with_prescoring():
+    """Test that /screen returns the pre-ranked top K when a risk tolerance is given"""
+    metadata = pd.DataFrame({
+        'ticker': ['AAPL', 'NVDA', 'MSFT'],
+        'sector': ['Technology', 'Technology', 'Technology'],
+        'volatility': [0.25, 0.70, 0.22],
+        'market_cap': [3.0e12, 2.5e12, 3.1e12],
+    })
+    app = AdvisorAPI(metadata=metadata)
+
+    status, payload = asyncio.run(post(app, "/screen", {"sectors": ["Technology"], "risk_tolerance": "low", "k": 2}))
+
+    assert status == 200
+    assert payload["tickers"] == ["MSFT", "AAPL"]
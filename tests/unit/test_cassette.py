@@ -0,0 +1,77 @@
+import json
+import time
+from types import SimpleNamespace
+import pytest
+from agents.cassette import RECORD, REPLAY, Cassette, CassetteMiss, RecordedError
+
+SYSTEM = {"role": "system", "content": "You are an expert fundamental analyst. " * 20}
+
+
+class StubClient:
+    """Chat client answering with the user prompt reversed; fails once for 'FLAKY'"""
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, messages, **params):
+        self.calls += 1
+        prompt = messages[-1]["content"]
+        if prompt == "FLAKY" and self.calls == 1:
+            raise RuntimeError("Error code: 429 - Rate limit is exceeded.")
+        time.sleep(0.02)
+        return SimpleNamespace(
+            id=f"c{self.calls}", model=params.get("model"),
+            choices=[SimpleNamespace(finish_reason="stop", message=SimpleNamespace(content=prompt[::-1]))],
+            usage=SimpleNamespace(prompt_tokens=len(prompt), completion_tokens=3),
+        )
+
+
+def ask(client, prompt, max_tokens=100):
+    return client.chat.completions.create(messages=[SYSTEM, {"role": "user", "content": prompt}],
+                                          max_tokens=max_tokens, model="gpt-35-turbo")
+
+
+def test_replay_returns_recorded_responses_offline(tmp_path):
+    """Test that a recorded session replays identically without a client, in order per request"""
+    path = str(tmp_path / "run.jsonl")
+    recorder = Cassette(path, RECORD).wrap(StubClient())
+    recorded = [ask(recorder, p).choices[0].message.content for p in ("AAPL", "MSFT", "AAPL")]
+
+    player = Cassette(path, REPLAY, latency_scale=0).wrap(None)
+    replayed = [ask(player, p, max_tokens=4096) for p in ("AAPL", "MSFT", "AAPL", "AAPL")]
+
+    assert [r.choices[0].message.content for r in replayed] == recorded + ["LPAA"]
+    assert replayed[1].usage.prompt_tokens == 4 and replayed[1].usage.total_tokens == 7
+    with pytest.raises(CassetteMiss):
+        ask(player, "NVDA")
+
+
+def test_cassette_stores_each_prompt_text_once(tmp_path):
+    """Test that repeated system prompts are written as a single text blob"""
+    path = tmp_path / "run.jsonl"
+    recorder = Cassette(str(path), RECORD).wrap(StubClient())
+    for ticker in ("AAPL", "MSFT", "NVDA"):
+        ask(recorder, ticker)
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    texts = [line for line in lines if "text" in line]
+    assert len(texts) == 4  # system prompt + three user prompts
+    assert Cassette(str(path)).summary()["models"] == {
+        "gpt-35-turbo": {"calls": 3, "errors": 0, "latency": pytest.approx(0.06, abs=0.05)}}
+
+
+def test_errors_and_latency_are_replayed(tmp_path):
+    """Test that recorded API errors are raised again and original latency is reproduced"""
+    path = str(tmp_path / "run.jsonl")
+    recorder = Cassette(path, RECORD).wrap(StubClient())
+    with pytest.raises(RuntimeError):
+        ask(recorder, "FLAKY")
+    ask(recorder, "FLAKY")
+
+    player = Cassette(path, REPLAY, latency_scale=1.0).wrap(None)
+    with pytest.raises(RecordedError, match="429"):
+        ask(player, "FLAKY")
+    started = time.perf_counter()
+    assert ask(player, "FLAKY").choices[0].message.content == "YKALF"
+    assert time.perf_counter() - started >= 0.015
@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+from pipeline.chat import (
+    GUIDED_SYSTEM_PROMPT,
+    build_context,
+    estimate_tokens,
+    guided_chat_turn,
+    new_guided_chat,
+    parse_preferences
+)
+
+REPLY = 'Sounds good.\n<preferences>\n{"risk_tolerance": "low", "investment_horizon": null, "sectors": []}\n</preferences>'
+
+
+class StubClient:
+    """Chat client recording each request's messages"""
+
+    def __init__(self):
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, messages, **kwargs):
+        self.requests.append(messages)
+        summary = "Summarize the conversation" in messages[0]['content']
+        content = "Client prefers low risk." if summary else REPLY
+        return SimpleNamespace(
+            usage=SimpleNamespace(prompt_tokens=sum(estimate_tokens(m['content']) for m in messages),
+                                  completion_tokens=estimate_tokens(content)),
+            choices=[SimpleNamespace(finish_reason='stop', message=SimpleNamespace(content=content))],
+        )
+
+
+def test_context_is_capped_and_keeps_the_system_prompt_first():
+    """Test that long conversations are summarized and each request stays within the window"""
+    client = StubClient()
+    guided = new_guided_chat()
+    for i in range(20):
+        guided_chat_turn(client, guided, f"message {i} " + "x" * 400, max_history_tokens=300, keep_last=2)
+
+    chat_requests = [r for r in client.requests if r[0]['content'] == GUIDED_SYSTEM_PROMPT]
+    assert len(chat_requests) == 20
+    assert len(client.requests) > 20  # some summarization calls
+    assert guided['summary'] == "Client prefers low risk."
+    assert len(guided['messages']) == 41  # full history kept for display
+
+    last = chat_requests[-1]
+    assert last[1]['content'].startswith("Summary of the earlier conversation")
+    assert last[-1]['content'].startswith("message 19")
+    history_tokens = sum(estimate_tokens(m['content']) for m in last[2:])
+    assert history_tokens <= 300 + estimate_tokens(last[-1]['content'])
+    assert guided['preferences'] == {"risk_tolerance": "low", "investment_horizon": None, "sectors": []}
+
+
+def test_short_conversations_are_sent_unchanged():
+    """Test that nothing is summarized or dropped while the history fits the window"""
+    client = StubClient()
+    guided = new_guided_chat()
+    guided_chat_turn(client, guided, "I want low risk")
+    guided_chat_turn(client, guided, "Technology please")
+
+    assert len(client.requests) == 2
+    assert client.requests[-1] == build_context(guided)[:-1]
+    assert guided['summary'] is None
+
+
+def test_parse_preferences_ignores_empty_or_malformed_blocks():
+    """Test that only a non-empty preferences JSON block is returned"""
+    assert parse_preferences(REPLY)['risk_tolerance'] == "low"
+    assert parse_preferences("no block here") is None
+    assert parse_preferences("<preferences>{not json}</preferences>") is None
+    assert parse_preferences('<preferences>{"risk_tolerance": null, "sectors": []}</preferences>') is None
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+from data.correlation_index import (CorrelationIndex, compute_moments, correlation_from_moments, cut_tree,
+                                    daily_returns, leaf_order, linkage, refresh_index, update_index,
+                                    volatility_from_moments)
+from tests.benchmark.synthetic import make_wide_prices
+
+
+def test_correlation_matches_pandas_with_missing_prices():
+    """Test that the moment-based correlation and volatility equal pairwise-complete pandas results"""
+    prices = make_wide_prices()
+    prices.iloc[40:90, 2] = np.nan
+    returns = daily_returns(prices)
+    moments = compute_moments(returns.to_numpy())
+
+    expected = returns.corr(min_periods=2).to_numpy()
+    assert correlation_from_moments(moments) == pytest.approx(expected, abs=1e-9)
+    expected_vol = returns.std().to_numpy() * np.sqrt(252)
+    assert volatility_from_moments(moments) == pytest.approx(expected_vol, rel=1e-9)
+    # Too little overlap: treated as uncorrelated
+    assert correlation_from_moments(moments, min_overlap=10 ** 6)[0, 1] == 0.0
+
+
+@pytest.mark.parametrize("method", ["single", "average"])
+def test_clustering_groups_correlated_blocs(method):
+    """Test that the linkage puts each bloc in one cluster and lays the blocs out contiguously"""
+    returns = daily_returns(make_wide_prices())
+    correlation = correlation_from_moments(compute_moments(returns.to_numpy()))
+    links = linkage(np.sqrt((1 - correlation) / 2), method)
+
+    assert links.shape == (5, 4) and links[-1, 3] == 6
+    assert np.all(np.diff(links[:, 2]) >= 0)
+    labels = dict(zip(returns.columns, cut_tree(links, 3)))
+    assert labels['AAPL'] == labels['MSFT'] == labels['NVDA']
+    assert labels['XOM'] == labels['CVX'] != labels['AAPL']
+    assert len({labels['GOLD'], labels['AAPL'], labels['XOM']}) == 3
+    order = [returns.columns[i] for i in leaf_order(links)]
+    assert abs(order.index('XOM') - order.index('CVX')) == 1
+    assert sorted(order) == sorted(returns.columns)
+
+
+def test_index_queries(tmp_path):
+    """Test k-nearest, k-farthest, diversifier and cluster lookups on a stored index"""
+    index = update_index(make_wide_prices(), str(tmp_path / "index"))
+
+    assert len(index) == 6 and 'AAPL' in index and index.as_of == '2021-03-23'
+    assert index.nearest('AAPL', k=2).index.tolist() == ['MSFT', 'NVDA']
+    assert index.nearest('AAPL', k=1, universe=['XOM', 'CVX', 'NVDA']).index.tolist() == ['NVDA']
+    assert index.farthest('AAPL', k=3).index[0] in ('GOLD', 'XOM', 'CVX')
+    assert index.nearest('NOPE').empty
+
+    diversifiers = index.diversifiers({'AAPL': 0.5, 'MSFT': 0.5}, k=3)
+    assert set(diversifiers.index) == {'GOLD', 'XOM', 'CVX'}
+    assert diversifiers.is_monotonic_increasing
+    assert index.diversifiers(['AAPL', 'MSFT'], k=1, universe=['NVDA', 'XOM']).index.tolist() == ['XOM']
+    assert index.portfolio_correlation(['AAPL'])[index.ticker_index['AAPL']] == pytest.approx(1.0, abs=1e-6)
+
+    clusters = index.clusters(3, ['XOM', 'CVX', 'GOLD'])
+    assert clusters['XOM'] == clusters['CVX'] != clusters['GOLD']
+    assert index.matrix(['AAPL', 'MSFT']).shape == (2, 2)
+
+
+def test_incremental_update_matches_full_rebuild(tmp_path):
+    """Test that rolling the window forward by a few days gives the same index as recomputing it"""
+    prices = make_wide_prices(days=330)
+    directory = str(tmp_path / "index")
+
+    first = update_index(prices.iloc[:320], directory, window=252)
+    assert first.manifest['update'] == 'full'
+    rolled = update_index(prices, directory, window=252)
+    assert rolled.manifest['update'] == 'incremental'
+    assert (rolled.manifest['added_days'], rolled.manifest['removed_days']) == (10, 10)
+
+    full = update_index(prices, str(tmp_path / "full"), window=252)
+    assert np.asarray(rolled.correlation) == pytest.approx(np.asarray(full.correlation), abs=1e-6)
+    assert rolled.volatility == pytest.approx(full.volatility, rel=1e-5)
+    assert rolled.leaf_order.tolist() == full.leaf_order.tolist()
+
+    # A different universe cannot be rolled forward
+    assert update_index(prices.drop(columns='GOLD'), directory, window=252).manifest['update'] == 'full'
+
+
+def test_refresh_skips_unchanged_prices(tmp_path):
+    """Test that the nightly refresh only updates when the price file changed"""
+    long = make_wide_prices().stack().rename('close').reset_index()
+    long.columns = ['date', 'ticker', 'close']
+    prices_path = tmp_path / "stock_prices.csv"
+    long.to_csv(prices_path, index=False)
+    directory = str(tmp_path / "index")
+
+    first = refresh_index(str(prices_path), directory)
+    marker = (tmp_path / "index" / "correlation.npy").stat().st_mtime_ns
+    second = refresh_index(str(prices_path), directory)
+
+    assert isinstance(second, CorrelationIndex) and len(first) == len(second) == 6
+    assert (tmp_path / "index" / "correlation.npy").stat().st_mtime_ns == marker
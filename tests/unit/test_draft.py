@@ -0,0 +1,125 @@
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+from pipeline.draft import cap_weights, draft_portfolio
+from pipeline.generation import collect_progress, run_portfolio_generation
+
+
+def test_cap_weights_normalizes_and_caps():
+    """Test that capped weights sum to one and spread the excess pro rata"""
+    weights = cap_weights({'A': 10.0, 'B': 1.0, 'C': 1.0, 'D': 2.0, 'E': 0.0}, cap=0.4)
+
+    assert set(weights) == {'A', 'B', 'C', 'D'}
+    assert sum(weights.values()) == pytest.approx(1.0)
+    assert weights['A'] == pytest.approx(0.4)
+    assert weights['D'] == pytest.approx(2 * weights['B'])
+
+
+def test_draft_portfolio_is_deterministic_and_skips_sells():
+    """Test that the draft weights follow scores, drop sells and do not depend on input order"""
+    analyses = {
+        'AAPL': {'overall_score': 0.9, 'financial_health': 0.9, 'recommendation': 'buy'},
+        'MSFT': {'overall_score': 0.7, 'financial_health': 0.8, 'recommendation': 'hold'},
+        'XOM': {'overall_score': 0.8, 'financial_health': 0.4, 'recommendation': 'sell'},
+        'T': {'overall_score': 0.5, 'financial_health': 0.5, 'recommendation': 'buy'},
+        'BAD': {'overall_score': 'n/a'},
+    }
+    draft = draft_portfolio(analyses, {'risk_tolerance': 'low'}, total=10, max_weight=0.6)
+    reversed_draft = draft_portfolio(dict(reversed(list(analyses.items()))), {'risk_tolerance': 'low'}, total=10,
+                                     max_weight=0.6)
+
+    assert draft == reversed_draft
+    assert draft['draft'] is True and draft['based_on'] == {'analyses': 5, 'total': 10}
+    assert [p['ticker'] for p in draft['portfolio']] == ['AAPL', 'MSFT', 'T']
+    assert sum(p['weight'] for p in draft['portfolio']) == pytest.approx(1.0, abs=1e-3)
+
+
+class FakeCompletions:
+    def create(self, **kwargs):
+        message = SimpleNamespace(content='{"risk_tolerance": "moderate", "sectors": []}')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason='stop')], usage=None)
+
+
+class StaggeredAgent:
+    """Analyses take longer the later the ticker; allocation records when it started"""
+    def __init__(self, delays):
+        self.delays = delays
+        self.portfolio_started = None
+        self.max_parallel = 0
+        self._running = 0
+        self._lock = threading.Lock()
+
+    def analyze(self, *args, **kwargs):
+        if isinstance(args[0], str):
+            with self._lock:
+                self._running += 1
+                self.max_parallel = max(self.max_parallel, self._running)
+            time.sleep(self.delays[args[0]])
+            with self._lock:
+                self._running -= 1
+            return {"overall_score": 0.5 + 0.1 * len(args[0]), "recommendation": "buy"}
+        self.portfolio_started = time.perf_counter()
+        return {"portfolio": [{"ticker": t, "weight": 1 / len(args[0])} for t in args[0]]}
+
+
+def test_draft_is_emitted_before_the_slow_analyses_finish():
+    """Test that a draft lands at the fraction threshold and the final allocation keeps ticker order"""
+    agent = StaggeredAgent({'A': 0.01, 'BB': 0.01, 'CCC': 0.3, 'DDDD': 0.3})
+    events = []
+
+    def progress(event, payload):
+        events.append({"event": event, "payload": payload, "at": time.perf_counter()})
+
+    result = run_portfolio_generation(
+        SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions())), agent, agent,
+        "moderate", "long_term", [], ['A', 'BB', 'CCC', 'DDDD'], progress=progress,
+        max_concurrency=4, draft_fraction=0.5
+    )
+
+    draft_event = next(e for e in events if e["event"] == "draft")
+    assert draft_event["at"] < agent.portfolio_started - 0.2
+    assert draft_event["payload"]["based_on"] == {"analyses": 2, "total": 4}
+    assert agent.max_parallel == 4
+    assert list(result['analyses']) == ['A', 'BB', 'CCC', 'DDDD']
+    assert collect_progress(events)['draft'] == result['draft']
+
+
+def test_draft_after_time_threshold():
+    """Test that the time threshold emits a draft even while analyses are still running"""
+    agent = StaggeredAgent({'A': 0.01, 'BB': 0.4})
+    events = []
+
+    run_portfolio_generation(
+        SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions())), agent, agent,
+        "moderate", "long_term", [], ['A', 'BB'], progress=lambda e, p: events.append(e),
+        max_concurrency=2, draft_after=0.1
+    )
+
+    assert events.index("draft") < events.index("portfolio")
+    assert events.count("analysis") == 2
+
+
+def test_expired_draft_window_waits_instead_of_spinning(monkeypatch):
+    """Test that once the draft window has passed with nothing analyzed, the loop blocks for the first analysis"""
+    import pipeline.generation as generation
+    calls = []
+
+    def counting_wait(*args, **kwargs):
+        calls.append(kwargs.get("timeout"))
+        return generation_wait(*args, **kwargs)
+
+    generation_wait = generation.wait
+    monkeypatch.setattr(generation, "wait", counting_wait)
+    agent = StaggeredAgent({'A': 0.2, 'BB': 0.3})
+    events = []
+
+    run_portfolio_generation(
+        SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions())), agent, agent,
+        "moderate", "long_term", [], ['A', 'BB'], progress=lambda e, p: events.append(e),
+        max_concurrency=2, draft_after=0.01
+    )
+
+    assert len(calls) <= 3 and calls[-1] is None
+    assert events.index("draft") < events.index("portfolio")
+
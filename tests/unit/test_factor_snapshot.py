@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from data.factor_snapshot import FactorSnapshot, compute_factors, refresh_snapshot, write_snapshot
+from tests.benchmark.synthetic import make_wide_prices as make_factor_prices
+
+
+# A market index and two names loading on it at half and twice its moves
+MARKET = {'CALM': ({'market': 0.5}, 0.002), 'MKT': ({'market': 1.0}, 0.0), 'WILD': ({'market': 2.0}, 0.02)}
+
+
+def make_wide_prices(days=300):
+    return make_factor_prices(MARKET, days=days, seed=3)
+
+
+def test_compute_factors_matches_direct_calculation():
+    """Test that vectorized factors agree with per-ticker pandas calculations"""
+    prices = make_wide_prices()
+    factors = compute_factors(prices, benchmark='MKT')
+
+    year = prices.iloc[-253:]
+    returns = year.pct_change().iloc[1:]
+    expected_vol = returns.std() * np.sqrt(252)
+    expected_drawdown = (year / year.cummax() - 1).min()
+    expected_momentum = prices.iloc[-22] / prices.iloc[-253] - 1
+
+    assert factors['volatility_1y'].to_numpy() == pytest.approx(expected_vol.to_numpy(), rel=1e-4)
+    assert factors['max_drawdown_1y'].to_numpy() == pytest.approx(expected_drawdown.to_numpy(), rel=1e-4)
+    assert factors['momentum_12_1'].to_numpy() == pytest.approx(expected_momentum.to_numpy(), rel=1e-4)
+    assert factors.loc['MKT', 'beta_1y'] == pytest.approx(1.0, rel=1e-4)
+    assert factors.loc['CALM', 'beta_1y'] < 1 < factors.loc['WILD', 'beta_1y']
+    assert factors['risk_bucket'].tolist() == [0, 1, 2]
+
+
+def test_snapshot_round_trip_and_ranking(tmp_path):
+    """Test that the persisted snapshot supports row lookups, risk filtering and ranking"""
+    factors = compute_factors(make_wide_prices())
+    snapshot = FactorSnapshot(write_snapshot(factors, str(tmp_path / "snapshot"), as_of='2021-02-22'))
+
+    assert snapshot.as_of == '2021-02-22'
+    assert snapshot.row('WILD')['volatility_1y'] == pytest.approx(float(factors.loc['WILD', 'volatility_1y']))
+    assert snapshot.rank('volatility_1y') == ['WILD', 'MKT', 'CALM']
+    assert snapshot.rank('volatility_1y', ascending=True, top_k=1) == ['CALM']
+    assert snapshot.rank('volatility_1y', risk_tolerance='moderate') == ['MKT', 'CALM']
+    assert snapshot.rank('volatility_1y', universe=['CALM', 'WILD', 'NOPE']) == ['WILD', 'CALM']
+    assert list(snapshot.frame(['MKT', 'NOPE']).index) == ['MKT']
+
+
+def test_refresh_skips_unchanged_prices(tmp_path):
+    """Test that the nightly refresh only recomputes when the price file changed"""
+    wide = make_wide_prices()
+    long = wide.stack().rename('close').reset_index()
+    long.columns = ['date', 'ticker', 'close']
+    prices_path = tmp_path / "stock_prices.csv"
+    long.to_csv(prices_path, index=False)
+    directory = str(tmp_path / "snapshot")
+
+    first = refresh_snapshot(str(prices_path), directory)
+    marker = (tmp_path / "snapshot" / "volatility_1y.npy").stat().st_mtime_ns
+    second = refresh_snapshot(str(prices_path), directory)
+
+    assert len(first) == len(second) == 3
+    assert (tmp_path / "snapshot" / "volatility_1y.npy").stat().st_mtime_ns == marker
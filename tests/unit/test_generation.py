@@ -0,0 +1,98 @@
+from datetime import date, timedelta
+from types import SimpleNamespace
+from agents.fundamental_agent import adjust_for_profile
+from pipeline.analysis_store import MAX_AGE_DAYS
+from pipeline.generation import collect_progress, run_portfolio_generation
+
+PROFILES = {
+    "moderate": '{"risk_tolerance": "moderate", "investment_horizon": "long_term", "sectors": []}',
+    "high": '{"risk_tolerance": "high", "investment_horizon": "long_term", "sectors": []}',
+}
+
+
+class ProfileClient:
+    """Returns the profile for the risk level named in the system prompt"""
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, messages, **kwargs):
+        self.calls += 1
+        risk = "high" if "Risk tolerance: high" in messages[0]["content"] else "moderate"
+        message = SimpleNamespace(content=PROFILES[risk])
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason='stop')], usage=None)
+
+
+class RecordingAgent:
+    """Profile-adjusted analyses like FundamentalAgent's, and an equal-weight allocation"""
+    def __init__(self):
+        self.analyzed = []
+        self.allocations = 0
+
+    def analyze(self, *args, **kwargs):
+        if isinstance(args[0], str):
+            self.analyzed.append(args[0])
+            base = {"financial_health": 0.9, "growth_potential": 0.2 + 0.1 * len(args[0]),
+                    "competitive_position": 0.5, "management_quality": 0.5, "overall_score": 0.5,
+                    "recommendation": "buy"}
+            return adjust_for_profile(base, args[1])
+        self.allocations += 1
+        return {"portfolio": [{"ticker": t, "weight": 1 / len(args[0])} for t in args[0]]}
+
+
+def generate(client, agent, risk, tickers, previous=None, progress=None):
+    return run_portfolio_generation(client, agent, agent, risk, "long_term", [], tickers,
+                                    progress=progress, previous=previous)
+
+
+def test_added_ticker_is_the_only_new_analysis():
+    """Test that an incremental run analyzes new tickers only and reuses everything when nothing changed"""
+    client, agent = ProfileClient(), RecordingAgent()
+    first = generate(client, agent, "moderate", ["A", "BB"])
+    events = []
+    second = generate(client, agent, "moderate", ["A", "BB", "CCC"], previous=first,
+                      progress=lambda event, payload: events.append({"event": event, "payload": payload}))
+
+    assert agent.analyzed == ["A", "BB", "CCC"]
+    assert client.calls == 1 and agent.allocations == 2
+    assert second["reused"] == {"profile": True, "analyses": 2, "portfolio": False}
+    assert list(second["analyses"]) == ["A", "BB", "CCC"]
+    assert collect_progress(events)["reused"] == second["reused"]
+
+    third = generate(client, agent, "moderate", ["A", "BB", "CCC"], previous=second)
+    assert client.calls == 1 and agent.allocations == 2 and len(agent.analyzed) == 3
+    assert third["reused"]["portfolio"] and third["portfolio"] == second["portfolio"]
+
+
+def test_risk_change_reweights_analyses_without_reanalyzing():
+    """Test that a new risk tolerance regenerates the profile and allocation but reuses the analyses"""
+    client, agent = ProfileClient(), RecordingAgent()
+    first = generate(client, agent, "moderate", ["A", "BB"])
+    fresh = generate(ProfileClient(), RecordingAgent(), "high", ["A", "BB"])
+
+    changed = generate(client, agent, "high", ["A", "BB"], previous=first)
+
+    assert agent.analyzed == ["A", "BB"]
+    assert client.calls == 2 and agent.allocations == 2
+    assert changed["reused"] == {"profile": False, "analyses": 2, "portfolio": False}
+    assert changed["analyses"] == fresh["analyses"]
+    assert changed["analyses"]["A"]["overall_score"] != first["analyses"]["A"]["overall_score"]
+
+
+def test_stale_previous_analyses_are_redone():
+    """Test that analyses older than the store's freshness window are not reused"""
+    client, agent = ProfileClient(), RecordingAgent()
+    first = generate(client, agent, "moderate", ["A", "BB"])
+    first["inputs"]["as_of"] = (date.today() - timedelta(days=MAX_AGE_DAYS + 1)).isoformat()
+    first["analyses"]["BB"]["as_of"] = date.today().isoformat()
+
+    second = generate(client, agent, "moderate", ["A", "BB"], previous=first)
+
+    assert agent.analyzed == ["A", "BB", "A"]
+    assert second["reused"]["analyses"] == 1 and second["inputs"]["as_of"] == date.today().isoformat()
+
+    # Carried-over analyses without a date keep the date of the run that made them
+    second["inputs"]["as_of"] = (date.today() - timedelta(days=MAX_AGE_DAYS)).isoformat()
+    third = generate(client, agent, "moderate", ["A", "BB"], previous=second)
+    assert third["inputs"]["as_of"] == second["inputs"]["as_of"]
+
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+from data.correlation_index import update_index
+from engine.hrp import hrp_portfolio, hrp_weights, inverse_variance_weights, recursive_bisection
+from tests.benchmark.synthetic import make_wide_prices
+
+
+def reference_bisection(covariance, order):
+    """Recursive bisection as in Lopez de Prado (2016), on pandas objects"""
+    cov = pd.DataFrame(covariance)
+    weights = pd.Series(1.0, index=order)
+    clusters = [list(order)]
+    while clusters:
+        clusters = [c[j:k] for c in clusters for j, k in ((0, len(c) // 2), (len(c) // 2, len(c))) if len(c) > 1]
+        for i in range(0, len(clusters), 2):
+            variances = []
+            for items in (clusters[i], clusters[i + 1]):
+                block = cov.loc[items, items]
+                ivp = 1 / np.diag(block)
+                ivp /= ivp.sum()
+                variances.append(ivp @ block.to_numpy() @ ivp)
+            alpha = 1 - variances[0] / sum(variances)
+            weights[clusters[i]] *= alpha
+            weights[clusters[i + 1]] *= 1 - alpha
+    return weights.sort_index().to_numpy()
+
+
+def test_bisection_matches_reference_implementation():
+    """Test that the level-wise bisection gives the textbook HRP weights"""
+    rng = np.random.default_rng(11)
+    returns = rng.normal(0, 0.01, (300, 9)) + rng.normal(0, 0.01, (300, 1)) * rng.uniform(0, 1, 9)
+    covariance = np.cov(returns, rowvar=False)
+    order = [4, 0, 7, 2, 8, 1, 6, 3, 5]
+
+    weights = recursive_bisection(covariance, order)
+    assert weights == pytest.approx(reference_bisection(covariance, order), rel=1e-12)
+    assert weights.sum() == pytest.approx(1.0)
+    # Uncorrelated assets: HRP reduces to inverse-variance weights
+    diagonal = np.diag([0.04, 0.01, 0.09, 0.16])
+    assert recursive_bisection(diagonal) == pytest.approx(inverse_variance_weights(diagonal))
+
+
+def test_subset_allocation_reuses_universe_clustering(tmp_path):
+    """Test HRP weights for ticker subsets drawn from one stored index"""
+    index = update_index(make_wide_prices(), str(tmp_path / "index"))
+
+    weights = hrp_weights(['AAPL', 'MSFT', 'NVDA', 'XOM', 'GOLD', 'NOPE'], index)
+    assert set(weights.index) == {'AAPL', 'MSFT', 'NVDA', 'XOM', 'GOLD'}
+    assert weights.sum() == pytest.approx(1.0)
+    assert (weights > 0).all() and weights.is_monotonic_decreasing
+    # Three correlated tech names share a risk budget; the independent names get more each
+    assert weights['GOLD'] > weights['AAPL'] and weights['XOM'] > weights['MSFT']
+
+    rows = index.quasi_diagonal(['GOLD', 'CVX', 'AAPL', 'XOM'])
+    order = [t for t in index.tickers[index.leaf_order] if t in ('GOLD', 'CVX', 'AAPL', 'XOM')]
+    assert index.tickers[rows].tolist() == order
+    expected = recursive_bisection(index.covariance(rows))
+    assert hrp_weights(['GOLD', 'CVX', 'AAPL', 'XOM'], index)[index.tickers[rows]].to_numpy() \
+        == pytest.approx(expected)
+
+    portfolio = hrp_portfolio(['XOM', 'CVX', 'NOPE'], index)
+    assert [p['ticker'] for p in portfolio['portfolio']] in (['XOM', 'CVX'], ['CVX', 'XOM'])
+    assert portfolio['missing'] == ['NOPE'] and portfolio['method'] == 'hrp'
+    assert hrp_weights(['NOPE'], index).empty
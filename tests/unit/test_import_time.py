@@ -0,0 +1,68 @@
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Heavy dependencies that must only load at first use
+HEAVY_MODULES = ['openai', 'dotenv', 'yfinance', 'matplotlib', 'streamlit']
+
+# Module -> import-time budget in seconds (scaled by IMPORT_BUDGET_SCALE on slow machines)
+IMPORT_BUDGETS = {
+    'agents': 0.3,
+    'agents.cassette': 0.3,
+    'agents.fundamental_agent': 0.3,
+    'agents.portfolio_manager': 0.3,
+    'agents.routing': 0.3,
+    'agents.usage': 0.3,
+    'pipeline.analysis_store': 0.3,
+    'pipeline.chat': 0.3,
+    'pipeline.generation': 0.3,
+    'pipeline.report': 1.0,
+    'pipeline.jobs': 0.3,
+    'pipeline.work_queue': 0.3,
+    'pipeline.api': 0.3,
+    'data.records': 1.0,
+    'data.sp500_loader': 2.0,
+    'data.typed_loader': 2.0,
+    'data.factor_snapshot': 2.0,
+    'data.correlation_index': 2.0,
+    'filter': 2.0,
+    'filter.prescore': 2.0,
+    'engine': 2.0,
+    'engine.monte_carlo': 2.0,
+    'engine.hrp': 2.0,
+    'engine.stress': 2.0,
+    'engine.rebalance': 2.0,
+}
+
+
+def measure_import(module):
+    """Import a module in a fresh interpreter; return (seconds, heavy modules loaded)"""
+    code = (
+        "import json, sys, time\n"
+        "started = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = time.perf_counter() - started\n"
+        f"print(json.dumps([elapsed, [m for m in {HEAVY_MODULES!r} if m in sys.modules]]))\n"
+    )
+    output = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True,
+                            text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("module", sorted(IMPORT_BUDGETS))
+def test_import_is_lazy_and_within_budget(module):
+    """Test that importing a package stays cheap and does not load the LLM/UI stack"""
+    root = module.split('.')[0]
+    if not os.path.exists(os.path.join(PROJECT_ROOT, root)) or importlib.util.find_spec(root) is None:
+        pytest.skip(f"{root} is not part of this checkout")
+
+    elapsed, heavy = measure_import(module)
+    budget = IMPORT_BUDGETS[module] * float(os.getenv("IMPORT_BUDGET_SCALE", "1"))
+
+    assert heavy == [], f"importing {module} eagerly loaded {heavy}"
+    assert elapsed < budget, f"importing {module} took {elapsed:.3f}s (budget {budget:.3f}s)"
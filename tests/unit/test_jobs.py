@@ -0,0 +1,112 @@
+import subprocess
+import sys
+import threading
+import time
+import pytest
+from pipeline.generation import collect_progress, run_portfolio_generation
+from pipeline.jobs import DONE, FAILED, INTERRUPTED, RUNNING, JobExecutor, JobStore, process_owner
+
+
+@pytest.fixture
+def job_store(tmp_path):
+    """Fixture providing a JobStore in a temporary directory"""
+    return JobStore(str(tmp_path / "jobs.sqlite3"))
+
+
+def test_job_runs_in_background_and_streams_progress(job_store):
+    """Test that a job's progress events and result are persisted"""
+    executor = JobExecutor(job_store)
+
+    def job(params, progress):
+        for i in range(params['n']):
+            progress("step", {"i": i})
+        return {"total": params['n']}
+
+    job_id = executor.submit("test", job, {'n': 3})
+    executor.wait(job_id, timeout=10)
+    executor.shutdown()
+
+    stored = job_store.get(job_id)
+    assert stored['status'] == DONE
+    assert stored['result'] == {"total": 3}
+    events = job_store.events(job_id)
+    assert [e['payload']['i'] for e in events] == [0, 1, 2]
+    assert job_store.events(job_id, after_seq=events[1]['seq'])[0]['payload'] == {"i": 2}
+
+
+def test_failed_job_records_error(job_store):
+    """Test that exceptions mark the job as failed"""
+    executor = JobExecutor(job_store)
+
+    def job(params, progress):
+        raise ValueError("boom")
+
+    job_id = executor.submit("test", job, {})
+    executor.wait(job_id, timeout=10)
+    executor.shutdown()
+
+    stored = job_store.get(job_id)
+    assert stored['status'] == FAILED
+    assert stored['error'] == "boom"
+    assert job_store.events(job_id)[-1]['event'] == "error"
+
+
+def test_stale_jobs_are_marked_interrupted(job_store):
+    """Test that jobs left running by a dead process are flagged on startup, and live ones are not"""
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    host = process_owner().rpartition(":")[0]
+    orphan, live, remote, quiet_remote = (job_store.create("test", {}) for _ in range(4))
+    for job_id in (orphan, live, remote, quiet_remote):
+        job_store.set_status(job_id, RUNNING)
+    with job_store._connect() as conn:
+        conn.execute("UPDATE jobs SET owner = ? WHERE id = ?", (f"{host}:{dead.pid}", orphan))
+        conn.execute("UPDATE jobs SET owner = 'elsewhere:1' WHERE id IN (?, ?)", (remote, quiet_remote))
+        conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time() - 7200, quiet_remote))
+
+    JobExecutor(job_store).shutdown()
+
+    assert job_store.get(orphan)['status'] == INTERRUPTED
+    assert job_store.get(quiet_remote)['status'] == INTERRUPTED
+    assert job_store.get(live)['status'] == RUNNING
+    assert job_store.get(remote)['status'] == RUNNING
+
+
+def test_concurrent_events_get_distinct_sequence_numbers(job_store):
+    """Test that progress events from many threads never collide on seq"""
+    job_id = job_store.create("test", {})
+    threads = [threading.Thread(target=lambda: [job_store.add_event(job_id, "step") for _ in range(20)])
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [e['seq'] for e in job_store.events(job_id)] == list(range(1, 161))
+
+
+def test_generation_progress_can_be_replayed(job_store):
+    """Test that partial generation results can be rebuilt from the event stream"""
+    class FakeCompletions:
+        def create(self, **kwargs):
+            message = type("Message", (), {"content": '{"risk_tolerance": "low", "sectors": []}'})
+            return type("Response", (), {"choices": [type("Choice", (), {"message": message})]})
+
+    class FakeClient:
+        chat = type("Chat", (), {"completions": FakeCompletions()})
+
+    class FakeAgent:
+        def analyze(self, *args):
+            if isinstance(args[0], str):
+                return {"overall_score": 0.5}
+            return {"portfolio": [{"ticker": t, "weight": 0.5} for t in args[0]]}
+
+    job_id = job_store.create("portfolio_generation", {})
+    run_portfolio_generation(FakeClient(), FakeAgent(), FakeAgent(), "low", "long_term", [], ["AAPL", "MSFT"],
+                             progress=lambda event, payload: job_store.add_event(job_id, event, payload))
+
+    progress = collect_progress(job_store.events(job_id))
+    assert progress['profile']['risk_tolerance'] == "low"
+    assert set(progress['analyses']) == {"AAPL", "MSFT"}
+    assert progress['stage'] == "portfolio"
+    assert len(progress['portfolio']['portfolio']) == 2
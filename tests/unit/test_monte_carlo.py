@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+from engine.monte_carlo import percentile_table, returns_from_prices, simulate_portfolio
+
+
+def sample_returns(days=500, seed=7):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start='2020-01-01', periods=days, freq='B')
+    noise = rng.normal(0.0, 0.015, (days, 3))
+    # Demeaned noise plus a fixed drift, so every method sees a positive expected return
+    returns = noise - noise.mean(axis=0) + 0.0008
+    return pd.DataFrame(returns, index=dates, columns=['AAPL', 'GOOG', 'XOM'])
+
+
+def test_results_do_not_depend_on_worker_count():
+    """Test that the same seed gives identical results in-process and on a process pool"""
+    returns = sample_returns()
+    weights = {'AAPL': 0.5, 'GOOG': 0.3, 'XOM': 0.2}
+
+    serial = simulate_portfolio(returns, weights, n_paths=3000, batch_size=1000, method='block', max_workers=1)
+    parallel = simulate_portfolio(returns, weights, n_paths=3000, batch_size=1000, method='block', max_workers=2)
+
+    assert serial == parallel
+
+
+@pytest.mark.parametrize("method", ['bootstrap', 'block', 'normal'])
+@pytest.mark.parametrize("rebalance", [True, False])
+def test_percentile_bands_are_ordered(method, rebalance):
+    """Test that every method yields ordered bands and a shrinking loss probability"""
+    result = simulate_portfolio(sample_returns(), {'AAPL': 1, 'GOOG': 1, 'XOM': 1}, horizons_years=(1, 5),
+                                n_paths=2000, method=method, rebalance=rebalance, max_workers=1)
+
+    table = percentile_table(result)
+    assert list(table.index) == [1, 5]
+    assert (table[['p5', 'p25', 'p50', 'p75', 'p95']].diff(axis=1).iloc[:, 1:] >= 0).all().all()
+    assert table.loc[5, 'prob_loss'] <= table.loc[1, 'prob_loss']
+    assert result['weights'] == pytest.approx([1 / 3] * 3, abs=1e-6)
+
+
+def test_returns_from_prices_and_unknown_tickers():
+    """Test that prices convert to returns and tickers without history are dropped"""
+    prices = pd.DataFrame({'AAPL': [100.0, 110.0, 99.0]}, index=pd.date_range('2024-01-01', periods=3))
+    returns = returns_from_prices(prices)
+    assert returns['AAPL'].round(4).tolist() == [0.1, -0.1]
+
+    result = simulate_portfolio(returns, {'AAPL': 0.5, 'MISSING': 0.5}, horizons_years=(1,), n_paths=10,
+                                max_workers=1)
+    assert result['tickers'] == ['AAPL']
+    with pytest.raises(ValueError):
+        simulate_portfolio(returns, {'MISSING': 1.0}, max_workers=1)
+
+
+@pytest.mark.parametrize("kwargs, message", [
+    ({'n_paths': 0}, "n_paths"),
+    ({'n_paths': -5}, "n_paths"),
+    ({'batch_size': 0}, "batch_size"),
+    ({'horizons_years': ()}, "horizons_years"),
+    ({'horizons_years': (0, 1)}, "horizons_years"),
+    ({'horizons_years': (-3,)}, "horizons_years"),
+])
+def test_invalid_path_counts_and_horizons_are_rejected(kwargs, message):
+    """Test that empty or non-positive simulation sizes raise a clear ValueError"""
+    returns = pd.DataFrame({'AAPL': [0.01, -0.01, 0.02]})
+    with pytest.raises(ValueError, match=message):
+        simulate_portfolio(returns, {'AAPL': 1.0}, max_workers=1, **kwargs)
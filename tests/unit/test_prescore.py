@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+from filter.prescore import candidate_budget, diversify, explain, prescore, select_candidates
+
+
+def sample_metadata():
+    return pd.DataFrame({
+        'ticker': ['AAPL', 'MSFT', 'NVDA', 'TINY', 'XOM', 'ZZZ'],
+        'sector': ['Technology', 'Technology', 'Technology', 'Technology', 'Energy', 'Unknown'],
+        'volatility': [0.28, 0.22, 0.60, 0.19, 0.30, 0.20],
+        'market_cap': [3.0e12, 3.1e12, 2.5e12, 1.0e9, 4.0e11, 5.0e9],
+    })
+
+
+def test_prescore_filters_and_orders_deterministically():
+    """Test that sector rules apply and the ranking is stable across calls"""
+    scores = prescore(sample_metadata(), 'low', ['Technology'])
+
+    assert set(scores.index) == {'AAPL', 'MSFT', 'NVDA', 'TINY'}
+    assert scores.index[0] == 'MSFT'
+    # Too volatile for a low-risk client: ranked last despite its size
+    assert scores.index[-1] == 'NVDA'
+    assert scores.equals(prescore(sample_metadata(), 'low', ['Technology']))
+
+
+def test_factors_change_the_ranking():
+    """Test that price-derived factors feed into the score when available"""
+    factors = pd.DataFrame({
+        'volatility_1y': [0.30, 0.30],
+        'momentum_12_1': [0.50, -0.30],
+        'max_drawdown_1y': [-0.10, -0.40],
+        'dollar_volume_3m': [1e9, 1e8],
+    }, index=pd.Index(['TINY', 'AAPL'], name='ticker'))
+
+    without = select_candidates(sample_metadata(), 'high', ['Technology'], k=4)
+    with_factors = select_candidates(sample_metadata(), 'high', ['Technology'], k=4, factors=factors)
+
+    assert with_factors.index('TINY') < without.index('TINY')
+    assert explain(prescore(sample_metadata(), 'high', factors=factors), 'TINY')['momentum'] == 1.0
+
+
+def test_candidate_budget():
+    """Test that K follows the tighter of the latency and cost budgets"""
+    assert candidate_budget(latency_budget_s=40, seconds_per_analysis=4) == 10
+    assert candidate_budget(latency_budget_s=40, seconds_per_analysis=4, concurrency=2, max_k=100) == 20
+    assert candidate_budget(latency_budget_s=40, cost_budget_usd=0.012, seconds_per_analysis=4,
+                            cost_per_analysis_usd=0.002) == 6
+    assert candidate_budget(latency_budget_s=1, seconds_per_analysis=4) == 5
+
+
+@pytest.mark.parametrize("k", [1, 3])
+def test_select_candidates_respects_k_and_exclusions(k):
+    """Test that exactly the top K non-excluded tickers are returned"""
+    tickers = select_candidates(sample_metadata(), 'moderate', None, k=k, exclude=['MSFT'])
+    assert len(tickers) == k
+    assert 'MSFT' not in tickers and 'ZZZ' not in tickers
+
+
+def test_diversify_skips_near_duplicates():
+    """Test that a correlation index pushes near-duplicates of better picks behind diversifiers"""
+    class FakeIndex:
+        tickers = ['AAPL', 'MSFT', 'NVDA', 'XOM']
+        correlation = np.array([[1.0, 0.95, 0.70, 0.10],
+                                [0.95, 1.0, 0.60, 0.20],
+                                [0.70, 0.60, 1.0, 0.00],
+                                [0.10, 0.20, 0.00, 1.0]])
+
+        def __contains__(self, ticker):
+            return ticker in self.tickers
+
+        def rows(self, tickers):
+            return np.array([self.tickers.index(t) for t in tickers if t in self.tickers])
+
+    ranked = ['AAPL', 'MSFT', 'TINY', 'NVDA', 'XOM']
+    assert diversify(ranked, FakeIndex(), 3) == ['AAPL', 'TINY', 'NVDA']
+    assert diversify(ranked, FakeIndex(), 5) == ['AAPL', 'TINY', 'NVDA', 'XOM', 'MSFT']
+    assert diversify(ranked, FakeIndex(), 3, max_correlation=0.5) == ['AAPL', 'TINY', 'XOM']
@@ -0,0 +1,92 @@
+import itertools
+import numpy as np
+import pytest
+from engine.rebalance import objective, plan_rebalance
+
+PRICES = {'AAPL': 100.0, 'MSFT': 50.0, 'XOM': 30.0, 'JNJ': 7.0}
+
+
+def test_targets_become_whole_share_orders_within_cash():
+    """Test that a cash account buys whole shares close to its targets and never overspends"""
+    plan = plan_rebalance([{'account_id': 'a1', 'cash': 10000, 'targets': {'AAPL': 0.5, 'MSFT': 0.5}}], PRICES)[0]
+    assert plan['account_id'] == 'a1'
+    assert plan['shares'] == {'AAPL': 50, 'MSFT': 100} and plan['cash'] == 0.0
+    assert plan['tracking_error'] == pytest.approx(0.0, abs=1e-12)
+
+    plan = plan_rebalance([{'cash': 1000, 'targets': {'AAPL': 0.33, 'MSFT': 0.33, 'XOM': 0.34}}], PRICES,
+                          min_cash=50)[0]
+    assert plan['cash'] >= 50
+    assert all(o['side'] == 'buy' and isinstance(o['shares'], int) for o in plan['orders'])
+    assert sum(o['value'] for o in plan['orders']) == pytest.approx(1000 - plan['cash'])
+
+
+def test_min_trade_lots_and_unpriced_positions():
+    """Test that small drifts are left alone, lots are respected and unpriced holdings are untouched"""
+    account = {'cash': 500, 'holdings': {'AAPL': 48, 'MSFT': 95, 'XOM': 3, 'OLD': 10},
+               'targets': {'AAPL': 0.5, 'MSFT': 0.5}}
+    plan = plan_rebalance([account], PRICES, min_trade=300)[0]
+    orders = {o['ticker']: o for o in plan['orders']}
+    # The XOM position is below the minimum trade but closing it is allowed
+    assert orders['XOM'] == {'ticker': 'XOM', 'side': 'sell', 'shares': 3, 'price': 30.0, 'value': 90.0}
+    assert all(o['value'] >= 300 for t, o in orders.items() if t != 'XOM')
+    assert 'OLD' not in orders and plan['unpriced'] == ['OLD']
+
+    plan = plan_rebalance([{'cash': 10000, 'targets': {'JNJ': 1.0}}], PRICES, lot_sizes={'JNJ': 100})[0]
+    assert plan['shares'] == {'JNJ': 1400}
+
+
+def test_batched_plans_match_single_account_plans():
+    """Test that planning many accounts in one call gives each the plan it would get alone"""
+    rng = np.random.default_rng(8)
+    accounts = [{'account_id': i, 'cash': float(rng.uniform(500, 5000)),
+                 'holdings': {t: int(rng.integers(0, 20)) for t in rng.choice(list(PRICES), 2, replace=False)},
+                 'targets': dict(zip(PRICES, rng.dirichlet(np.ones(4))))} for i in range(25)]
+    batched = plan_rebalance(accounts, PRICES)
+    assert batched == [plan_rebalance([account], PRICES)[0] for account in accounts]
+    assert all(plan['cash'] >= -1e-9 for plan in batched)
+
+    portfolio = {'portfolio': [{'ticker': 'AAPL', 'weight': 0.6}, {'ticker': 'XOM', 'weight': 0.4}]}
+    assert plan_rebalance([{'cash': 1000, 'targets': portfolio}], PRICES)[0]['shares'] == {'AAPL': 6, 'XOM': 13}
+
+
+def brute_force(account, min_trade):
+    """Best feasible objective over every whole-share combination near the targets"""
+    value = account['cash'] + sum(account['holdings'].get(t, 0) * p for t, p in PRICES.items())
+    tickers = list(PRICES)
+    ranges = [range(0, int(value * account['targets'].get(t, 0) / PRICES[t]) + 5) for t in tickers]
+    best = np.inf
+    for shares in itertools.product(*ranges):
+        trades = [(s - account['holdings'].get(t, 0)) * PRICES[t] for t, s in zip(tickers, shares)]
+        if sum(trades) > account['cash'] + 1e-9:
+            continue
+        if any(0 < abs(v) < min_trade and s > 0 for v, s in zip(trades, shares)):
+            continue
+        weights = [s * PRICES[t] / value for t, s in zip(tickers, shares)]
+        tracking = sum((w - account['targets'].get(t, 0)) ** 2 for t, w in zip(tickers, weights))
+        best = min(best, objective({'tracking_error': np.sqrt(tracking), 'turnover': sum(map(abs, trades)) / value}))
+    return best
+
+
+def test_exact_mode_finds_the_optimum():
+    """Test that the exact solver matches exhaustive search and is never worse than greedy"""
+    rng = np.random.default_rng(3)
+    for _ in range(6):
+        account = {'cash': float(rng.integers(100, 600)),
+                   'holdings': {'XOM': int(rng.integers(0, 4)), 'JNJ': int(rng.integers(0, 10))},
+                   'targets': dict(zip(PRICES, rng.dirichlet(np.ones(4))))}
+        greedy = plan_rebalance([account], PRICES, min_trade=40)[0]
+        exact = plan_rebalance([account], PRICES, min_trade=40, exact=True)[0]
+        assert objective(exact) <= objective(greedy) + 1e-12
+        assert objective(exact) == pytest.approx(brute_force(account, 40), abs=1e-12)
+
+
+def test_accounts_without_priced_tickers():
+    """Test that accounts with nothing priced get an empty plan whatever else is in the batch"""
+    alone = {'account_id': 'z', 'targets': {'Z': 1.0}, 'holdings': {'Y': 4}, 'cash': 1000}
+    for exact in (False, True):
+        assert plan_rebalance([], PRICES, exact=exact) == []
+        plan = plan_rebalance([alone], PRICES, exact=exact)[0]
+        assert plan == {'account_id': 'z', 'orders': [], 'shares': {}, 'weights': {}, 'cash': 1000.0,
+                        'tracking_error': 0.0, 'turnover': 0.0, 'unpriced': ['Y', 'Z']}
+        mixed = plan_rebalance([alone, {'cash': 1000, 'targets': {'AAPL': 1.0}}], PRICES, exact=exact)
+        assert mixed[0] == plan
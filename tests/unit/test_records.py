@@ -0,0 +1,72 @@
+import math
+import numpy as np
+import pandas as pd
+from data.records import (
+    FundamentalAnalysis,
+    PortfolioPosition,
+    StockMetadata,
+    UniverseTable,
+    positions_from_portfolio
+)
+
+
+def make_metadata():
+    return pd.DataFrame({
+        'ticker': ['AAPL', 'XOM', 'MSFT', 'JNJ'],
+        'name': ['Apple', 'Exxon', 'Microsoft', 'Johnson & Johnson'],
+        'sector': ['Technology', 'Energy', 'Technology', 'Healthcare'],
+        'industry': ['Hardware', 'Oil & Gas', 'Software', 'Drug Manufacturers'],
+        'volatility': [0.25, 0.3, 0.22, 0.15],
+        'market_cap': [3e12, 4e11, 3e12, 4e11],
+        'tags': ['Technology, Hardware', 'Energy, Oil & Gas', 'Technology, Software', 'Healthcare, Drugs'],
+    })
+
+
+def test_records_round_trip_agent_dicts():
+    """Test conversion between agent JSON dicts and typed records"""
+    raw = {
+        "financial_health": 0.8, "growth_potential": "0.6", "competitive_position": 0.9,
+        "management_quality": 0.7, "overall_score": 0.75,
+        "key_strengths": ["Brand"], "key_risks": ["Regulation"], "recommendation": "BUY"
+    }
+    analysis = FundamentalAnalysis.from_dict("AAPL", raw)
+
+    assert analysis.growth_potential == 0.6
+    assert analysis.recommendation == "buy"
+    assert analysis.to_dict()["key_risks"] == ["Regulation"]
+    assert not hasattr(analysis, "__dict__")
+
+    partial = FundamentalAnalysis.from_dict("XOM", {"overall_score": 0.4})
+    assert math.isnan(partial.financial_health)
+
+    positions = positions_from_portfolio({"portfolio": [{"ticker": "AAPL", "weight": 0.6}]})
+    assert positions == [PortfolioPosition("AAPL", 0.6, "")]
+
+
+def test_universe_table_is_columnar_and_categorical():
+    """Test that the universe stores compact categorical/float32 columns"""
+    universe = UniverseTable.from_metadata(make_metadata())
+
+    assert len(universe) == 4
+    assert universe.scores.dtype == np.float32
+    assert universe.volatility.dtype == np.float32
+    assert list(universe.sectors) == ['Energy', 'Healthcare', 'Technology']
+    assert universe.metadata('MSFT') == StockMetadata(
+        'MSFT', 'Microsoft', 'Technology', 'Software', float(np.float32(0.22)), 3e12, 'Technology, Software'
+    )
+    assert universe.metadata('NOPE') is None
+
+
+def test_universe_rank_by_score_and_sector():
+    """Test vectorized ranking over analyzed tickers"""
+    universe = UniverseTable.from_metadata(make_metadata())
+    universe.set_analyses({
+        'AAPL': {'overall_score': 0.7, 'recommendation': 'buy'},
+        'MSFT': {'overall_score': 0.9, 'recommendation': 'buy'},
+        'XOM': {'overall_score': 0.8, 'recommendation': 'hold'},
+        'UNKNOWN': {'overall_score': 1.0},
+    })
+
+    assert universe.rank() == ['MSFT', 'XOM', 'AAPL']
+    assert universe.rank(sectors=['Technology']) == ['MSFT', 'AAPL']
+    assert universe.rank(top_k=1) == ['MSFT']
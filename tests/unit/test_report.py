@@ -0,0 +1,97 @@
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+import pytest
+from data.correlation_index import update_index
+from data.records import UniverseTable
+from engine.stress import Scenarios
+from pipeline.report import build_report, portfolio_key
+from tests.benchmark.synthetic import make_wide_prices
+
+PORTFOLIO = {
+    "portfolio": [
+        {"ticker": "AAPL", "weight": 0.6, "rationale": "Quality"},
+        {"ticker": "ZZZZ", "weight": 0.4, "rationale": "Unknown"},
+    ],
+    "key_risks": ["Market drawdown", "Sector concentration"],
+}
+
+
+class StubClient:
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, messages, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(
+            usage=SimpleNamespace(prompt_tokens=40, completion_tokens=20),
+            choices=[SimpleNamespace(finish_reason='stop', message=SimpleNamespace(content="Risks are moderate."))],
+        )
+
+
+def make_universe():
+    return UniverseTable.from_metadata(pd.DataFrame({
+        'ticker': ['AAPL'], 'name': ['Apple'], 'sector': ['Technology'], 'industry': ['Hardware'],
+        'volatility': [0.25], 'market_cap': [3e12], 'tags': ['Technology, Hardware'],
+    }))
+
+
+def test_portfolio_key_depends_on_content_only():
+    """Test that the key ignores dict ordering but changes with any weight"""
+    reordered = {"key_risks": list(PORTFOLIO["key_risks"]),
+                 "portfolio": [dict(reversed(list(p.items()))) for p in PORTFOLIO["portfolio"]]}
+    changed = {**PORTFOLIO, "portfolio": [dict(PORTFOLIO["portfolio"][0], weight=0.5), PORTFOLIO["portfolio"][1]]}
+
+    assert portfolio_key(reordered) == portfolio_key(PORTFOLIO)
+    assert portfolio_key(changed) != portfolio_key(PORTFOLIO)
+
+
+def test_build_report_renders_every_artifact():
+    """Test that the report holds the enriched table, a PNG chart and one risk summary"""
+    client = StubClient()
+    report = build_report(client, PORTFOLIO, make_universe())
+
+    assert report['key'] == portfolio_key(PORTFOLIO)
+    assert report['table'].to_dict('records')[0] == {
+        "Ticker": "AAPL", "Full Name": "Apple", "Sector": "Technology", "Industry": "Hardware", "Weight (%)": "60.00%"
+    }
+    assert report['missing'] == ["ZZZZ"]
+    assert report['chart'].startswith(b"\x89PNG")
+    assert report['risk_summary'] == "Risks are moderate."
+    assert client.calls == 1
+
+
+def test_build_report_skips_the_llm_without_risks():
+    """Test that a draft portfolio (no key risks) needs no LLM call"""
+    client = StubClient()
+    report = build_report(client, {"portfolio": PORTFOLIO["portfolio"], "draft": True}, make_universe())
+
+    assert report['risk_summary'] is None
+    assert client.calls == 0
+
+
+def test_build_report_compares_with_hrp_weights(tmp_path):
+    """Test that the HRP comparison is part of the cached report when a correlation index exists"""
+    index = update_index(make_wide_prices(), str(tmp_path / "index"))
+    portfolio = {"portfolio": [{"ticker": "AAPL", "weight": 0.5}, {"ticker": "MSFT", "weight": 0.3},
+                               {"ticker": "ZZZZ", "weight": 0.2}]}
+
+    hrp = build_report(StubClient(), portfolio, make_universe(), index)['hrp']
+    assert sorted(hrp["Ticker"]) == ["AAPL", "MSFT"]
+    assert hrp["HRP (%)"].sum() == pytest.approx(100, abs=0.02)
+    assert dict(zip(hrp["Ticker"], hrp["Recommended (%)"])) == {"AAPL": 50.0, "MSFT": 30.0}
+    assert build_report(StubClient(), portfolio, make_universe())['hrp'] is None
+
+
+def test_build_report_includes_the_stress_test():
+    """Test that scenario returns of the portfolio are part of the cached report"""
+    scenarios = Scenarios(['tech_selloff', 'oil_spike'], ['sector', 'sector'], ['AAPL', 'XOM'],
+                          np.array([[-0.2, 0.0], [0.0, 0.1]]))
+
+    stress = build_report(StubClient(), PORTFOLIO, make_universe(), scenarios=scenarios)['stress']
+    assert stress["Scenario"].tolist() == ["Tech selloff", "Oil spike"]
+    # ZZZZ is outside the scenarios and takes each scenario's average shock
+    assert stress["Portfolio return (%)"].tolist() == pytest.approx([-0.6 * 20 - 0.4 * 10, 0.4 * 5])
+    assert build_report(StubClient(), PORTFOLIO, make_universe())['stress'] is None
+
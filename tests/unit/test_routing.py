@@ -0,0 +1,106 @@
+import time
+from types import SimpleNamespace
+import pytest
+from agents import usage
+from agents.routing import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, Deployment, Router, load_deployments
+
+
+class StubClient:
+    """Chat client failing for the models in `failing`"""
+
+    def __init__(self, failing=(), empty=()):
+        self.failing = set(failing)
+        self.empty = set(empty)
+        self.models = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **kwargs):
+        self.models.append(model)
+        if model in self.failing:
+            raise RuntimeError("500 Internal Server Error")
+        content = None if model in self.empty else '{}'
+        return SimpleNamespace(
+            usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5),
+            choices=[SimpleNamespace(finish_reason='stop', message=SimpleNamespace(content=content))],
+        )
+
+
+def test_circuit_breaker_opens_and_recovers():
+    """Test closed -> open after repeated failures -> half open after the cool-down -> closed on success"""
+    breaker = CircuitBreaker("fast", failure_threshold=2, reset_after=0.05)
+    breaker.failure()
+    assert breaker.allow() and breaker.state == CLOSED
+    breaker.failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    breaker.failure()
+    assert breaker.state == OPEN
+
+    time.sleep(0.06)
+    assert breaker.available() and breaker.state == OPEN
+    assert breaker.allow() and not breaker.allow()
+    # A trial that never reports back is retried after another cool-down
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == CLOSED
+
+
+def test_router_fails_over_and_falls_back_when_every_circuit_is_open():
+    """Test that a failing deployment is skipped, and still tried when nothing else is left"""
+    client = StubClient(failing={"small"})
+    router = Router({"fast": Deployment("fast", "small"), "large": Deployment("large", "big")},
+                    failure_threshold=1, reset_after=60, hedge=False)
+
+    router.complete("RoutingTest", "scoring", client, messages=[])
+    router.complete("RoutingTest", "scoring", client, messages=[])
+    assert client.models == ["small", "big", "big"]
+
+    only_failing = Router({"fast": Deployment("fast", "small")}, failure_threshold=1, hedge=False)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            only_failing.complete("RoutingTest", "scoring", client, messages=[])
+    assert only_failing.stats()["circuits"] == {"fast": OPEN}
+
+
+def test_empty_response_fails_over():
+    """Test that an empty reply moves on to the next deployment like an error does"""
+    client = StubClient(empty={"small"})
+    router = Router({"fast": Deployment("fast", "small"), "large": Deployment("large", "big")}, hedge=False)
+
+    response = router.complete("RoutingTest", "scoring", client, messages=[])
+    assert response.choices[0].message.content == '{}'
+    assert client.models == ["small", "big"] and router.stats()["failovers"] == 1
+
+
+def test_fallback_routes_do_not_use_up_the_half_open_trial():
+    """Test that a recovered deployment gets its trial call even after routes listing it as fallback ran"""
+    client = StubClient(failing={"big"})
+    router = Router({"fast": Deployment("fast", "small"), "large": Deployment("large", "big")},
+                    failure_threshold=1, reset_after=0.05, hedge=False)
+    router.complete("RoutingTest", "allocation", client, messages=[])
+    assert client.models == ["big", "small"] and router.breakers["large"].state == OPEN
+
+    client.failing = set()
+    time.sleep(0.06)
+    for _ in range(3):
+        router.complete("RoutingTest", "scoring", client, messages=[])
+    assert router.breakers["large"].state == OPEN
+    router.complete("RoutingTest", "allocation", client, messages=[])
+    assert client.models[-1] == "big" and router.breakers["large"].state == CLOSED
+
+
+def test_deployments_are_read_from_the_environment(monkeypatch):
+    """Test BIONIC_DEPLOYMENTS parsing and the single-deployment default"""
+    monkeypatch.delenv("BIONIC_DEPLOYMENTS", raising=False)
+    assert load_deployments() == {"fast": Deployment("fast", "gpt-35-turbo")}
+    monkeypatch.setenv("BIONIC_DEPLOYMENTS", '{"large": {"model": "gpt-4o", "endpoint": "https://x/", '
+                                             '"api_key_env": "LARGE_KEY"}}')
+    assert load_deployments() == {"large": Deployment("large", "gpt-4o", "https://x/", "LARGE_KEY")}
+
+    monkeypatch.setattr(usage, "MODEL_PRICES", dict(usage.MODEL_PRICES))
+    monkeypatch.setenv("BIONIC_DEPLOYMENTS", '{"large": {"model": "big-prod", "price": [0.01, 0.03]}}')
+    Router(hedge=False)
+    assert usage.model_price("big-prod") == (0.01, 0.03)
@@ -0,0 +1,74 @@
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from data.shared_prices import (
+    SharedPriceMatrix,
+    ensure_price_matrix,
+    map_with_prices,
+    materialize_price_matrix
+)
+
+
+def make_prices():
+    dates = pd.date_range(start='2020-01-01', periods=30, freq='B')
+    tickers = ['AAPL', 'GOOG', 'MSFT']
+    return pd.DataFrame({
+        'date': np.repeat(dates, len(tickers)),
+        'ticker': tickers * len(dates),
+        'close': np.arange(len(dates) * len(tickers), dtype=float) + 100.0,
+    })
+
+
+def column_mean(matrix, ticker):
+    return float(matrix.columns([ticker]).mean())
+
+
+def test_materialize_and_attach(tmp_path):
+    """Test that the wide matrix round-trips through the memory-mapped files"""
+    prices = make_prices()
+    directory = materialize_price_matrix(prices, str(tmp_path / "matrix"))
+
+    matrix = SharedPriceMatrix(directory)
+    expected = prices.pivot(index='date', columns='ticker', values='close')
+
+    assert isinstance(matrix.values, np.memmap)
+    assert matrix.shape == (30, 3)
+    assert list(matrix.tickers) == ['AAPL', 'GOOG', 'MSFT']
+    np.testing.assert_allclose(matrix.frame().to_numpy(), expected.to_numpy())
+    assert matrix.frame(['MSFT']).columns.tolist() == ['MSFT']
+
+
+def test_pickle_sends_only_the_path(tmp_path):
+    """Test that pickling re-attaches instead of copying the data"""
+    matrix = SharedPriceMatrix(materialize_price_matrix(make_prices(), str(tmp_path / "matrix")))
+
+    payload = pickle.dumps(matrix)
+
+    assert len(payload) < 500
+    np.testing.assert_array_equal(pickle.loads(payload).values, matrix.values)
+
+
+def test_ensure_rebuilds_when_source_changes(tmp_path):
+    """Test that the matrix is rebuilt only when the price CSV changes"""
+    prices_path = str(tmp_path / "stock_prices.csv")
+    directory = str(tmp_path / "matrix")
+    make_prices().to_csv(prices_path, index=False)
+
+    first = ensure_price_matrix(prices_path, directory)
+    built_at = os.path.getmtime(os.path.join(directory, "prices.f32"))
+    assert ensure_price_matrix(prices_path, directory).shape == first.shape
+    assert os.path.getmtime(os.path.join(directory, "prices.f32")) == built_at
+
+    make_prices().iloc[:30].to_csv(prices_path, index=False)
+    os.utime(prices_path, (built_at + 10, built_at + 10))
+    assert ensure_price_matrix(prices_path, directory).shape == (10, 3)
+
+
+def test_process_pool_workers_share_the_matrix(tmp_path):
+    """Test fan-out over a process pool attached to the same matrix"""
+    matrix = SharedPriceMatrix(materialize_price_matrix(make_prices(), str(tmp_path / "matrix")))
+
+    results = map_with_prices(column_mean, ['AAPL', 'MSFT'], matrix, max_workers=2)
+
+    assert results == [column_mean(matrix, 'AAPL'), column_mean(matrix, 'MSFT')]
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+from engine.stress import (Scenarios, combine_scenarios, default_scenarios, factor_scenarios, historical_scenarios,
+                           loss_table, sector_scenarios, stress_test, weight_matrix)
+from tests.benchmark.synthetic import make_wide_prices as make_factor_prices
+
+
+def make_wide_prices():
+    """Three independent names, and NEW without prices before April"""
+    independent = {ticker: ({}, 0.02) for ticker in ('AAPL', 'MSFT', 'XOM', 'NEW')}
+    prices = make_factor_prices(independent, days=64, seed=2, start='2020-02-03')
+    prices.loc[:'2020-03-31', 'NEW'] = np.nan
+    return prices
+
+
+SECTORS = {'AAPL': 'Technology', 'MSFT': 'Technology', 'XOM': 'Energy', 'NEW': 'Technology'}
+
+
+def test_historical_episodes_replay_stored_prices():
+    """Test buy-and-hold episode returns, sector fill-in for missing prices and skipping uncovered episodes"""
+    prices = make_wide_prices()
+    episodes = {'covid': ('2020-02-19', '2020-03-23'), 'rebound': ('2020-03-24', '2020-04-30'),
+                'gfc': ('2008-09-19', '2009-03-09')}
+    scenarios = historical_scenarios(prices, episodes, sectors=SECTORS)
+
+    assert scenarios.names == ['covid', 'rebound'] and scenarios.kinds == ['historical'] * 2
+    covid = scenarios.frame().loc['covid']
+    expected = prices.loc['2020-03-23'] / prices.loc['2020-02-19'] - 1
+    assert covid[['AAPL', 'MSFT', 'XOM']].to_numpy() == pytest.approx(expected[['AAPL', 'MSFT', 'XOM']].to_numpy())
+    # No prices before April: the technology average stands in
+    assert covid['NEW'] == pytest.approx(expected[['AAPL', 'MSFT']].mean())
+    rebound = scenarios.frame().loc['rebound']
+    assert rebound['NEW'] == pytest.approx(rebound[['AAPL', 'MSFT']].mean())
+
+
+def test_parametric_scenarios_and_combination():
+    """Test sector shocks, beta-scaled market shocks and stacking over the union of tickers"""
+    sectors = sector_scenarios(SECTORS, {'tech': {'Technology': -0.2}, 'oil': {'Energy': 0.1}})
+    assert sectors.frame().loc['tech'].tolist() == [-0.2, -0.2, 0.0, -0.2]
+    betas = pd.DataFrame({'beta_1y': [1.5, np.nan, 0.5]}, index=['AAPL', 'MSFT', 'GLD'])
+    market = factor_scenarios(betas, {'crash': {'beta_1y': -0.2}})
+    assert market.shocks[0] == pytest.approx([-0.3, -0.2, -0.1])
+
+    combined = combine_scenarios(sectors, market)
+    assert combined.names == ['tech', 'oil', 'crash'] and combined.tickers == ['AAPL', 'MSFT', 'XOM', 'NEW', 'GLD']
+    frame = combined.frame()
+    assert frame.loc['tech', 'GLD'] == pytest.approx(-0.6 / 4)
+    assert frame.loc['crash', 'XOM'] == pytest.approx(-0.2)
+
+    metadata = pd.DataFrame({'ticker': list(SECTORS), 'sector': list(SECTORS.values())})
+    defaults = default_scenarios(metadata, betas, make_wide_prices())
+    assert {'sector', 'factor', 'historical'} == set(defaults.kinds)
+
+
+def test_stress_test_matches_per_portfolio_loop():
+    """Test that the batched losses and their distribution equal a per-portfolio calculation"""
+    rng = np.random.default_rng(4)
+    tickers = [f"T{i}" for i in range(40)]
+    scenarios = Scenarios([f"s{k}" for k in range(6)], ['sector'] * 6, tickers, rng.normal(-0.05, 0.1, (6, 40)))
+    portfolios = [dict(zip(rng.choice(tickers, 5, replace=False), rng.dirichlet(np.ones(5)))) for _ in range(200)]
+
+    result = stress_test(portfolios, scenarios)
+    expected = np.array([[-sum(w * scenarios.shocks[k, tickers.index(t)] for t, w in p.items()) for k in range(6)]
+                         for p in portfolios])
+    assert result['losses'] == pytest.approx(expected)
+    assert result['scenarios'][2]['worst'] == pytest.approx(expected[:, 2].max())
+    assert result['scenarios'][2]['percentiles']['50'] == pytest.approx(np.median(expected[:, 2]))
+    assert result['scenarios'][2]['prob_loss'] == pytest.approx((expected[:, 2] > 0).mean())
+    assert list(loss_table(result).columns) == ['kind', 'p5', 'p50', 'p95', 'mean', 'worst', 'prob_loss']
+
+
+def test_portfolio_manager_results_and_unknown_tickers():
+    """Test PortfolioManager-shaped input, and that unknown tickers take the scenario average"""
+    scenarios = Scenarios(['down'], ['sector'], ['AAPL', 'XOM'], np.array([[-0.2, 0.0]]))
+    portfolio = {'portfolio': [{'ticker': 'AAPL', 'weight': 0.5}, {'ticker': 'ZZZ', 'weight': 0.3}]}
+
+    weights, uncovered = weight_matrix([portfolio], scenarios.tickers)
+    assert weights.tolist() == [[0.5, 0.0]] and uncovered.tolist() == [pytest.approx(0.3)]
+    # 0.5 * 20% + 0.3 * 10% (average shock); the remaining 20% is cash
+    assert stress_test([portfolio], scenarios)['losses'][0, 0] == pytest.approx(0.13)
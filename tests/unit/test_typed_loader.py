@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+from data.typed_loader import (
+    downcast_prices,
+    frame_bytes,
+    load_data,
+    pivot_prices
+)
+from pipeline.generation import screen_by_sector
+
+
+def write_sample(test_data_dir):
+    dates = pd.date_range(start='2020-01-01', periods=50, freq='B')
+    tickers = ['AAPL', 'GOOG', 'XOM']
+    prices = pd.DataFrame({
+        'date': np.repeat(dates, len(tickers)),
+        'ticker': tickers * len(dates),
+        'close': np.linspace(100.0, 250.0, len(dates) * len(tickers)).round(2),
+    })
+    metadata = pd.DataFrame({
+        'ticker': tickers,
+        'name': ['Apple', 'Alphabet', 'Exxon'],
+        'sector': ['Technology', 'Technology', 'Energy'],
+        'industry': ['Hardware', 'Internet', 'Oil & Gas'],
+        'volatility': [0.2, 0.25, 0.3],
+        'market_cap': [3e12, 2e12, 4e11],
+        'tags': ['Tech', 'Tech', 'Energy'],
+    })
+    prices_path = test_data_dir / "stock_prices.csv"
+    metadata_path = test_data_dir / "stock_metadata.csv"
+    prices.to_csv(prices_path, index=False)
+    metadata.to_csv(metadata_path, index=False)
+    return prices, str(prices_path), str(metadata_path)
+
+
+def test_load_data_uses_compact_dtypes(tmp_path):
+    """Test that tickers/sectors load as categoricals and prices as float32"""
+    raw_prices, prices_path, metadata_path = write_sample(tmp_path)
+
+    stock_data, metadata = load_data(prices_path, metadata_path)
+
+    assert isinstance(stock_data['ticker'].dtype, pd.CategoricalDtype)
+    assert stock_data['close'].dtype == np.float32
+    assert isinstance(metadata['sector'].dtype, pd.CategoricalDtype)
+    assert metadata['volatility'].dtype == np.float32
+    assert np.allclose(stock_data['close'], raw_prices['close'], atol=0.005)
+    assert frame_bytes(stock_data) < frame_bytes(pd.read_csv(prices_path, parse_dates=['date']))
+
+
+def test_downcast_keeps_float64_when_precision_is_lost():
+    """Test that prices needing more than float32 precision stay float64"""
+    precise = pd.Series([123456789.01, 2.5])
+    assert downcast_prices(precise).dtype == np.float64
+    assert downcast_prices(pd.Series([101.25, 99.99])).dtype == np.float32
+
+
+def test_compact_frames_work_with_consumers(tmp_path):
+    """Test that pivoting and sector screening accept the compact frames"""
+    _, prices_path, metadata_path = write_sample(tmp_path)
+    stock_data, metadata = load_data(prices_path, metadata_path)
+
+    wide = pivot_prices(stock_data)
+
+    assert list(wide.columns) == ['AAPL', 'GOOG', 'XOM']
+    assert wide.shape == (50, 3)
+    assert wide.dtypes.iloc[0] == np.float32
+    assert screen_by_sector(metadata, ['Technology']) == ['AAPL', 'GOOG']
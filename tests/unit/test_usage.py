@@ -0,0 +1,158 @@
+from types import SimpleNamespace
+import pytest
+from agents.usage import (
+    Budget,
+    BudgetExceeded,
+    UsageLedger,
+    UsageRecord,
+    current_run,
+    derived_max_tokens,
+    model_price,
+    record_response,
+    track_run
+)
+import pipeline.generation as generation
+
+
+def fake_response(prompt_tokens, completion_tokens, content='{}', finish_reason='stop'):
+    return SimpleNamespace(
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens),
+        choices=[SimpleNamespace(finish_reason=finish_reason, message=SimpleNamespace(content=content))],
+    )
+
+
+def test_ledger_totals_and_budget():
+    """Test that the ledger sums tokens/cost and reports an exhausted budget"""
+    ledger = UsageLedger(Budget(max_tokens=3000))
+    ledger.add(UsageRecord('FundamentalAgent', 'gpt-35-turbo', 1000, 500, 1.5))
+    ledger.add(UsageRecord('PortfolioManager', 'gpt-35-turbo', 2000, 1000, 4.0))
+
+    totals = ledger.totals()
+    assert totals['calls'] == 2
+    assert totals['prompt_tokens'] == 3000 and totals['completion_tokens'] == 1500
+    assert totals['cost_usd'] == pytest.approx(0.00375)
+    assert ledger.by_agent()['FundamentalAgent']['llm_seconds'] == 1.5
+    assert "token budget" in ledger.exceeded()
+    with pytest.raises(BudgetExceeded):
+        ledger.check()
+
+
+def test_max_tokens_are_derived_from_observed_outputs():
+    """Test that max_tokens follows observed output sizes once enough calls are seen"""
+    ledger = UsageLedger()
+    assert derived_max_tokens('FundamentalAgent', 1024, ledger=ledger) == 1024
+
+    for completion_tokens in range(200, 400, 10):
+        ledger.add(UsageRecord('FundamentalAgent', 'gpt-35-turbo', 500, completion_tokens, 1.0))
+    ledger.add(UsageRecord('FundamentalAgent', 'gpt-35-turbo', 500, 1024, 1.0, truncated=True))
+
+    assert derived_max_tokens('FundamentalAgent', 1024, ledger=ledger) == 585  # p99 390 * 1.5
+    assert derived_max_tokens('FundamentalAgent', 1024, ledger=ledger, headroom=100) == 4096
+
+
+def test_routed_models_are_priced():
+    """Test that larger and versioned models are not costed at the default price"""
+    assert model_price('gpt-4o') == (0.0025, 0.01)
+    assert model_price('gpt-4o-2024-08-06') == (0.0025, 0.01)
+    assert model_price('gpt-4o-mini-2024-07-18') == (0.00015, 0.0006)
+    assert UsageRecord('PortfolioManager', 'gpt-4o', 1000, 1000, 1.0).cost == pytest.approx(0.0125)
+
+
+def test_track_run_attributes_calls_to_the_active_run():
+    """Test that responses are recorded in the run being tracked and nowhere else"""
+    with track_run() as outer:
+        record_response('FundamentalAgent', 'gpt-35-turbo', fake_response(100, 50), 0.1)
+        with track_run() as inner:
+            record = record_response('FundamentalAgent', 'gpt-35-turbo', fake_response(100, 50, finish_reason='length'), 0.1)
+        assert current_run() is outer
+
+    assert record.truncated
+    assert outer.totals()['calls'] == 1
+    assert inner.totals()['calls'] == 1
+    assert current_run() is None
+
+
+class FakeCompletions:
+    def create(self, **kwargs):
+        return fake_response(0, 0, '{"risk_tolerance": "low", "sectors": []}')
+
+
+class FakeClient:
+    chat = SimpleNamespace(completions=FakeCompletions())
+
+
+class MeteredAgent:
+    """Agent stand-in whose calls cost 1000 prompt + 500 completion tokens"""
+    def __init__(self):
+        self.portfolio_calls = []
+
+    def analyze(self, *args, **kwargs):
+        if isinstance(args[0], str):
+            record_response('FundamentalAgent', 'gpt-35-turbo', fake_response(1000, 500), 0.01)
+            return {"overall_score": 0.5, "key_risks": ["long text"]}
+        self.portfolio_calls.append((args, kwargs))
+        return {"portfolio": [{"ticker": t, "weight": 1 / len(args[0])} for t in args[0]]}
+
+
+def test_run_degrades_to_fewer_tickers_within_budget(monkeypatch):
+    """Test that a budgeted run stops analyzing early and allocates with a compact prompt"""
+    monkeypatch.setattr(generation, "GLOBAL_LEDGER", UsageLedger())
+    agent = MeteredAgent()
+    events = []
+    tickers = ["AAPL", "MSFT", "GOOG", "AMZN", "META", "NVDA"]
+
+    result = generation.run_portfolio_generation(
+        FakeClient(), agent, agent, "low", "long_term", [], tickers,
+        progress=lambda event, payload: events.append({"event": event, "payload": payload}),
+        budget=Budget(max_cost_usd=0.01)
+    )
+
+    progress = generation.collect_progress(events)
+    assert 0 < len(result['analyses']) < len(tickers)
+    assert progress['budget']['skipped'] == tickers[len(result['analyses']):]
+    args, kwargs = agent.portfolio_calls[0]
+    assert args[0] == list(result['analyses']) and kwargs == {"compact": True}
+    assert result['usage']['calls'] == len(result['analyses']) + 1  # plus the profile call
+    assert result['usage']['cost_usd'] <= 0.01
+
+
+def test_run_aborts_when_nothing_fits_the_budget(monkeypatch):
+    """Test that a budget too small for a single analysis aborts the run"""
+    monkeypatch.setattr(generation, "GLOBAL_LEDGER", UsageLedger())
+    with pytest.raises(BudgetExceeded):
+        generation.run_portfolio_generation(FakeClient(), MeteredAgent(), MeteredAgent(), "low", "long_term", [],
+                                            ["AAPL"], budget=Budget(max_cost_usd=0.001))
+
+
+def test_budget_exceeded_mid_analysis_keeps_finished_analyses(monkeypatch):
+    """Test that running out of budget inside an analysis allocates from the analyses that finished"""
+    monkeypatch.setattr(generation, "GLOBAL_LEDGER", UsageLedger())
+
+    class ExhaustingAgent(MeteredAgent):
+        def analyze(self, *args, **kwargs):
+            if args[0] == "GOOG":
+                raise BudgetExceeded("cost budget used")
+            return super().analyze(*args, **kwargs)
+
+    agent = ExhaustingAgent()
+    events = []
+    tickers = ["AAPL", "MSFT", "GOOG", "AMZN", "META"]
+    result = generation.run_portfolio_generation(
+        FakeClient(), agent, agent, "low", "long_term", [], tickers,
+        progress=lambda event, payload: events.append({"event": event, "payload": payload}))
+
+    progress = generation.collect_progress(events)
+    assert list(result['analyses']) == ["AAPL", "MSFT"]
+    assert progress['budget'] == {"reason": "cost budget used", "analyzed": 2, "skipped": ["GOOG", "AMZN", "META"]}
+    assert agent.portfolio_calls == []
+    assert {p['ticker'] for p in result['portfolio']['portfolio']} <= {"AAPL", "MSFT"}
+    assert result['portfolio']['draft'] is False
+
+    class SellingAgent(ExhaustingAgent):
+        def analyze(self, *args, **kwargs):
+            analysis = super().analyze(*args, **kwargs)
+            return dict(analysis, recommendation="sell")
+
+    with pytest.raises(BudgetExceeded, match="cost budget used; none of the 2 analyzed tickers"):
+        generation.run_portfolio_generation(FakeClient(), SellingAgent(), agent, "low", "long_term", [], tickers)
+
@@ -0,0 +1,155 @@
+import threading
+import time
+import pytest
+import pipeline.work_queue as work_queue
+from pipeline.work_queue import SQLiteWorkQueue, WorkQueue, enqueue_rebalance, open_queue, run_worker
+
+
+def make_queue(tmp_path):
+    return SQLiteWorkQueue(str(tmp_path / "queue.sqlite3"))
+
+
+def test_leased_task_reappears_when_its_lease_expires(tmp_path):
+    """Test that a task held by a dead worker is leased again, up to max_attempts times"""
+    queue = make_queue(tmp_path)
+    assert queue.put("analysis", {"ticker": "AAPL"}, task_id="t1", max_attempts=2) == "t1"
+    queue.put("analysis", {"ticker": "AAPL"}, task_id="t1", max_attempts=2)
+
+    first = queue.lease("w1", lease_seconds=0.05)
+    assert first.payload == {"ticker": "AAPL"} and first.attempts == 1
+    assert queue.lease("w2") is None
+    assert queue.counts() == {'queued': 0, 'leased': 1, 'done': 0, 'failed': 0}
+
+    time.sleep(0.06)
+    second = queue.lease("w2", lease_seconds=0.05)
+    assert second.id == "t1" and second.attempts == 2
+    assert not queue.extend("t1", "w1")
+
+    time.sleep(0.06)
+    assert queue.lease("w3") is None
+    assert queue.counts()['failed'] == 1
+    assert "Lease expired" in queue.errors()["t1"]
+
+
+def test_results_are_written_once(tmp_path):
+    """Test that a duplicate completion keeps the first result"""
+    queue = make_queue(tmp_path)
+    queue.put("analysis", {}, task_id="t1")
+    queue.lease("w1", lease_seconds=0.01)
+    time.sleep(0.02)
+    queue.lease("w2")
+
+    assert queue.complete("t1", "w2", {"score": 1}, seconds=0.5)
+    assert not queue.complete("t1", "w1", {"score": 2})
+    assert queue.result("t1") == {"score": 1}
+    assert queue.lease("w3") is None
+
+
+def test_failed_tasks_are_retried_then_given_up(tmp_path, monkeypatch):
+    """Test that handler errors are retried until max_attempts and then recorded"""
+    monkeypatch.setattr(work_queue, "RETRY_DELAY", 0.0)
+    queue = make_queue(tmp_path)
+    queue.put("flaky", {}, task_id="flaky", max_attempts=3)
+    queue.put("broken", {}, task_id="broken", max_attempts=2)
+    calls = {"flaky": 0, "broken": 0}
+
+    def flaky(payload):
+        calls["flaky"] += 1
+        if calls["flaky"] < 3:
+            raise RuntimeError("timeout")
+        return "ok"
+
+    def broken(payload):
+        calls["broken"] += 1
+        raise ValueError("bad payload")
+
+    stats = run_worker(queue, {"flaky": flaky, "broken": broken}, worker="w1")
+
+    assert calls == {"flaky": 3, "broken": 2}
+    assert queue.result("flaky") == "ok"
+    assert queue.errors() == {"broken": "bad payload"}
+    assert stats["tasks"] == 1 and stats["failures"] == 4
+    assert queue.worker_stats()["w1"]["failures"] == 4
+
+
+def test_failing_after_losing_the_lease_leaves_the_new_holder_alone(tmp_path):
+    """Test that a stalled worker's failure does not release a task another worker has leased"""
+    queue = make_queue(tmp_path)
+    queue.put("slow", {}, task_id="t1", max_attempts=2)
+    queue.lease("w1", lease_seconds=0.05)
+    time.sleep(0.06)
+    assert queue.lease("w2", lease_seconds=5).attempts == 2
+
+    assert not queue.fail("t1", "w1", "timeout")
+    assert queue.state("t1") == work_queue.LEASED and queue.lease("w3") is None
+    assert queue.extend("t1", "w2") and queue.complete("t1", "w2", "ok")
+    assert queue.errors() == {} and queue.counts() == {'queued': 0, 'leased': 0, 'done': 1, 'failed': 0}
+    assert queue.worker_stats()["w1"]["failures"] == 1
+
+
+def test_concurrent_workers_run_each_task_once(tmp_path):
+    """Test that parallel workers split the queue without running a task twice"""
+    queue = make_queue(tmp_path)
+    queue.put_many({"kind": "square", "payload": {"n": n}, "task_id": f"sq-{n}"} for n in range(40))
+    seen = []
+    lock = threading.Lock()
+
+    def square(payload):
+        with lock:
+            seen.append(payload["n"])
+        time.sleep(0.005)
+        return payload["n"] ** 2
+
+    stats = []
+    threads = [threading.Thread(target=lambda i=i: stats.append(run_worker(open_queue(f"sqlite:///{queue.path}"),
+                                                                          {"square": square}, worker=f"w{i}")))
+               for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(seen) == list(range(40))
+    assert queue.result("sq-7") == 49
+    assert sum(s["tasks"] for s in stats) == 40
+    per_worker = queue.worker_stats()
+    assert sum(w["tasks"] for w in per_worker.values()) == 40
+    assert all(w["tasks_per_busy_sec"] > 0 for w in per_worker.values() if w["tasks"])
+
+
+def test_rebalance_batch_is_enqueued_once_per_day(tmp_path):
+    """Test that re-submitting a client book adds no tasks"""
+    queue = make_queue(tmp_path)
+    clients = [{"client_id": "c1", "risk_tolerance": "moderate", "investment_horizon": "long_term",
+                "sectors": ["Technology"], "tickers": ["AAPL", "MSFT"]},
+               {"client_id": "c2", "risk_tolerance": "conservative", "investment_horizon": "short_term",
+                "sectors": ["Technology"], "tickers": ["MSFT", "JNJ"]}]
+
+    assert enqueue_rebalance(queue, clients, as_of="2024-05-10") == {"analyses": 3, "portfolios": 2}
+    enqueue_rebalance(queue, clients, as_of="2024-05-10")
+
+    assert queue.counts()['queued'] == 5
+    assert [queue.lease("w1").kind for _ in range(5)] == ["analysis"] * 3 + ["portfolio"] * 2
+
+
+def test_rebalance_tasks_carry_the_batch_date(tmp_path):
+    """Test that every task of a batch enqueued without a date records the enqueue date"""
+    from datetime import date
+    queue = make_queue(tmp_path)
+    enqueue_rebalance(queue, [{"client_id": "c1", "risk_tolerance": "moderate", "investment_horizon": "long_term",
+                               "sectors": ["Technology"], "tickers": ["AAPL"]}])
+
+    tasks = [queue.lease("w1"), queue.lease("w1")]
+    assert {task.payload['as_of'] for task in tasks} == {date.today().isoformat()}
+    assert tasks[0].id == f"analysis:AAPL:{date.today().isoformat()}"
+
+
+def test_incomplete_backend_cannot_be_instantiated():
+    """Test that a backend missing part of the interface fails when it is created"""
+    class LeaseOnly(WorkQueue):
+        def lease(self, worker, lease_seconds=0.0):
+            return None
+
+    with pytest.raises(TypeError):
+        LeaseOnly()
+